@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+""" Compare the benchmark results of two commits.
+
+Matches the results of the same task and benchmark setting (format, shape, block shape,
+density, jobs and threads) and reports the relative change of throughput and peak RSS.
+If a commit has several results for the same setting, the most recent one is used.
+
+Example:
+    python compare_benchmarks.py benchmark_results.jsonl <commit_a> <commit_b>
+"""
+import argparse
+import json
+import sys
+
+SETTING_KEYS = ("task", "format", "shape", "block_shape", "density", "max_jobs", "threads_per_job")
+
+
+def load_results(path, commit):
+    results = {}
+    with open(path) as f:
+        for line in f:
+            res = json.loads(line)
+            if res["commit"] is None or not res["commit"].startswith(commit) or not res["success"]:
+                continue
+            setting = tuple(json.dumps(res[key]) for key in SETTING_KEYS)
+            if setting not in results or res["date"] > results[setting]["date"]:
+                results[setting] = res
+    return results
+
+
+def compare_results(path, commit_a, commit_b, tolerance=0.1):
+    """ Compare the results of commit b against commit a.
+
+    Returns the settings where the throughput dropped or the peak RSS grew by more than `tolerance`.
+    """
+    results_a, results_b = load_results(path, commit_a), load_results(path, commit_b)
+    regressions = []
+    print("%-24s %-6s %14s %14s %10s %10s" % ("task", "format", "voxel/s/thread", "change", "rss (MB)", "change"))
+    for setting in sorted(set(results_a) & set(results_b)):
+        res_a, res_b = results_a[setting], results_b[setting]
+        speed = res_b["voxels_per_s_per_thread"] / res_a["voxels_per_s_per_thread"] - 1.
+        rss = res_b["peak_rss_mb"] / res_a["peak_rss_mb"] - 1. if res_a["peak_rss_mb"] > 0 else 0.
+        print("%-24s %-6s %14.3e %+13.1f%% %10.1f %+9.1f%%" % (res_b["task"], res_b["format"],
+                                                             res_b["voxels_per_s_per_thread"], 100 * speed,
+                                                             res_b["peak_rss_mb"], 100 * rss))
+        if speed < -tolerance or rss > tolerance:
+            regressions.append(res_b)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results")
+    parser.add_argument("commit_a")
+    parser.add_argument("commit_b")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+    regressions = compare_results(args.results, args.commit_a, args.commit_b, args.tolerance)
+    if regressions:
+        print("Regressions for:", ", ".join("%s (%s)" % (res["task"], res["format"]) for res in regressions))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
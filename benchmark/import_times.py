@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+""" Measure the import time of the job scripts.
+
+Imports each job module (the job scripts are copies of the modules in the `jobs` sub-packages)
+in a fresh interpreter with `python -X importtime` and reports the total import time and the most
+expensive top-level dependencies. The results are appended to a json-lines file tagged with the commit.
+
+Example:
+    python import_times.py --modules relabel.jobs.merge_uniques relabel.jobs.find_labeling
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import cluster_tools
+
+from run_benchmarks import _get_commit
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(cluster_tools.__file__))
+
+
+def find_job_modules():
+    """ Find the modules that can be run as job scripts.
+    """
+    modules = []
+    for root, dirs, files in os.walk(PACKAGE_DIR):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith(".py") or name == "__init__.py":
+                continue
+            path = os.path.join(root, name)
+            with open(path) as f:
+                if "if __name__ == '__main__':" not in f.read().replace('"', "'"):
+                    continue
+            rel_path = os.path.relpath(path, PACKAGE_DIR)
+            modules.append(os.path.splitext(rel_path)[0].replace(os.sep, "."))
+    return modules
+
+
+def measure_import(module, n_top=5):
+    """ Import the module in a fresh interpreter and parse the import time output.
+    """
+    name = "cluster_tools.%s" % module
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % name],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    lines = res.stderr.decode().splitlines()
+    # the lines have the format 'import time: self [us] | cumulative | imported package'
+    # nested imports are indented by two spaces per level and are listed before the importing package
+    total, timings, group = 0, [], []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative, package = line[len("import time:"):].split("|")
+        level = (len(package) - len(package.lstrip()) - 1) // 2
+        package = package.strip()
+        group.append((package, int(cumulative)))
+        if level > 0:
+            continue
+        # only count the imports triggered by the package, not the ones of the interpreter start-up
+        if package.split(".")[0] == "cluster_tools":
+            total += int(cumulative)
+            timings.extend(group)
+        group = []
+    # report the most expensive dependencies
+    top = sorted([(package, cumulative) for package, cumulative in timings
+                  if "." not in package and package != "cluster_tools"], key=lambda x: x[1], reverse=True)[:n_top]
+    return {"module": module, "success": res.returncode == 0, "import_time_s": total / 1.e6,
+            "top_imports": [{"package": package, "time_s": cumulative / 1.e6} for package, cumulative in top]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=None,
+                        help="the modules to measure, relative to cluster_tools; by default all job scripts")
+    parser.add_argument("--results", default="./import_times.jsonl")
+    args = parser.parse_args()
+
+    modules = find_job_modules() if args.modules is None else args.modules
+    meta = {"commit": _get_commit(), "date": datetime.now().isoformat()}
+    with open(args.results, "a") as f:
+        for module in modules:
+            res = measure_import(module)
+            top = ", ".join("%s: %.2f s" % (imp["package"], imp["time_s"]) for imp in res["top_imports"][:3])
+            print("%-48s %6.2f s (%s)" % (module, res["import_time_s"], top if res["success"] else "failed"))
+            f.write(json.dumps({**meta, **res}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#! /usr/bin/env python
+""" Benchmark the blockwise tasks on synthetic data.
+
+Runs each task via its `LocalTask` implementation in a fresh process and appends
+the throughput (voxels / s / thread), peak RSS and I/O volume to a json-lines results file,
+which can be compared across commits with `compare_benchmarks.py`.
+
+Example:
+    python run_benchmarks.py --shape 128 512 512 --format n5 --max_jobs 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent import futures
+from datetime import datetime
+from shutil import rmtree
+
+import numpy as np
+import luigi
+
+from synthetic_data import make_synthetic_data
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.telemetry_utils as tu
+from cluster_tools.cluster_tasks import BaseClusterTask
+from cluster_tools.utils.task_utils import DummyTask
+
+
+#
+# the benchmarked tasks
+#
+
+# each benchmark returns the task class, the task parameters and the input keys
+# (the data that is processed blockwise) for the data keys and the output path
+def _watershed(keys, out_path):
+    from cluster_tools.watershed.watershed import WatershedLocal
+    return WatershedLocal, dict(input_path=keys["path"], input_key=keys["boundaries"],
+                                output_path=out_path, output_key="watershed"), [keys["boundaries"]]
+
+
+def _initial_sub_graphs(keys, out_path):
+    from cluster_tools.graph.initial_sub_graphs import InitialSubGraphsLocal
+    return InitialSubGraphsLocal, dict(input_path=keys["path"], input_key=keys["labels"],
+                                       graph_path=out_path, dependency=DummyTask()), [keys["labels"]]
+
+
+def _block_edge_features(keys, out_path):
+    from cluster_tools.features.block_edge_features import BlockEdgeFeaturesLocal
+    # needs the sub-graphs from 'initial_sub_graphs'
+    return BlockEdgeFeaturesLocal, dict(input_path=keys["path"], input_key=keys["boundaries"],
+                                        labels_path=keys["path"], labels_key=keys["labels"],
+                                        graph_path=out_path, output_path=os.path.join(os.path.dirname(out_path),
+                                                                                      "features.n5"),
+                                        dependency=DummyTask()), [keys["boundaries"], keys["labels"]]
+
+
+def _solve_subproblems(keys, out_path):
+    from cluster_tools.multicut.solve_subproblems import SolveSubproblemsLocal
+    # needs the problem from `_prepare_problem`
+    return SolveSubproblemsLocal, dict(problem_path=_problem_path(out_path), scale=0,
+                                       dependency=DummyTask()), [keys["labels"]]
+
+
+def _write(keys, out_path):
+    from cluster_tools.write.write import WriteLocal
+    # needs the assignments from `_prepare_assignments`
+    return WriteLocal, dict(input_path=keys["path"], input_key=keys["labels"],
+                            output_path=out_path, output_key="write",
+                            assignment_path=out_path, assignment_key="assignments",
+                            identifier="benchmark"), [keys["labels"]]
+
+
+def _downscaling(keys, out_path):
+    from cluster_tools.downscaling.downscaling import DownscalingLocal
+    return DownscalingLocal, dict(input_path=keys["path"], input_key=keys["boundaries"],
+                                  output_path=out_path, output_key="downscaled/s1",
+                                  scale_factor=2, scale_prefix="s1"), [keys["boundaries"]]
+
+
+def _connected_components(keys, out_path):
+    from cluster_tools.connected_components.connected_component_blocks import ConnectedComponentBlocksLocal
+    return ConnectedComponentBlocksLocal, dict(input_path=keys["path"], input_key=keys["boundaries"],
+                                               output_path=out_path, output_key="components",
+                                               threshold=0.5, threshold_mode="less",
+                                               dependency=DummyTask()), [keys["boundaries"]]
+
+
+def _region_features(keys, out_path):
+    from cluster_tools.features.region_features import RegionFeaturesLocal
+    return RegionFeaturesLocal, dict(input_path=keys["path"], input_key=keys["boundaries"],
+                                     labels_path=keys["path"], labels_key=keys["labels"],
+                                     dependency=DummyTask()), [keys["boundaries"], keys["labels"]]
+
+
+def _find_uniques(keys, out_path):
+    from cluster_tools.relabel.find_uniques import FindUniquesLocal
+    return FindUniquesLocal, dict(input_path=keys["path"], input_key=keys["labels"],
+                                  dependency=DummyTask()), [keys["labels"]]
+
+
+# the order matters, 'block_edge_features' needs the result of 'initial_sub_graphs'
+BENCHMARKS = {"watershed": _watershed,
+              "initial_sub_graphs": _initial_sub_graphs,
+              "block_edge_features": _block_edge_features,
+              "solve_subproblems": _solve_subproblems,
+              "write": _write,
+              "downscaling": _downscaling,
+              "connected_components": _connected_components,
+              "region_features": _region_features,
+              "find_uniques": _find_uniques}
+
+
+#
+# preparation of the inputs for tasks that depend on other tasks
+# (not part of the measurements)
+#
+
+def _problem_path(out_path):
+    return os.path.join(os.path.dirname(out_path), "problem.n5")
+
+
+def _prepare_problem(keys, out_path, work_dir, config_dir, max_jobs):
+    from cluster_tools.workflows import ProblemWorkflow
+    task = ProblemWorkflow(tmp_folder=os.path.join(work_dir, "tmp_problem"), config_dir=config_dir,
+                           max_jobs=max_jobs, target="local",
+                           input_path=keys["path"], input_key=keys["boundaries"],
+                           ws_path=keys["path"], ws_key=keys["labels"],
+                           problem_path=_problem_path(out_path))
+    return luigi.build([task], local_scheduler=True)
+
+
+def _prepare_assignments(keys, out_path, work_dir, config_dir, max_jobs):
+    with vu.file_reader(keys["path"], "r") as f:
+        n_labels = f[keys["labels"]].attrs["maxId"] + 1
+    assignments = np.random.default_rng(0).integers(0, max(n_labels // 2, 1), size=n_labels, dtype="uint64")
+    with vu.file_reader(out_path, "a") as f:
+        f.create_dataset("assignments", data=assignments, chunks=assignments.shape, compression="gzip")
+    return True
+
+
+PREPARATIONS = {"solve_subproblems": _prepare_problem, "write": _prepare_assignments}
+
+
+#
+# run and measure the tasks
+#
+
+def _run_task(name, keys, out_path, work_dir, config_dir, max_jobs):
+    """ Run a single benchmark; is called in a fresh process,
+    so that the resource usage of the children only covers the jobs of this task.
+    """
+    task_cls, params, input_keys = BENCHMARKS[name](keys, out_path)
+    tmp_folder = os.path.join(work_dir, "tmp_%s" % name)
+    task = task_cls(tmp_folder=tmp_folder, config_dir=config_dir, max_jobs=max_jobs, **params)
+
+    t0 = time.time()
+    success = luigi.build([task], local_scheduler=True)
+    runtime = time.time() - t0
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    with vu.file_reader(keys["path"], "r") as f:
+        input_bytes = sum(int(np.prod(f[key].shape)) * f[key].dtype.itemsize for key in input_keys)
+        n_voxels = int(np.prod(f[input_keys[0]].shape[-3:]))
+
+    telemetry = {job_name: tu.summarize_events(tu.load_events(paths), n_slowest=5)
+                 for job_name, paths in tu.find_telemetry_files(tmp_folder).items()}
+    # ru_maxrss is in kB on linux; it is the peak RSS of the largest job
+    # (the blocks are processed in threads in the jobs)
+    return {"success": bool(success), "runtime": runtime, "n_voxels": n_voxels,
+            "peak_rss_mb": usage.ru_maxrss / 1.e3,
+            "input_mb": input_bytes / 1.e6,
+            # block I/O counts 512 byte blocks, reads served from the page cache are not counted
+            "io_read_mb": usage.ru_inblock * 512 / 1.e6,
+            "io_write_mb": usage.ru_oublock * 512 / 1.e6,
+            "telemetry": telemetry}
+
+
+def _write_configs(config_dir, block_shape, threads_per_job):
+    os.makedirs(config_dir, exist_ok=True)
+    config = BaseClusterTask.default_global_config()
+    config.update({"block_shape": block_shape, "telemetry": True})
+    with open(os.path.join(config_dir, "global.config"), "w") as f:
+        json.dump(config, f)
+
+    dummy_keys = {"path": "", "boundaries": "", "labels": ""}
+    for name, benchmark in BENCHMARKS.items():
+        task_cls = benchmark(dummy_keys, "")[0]
+        task_config = task_cls.default_task_config()
+        task_config.update({"threads_per_job": threads_per_job})
+        with open(os.path.join(config_dir, "%s.config" % task_cls.task_name), "w") as f:
+            json.dump(task_config, f)
+
+
+def _get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def run_benchmarks(work_dir, results_path, shape, block_shape, density=1.e-4,
+                   data_format="n5", max_jobs=4, threads_per_job=1, tasks=None):
+    """ Run the benchmarks and append the results to the results file.
+
+    Arguments:
+        work_dir [str] - folder for the data, the outputs and the tmp folders
+        results_path [str] - json-lines file for the results
+        shape [list] - shape of the synthetic volumes
+        block_shape [list] - block shape of the tasks, also used as chunk shape for the data
+        density [float] - density of the segments in the synthetic data (default: 1.e-4)
+        data_format [str] - file format of the synthetic data (default: 'n5')
+        max_jobs [int] - number of jobs per task (default: 4)
+        threads_per_job [int] - number of threads per job (default: 1)
+        tasks [list] - the tasks to benchmark, by default all tasks in `BENCHMARKS` (default: None)
+    """
+    tasks = list(BENCHMARKS) if tasks is None else tasks
+    for name in tasks:
+        if name not in BENCHMARKS:
+            raise ValueError("Invalid benchmark %s, expected one of %s" % (name, ", ".join(BENCHMARKS)))
+    # 'block_edge_features' needs the sub-graphs of 'initial_sub_graphs'
+    if "block_edge_features" in tasks and "initial_sub_graphs" not in tasks:
+        tasks.insert(tasks.index("block_edge_features"), "initial_sub_graphs")
+
+    data_folder = os.path.join(work_dir, "data_%s" % data_format)
+    path, keys = make_synthetic_data(data_folder, shape, block_shape, density, data_format)
+    keys = {"path": path, **keys}
+
+    # the outputs are always written to n5, because h5 does not support parallel writes
+    run_dir = os.path.join(work_dir, "run")
+    rmtree(run_dir, ignore_errors=True)
+    out_path = os.path.join(run_dir, "outputs.n5")
+    config_dir = os.path.join(run_dir, "configs")
+    _write_configs(config_dir, block_shape, threads_per_job)
+
+    meta = {"commit": _get_commit(), "date": datetime.now().isoformat(),
+            "format": data_format, "shape": list(shape), "block_shape": list(block_shape),
+            "density": density, "max_jobs": max_jobs, "threads_per_job": threads_per_job}
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for name in tasks:
+        if name in PREPARATIONS:
+            assert PREPARATIONS[name](keys, out_path, run_dir, config_dir, max_jobs), "Preparation of %s failed" % name
+        with futures.ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            res = pool.submit(_run_task, name, keys, out_path, run_dir, config_dir, max_jobs).result()
+        n_threads = max_jobs * threads_per_job
+        res["voxels_per_s_per_thread"] = res["n_voxels"] / res["runtime"] / n_threads
+        res = {"task": name, **meta, **res}
+        print("%s: %.2f s, %.3e voxels / s / thread, peak rss %.1f MB, success: %s" %
+              (name, res["runtime"], res["voxels_per_s_per_thread"], res["peak_rss_mb"], res["success"]))
+        with open(results_path, "a") as f:
+            f.write(json.dumps(res) + "\n")
+        results.append(res)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--work_dir", default="./benchmark_tmp")
+    parser.add_argument("--results", default="./benchmark_results.jsonl")
+    parser.add_argument("--shape", type=int, nargs=3, default=[64, 256, 256])
+    parser.add_argument("--block_shape", type=int, nargs=3, default=[32, 128, 128])
+    parser.add_argument("--density", type=float, default=1.e-4)
+    parser.add_argument("--format", default="n5", choices=["n5", "zarr", "h5"])
+    parser.add_argument("--max_jobs", type=int, default=4)
+    parser.add_argument("--threads_per_job", type=int, default=1)
+    parser.add_argument("--tasks", nargs="+", default=None, choices=list(BENCHMARKS))
+    args = parser.parse_args()
+    results = run_benchmarks(args.work_dir, args.results, args.shape, args.block_shape, args.density,
+                             args.format, args.max_jobs, args.threads_per_job, args.tasks)
+    sys.exit(0 if all(res["success"] for res in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+from itertools import product
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+from scipy.spatial import cKDTree
+
+import cluster_tools.utils.volume_utils as vu
+
+FORMATS = {"n5": ".n5", "zarr": ".zarr", "h5": ".h5"}
+
+# offsets of the (boundary) affinity channels
+OFFSETS = [[-1, 0, 0], [0, -1, 0], [0, 0, -1]]
+# smoothing and noise of the boundaries and affinities
+SIGMA = 1.
+NOISE = 0.1
+HALO = int(np.ceil(3 * SIGMA)) + 1
+
+
+def _chunk_bbs(shape, chunks):
+    ranges = [range(0, sh, ch) for sh, ch in zip(shape, chunks)]
+    for begin in product(*ranges):
+        yield tuple(slice(b, min(b + ch, sh)) for b, ch, sh in zip(begin, chunks, shape))
+
+
+def _labels_in_bb(tree, bb):
+    grid = np.meshgrid(*[np.arange(b.start, b.stop) for b in bb], indexing="ij")
+    coords = np.stack([g.ravel() for g in grid], axis=1)
+    _, nearest = tree.query(coords)
+    # label 0 is reserved for the background
+    return (nearest + 1).astype("uint64").reshape(grid[0].shape)
+
+
+def _boundaries(labels, rng):
+    bd = np.zeros(labels.shape, dtype="float32")
+    for axis in range(labels.ndim):
+        diff = np.diff(labels, axis=axis) != 0
+        lower = tuple(slice(None, -1) if ax == axis else slice(None) for ax in range(labels.ndim))
+        upper = tuple(slice(1, None) if ax == axis else slice(None) for ax in range(labels.ndim))
+        bd[lower][diff] = 1.
+        bd[upper][diff] = 1.
+    bd = gaussian_filter(bd, SIGMA)
+    bd += NOISE * rng.standard_normal(bd.shape).astype("float32")
+    return np.clip(bd, 0., 1.)
+
+
+def _affinities(labels, rng):
+    affs = np.zeros((len(OFFSETS),) + labels.shape, dtype="float32")
+    for chan, offset in enumerate(OFFSETS):
+        axis = [ax for ax, off in enumerate(offset) if off != 0][0]
+        diff = np.diff(labels, axis=axis) != 0
+        upper = tuple(slice(1, None) if ax == axis else slice(None) for ax in range(labels.ndim))
+        affs[chan][upper][diff] = 1.
+        affs[chan] = gaussian_filter(affs[chan], SIGMA)
+    affs += NOISE * rng.standard_normal(affs.shape).astype("float32")
+    return np.clip(affs, 0., 1.)
+
+
+def make_synthetic_data(folder, shape, chunks, density=1.e-4, data_format="n5", seed=42):
+    """ Generate synthetic label, boundary and affinity volumes.
+
+    The labels are the voronoi tesselation of random seeds; the number of seeds is
+    `density` times the number of voxels. Boundaries and affinities are derived from
+    the label boundaries, smoothed and with additive noise. The volumes are generated
+    chunk by chunk, so that large volumes can be generated with little memory.
+
+    Arguments:
+        folder [str] - folder for the data file
+        shape [tuple] - shape of the volumes
+        chunks [tuple] - chunk shape of the volumes
+        density [float] - density of the segments (default: 1.e-4)
+        data_format [str] - file format, one of 'n5', 'zarr' or 'h5' (default: 'n5')
+        seed [int] - random seed (default: 42)
+    Returns:
+        str - path to the data file
+        dict - keys of the volumes
+    """
+    if data_format not in FORMATS:
+        raise ValueError("Invalid data format %s, expected one of %s" % (data_format, ", ".join(FORMATS)))
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "data%s" % FORMATS[data_format])
+    keys = {"labels": "labels", "boundaries": "boundaries", "affinities": "affinities"}
+
+    rng = np.random.default_rng(seed)
+    n_seeds = max(int(np.prod(shape) * density), 1)
+    seeds = np.stack([rng.uniform(0, sh, size=n_seeds) for sh in shape], axis=1)
+    tree = cKDTree(seeds)
+
+    with vu.file_reader(path, "a") as f:
+        ds_labels = f.require_dataset(keys["labels"], shape=tuple(shape), chunks=tuple(chunks),
+                                      dtype="uint64", compression="gzip")
+        ds_bd = f.require_dataset(keys["boundaries"], shape=tuple(shape), chunks=tuple(chunks),
+                                  dtype="float32", compression="gzip")
+        ds_affs = f.require_dataset(keys["affinities"], shape=(len(OFFSETS),) + tuple(shape),
+                                    chunks=(1,) + tuple(chunks), dtype="float32", compression="gzip")
+
+        for chunk_id, bb in enumerate(_chunk_bbs(shape, chunks)):
+            # compute the labels with a halo for smoothing the boundaries
+            bb_halo = tuple(slice(max(b.start - HALO, 0), min(b.stop + HALO, sh)) for b, sh in zip(bb, shape))
+            inner = tuple(slice(b.start - bh.start, b.stop - bh.start) for b, bh in zip(bb, bb_halo))
+            labels = _labels_in_bb(tree, bb_halo)
+            chunk_rng = np.random.default_rng(seed + chunk_id + 1)
+            ds_labels[bb] = labels[inner]
+            ds_bd[bb] = _boundaries(labels, chunk_rng)[inner]
+            ds_affs[(slice(None),) + bb] = _affinities(labels, chunk_rng)[(slice(None),) + inner]
+
+        ds_labels.attrs["maxId"] = n_seeds
+        ds_affs.attrs["offsets"] = OFFSETS
+    return path, keys
@@ -1,5 +1,11 @@
-from .workflows import (AgglomerativeClusteringWorkflow, LiftedMulticutSegmentationWorkflow,
-                        MulticutSegmentationWorkflow, SimpleStitchingWorkflow)
-from .connected_components import ConnectedComponentsWorkflow, ConnectedComponentsAndWatershedWorkflow
-
 from .version import __version__
+from .utils.lazy_utils import lazy_exports
+
+# the workflows are imported lazily, so that the job scripts, which import
+# modules from this package, don't import all workflows and their dependencies
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".workflows": ["AgglomerativeClusteringWorkflow", "LiftedMulticutSegmentationWorkflow",
+                   "MulticutSegmentationWorkflow", "SimpleStitchingWorkflow"],
+    ".connected_components": ["ConnectedComponentsWorkflow", "ConnectedComponentsAndWatershedWorkflow"],
+    ".in_memory": ["multicut_segmentation", "lifted_multicut_segmentation"],
+})
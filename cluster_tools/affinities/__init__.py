@@ -1,3 +1,8 @@
-from .embedding_distances import EmbeddingDistancesLSF, EmbeddingDistancesLocal, EmbeddingDistancesSlurm
-from .gradients import GradientsLSF, GradientsLocal, GradientsSlurm
-from .insert_affinities_workflow import InsertAffinitiesWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".embedding_distances": ["EmbeddingDistancesLSF", "EmbeddingDistancesExecutor",
+                             "EmbeddingDistancesLocal", "EmbeddingDistancesSlurm"],
+    ".gradients": ["GradientsLSF", "GradientsExecutor", "GradientsLocal", "GradientsSlurm"],
+    ".insert_affinities_workflow": ["InsertAffinitiesWorkflow"],
+})
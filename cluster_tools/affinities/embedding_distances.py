@@ -1,19 +1,11 @@
-#! /usr/bin/python
-
 import os
-import sys
 import json
 
-import numpy as np
-
 import luigi
-import nifty.tools as nt
-from affogato.affinities import compute_embedding_distances
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
 from cluster_tools.utils.task_utils import DummyTask
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -25,7 +17,7 @@ class EmbeddingDistancesBase(luigi.Task):
     """
 
     task_name = 'embedding_distances'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'embedding_distances.py'))
     allow_retry = False
 
     path_dict = luigi.Parameter()
@@ -131,74 +123,8 @@ class EmbeddingDistancesLSF(EmbeddingDistancesBase, LSFTask):
     pass
 
 
-def _embedding_distances_block(block_id, blocking,
-                               input_datasets, ds, offsets,
-                               norm):
-    fu.log("start processing block %i" % block_id)
-    halo = np.max(np.abs(offsets), axis=0)
-
-    block = blocking.getBlockWithHalo(block_id, halo.tolist())
-    outer_bb = vu.block_to_bb(block.outerBlock)
-    inner_bb = (slice(None),) + vu.block_to_bb(block.innerBlock)
-    local_bb = (slice(None),) + vu.block_to_bb(block.innerBlockLocal)
-
-    bshape = tuple(ob.stop - ob.start for ob in outer_bb)
-    # TODO support multi-channel input data
-    n_inchannels = len(input_datasets)
-    in_shape = (n_inchannels,) + bshape
-    in_data = np.zeros(in_shape, dtype='float32')
-
-    for chan, inds in enumerate(input_datasets):
-        in_data[chan] = inds[outer_bb]
-
-    # TODO support thresholding the embedding before distance caclulation
-    distance = compute_embedding_distances(in_data, offsets, norm)
-    ds[inner_bb] = distance[local_bb]
-
-    fu.log_block_success(block_id)
-
-
-def embedding_distances(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    path_dict = config['path_dict']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    block_list = config['block_list']
-    block_shape = config['block_shape']
-    offsets = config['offsets']
-    norm = config['norm']
-
-    # TODO support thresholding
-    threshold = config['threshold']
-    # threshold_mode = config['threshold_mode']
-    assert threshold is None
-
-    with open(path_dict) as f:
-        path_dict = json.load(f)
-
-    input_datasets = []
-    for path in sorted(path_dict):
-        input_datasets.append(vu.file_reader(path, 'r')[path_dict[path]])
-
-    with vu.file_reader(output_path) as f:
-
-        ds = f[output_key]
-
-        shape = ds.shape[1:]
-        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
-        [_embedding_distances_block(block_id, blocking, input_datasets, ds, offsets, norm)
-         for block_id in block_list]
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    embedding_distances(job_id, path)
+class EmbeddingDistancesExecutor(EmbeddingDistancesBase, ExecutorTask):
+    """
+    EmbeddingDistances on executor
+    """
+    pass
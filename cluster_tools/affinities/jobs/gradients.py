@@ -0,0 +1,104 @@
+#! /usr/bin/python
+
+import os
+import sys
+import json
+
+import numpy as np
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+# np.gradient returns a list of len 3 corresponding to the gradient
+# along each direction. I am not sure if we want to average
+# along that as done here, or keep the dimension information
+def _compute_average_gradients(input_datasets, shape, outer_bb):
+    out_data = np.zeros(shape, dtype='float32')
+    for chan, inds in enumerate(input_datasets):
+        x = inds[outer_bb]
+        x = np.array(np.gradient(x))
+        x = np.mean(x, axis=0)
+        assert x.shape == out_data.shape
+        out_data = (x + out_data * chan) / (chan + 1)
+    return out_data
+
+
+def _compute_all_gradients(input_datasets, shape, outer_bb):
+    out_data = np.zeros(shape, dtype='float32')
+    for chan, inds in enumerate(input_datasets):
+        x = inds[outer_bb]
+        x = np.array(np.gradient(x))
+        x = np.mean(x, axis=0)
+        out_data[chan] = x
+    return out_data
+
+
+def _gradients_block(block_id, blocking,
+                     input_datasets, ds, halo,
+                     average_gradient):
+    fu.log_block_start(block_id)
+
+    block = blocking.getBlockWithHalo(block_id, halo)
+    outer_bb = vu.block_to_bb(block.outerBlock)
+    inner_bb = vu.block_to_bb(block.innerBlock)
+    local_bb = vu.block_to_bb(block.innerBlockLocal)
+
+    bshape = tuple(ob.stop - ob.start for ob in outer_bb)
+    if average_gradient:
+        out_shape = bshape
+        out_data = _compute_average_gradients(input_datasets, out_shape, outer_bb)
+    else:
+        n_channels = len(input_datasets)
+        out_shape = (n_channels,) + bshape
+        out_data = _compute_all_gradients(input_datasets, out_shape, outer_bb)
+
+        inner_bb = (slice(None),) + inner_bb
+        local_bb = (slice(None),) + local_bb
+
+    ds[inner_bb] = out_data[local_bb]
+    fu.log_block_success(block_id)
+
+
+def gradients(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+    path_dict = config['path_dict']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+    average_gradient = config['average_gradient']
+
+    with open(path_dict) as f:
+        path_dict = json.load(f)
+
+    input_datasets = []
+    for path in sorted(path_dict):
+        input_datasets.append(vu.file_reader(path, 'r')[path_dict[path]])
+
+    # 5 pix should be enough halo to make gradient computation correct
+    halo = 3 * [5]
+    with vu.file_reader(output_path) as f:
+        ds = f[output_key]
+        shape = ds.shape if average_gradient else ds.shape[1:]
+        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
+        [_gradients_block(block_id, blocking, input_datasets,
+                          ds, halo, average_gradient)
+         for block_id in block_list]
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    gradients(job_id, path)
@@ -1,17 +1,10 @@
-#! /usr/bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import numpy as np
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
 from cluster_tools.utils.task_utils import DummyTask
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -22,7 +15,7 @@ class ToBoundariesBase(luigi.Task):
     """ ToBoundaries base class
     """
     task_name = 'to_boundaries'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'to_boundaries.py'))
     allow_retry = True
 
     input_path = luigi.Parameter()
@@ -99,56 +92,8 @@ class ToBoundariesLSF(ToBoundariesBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _to_boundaries_block(block_id, blocking,
-                         ds_in, ds_out, accumulator,
-                         channel_begin, channel_end):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-    bb_in = (slice(channel_begin, channel_end),) + bb
-    affs = ds_in[bb_in]
-    bd = accumulator(affs, axis=0).astype(ds_out.dtype)
-    ds_out[bb] = bd
-    fu.log_block_success(block_id)
-
-
-def to_boundaries(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    input_path = config['input_path']
-    input_key = config['input_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    block_list = config['block_list']
-    block_shape = config['block_shape']
-
-    accumulation_method = config['accumulation_method']
-    channel_begin = config['channel_begin']
-    channel_end = config['channel_end']
-
-    accumulator = getattr(np, accumulation_method)
-
-    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path, 'a') as f_out:
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-        shape = ds_out.shape
-        blocking = nt.blocking([0, 0, 0], shape, block_shape)
-        [_to_boundaries_block(block_id, blocking, ds_in, ds_out,
-                              accumulator, channel_begin, channel_end)
-         for block_id in block_list]
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    to_boundaries(job_id, path)
+class ToBoundariesExecutor(ToBoundariesBase, ExecutorTask):
+    """
+    ToBoundaries on executor
+    """
+    pass
@@ -1,12 +1,24 @@
+import io
 import os
 import shutil
 import stat
 import json
 import time
 import fileinput
+import hashlib
+import heapq
 import sys
+import importlib
+import re
+import math
+import multiprocessing
+import runpy
+import signal
+import traceback
+from contextlib import nullcontext, redirect_stdout, redirect_stderr
 from copy import deepcopy
 from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
 from subprocess import call, check_output, CalledProcessError, STDOUT
 from datetime import datetime, timedelta
 from multiprocessing import cpu_count
@@ -14,6 +26,18 @@ from multiprocessing import cpu_count
 import numpy as np
 import luigi
 
+from .utils import block_queue as bq
+from .utils import blocking_utils as blu
+from .utils import completion_utils as cu
+from .utils import manifest_utils as mfu
+from .utils import memory_utils as mu
+from .utils import occupancy_utils as ou
+from .utils import profile_utils as pu
+from .utils import reduce_utils as rdu
+from .utils import resource_utils as ru
+from .utils import telemetry_utils as tu
+from .utils import thread_utils as thu
+from .utils import volume_utils as vu
 from .utils.parse_utils import parse_blocks_task, parse_job, parse_job_lsf
 from .utils.task_utils import DummyTask
 
@@ -69,6 +93,31 @@ class BaseClusterTask(luigi.Task):
     allow_retry = True
     # number of retries already done
     n_retries = 0
+    # does the job script get its blocks via `block_queue.job_blocks`?
+    # set to true in deriving class to support the block queue
+    supports_block_queue = False
+    # can straggler jobs be duplicated (speculative execution)?
+    # set to true in deriving class if the blocks are written idempotently, the job script gets
+    # its blocks via `block_queue.job_blocks` and there are no outputs that depend on the job id
+    allow_speculation = False
+    # can blocks that ran out of memory be processed as sub-blocks in the retry?
+    # set to true in deriving class if the job script processes the sub-blocks given by `split_blocks`
+    # in the job config, otherwise the memory limit is increased for the retry
+    allow_block_splitting = False
+    # name of the output dataset (parameters `<name>_path` and `<name>_key`) whose block occupancy
+    # is recorded by the job script via `occupancy_utils.record_block`
+    occupancy_output = None
+    # does the task restrict its blocks to the dirty regions via `restrict_to_dirty_regions`?
+    # set to true in deriving class; if the dirty regions change, these tasks and the tasks that depend
+    # on them are run again, the other tasks are not affected
+    supports_dirty_regions = False
+    # job script that runs the actual script under cProfile, used if `profile` is set in the global config
+    # the first line is replaced by the shebang
+    profile_launcher = ("#! /bin/python\n\n"
+                        "import sys\n"
+                        "from cluster_tools.utils.profile_utils import run_profiled\n\n"
+                        "if __name__ == '__main__':\n"
+                        "    run_profiled(%r, sys.argv[1])\n")
 
     #
     # API
@@ -117,9 +166,29 @@ class BaseClusterTask(luigi.Task):
         job_name = self.task_name if job_prefix is None else '%s_%s' % (self.task_name,
                                                                         job_prefix)
         log_prefix = os.path.join(self.tmp_folder, 'logs', '%s_' % job_name)
-        success_list = self.parse_jobs(log_prefix, n_jobs)
+        speculative_jobs = getattr(self, 'speculative_jobs', {})
+        success_list = self._passed_jobs(log_prefix, n_jobs + len(speculative_jobs), job_prefix)
+        # a job has passed if either the job or its speculative copy has passed
+        success_list = sorted(set(job_id for job_id in success_list if job_id < n_jobs) |
+                              set(job_id for job_id, copy_id in speculative_jobs.items() if copy_id in success_list))
+        if self.get_global_config().get('profile', False):
+            self._merge_profiles(job_prefix)
+        if self.get_global_config().get('resource_history', None) is not None:
+            self._record_resources(job_prefix)
+        if getattr(self, '_occupancy_output', None) is not None:
+            self._update_occupancy_index(job_prefix)
+        if self.get_global_config().get('memory_watchdog', False):
+            self._summarize_block_memory(job_prefix)
 
         if len(success_list) == n_jobs:
+            if getattr(self, '_occupancy_output', None) is not None:
+                self._save_occupancy_index()
+            if getattr(self, '_dirty_blocks', None) is not None:
+                self._propagate_dirty_regions()
+            # the processed blocks are only kept to resume a run that did not finish
+            db_path = self._completion_db_path()
+            if db_path is not None:
+                cu.reset(db_path, job_name)
             self._write_log("%s finished successfully" % self.task_name)
         else:
             failed_jobs = set(range(n_jobs)) - set(success_list)
@@ -131,18 +200,25 @@ class BaseClusterTask(luigi.Task):
                 self._write_log("corresponds to failed slurm ids:")
                 failed_slurm_ids = [self.slurm_ids[fjob_id] for fjob_id in list(failed_jobs)]
                 self._write_log("%s" % ', '.join(map(str, failed_slurm_ids)))
+                slurm_states = getattr(self, 'slurm_states', {})
+                if slurm_states:
+                    self._write_log("with final states:")
+                    self._write_log("%s" % ', '.join(slurm_states.get(slurm_id, 'UNKNOWN')
+                                                     for slurm_id in failed_slurm_ids))
 
             # check if conditions to retry jobs are met
             max_num_retries = self.get_global_config().get('max_num_retries', 0)
             # does the number of retries exceed the max number of retries?
-            # does this task allow for retries?
-            retry = (self.n_retries < max_num_retries) and self.allow_retry
+            # does this task allow for retries? (the levels of a reduction tree are not retried)
+            retry = (self.n_retries < max_num_retries) and self.allow_retry and\
+                job_prefix not in getattr(self, '_reduce_prefixes', ())
             # have at least 50 % of the jobs passed?
             # we use this as heuristic to determine if something is fundementally broken.
             retry = retry and len(failed_jobs) / n_jobs <= 0.5
 
             if retry:
                 failed_blocks = self.get_failed_blocks(n_jobs, success_list, job_prefix)
+                self._handle_oom_failures(failed_jobs, failed_blocks, job_prefix)
                 self._write_log("resubmitting %i failed blocks in %i retry attempt" % (len(failed_blocks),
                                                                                        self.n_retries + 1))
                 self.n_retries += 1
@@ -158,17 +234,85 @@ class BaseClusterTask(luigi.Task):
                                                                             len(failed_jobs),
                                                                             n_jobs))
 
+    def _oom_jobs(self, failed_jobs, job_prefix=None):
+        """ Find the failed jobs that ran out of memory.
+
+        A job ran out of memory if the scheduler reports it, if its logs contain an out of memory error
+        or if its recorded peak memory has reached `oom_rss_fraction` (global config) of the `mem_limit`.
+        """
+        mem_limit = self.get_task_config().get('mem_limit', None)
+        rss_limit = None if not isinstance(mem_limit, (int, float)) else\
+            1024. * mem_limit * self.get_global_config().get('oom_rss_fraction', 0.95)
+        slurm_states = getattr(self, 'slurm_states', {})
+        job_name = self._job_name(job_prefix)
+        oom_jobs = []
+        for job_id in sorted(failed_jobs):
+            state = slurm_states.get(self.slurm_ids[job_id], None) if slurm_states else None
+            log_paths = [os.path.join(self.tmp_folder, 'logs', '%s_%i.log' % (job_name, job_id)),
+                         os.path.join(self.tmp_folder, 'error_logs', '%s_%i.err' % (job_name, job_id))]
+            peak_rss = ru.load_peak_rss(ru.get_peak_rss_path(self._config_path(job_id, job_prefix)))
+            if ru.is_oom_failure(state, log_paths, peak_rss, rss_limit):
+                oom_jobs.append(job_id)
+        return oom_jobs
+
+    def _handle_oom_failures(self, failed_jobs, failed_blocks, job_prefix=None):
+        """ Adapt the retry for the jobs that ran out of memory.
+
+        If the task allows it (`allow_block_splitting`), the failed blocks of these jobs are processed
+        as sub-blocks, which are halved for each retry. Otherwise the `mem_limit` is increased by
+        `oom_mem_factor` (global config) for the retry; set it to None to retry without changes.
+        """
+        mem_factor = self.get_global_config().get('oom_mem_factor', 2.)
+        if mem_factor is None:
+            return
+        oom_jobs = self._oom_jobs(failed_jobs, job_prefix)
+        if not oom_jobs:
+            return
+        self._write_log("jobs %s ran out of memory" % ', '.join(map(str, oom_jobs)))
+
+        if self.allow_block_splitting:
+            # the blocks of a job are not known in advance if they are pulled from the block queue
+            if self._use_block_queue():
+                oom_blocks = failed_blocks
+            else:
+                job_blocks = set(block_id for job_id in oom_jobs
+                                 for block_id in self._load_job_config(job_id, job_prefix)['block_list'])
+                oom_blocks = [block_id for block_id in failed_blocks if block_id in job_blocks]
+            # the number of times each block has been split
+            split_blocks = getattr(self, '_split_blocks', {})
+            for block_id in oom_blocks:
+                split_blocks[block_id] = split_blocks.get(block_id, 0) + 1
+            self._split_blocks = split_blocks
+            self._write_log("process %i blocks as sub-blocks in the retry" % len(oom_blocks))
+        else:
+            self._mem_factor = getattr(self, '_mem_factor', 1.) * mem_factor
+            self._write_log("increase the memory limit by a factor of %.2f for the retry" % self._mem_factor)
+
+    def _passed_jobs(self, log_prefix, n_jobs, job_prefix=None):
+        db_path = self._completion_db_path()
+        if db_path is None:
+            return self.parse_jobs(log_prefix, n_jobs)
+        return cu.get_passed_jobs(db_path, self._job_name(job_prefix), n_jobs)
+
     def get_failed_blocks(self, n_jobs, passed_jobs=[], job_prefix=None):
         """ Parse the log of failed jobs to find the ids of all blocks that have failed.
         """
         job_name = self.task_name if job_prefix is None else '%s_%s' % (self.task_name,
                                                                         job_prefix)
+        # if we have the completion db, we can just look up the processed blocks
+        db_path = self._completion_db_path()
+        if db_path is not None:
+            passed_blocks = cu.get_passed_blocks(db_path, job_name)
+            return list(set(self.block_list) - set(passed_blocks))
+
         # for the jobs that have completely passed, we can add the block list from the config
-        passed_blocks = []
-        for job_id in passed_blocks:
-            config_path = self._config_path(job_id, job_prefix)
-            with open(config_path, 'r') as f:
-                passed_blocks.extend(json.load(f)['block_list'])
+        # or the blocks they have claimed from the block queue
+        if self._use_block_queue():
+            passed_blocks = bq.get_claimed_blocks(bq.get_db_path(self.tmp_folder), job_name, passed_jobs)
+        else:
+            passed_blocks = []
+            for job_id in passed_jobs:
+                passed_blocks.extend(self._load_job_config(job_id, job_prefix)['block_list'])
 
         # for the failed jobs, we parse the output logs
         log_prefix = os.path.join(self.tmp_folder, 'logs', '%s_' % job_name)
@@ -182,15 +326,42 @@ class BaseClusterTask(luigi.Task):
 
         Reads the task config from 'config_dir/task_name.config'.
         If this does not exist, returns the default task config.
+        The resources `time_limit`, `mem_limit` and `threads_per_job` can be set to "auto",
+        in which case they are estimated from the `resource_history` of previous runs.
+        The `mem_limit` is increased for retries of jobs that ran out of memory.
         """
         config_path = os.path.join(self.config_dir, self.task_name + '.config')
         if os.path.exists(config_path):
             self._write_log("reading task config from %s" % config_path)
             with open(config_path, 'r') as f:
-                return json.load(f)
+                config = json.load(f)
         else:
             self._write_log("reading default task config")
-            return self.default_task_config()
+            config = self.default_task_config()
+        if any(config.get(name, None) == "auto" for name in ru.AUTO_RESOURCES):
+            config = self._resolve_auto_resources(config)
+        mem_factor = getattr(self, '_mem_factor', 1.)
+        if mem_factor != 1. and isinstance(config.get('mem_limit', None), (int, float)):
+            config = deepcopy(config)
+            config['mem_limit'] = round(config['mem_limit'] * mem_factor, 2)
+        return config
+
+    def _resolve_auto_resources(self, config):
+        # estimate the resources set to "auto" from the previous runs of this task with the same block shape,
+        # if there is no history yet we fall back to the default resources
+        global_config = self.get_global_config()
+        if not hasattr(self, '_resource_records'):
+            self._resource_records = ru.load_history(global_config.get('resource_history', None),
+                                                     self.task_name, global_config['block_shape'])
+        estimate = ru.estimate_resources(self._resource_records, getattr(self, 'blocks_per_job', None),
+                                         percentile=global_config.get('resource_percentile', 95),
+                                         margin=global_config.get('resource_margin', 1.2))
+        defaults = {**BaseClusterTask.default_task_config(), **self.default_task_config()}
+        config = deepcopy(config)
+        for name in ru.AUTO_RESOURCES:
+            if config.get(name, None) == "auto":
+                config[name] = estimate.get(name, defaults[name])
+        return config
 
     @staticmethod
     def default_task_config():
@@ -232,13 +403,46 @@ class BaseClusterTask(luigi.Task):
                 "max_num_retries": 0,
                 "block_list_path": None,
                 "easybuild": True,
-                "qos": "normal"}
+                "qos": "normal",
+                "local_worker_pool": False,
+                "job_array": False,
+                "job_array_limit": None,
+                "poll_interval": 1,
+                "max_poll_interval": 30,
+                "completion_db": False,
+                "block_weights_path": None,
+                "block_queue": False,
+                "telemetry": False,
+                "profile": False,
+                "limit_job_threads": False,
+                "executor": "processes",
+                "executor_address": None,
+                "speculative_fraction": None,
+                "resource_history": None,
+                "resource_percentile": 95,
+                "resource_margin": 1.2,
+                "block_shape_check": None,
+                "max_read_amplification": 2.,
+                "max_block_mb": None,
+                "occupancy_index": None,
+                "dirty_regions_path": None,
+                "block_order": None,
+                "reduce_fan_in": 64,
+                "oom_mem_factor": 2.,
+                "oom_rss_fraction": 0.95,
+                "memory_watchdog": False,
+                "memory_watchdog_interval": 1.,
+                "memory_warn_fraction": 0.8,
+                "memory_stop_fraction": 0.95,
+                "block_manifest_min_blocks": 10000}
 
     def global_config_values(self, with_block_list_path=False):
         """ Load the global config values that are needed
             in most of the tasks
         """
         config = self.get_global_config()
+        if config.get("block_shape_check", None) is not None:
+            self._check_block_shape(config)
         # first two return values (shebang, block_shape) must exist
         # the rest default to None
         conf = (config["shebang"], config["block_shape"],
@@ -248,6 +452,43 @@ class BaseClusterTask(luigi.Task):
             conf = conf + (config.get("block_list_path", None),)
         return conf
 
+    def _task_datasets(self):
+        # the datasets of a task are given by the parameter pairs `<name>_path` and `<name>_key`
+        datasets = []
+        for name, _ in self.get_params():
+            if name.endswith('_path') and hasattr(self, name[:-len('_path')] + '_key'):
+                datasets.append((getattr(self, name), getattr(self, name[:-len('_path')] + '_key')))
+        return datasets
+
+    def _check_block_shape(self, config):
+        """ Check that the block shape is aligned with the chunks of the datasets of this task.
+
+        Computes the read amplification of the block shape for the existing datasets
+        and a block shape that is a multiple of their chunks. If `block_shape_check` is "warn",
+        the planned block shape is suggested in the log if the amplification exceeds `max_read_amplification`,
+        if it is "enforce" an error is raised instead. The block shape is not changed here, because
+        all tasks of a workflow need to use the same blocking.
+        """
+        mode = config["block_shape_check"]
+        assert mode in ("warn", "enforce"), mode
+        block_shape = config["block_shape"]
+        chunk_infos = [blu.get_chunks(path, key, ndim=len(block_shape)) for path, key in self._task_datasets()]
+        chunk_infos = [info for info in chunk_infos if info is not None]
+        if not chunk_infos:
+            return
+        chunk_shapes = [chunks for chunks, _ in chunk_infos]
+        amplification = max(blu.read_amplification(block_shape, chunks) for chunks in chunk_shapes)
+        if amplification <= config.get("max_read_amplification", 2.):
+            return
+        planned = blu.plan_block_shape(block_shape, chunk_shapes, config.get("max_block_mb", None),
+                                       itemsize=sum(itemsize for _, itemsize in chunk_infos))
+        msg = ("block shape %s is not aligned with the chunks %s and has a read amplification of %.2f, "
+               "consider using the block shape %s" % (str(block_shape), ", ".join(map(str, chunk_shapes)),
+                                                      amplification, str(list(planned))))
+        if mode == "enforce":
+            raise ValueError(msg)
+        self._write_log("WARNING: %s" % msg)
+
     def clean_up_for_retry(self, block_list, prefix=None):
         """ Clean up before starting a retry.
         The base implementation is just a dummy.
@@ -258,11 +499,35 @@ class BaseClusterTask(luigi.Task):
     def output(self):
         return luigi.LocalTarget(os.path.join(self.tmp_folder, self.task_name + '.log'))
 
+    # part of the luigi API
+    def complete(self):
+        """ The task is complete if its log exists and, if `dirty_regions_path` is given
+        in the global config and the task or one of its dependencies supports the dirty regions,
+        the task has run after the dirty regions were last changed.
+        """
+        if not super().complete():
+            return False
+        # the dependencies don't change, so we only check them once
+        if not hasattr(self, '_dirty_dependency'):
+            self._dirty_dependency = _depends_on_dirty_regions(self)
+        if not self._dirty_dependency:
+            return True
+        # we read the global config directly, because `get_global_config` writes to the log
+        config_path = os.path.join(self.config_dir, 'global.config')
+        if not os.path.exists(config_path):
+            return True
+        with open(config_path) as f:
+            dirty_path = json.load(f).get('dirty_regions_path', None)
+        if dirty_path is None or not os.path.exists(dirty_path):
+            return True
+        return os.path.getmtime(self.output().path) > os.path.getmtime(dirty_path)
+
     #
     # Must implement API
     #
 
-    def prepare_jobs(self, n_jobs, block_list, config, job_prefix=None, consecutive_blocks=False):
+    def prepare_jobs(self, n_jobs, block_list, config, job_prefix=None, consecutive_blocks=False,
+                     block_weights=None):
         raise NotImplementedError("BaseClusterTask does not implement this functionality")
 
     def submit_jobs(self, n_jobs, job_prefix=None):
@@ -281,12 +546,366 @@ class BaseClusterTask(luigi.Task):
         with open(log_file, 'a') as f:
             f.write('%s: %s\n' % (str(datetime.now()), msg))
 
+    def _job_name(self, job_prefix=None):
+        return self.task_name if job_prefix is None else '%s_%s' % (self.task_name, job_prefix)
+
+    def _use_block_queue(self, global_config=None):
+        """ Do the jobs pull their blocks from a shared queue instead of getting a fixed block list?
+
+        Only supported for tasks that set `supports_block_queue`.
+        """
+        global_config = self.get_global_config() if global_config is None else global_config
+        return self.supports_block_queue and global_config.get('block_queue', False)
+
+    def _use_block_manifest(self, n_blocks, global_config=None):
+        """ Store the block lists of the jobs in a binary manifest instead of the job configs?
+
+        Used if the task has at least `block_manifest_min_blocks` blocks (global config, None disables it).
+        """
+        global_config = self.get_global_config() if global_config is None else global_config
+        min_blocks = global_config.get('block_manifest_min_blocks', 10000)
+        return min_blocks is not None and n_blocks >= min_blocks
+
+    def _manifest_path(self, job_prefix=None):
+        return os.path.join(self.tmp_folder, self._job_name(job_prefix) + mfu.MANIFEST_EXT)
+
+    def _completion_db_path(self, global_config=None):
+        """ Path to the db that records the processed blocks and jobs, None if it is not enabled.
+
+        The db replaces parsing the job logs to check for successful jobs and failed blocks.
+        It is always enabled for speculative execution, which needs to know the blocks that were processed.
+        The processed blocks of a task that did not finish are kept, so that a new run with the same
+        parameters, config and blocks (e.g. after the scheduler was interrupted) only submits the remaining blocks.
+        Note that many jobs write to the db concurrently, which may not be supported by all network file systems.
+        """
+        global_config = self.get_global_config() if global_config is None else global_config
+        if not (global_config.get('completion_db', False) or self._use_speculation(global_config)):
+            return None
+        return cu.get_db_path(self.tmp_folder)
+
+    def _run_key(self, block_list, config):
+        # the processed blocks can only be reused by a run of the same blocks with the same parameters and config
+        return hashlib.sha1(json.dumps([self.to_str_params(only_significant=True), config, block_list],
+                                       sort_keys=True, default=str).encode()).hexdigest()
+
+    def _use_speculation(self, global_config=None):
+        """ Are straggler jobs duplicated once `speculative_fraction` of the jobs have passed?
+
+        Only supported for tasks that set `allow_speculation` and targets that poll the jobs.
+        """
+        global_config = self.get_global_config() if global_config is None else global_config
+        return self.allow_speculation and global_config.get('speculative_fraction', None) is not None
+
+    #
+    # speculative execution of straggler jobs
+    #
+
+    def _init_speculation(self, n_jobs):
+        self.n_original_jobs = n_jobs
+        # maps the job id of the stragglers to the id of their copy
+        self.speculative_jobs = {}
+        self.cancelled_jobs = set()
+
+    def _submit_speculative_jobs(self, job_ids, job_prefix=None):
+        raise NotImplementedError("%s does not support speculative execution" % type(self).__name__)
+
+    def _cancel_jobs(self, job_ids):
+        raise NotImplementedError("%s does not support speculative execution" % type(self).__name__)
+
+    def _speculate(self, job_prefix=None):
+        """ Duplicate the straggler jobs and cancel the copies that are not needed anymore.
+
+        Once `speculative_fraction` of the jobs have passed, the unfinished blocks of each remaining job
+        are submitted as a new job, that processes them in reverse order. Both copies skip the blocks
+        that were recorded in the completion db already and the copy that finishes first wins;
+        the other one is cancelled. Must be called periodically while waiting for the jobs.
+        """
+        if not self._use_speculation() or not hasattr(self, 'speculative_jobs'):
+            return
+        db_path = self._completion_db_path()
+        job_name = self._job_name(job_prefix)
+        n_jobs = self.n_original_jobs
+        passed_jobs = set(cu.get_passed_jobs(db_path, job_name, n_jobs + len(self.speculative_jobs)))
+
+        if not self.speculative_jobs:
+            fraction = self.get_global_config()['speculative_fraction']
+            if len(passed_jobs) == n_jobs or len(passed_jobs) < fraction * n_jobs:
+                return
+            passed_blocks = set(cu.get_passed_blocks(db_path, job_name))
+            stragglers = sorted(set(range(n_jobs)) - passed_jobs)
+            for copy_id, job_id in enumerate(stragglers, n_jobs):
+                config = self._load_job_config(job_id, job_prefix)
+                if 'block_queue' in config:
+                    block_list = bq.get_claimed_blocks(config.pop('block_queue'), config.pop('queue_name'), [job_id])
+                else:
+                    block_list = config['block_list']
+                config['block_list'] = [block_id for block_id in block_list if block_id not in passed_blocks][::-1]
+                self._dump_job_config(self._config_path(copy_id, job_prefix), config)
+                self.speculative_jobs[job_id] = copy_id
+            self._write_log("%i / %i jobs have passed, submitting copies of the jobs %s" %
+                            (len(passed_jobs), n_jobs, ', '.join(map(str, stragglers))))
+            self._submit_speculative_jobs(list(self.speculative_jobs.values()), job_prefix)
+            return
+
+        # cancel the jobs whose copy has passed already
+        cancel = [loser for job_id, copy_id in self.speculative_jobs.items()
+                  for winner, loser in ((job_id, copy_id), (copy_id, job_id))
+                  if winner in passed_jobs and loser not in passed_jobs and loser not in self.cancelled_jobs]
+        if cancel:
+            self._write_log("cancel the jobs %s, because their copies have passed" % ', '.join(map(str, cancel)))
+            self._cancel_jobs(cancel)
+            self.cancelled_jobs.update(cancel)
+
     def _config_path(self, job_id, job_prefix=None):
         if job_prefix is None:
             return os.path.join(self.tmp_folder, self.task_name + '_job_%s.config' % str(job_id))
         else:
             return os.path.join(self.tmp_folder, self.task_name + '_job_%s_%s.config' % (job_prefix, str(job_id)))
 
+    def _job_sidecar_paths(self, folder, ext, job_prefix=None):
+        # find the files named like the job configs with the given extension
+        if not os.path.exists(folder):
+            return []
+        prefix = os.path.split(self._config_path('', job_prefix))[1][:-len('.config')]
+        pattern = re.compile(re.escape(prefix) + r'\d+' + re.escape(ext))
+        return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                      if pattern.fullmatch(name))
+
+    def telemetry_paths(self, job_prefix=None):
+        """ Get the block telemetry files written by the jobs of this task.
+        """
+        return self._job_sidecar_paths(self.tmp_folder, tu.TELEMETRY_EXT, job_prefix)
+
+    def profile_paths(self, job_prefix=None):
+        """ Get the profiles written by the jobs of this task.
+        """
+        return self._job_sidecar_paths(os.path.join(self.tmp_folder, 'logs'), pu.PROFILE_EXT, job_prefix)
+
+    def resource_paths(self, job_prefix=None):
+        """ Get the job resource records written by the jobs of this task.
+        """
+        return self._job_sidecar_paths(self.tmp_folder, ru.RESOURCES_EXT, job_prefix)
+
+    def peak_rss_paths(self, job_prefix=None):
+        """ Get the peak memory records written by the jobs of this task.
+        """
+        return self._job_sidecar_paths(self.tmp_folder, ru.PEAK_RSS_EXT, job_prefix)
+
+    def memory_paths(self, job_prefix=None):
+        """ Get the peak memory per block written by the memory watchdog of the jobs of this task.
+        """
+        return self._job_sidecar_paths(self.tmp_folder, mu.MEMORY_EXT, job_prefix)
+
+    def _summarize_block_memory(self, job_prefix=None):
+        # log the peak memory per block, which helps to choose the `block_shape` and `mem_limit`
+        summary = mu.summarize_block_memory(mu.load_block_memory(self.memory_paths(job_prefix)))
+        if summary['n_blocks'] == 0:
+            return
+        self._write_log("peak memory of the jobs while processing %i blocks (MB): %s" % (
+            summary['n_blocks'], ', '.join('%s: %.1f' % (k, v) for k, v in summary['peak_rss_mb'].items())))
+        self._write_log("memory increase per block (MB): %s, the largest increase was for block %i" % (
+            ', '.join('%s: %.1f' % (k, v) for k, v in summary['block_increase_mb'].items()),
+            summary['largest_block']))
+
+    def _dirty_regions_state(self):
+        # the dirty regions of the current run; each task that is restricted to the dirty regions
+        # adds the regions it has written to, so that they are propagated to the downstream tasks
+        dirty_path = self.get_global_config()['dirty_regions_path']
+        state_path = os.path.join(self.tmp_folder, 'dirty_regions.json')
+        source = {'path': os.path.abspath(dirty_path), 'mtime': os.path.getmtime(dirty_path)}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state['source'] == source:
+                return state_path, state
+        # the dirty regions have been changed, so we start from the new ones
+        with open(dirty_path) as f:
+            regions = json.load(f)
+        return state_path, {'source': source, 'regions': regions}
+
+    def restrict_to_dirty_regions(self, block_list, shape, block_shape, halo=None, restrict=True):
+        """ Restrict the block list to the blocks that are affected by the dirty regions.
+
+        The dirty regions are the regions of the input that have changed, given as list of `[begin, end]`
+        in the file `dirty_regions_path` in the global config. The regions written by this task are
+        added to the dirty regions for the downstream tasks. Only use this for tasks whose result for a block
+        only depends on the data in the block and the halo, and that don't change the output of other blocks.
+        If `restrict` is false, e.g. because the output of the other blocks is changed downstream, all blocks
+        are processed and added to the dirty regions.
+        """
+        self._dirty_blocks = None
+        if self.get_global_config().get('dirty_regions_path', None) is None:
+            return block_list
+        if restrict:
+            _, state = self._dirty_regions_state()
+            dirty_blocks = blu.blocks_in_regions(shape, block_shape, block_list, state['regions'], halo)
+            self._write_log("restricted to %i / %i blocks in the dirty regions" % (len(dirty_blocks),
+                                                                                   len(block_list)))
+        else:
+            dirty_blocks = list(block_list)
+            self._write_log("all %i blocks are processed and added to the dirty regions" % len(block_list))
+        self._dirty_blocks = (shape, block_shape, dirty_blocks)
+        return dirty_blocks
+
+    def tree_reduce(self, paths, reducer, config=None, allow_missing=False):
+        """ Merge the partial results in a tree of reduce jobs.
+
+        The partial results are merged by `reduce_fan_in` (global config) at a time, each level of
+        the tree is run as a set of jobs with the prefix 'reduce_<reducer><level>'. The job script of the task
+        must run the reduce jobs via `reduce_utils.run_reduce_job` if `reduce_utils.is_reduce_job`.
+
+        Arguments:
+            paths [list] - paths to the partial results
+            reducer [str] - the reducer, see `reduce_utils.REDUCERS`
+            config [dict] - config for the reduce jobs (default: None)
+            allow_missing [bool] - whether partial results may be missing,
+                otherwise the reduce jobs fail for missing results (default: False)
+        Returns:
+            list - paths to the at most `reduce_fan_in` partial results that remain to be merged
+        """
+        fan_in = self.get_global_config().get('reduce_fan_in', 64)
+        assert fan_in > 1, fan_in
+        level = 0
+        while len(paths) > fan_in:
+            groups = rdu.plan_level(paths, fan_in)
+            outputs = [rdu.level_output_path(self.tmp_folder, self.task_name, reducer, level, group_id)
+                       for group_id in range(len(groups))]
+            level_config = {**({} if config is None else config), 'reducer': reducer,
+                            'reduce_groups': groups, 'reduce_outputs': outputs,
+                            'reduce_allow_missing': allow_missing}
+            self._write_log("reduce %i partial results to %i in level %i" % (len(paths), len(outputs), level))
+            n_jobs = min(len(groups), self.max_jobs)
+            prefix = 'reduce_%s%i' % (reducer, level)
+            # the jobs of the reduce levels get group ids instead of block ids
+            self._reduce_prefixes = getattr(self, '_reduce_prefixes', set()) | {prefix}
+            self.prepare_jobs(n_jobs, list(range(len(groups))), level_config, prefix)
+            self.submit_jobs(n_jobs, prefix)
+            self.wait_for_jobs(prefix)
+            self.check_jobs(n_jobs, prefix)
+            paths = outputs
+            level += 1
+        return paths
+
+    def order_blocks(self, block_list, shape, block_shape):
+        """ Order the blocks along the space-filling curve given by `block_order` in the global config.
+
+        If the blocks are ordered, each job processes a contiguous part of the curve instead of
+        every n-th block, so that its blocks form a compact region and share halos and chunks.
+        Use this for tasks that read a halo or that read chunks shared by neighboring blocks.
+        """
+        self._block_order = None
+        order = self.get_global_config().get('block_order', None)
+        if order is None:
+            return block_list
+        block_list = blu.order_blocks(shape, block_shape, block_list, order)
+        self._block_order = block_list
+        self._write_log("ordered the blocks along a %s curve" % order)
+        return block_list
+
+    def _propagate_dirty_regions(self):
+        shape, block_shape, dirty_blocks = self._dirty_blocks
+        state_path, state = self._dirty_regions_state()
+        regions = {json.dumps(region) for region in state['regions']}
+        new_regions = [region for region in blu.block_regions(shape, block_shape, dirty_blocks)
+                       if json.dumps(region) not in regions]
+        state['regions'] = state['regions'] + new_regions
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _record_resources(self, job_prefix=None):
+        # add the resources used by the jobs to the history, so that they can be used
+        # to estimate the resources of this task in the next runs
+        paths = self.resource_paths(job_prefix)
+        records = []
+        for path in paths:
+            with open(path) as f:
+                records.append(json.load(f))
+            os.remove(path)
+        if records:
+            global_config = self.get_global_config()
+            ru.append_history(global_config['resource_history'], self.task_name,
+                              global_config['block_shape'], records)
+            self._write_log("recorded the resources of %i jobs" % len(records))
+
+    def occupancy_index_path(self, name, shape, block_shape):
+        """ Get the occupancy index of the dataset given by the parameters `<name>_path` and `<name>_key`.
+
+        If the index does not exist yet, it is derived from the existing chunks of the dataset.
+        Returns None if the occupancy index is not enabled in the global config or cannot be derived.
+        """
+        index_folder = self.get_global_config().get('occupancy_index', None)
+        if index_folder is None:
+            return None
+        path, key = getattr(self, name + '_path'), getattr(self, name + '_key')
+        index_path = ou.get_index_path(index_folder, path, key, block_shape)
+        if not os.path.exists(index_path):
+            chunk_info = blu.get_chunks(path, key, ndim=len(shape))
+            index = None if chunk_info is None else ou.derive_index(path, key, shape, chunk_info[0], block_shape)
+            if index is None:
+                return None
+            ou.save_index(index_path, index)
+            self._write_log("derived occupancy index for %s:%s from the existing chunks" % (path, key))
+        return index_path
+
+    def occupancy_paths(self, job_prefix=None):
+        """ Get the block occupancy records written by the jobs of this task.
+        """
+        return self._job_sidecar_paths(self.tmp_folder, ou.OCCUPANCY_EXT, job_prefix)
+
+    def _prepare_occupancy_index(self, job_prefix=None, global_config=None):
+        global_config = self.get_global_config() if global_config is None else global_config
+        # the indices of the output datasets of tasks that don't record the occupancy become invalid
+        index_folder = global_config['occupancy_index']
+        if self.occupancy_output is None:
+            if hasattr(self, 'output_path') and hasattr(self, 'output_key'):
+                ou.remove_indices(index_folder, self.output_path, self.output_key)
+            return {}
+        # the index of the output dataset is updated with the blocks recorded by the jobs;
+        # it is removed while the task is running and only saved again if all jobs have passed
+        if self.n_retries == 0:
+            block_shape = global_config['block_shape']
+            path = getattr(self, self.occupancy_output + '_path')
+            key = getattr(self, self.occupancy_output + '_key')
+            with vu.file_reader(path, 'r') as f:
+                shape = f[key].shape[-len(block_shape):]
+            index_path = self.occupancy_index_path(self.occupancy_output, shape, block_shape)
+            index = ou.load_index(index_path)
+            if index is None:
+                index_path = ou.get_index_path(index_folder, path, key, block_shape)
+                index = ou.empty_index(shape, block_shape)
+            ou.remove_indices(index_folder, path, key)
+            self._occupancy_output = (index_path, index)
+            for sidecar in self.occupancy_paths(job_prefix):
+                os.remove(sidecar)
+        return {'occupancy_record': True}
+
+    def _update_occupancy_index(self, job_prefix=None):
+        paths = self.occupancy_paths(job_prefix)
+        records = ou.load_records(paths)
+        ou.update_index(self._occupancy_output[1], records)
+        for path in paths:
+            os.remove(path)
+        self._write_log("recorded the occupancy of %i blocks" % len(records))
+
+    def _save_occupancy_index(self):
+        index_path, index = self._occupancy_output
+        ou.save_index(index_path, index)
+        self._write_log("saved occupancy index to %s" % index_path)
+
+    def _merge_profiles(self, job_prefix=None):
+        out_path = os.path.join(self.tmp_folder, 'profile_%s%s' % (self._job_name(job_prefix), pu.PROFILE_EXT))
+        if pu.merge_profiles(self.profile_paths(job_prefix), out_path):
+            self._write_log("merged job profiles into %s" % out_path)
+
+    def _thread_env(self, n_threads):
+        """ Environment variables to limit the numpy / BLAS / OpenMP threads of the jobs to `threads_per_job`.
+        """
+        if not self.get_global_config().get('limit_job_threads', False):
+            return {}
+        return thu.thread_env(n_threads)
+
     # make the tmpdir and logdirs
     def make_dirs(self):
         os.makedirs(self.tmp_folder, exist_ok=True)
@@ -294,13 +913,88 @@ class BaseClusterTask(luigi.Task):
         os.makedirs(os.path.join(self.tmp_folder, 'error_logs'), exist_ok=True)
         self._write_log('created tmp-folder and log dirs @ %s' % self.tmp_folder)
 
-    def _write_single_job_config(self, config, job_prefix):
-        config_path = self._config_path(0, job_prefix)
+    def _dump_job_config(self, config_path, config):
         with open(config_path, 'w') as f:
             json.dump(config, f)
 
+    def _load_job_config(self, job_id, job_prefix=None):
+        with open(self._config_path(job_id, job_prefix), 'r') as f:
+            return mfu.resolve_block_list(json.load(f))
+
+    def _write_single_job_config(self, config, job_prefix):
+        config_path = self._config_path(0, job_prefix)
+        self._dump_job_config(config_path, config)
+
+    @staticmethod
+    def _partition_by_weights(block_list, block_weights, n_jobs):
+        """ Partition the blocks into jobs with balanced total weight.
+
+        Uses the greedy longest-processing-time-first heuristic:
+        blocks are assigned by decreasing weight to the job with the smallest total weight.
+        Blocks without a weight get the mean weight.
+        Returns the block lists and the total weights of the jobs.
+        """
+        default_weight = np.mean(list(block_weights.values())) if block_weights else 1.
+        weights = {block_id: block_weights.get(block_id, default_weight) for block_id in block_list}
+
+        partition = [[] for _ in range(n_jobs)]
+        job_weights = [(0., job_id) for job_id in range(n_jobs)]
+        for block_id in sorted(block_list, key=lambda block_id: weights[block_id], reverse=True):
+            job_weight, job_id = heapq.heappop(job_weights)
+            partition[job_id].append(block_id)
+            heapq.heappush(job_weights, (job_weight + weights[block_id], job_id))
+        # keep the blocks of each job in ascending order
+        partition = [sorted(job_blocks) for job_blocks in partition]
+        job_weights = [job_weight for job_weight, _ in sorted(job_weights, key=lambda jw: jw[1])]
+        return partition, job_weights
+
+    def _load_block_weights(self, global_config=None):
+        """ Load the block weights from `block_weights_path` in the global config, if given.
+
+        The weights are stored as json mapping block ids to weights, e.g. the runtimes of
+        a previous run, see `parse_utils.parse_block_runtimes_task`.
+        """
+        global_config = self.get_global_config() if global_config is None else global_config
+        block_weights_path = global_config.get('block_weights_path', None)
+        if block_weights_path is None:
+            return None
+        with open(block_weights_path) as f:
+            block_weights = json.load(f)
+        # json keys are always str
+        return {int(block_id): float(weight) for block_id, weight in block_weights.items()}
+
+    def _write_block_queue_configs(self, n_jobs, block_list, config, job_prefix):
+        db_path = bq.get_db_path(self.tmp_folder)
+        queue_name = self._job_name(job_prefix)
+        bq.create_queue(db_path, queue_name, block_list)
+        self._write_log("created block queue %s with %i blocks" % (queue_name, len(block_list)))
+        for job_id in range(n_jobs):
+            job_config = {'block_queue': os.path.abspath(db_path), 'queue_name': queue_name, **config}
+            config_path = self._config_path(job_id, job_prefix)
+            self._dump_job_config(config_path, job_config)
+
     def _write_multiple_job_configs(self, n_jobs, block_list, config, job_prefix,
-                                    consecutive_blocks):
+                                    consecutive_blocks, block_weights=None, global_config=None):
+        global_config = self.get_global_config() if global_config is None else global_config
+
+        # keep the order of the blocks along the space-filling curve, e.g. for the blocks of a retry
+        block_order = getattr(self, '_block_order', None)
+        if block_order is not None and not consecutive_blocks:
+            rank = {block_id: pos for pos, block_id in enumerate(block_order)}
+            block_list = sorted(block_list, key=lambda block_id: rank.get(block_id, len(rank)))
+
+        # the jobs pull their blocks from the queue, so we don't need to partition them
+        if self._use_block_queue(global_config) and not consecutive_blocks:
+            self._write_block_queue_configs(n_jobs, block_list, config, job_prefix)
+            return
+
+        if block_weights is None and not consecutive_blocks:
+            block_weights = self._load_block_weights(global_config)
+        if block_weights is not None:
+            assert not consecutive_blocks, "Block weights are not supported for consecutive blocks"
+            partition, job_weights = self._partition_by_weights(block_list, block_weights, n_jobs)
+            self._write_log("partitioned blocks by weight, job weights are in range [%f, %f]" %
+                            (min(job_weights), max(job_weights)))
 
         # TODO there must be a more elegant way of doing this
         if consecutive_blocks:
@@ -322,40 +1016,145 @@ class BaseClusterTask(luigi.Task):
                 prepartiion.append(list(range(block_id, block_id + bpj)))
                 block_id += bpj
 
-        # write the configurations for all jobs to the tmp folder
+        job_blocks = []
         for job_id in range(n_jobs):
             # if `consecutive_blocks` is true, we keep the block_ids in
             # block_jobs consecutive
             if consecutive_blocks:
                 block_jobs = prepartiion[job_id]
+            elif block_weights is not None:
+                block_jobs = partition[job_id]
+            # if the blocks are ordered, each job gets a contiguous part of the curve
+            elif block_order is not None:
+                block_jobs = block_list[job_id * len(block_list) // n_jobs:(job_id + 1) * len(block_list) // n_jobs]
             else:
                 block_jobs = block_list[job_id::n_jobs]
-            job_config = {'block_list': block_jobs, **config}
+            job_blocks.append(block_jobs)
+
+        # for many blocks, we write the block lists to a manifest that is memory-mapped by the jobs,
+        # so that the job configs stay small
+        if self._use_block_manifest(len(block_list), global_config) and mfu.is_block_list(block_list):
+            manifest_path = self._manifest_path(job_prefix)
+            block_ranges = mfu.write_manifest(manifest_path, job_blocks)
+            self._write_log("written block manifest for %i blocks to %s" % (len(block_list), manifest_path))
+            job_configs = [{'block_manifest': os.path.abspath(manifest_path), 'block_range': block_range, **config}
+                           for block_range in block_ranges]
+        else:
+            job_configs = [{'block_list': block_jobs, **config} for block_jobs in job_blocks]
+
+        # write the configurations for all jobs to the tmp folder
+        for job_id, job_config in enumerate(job_configs):
             config_path = self._config_path(job_id, job_prefix)
-            with open(config_path, 'w') as f:
-                json.dump(job_config, f)
+            self._dump_job_config(config_path, job_config)
+
+    def _resume_blocks(self, db_path, job_name, block_list, config, job_prefix=None, consecutive_blocks=False):
+        """ Skip the blocks that were processed by a previous run of this task that did not finish.
+
+        The processed blocks are kept in the completion db if the previous run had the same parameters,
+        config and blocks. Like for retries, this is only done for tasks that allow retries and
+        distribute their blocks over the jobs.
+        """
+        can_resume = self.allow_retry and block_list is not None and not consecutive_blocks and\
+            job_prefix not in getattr(self, '_reduce_prefixes', ())
+        if not can_resume:
+            cu.reset(db_path, job_name)
+            return block_list
+        cu.reset(db_path, job_name, run_key=self._run_key(block_list, config))
+        passed_blocks = set(cu.get_passed_blocks(db_path, job_name))
+        if not passed_blocks:
+            return block_list
+        self._write_log("resume from the completion db, skipping %i / %i blocks that were processed already" %
+                        (len(passed_blocks), len(block_list)))
+        return [block_id for block_id in block_list if block_id not in passed_blocks]
 
     def _write_job_config(self, n_jobs, block_list, config,
-                          job_prefix=None, consecutive_blocks=False):
+                          job_prefix=None, consecutive_blocks=False, block_weights=None):
+        # pass the completion db to the jobs and remove outdated entries:
+        # the job ids are re-assigned for each submission, the processed blocks are kept
+        # for retries, so that only the blocks that have not been processed yet are checked
+        global_config = self.get_global_config()
+        db_path = self._completion_db_path(global_config)
+        if db_path is not None:
+            job_name = self._job_name(job_prefix)
+            if self.n_retries == 0:
+                block_list = self._resume_blocks(db_path, job_name, block_list, config,
+                                                 job_prefix, consecutive_blocks)
+            else:
+                cu.reset(db_path, job_name, reset_blocks=False)
+            config = {**config, 'completion_db': os.path.abspath(db_path), 'job_name': job_name}
+        if self._use_speculation(global_config):
+            config = {**config, 'speculative': True}
+        # enable the block telemetry in the jobs and remove the telemetry of previous runs
+        if global_config.get('telemetry', False):
+            if self.n_retries == 0:
+                for path in self.telemetry_paths(job_prefix):
+                    os.remove(path)
+            config = {**config, 'telemetry': True}
+        # record the resources used by the jobs and remove the records of previous runs
+        if global_config.get('resource_history', None) is not None:
+            for path in self.resource_paths(job_prefix):
+                os.remove(path)
+            config = {**config, 'record_resources': True}
+        # record the peak memory of the jobs to detect jobs that ran out of memory for the retry
+        if self.allow_retry and global_config.get('max_num_retries', 0) > 0:
+            for path in self.peak_rss_paths(job_prefix):
+                os.remove(path)
+            config = {**config, 'record_peak_rss': True}
+        # the blocks that ran out of memory before are processed as sub-blocks
+        if getattr(self, '_split_blocks', None):
+            block_shape = global_config['block_shape']
+            config = {**config, 'split_blocks': {str(block_id): blu.split_shape(block_shape, level)
+                                                 for block_id, level in self._split_blocks.items()}}
+        # enable the memory watchdog in the jobs and remove the records of previous runs
+        if global_config.get('memory_watchdog', False):
+            if self.n_retries == 0:
+                for path in self.memory_paths(job_prefix):
+                    os.remove(path)
+            config = {**config, 'memory_watchdog': True,
+                      **{name: global_config.get(name, default) for name, default in
+                         (('memory_watchdog_interval', 1.), ('memory_warn_fraction', 0.8),
+                          ('memory_stop_fraction', 0.95))}}
+        # keep the occupancy index of the output up to date
+        if global_config.get('occupancy_index', None) is not None:
+            config = {**config, **self._prepare_occupancy_index(job_prefix, global_config)}
+        # remove the profiles of previous runs
+        if global_config.get('profile', False) and self.n_retries == 0:
+            for path in self.profile_paths(job_prefix):
+                os.remove(path)
         # check f we have a reduce style block, that is
         # not distributed over blocks
         if block_list is None:
             assert n_jobs == 1
             self._write_single_job_config(config, job_prefix)
+        # the jobs of a reduce level get the ids of the groups of partial results, so the block list,
+        # weights and ordering of the task don't apply to them
+        elif job_prefix in getattr(self, '_reduce_prefixes', ()):
+            for job_id in range(n_jobs):
+                self._dump_job_config(self._config_path(job_id, job_prefix),
+                                      {'block_list': block_list[job_id::n_jobs], **config})
         # otherwise, we have multiple jobs distributed over blocks
         else:
             # we add the block list to this class to know all the blocks
             # that were scheduled if we need to rerun this task
             self.block_list = block_list
+            # the number of blocks per job is used to estimate the time limit
+            self.blocks_per_job = int(math.ceil(len(block_list) / n_jobs)) if n_jobs > 0 else None
             self._write_multiple_job_configs(n_jobs, block_list, config,
-                                             job_prefix, consecutive_blocks)
+                                             job_prefix, consecutive_blocks, block_weights, global_config)
         self._write_log('written config for %i jobs' % n_jobs)
 
     # copy the python script to the temp folder and replace the shebang
     def _write_script_file(self, shebang):
         assert os.path.exists(self.src_file), self.src_file
         trgt_file = os.path.join(self.tmp_folder, self.task_name + '.py')
-        shutil.copy(self.src_file, trgt_file)
+        # if we profile the jobs, the job script is a launcher that runs the actual script under the profiler
+        if self.get_global_config().get('profile', False):
+            impl_file = os.path.join(self.tmp_folder, self.task_name + '_impl.py')
+            shutil.copy(self.src_file, impl_file)
+            with open(trgt_file, 'w') as f:
+                f.write(self.profile_launcher % os.path.abspath(impl_file))
+        else:
+            shutil.copy(self.src_file, trgt_file)
 
         # check that the shebang/executable is valid
         if shebang.startswith('#!'):
@@ -391,7 +1190,16 @@ class SlurmTask(BaseClusterTask):
     """
     Task for cluster with Slurm scheduling system
     (tested on EMBL cluster)
+
+    If `job_array` is set in the global config, all jobs of a task are submitted
+    as a single slurm job array. The number of concurrently running array tasks
+    can be limited via `job_array_limit`.
     """
+    # the states of finished slurm jobs, see `man sacct`
+    final_states = ("COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY",
+                    "NODE_FAIL", "PREEMPTED", "BOOT_FAIL", "DEADLINE")
+    # number of job ids that are queried in a single sacct or squeue call
+    poll_batch_size = 500
 
     @staticmethod
     def _parse_time_limit(time_limit):
@@ -409,7 +1217,14 @@ class SlurmTask(BaseClusterTask):
         else:
             return "%iM" % int(mem_limit * 1000)
 
-    def _write_slurm_file(self, job_prefix=None):
+    def _use_job_array(self):
+        return self.get_global_config().get("job_array", False)
+
+    def _write_slurm_file(self, job_prefix=None, n_jobs=None):
+        """ Write the slurm submission script.
+
+        If `n_jobs` is given, the script is written for a job array with `n_jobs` tasks.
+        """
         global_config = self.get_global_config()
         groupname = global_config.get("groupname", None)
         partition = global_config.get("partition", None)
@@ -451,12 +1266,29 @@ class SlurmTask(BaseClusterTask):
         for extra in extras:
             slurm_template += f"{extra}\n"
 
+        # for a job array, the job id is given by the array task id and the
+        # log files are set here, because we only have a single submission
+        if n_jobs is not None:
+            array_range = "0-%i" % (n_jobs - 1)
+            array_limit = global_config.get("job_array_limit", None)
+            if array_limit is not None:
+                array_range += "%%%i" % array_limit
+            out_file = os.path.join(self.tmp_folder, "logs", "%s_%%a.log" % job_name)
+            err_file = os.path.join(self.tmp_folder, "error_logs", "%s_%%a.err" % job_name)
+            slurm_template += ("#SBATCH --array=%s\n"
+                               "#SBATCH -J %s\n"
+                               "#SBATCH -o %s\n"
+                               "#SBATCH -e %s\n") % (array_range, job_name, out_file, err_file)
+            config_tmpl = self._config_path("$SLURM_ARRAY_TASK_ID", job_prefix)
+
         # slurm directives are done
         slurm_template += "\n"
         # do we have easybuild ?
         if easybuild:
             slurm_template += "module purge\n"
             slurm_template += "module load GCC\n"
+        for var, val in self._thread_env(n_threads).items():
+            slurm_template += "export %s=%s\n" % (var, val)
         slurm_template += ("%s %s") % (trgt_file, config_tmpl)
 
         script_path = os.path.join(self.tmp_folder, "slurm_%s.sh" % job_name)
@@ -464,85 +1296,287 @@ class SlurmTask(BaseClusterTask):
             f.write(slurm_template)
 
     def prepare_jobs(self, n_jobs, block_list, config,
-                     job_prefix=None, consecutive_blocks=False):
+                     job_prefix=None, consecutive_blocks=False, block_weights=None):
         # write the job configs
-        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks)
+        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks, block_weights)
         # write the slurm script file
-        self._write_slurm_file(job_prefix)
+        self._write_slurm_file(job_prefix, n_jobs if self._use_job_array() else None)
+
+    def _submit_job_array(self, n_jobs, script_path):
+        outp = check_output(["sbatch", script_path]).decode().rstrip()
+        self.slurm_array_id = outp.split()[-1]
+        # the ids of the individual array tasks, in the format reported by squeue
+        self.slurm_ids = ["%s_%i" % (self.slurm_array_id, job_id) for job_id in range(n_jobs)]
+        print(outp)
+
+    def _submit_job(self, job_id, job_name, script_path):
+        out_file = os.path.join(self.tmp_folder, "logs", "%s_%i.log" % (job_name, job_id))
+        err_file = os.path.join(self.tmp_folder, "error_logs", "%s_%i.err" % (job_name,
+                                                                              job_id))
+        command = ["sbatch", "-o", out_file, "-e", err_file, "-J",
+                   "%s_%i" % (job_name, job_id), script_path, str(job_id)]
+        # call(command)
+        outp = check_output(command).decode().rstrip()
+        # get the slurm job-id
+        # NOTE: slurm ids are not always integer, so we cannot cast to int here
+        slurm_id = outp.split()[-1]
+        self.slurm_ids.append(slurm_id)
+        # print slurm message
+        print(outp)
 
     def submit_jobs(self, n_jobs, job_prefix=None):
         job_name = self.task_name if job_prefix is None else "%s_%s" % (self.task_name,
                                                                         job_prefix)
         script_path = os.path.join(self.tmp_folder, "slurm_%s.sh" % job_name)
+        self._init_speculation(n_jobs)
+        if self._use_job_array():
+            self._submit_job_array(n_jobs, script_path)
+            # for job arrays it is sufficient to query the array job
+            self.slurm_query_ids = [self.slurm_array_id]
+            return
+
+        self.slurm_array_id = None
         self.slurm_ids = []
         for job_id in range(n_jobs):
-            out_file = os.path.join(self.tmp_folder, "logs", "%s_%i.log" % (job_name, job_id))
-            err_file = os.path.join(self.tmp_folder, "error_logs", "%s_%i.err" % (job_name,
-                                                                                  job_id))
-            command = ["sbatch", "-o", out_file, "-e", err_file, "-J",
-                       "%s_%i" % (job_name, job_id), script_path, str(job_id)]
-            # call(command)
-            outp = check_output(command).decode().rstrip()
-            # get the slurm job-id
-            # NOTE: slurm ids are not always integer, so we cannot cast to int here
-            slurm_id = outp.split()[-1]
-            self.slurm_ids.append(slurm_id)
-            # print slurm message
-            print(outp)
+            self._submit_job(job_id, job_name, script_path)
+        self.slurm_query_ids = list(self.slurm_ids)
+
+    def _submit_speculative_jobs(self, job_ids, job_prefix=None):
+        # the job ids of the copies follow the ids of the original jobs, so we can append the slurm ids
+        job_name = self._job_name(job_prefix)
+        script_path = os.path.join(self.tmp_folder, "slurm_%s.sh" % job_name)
+        if self.slurm_array_id is None:
+            for job_id in job_ids:
+                self._submit_job(job_id, job_name, script_path)
+            self.slurm_query_ids = list(self.slurm_ids)
+            return
+        # for job arrays, we submit the copies as a new array with the given task ids
+        outp = check_output(["sbatch", "--array=%s" % ",".join(map(str, job_ids)), script_path]).decode().rstrip()
+        array_id = outp.split()[-1]
+        self.slurm_ids.extend("%s_%i" % (array_id, job_id) for job_id in job_ids)
+        self.slurm_query_ids.append(array_id)
+        print(outp)
+
+    def _cancel_jobs(self, job_ids):
+        call(["scancel"] + [self.slurm_ids[job_id] for job_id in job_ids])
+
+    def _query_job_states(self, job_ids):
+        """ Query the states of the given jobs via sacct, in batches of `poll_batch_size`.
+
+        Returns None if sacct is not available, e.g. because job accounting is disabled.
+        """
+        states = {}
+        for start in range(0, len(job_ids), self.poll_batch_size):
+            batch = job_ids[start:start + self.poll_batch_size]
+            try:
+                outp = check_output(["sacct", "-n", "-X", "-P", "-o", "JobID,State", "-j", ",".join(batch)],
+                                    stderr=STDOUT).decode()
+            except (CalledProcessError, OSError):
+                return None
+            states.update(self._parse_job_states(outp))
+        return states
+
+    @staticmethod
+    def _parse_job_states(outp):
+        """ Parse the job id to state mapping from the output of sacct
+        """
+        states = {}
+        for line in outp.split("\n"):
+            line = line.strip()
+            if line == "":
+                continue
+            job_id, state = line.split("|")[:2]
+            # the state may have a suffix, e.g. "CANCELLED by 1234"
+            states[job_id] = state.split()[0].rstrip("+")
+        return states
+
+    def _n_queued_jobs(self, job_ids):
+        """ Count the jobs that are still in the queue via squeue, in batches of `poll_batch_size`.
+        """
+        n_queued = 0
+        for start in range(0, len(job_ids), self.poll_batch_size):
+            batch = job_ids[start:start + self.poll_batch_size]
+            try:
+                outp = check_output(["squeue", "-h", "-o", "%i", "-j", ",".join(batch)],
+                                    stderr=STDOUT).decode()
+            # squeue fails with invalid job id if all jobs of the batch have left the queue
+            except CalledProcessError:
+                continue
+            n_queued += len([out for out in outp.split("\n") if out.strip() != ""])
+        return n_queued
 
     def wait_for_jobs(self, job_prefix=None):
-        # TODO move to some config
-        wait_time = 10
+        """ Wait until all jobs of this task have finished.
+
+        Only the jobs of this task are polled, starting with `poll_interval` seconds
+        and backing off up to `max_poll_interval` seconds between polls.
+        If slurm accounting is available, the final state of each job is recorded in `slurm_states`.
+        If `speculative_fraction` is set, the straggler jobs are duplicated while waiting.
+        """
+        global_config = self.get_global_config()
+        wait_time = global_config.get("poll_interval", 1)
+        max_wait_time = global_config.get("max_poll_interval", 30)
+
+        self.slurm_states = {}
+        use_sacct = True
         while True:
             time.sleep(wait_time)
+            wait_time = min(2 * wait_time, max_wait_time)
+            # this may submit copies of straggler jobs, so we query the ids afterwards
+            self._speculate(job_prefix)
+            query_ids = self.slurm_query_ids
+
+            if use_sacct:
+                states = self._query_job_states(query_ids)
+                if states is not None:
+                    # pending array tasks are not listed individually, so they are not finished yet
+                    if all(states.get(slurm_id, "PENDING") in self.final_states for slurm_id in self.slurm_ids):
+                        self.slurm_states = {slurm_id: states[slurm_id] for slurm_id in self.slurm_ids}
+                        break
+                    continue
+                self._write_log("sacct is not available, fall back to squeue to wait for jobs")
+                use_sacct = False
+
+            if self._n_queued_jobs(query_ids) == 0:
+                break
 
-            try:
-                outp = check_output(["squeue -u $USER | grep $USER"], shell=True).decode()
-            except CalledProcessError as e:
-                # handle error for empty queue
-                outp = e.output.decode().rstrip()
-                if outp == "":
-                    break
-                else:
-                    raise e
+    def _passed_jobs(self, log_prefix, n_jobs, job_prefix=None):
+        # if we know the final job states we don't need to check the jobs that have completed,
+        # for all other jobs we fall back to the completion db or parsing the logs
+        states = getattr(self, "slurm_states", {})
+        if not states:
+            return super()._passed_jobs(log_prefix, n_jobs, job_prefix)
+        job_states = [states.get(slurm_id, None) for slurm_id in self.slurm_ids[:n_jobs]]
+        checked_jobs = set(super()._passed_jobs(log_prefix, n_jobs, job_prefix))\
+            if None in job_states else set()
+        passed_jobs = [job_id for job_id, state in enumerate(job_states)
+                       if state == "COMPLETED" or (state is None and job_id in checked_jobs)]
+        return passed_jobs
 
-            outp = [out for out in outp.split("\n") if out != ""]
-            # check how many jobs there are in total, if none, stop waiting
-            n_running = len(outp)
-            if n_running == 0:
-                break
-            # if we have jobs, check how many belong to this task
-            n_running = sum([out.split()[0] in self.slurm_ids for out in outp])
-            if n_running == 0:
-                break
+
+#
+# Persistent worker pool for local execution
+#
+
+# the pool is shared by all local tasks that run in this process,
+# so that consecutive tasks of a workflow can re-use the warm workers
+_worker_pool = None
+
+
+def _depends_on_dirty_regions(task):
+    """ Does the task or one of the tasks it depends on support the dirty regions?
+    """
+    if getattr(task, 'supports_dirty_regions', False):
+        return True
+    return any(_depends_on_dirty_regions(dep) for dep in luigi.task.flatten(task.requires()))
+
+
+def _preload_modules(modules):
+    """ Import the (expensive) modules used by the job scripts once per worker.
+    """
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _get_worker_pool(n_workers, preload_modules):
+    global _worker_pool
+    if _worker_pool is None:
+        # use spawn to start the workers from a clean interpreter and not
+        # to inherit the state (and threads) of the luigi scheduler process
+        _worker_pool = futures.ProcessPoolExecutor(n_workers,
+                                                   mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=_preload_modules,
+                                                   initargs=(preload_modules,))
+    return _worker_pool
+
+
+def _reset_worker_pool():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=False)
+    _worker_pool = None
+
+
+def _thread_limits(n_threads):
+    # the thread environment variables have no effect in the workers, because numpy is imported already,
+    # so we limit the threads via threadpoolctl instead
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return nullcontext()
+    return threadpool_limits(limits=n_threads)
+
+
+def _run_job_in_worker(script_path, config_file, log_file, err_file, n_threads=None):
+    """ Run the job script in the current (worker) process.
+
+    The script is executed as `__main__`, with the same command line arguments and
+    the same redirection of stdout and stderr as for the sub-process submission.
+    """
+    from .utils import job_utils as ju
+    with open(log_file, 'w') as f_out, open(err_file, 'w') as f_err:
+        argv = sys.argv
+        sys.argv = [script_path, config_file]
+        # the worker runs several jobs and the configs of retries and speculative copies
+        # are re-written for the same paths, so we don't keep the cached configs between jobs
+        ju._job_configs.clear()
+        ru.start_job()
+        try:
+            limits = nullcontext() if n_threads is None else _thread_limits(n_threads)
+            with redirect_stdout(f_out), redirect_stderr(f_err), limits:
+                runpy.run_path(script_path, run_name='__main__')
+        # the job failing must not take down the worker;
+        # the failure is detected from the log in `check_jobs`
+        except (Exception, SystemExit):
+            traceback.print_exc(file=f_err)
+        finally:
+            mu.stop_watchdog()
+            ru.record_peak_rss()
+            ju._job_configs.clear()
+            sys.argv = argv
 
 
 class LocalTask(BaseClusterTask):
     """
     Task for running tasks locally via sub-processes
+
+    If `local_worker_pool` is set in the global config, the jobs are dispatched
+    to a pool of persistent worker processes instead of starting a new interpreter per job.
+    The workers import the modules in `preload_modules` once, which avoids paying
+    the import overhead for every job. Note that the workers use the python interpreter
+    of the scheduling process and not the interpreter given by the shebang.
     """
     # don't want to start too many local jobs, because
     # this is usually a sign that forgot to set the target
     # to slurm or lsf
     max_local_jobs = cpu_count()
+    # modules that are imported by the workers of the persistent pool at start-up
+    preload_modules = ('numpy', 'vigra', 'nifty', 'elf.io', 'z5py', 'h5py',
+                       'cluster_tools.utils.volume_utils')
 
     def prepare_jobs(self, n_jobs, block_list, config,
-                     job_prefix=None, consecutive_blocks=False):
+                     job_prefix=None, consecutive_blocks=False, block_weights=None):
         # write the job configs
-        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks)
+        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks, block_weights)
 
     # the normal submission logic doesn't work on windows
-    def _submit_win(self, script_path, config_file, log_file, err_file):
+    def _submit_win(self, script_path, config_file, log_file, err_file, env=None):
         with open(log_file, 'w') as f_out, open(err_file, 'w') as f_err:
             assert os.path.exists(script_path), script_path
-            call(["python", script_path, config_file], stdout=f_out, stderr=f_err, shell=True)
+            call(["python", script_path, config_file], stdout=f_out, stderr=f_err, shell=True, env=env)
 
-    def _submit_unix(self, script_path, config_file, log_file, err_file):
+    def _submit_unix(self, script_path, config_file, log_file, err_file, env=None):
         with open(log_file, 'w') as f_out, open(err_file, 'w') as f_err:
             assert os.path.exists(script_path), script_path
-            call([script_path, config_file], stdout=f_out, stderr=f_err)
+            ret = call([script_path, config_file], stdout=f_out, stderr=f_err, env=env)
+            # the job was killed without a trace in the logs, most likely by the oom-killer
+            if ret == -signal.SIGKILL:
+                f_err.write("job was killed (SIGKILL), probably by the oom-killer\n")
 
-    def _submit(self, job_id, job_prefix):
+    def _job_files(self, job_id, job_prefix):
         script_path = os.path.join(self.tmp_folder, self.task_name + '.py')
         assert os.path.exists(script_path), script_path
         config_file = self._config_path(job_id, job_prefix)
@@ -554,17 +1588,40 @@ class LocalTask(BaseClusterTask):
                                 '%s_%i.log' % (job_name, job_id))
         err_file = os.path.join(self.tmp_folder, 'error_logs',
                                 '%s_%i.err' % (job_name, job_id))
+        return script_path, config_file, log_file, err_file
+
+    def _submit(self, job_id, job_prefix, env=None):
+        script_path, config_file, log_file, err_file = self._job_files(job_id, job_prefix)
         if os.name == 'nt':
-            self._submit_win(script_path, config_file, log_file, err_file)
+            self._submit_win(script_path, config_file, log_file, err_file, env)
         else:
-            self._submit_unix(script_path, config_file, log_file, err_file)
+            self._submit_unix(script_path, config_file, log_file, err_file, env)
+
+    def _submit_to_worker_pool(self, n_jobs, job_prefix, n_threads=None):
+        pool = _get_worker_pool(self.max_local_jobs, self.preload_modules)
+        tasks = [pool.submit(_run_job_in_worker, *self._job_files(job_id, job_prefix), n_threads)
+                 for job_id in range(n_jobs)]
+        for task in tasks:
+            try:
+                task.result()
+            # a worker died (e.g. segfault or oom-kill); the affected jobs are
+            # marked as failed by `check_jobs` and we start a new pool for the next submission
+            except BrokenProcessPool as e:
+                self._write_log("worker pool broke down: %s" % str(e))
+                _reset_worker_pool()
 
     def submit_jobs(self, n_jobs, job_prefix=None):
         assert n_jobs <= self.max_local_jobs,\
             "Trying to submit %i local jobs but limit is %i. Did you forget to set the target to slurm or lsf?" %\
             (n_jobs, self.max_local_jobs)
+        n_threads = self.get_task_config().get("threads_per_job", 1)
+        thread_env = self._thread_env(n_threads)
+        if self.get_global_config().get('local_worker_pool', False):
+            self._submit_to_worker_pool(n_jobs, job_prefix, n_threads if thread_env else None)
+            return
+        env = {**os.environ, **thread_env} if thread_env else None
         with futures.ProcessPoolExecutor(n_jobs) as pp:
-            tasks = [pp.submit(self._submit, job_id, job_prefix) for job_id in range(n_jobs)]
+            tasks = [pp.submit(self._submit, job_id, job_prefix, env) for job_id in range(n_jobs)]
             [t.result() for t in tasks]
 
     # don't need to wait for process pool
@@ -576,11 +1633,66 @@ class LSFTask(BaseClusterTask):
     """
     Task for cluster with LSF scheduling system
     (tested on Janelia cluster)
+
+    If `job_array` is set in the global config, all jobs of a task are submitted
+    as a single LSF job array. The number of concurrently running array elements
+    can be limited via `job_array_limit`.
     """
+    def _use_job_array(self, global_config=None):
+        global_config = self.get_global_config() if global_config is None else global_config
+        return global_config.get('job_array', False)
+
+    # speculative execution is not supported for job arrays yet
+    def _use_speculation(self, global_config=None):
+        global_config = self.get_global_config() if global_config is None else global_config
+        return super()._use_speculation(global_config) and not self._use_job_array(global_config)
+
+    def _write_array_script(self, job_prefix, n_threads):
+        """ Write the script that is executed by the elements of the job array.
+
+        LSF array indices start at 1, so the script maps the index to the (zero-based) job id
+        and sets up the same per-job log files as for the individual submission.
+        """
+        script_path = os.path.join(self.tmp_folder, self.task_name + '.py')
+        job_name = self.task_name if job_prefix is None else '%s_%s' % (self.task_name,
+                                                                        job_prefix)
+        config_file = self._config_path('$JOB_ID', job_prefix)
+        log_file = os.path.join(self.tmp_folder, 'logs', '%s_$JOB_ID.log' % job_name)
+        err_file = os.path.join(self.tmp_folder, 'error_logs', '%s_$JOB_ID.err' % job_name)
+        array_template = "#!/bin/bash\nJOB_ID=$((LSB_JOBINDEX - 1))\n"
+        for var, val in self._thread_env(n_threads).items():
+            array_template += "export %s=%s\n" % (var, val)
+        array_template += "%s %s > %s 2> %s\n" % (script_path, config_file, log_file, err_file)
+
+        array_script = os.path.join(self.tmp_folder, 'lsf_%s.sh' % job_name)
+        with open(array_script, 'w') as f:
+            f.write(array_template)
+        self._make_executable(array_script)
+
     def prepare_jobs(self, n_jobs, block_list, config,
-                     job_prefix=None, consecutive_blocks=False):
+                     job_prefix=None, consecutive_blocks=False, block_weights=None):
         # write the job configs
-        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks)
+        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks, block_weights)
+        if self._use_job_array():
+            n_threads = self.get_task_config().get("threads_per_job", 1)
+            self._write_array_script(job_prefix, n_threads)
+
+    def _submit_job_array(self, n_jobs, job_name, n_threads, time_limit):
+        array_script = os.path.join(self.tmp_folder, 'lsf_%s.sh' % job_name)
+        assert os.path.exists(array_script), array_script
+
+        array_spec = '%s[1-%i]' % (job_name, n_jobs)
+        array_limit = self.get_global_config().get('job_array_limit', None)
+        if array_limit is not None:
+            array_spec += '%%%i' % array_limit
+        # the job logs are written by the array script, LSF only writes its job reports here
+        lsf_out = os.path.join(self.tmp_folder, 'error_logs', '%s_lsf_%%I.out' % job_name)
+        bsub_command = 'bsub -n %i -J \'%s\' -We %i -o %s %s' % (n_threads, array_spec, time_limit,
+                                                                lsf_out, array_script)
+        outp = check_output([bsub_command], shell=True).decode().rstrip()
+        self.bsub_array_id = int(outp.split()[1].lstrip('<').rstrip('>'))
+        self.bsub_ids = ['%i[%i]' % (self.bsub_array_id, job_id + 1) for job_id in range(n_jobs)]
+        print(outp)
 
     def submit_jobs(self, n_jobs, job_prefix=None):
         # read the task config to get number of threads and time limit
@@ -591,34 +1703,87 @@ class LSFTask(BaseClusterTask):
         script_path = os.path.join(self.tmp_folder, self.task_name + '.py')
         assert os.path.exists(script_path), script_path
 
-        self.bsub_ids = []
         job_name = self.task_name if job_prefix is None else '%s_%s' % (self.task_name,
                                                                         job_prefix)
+        self._init_speculation(n_jobs)
+        if self._use_job_array():
+            self._submit_job_array(n_jobs, job_name, n_threads, time_limit)
+            return
 
+        self.bsub_array_id = None
+        self.bsub_ids = []
         for job_id in range(n_jobs):
-            config_file = self._config_path(job_id, job_prefix)
-            command = '%s %s' % (script_path, config_file)
-            log_file = os.path.join(self.tmp_folder, 'logs',
-                                    '%s_%i.log' % (job_name, job_id))
-            err_file = os.path.join(self.tmp_folder, 'error_logs',
-                                    '%s_%i.err' % (job_name, job_id))
-            bsub_command = 'bsub -n %i -J %s_%i -We %i -o %s -e %s \'%s\'' % (n_threads,
-                                                                              self.task_name,
-                                                                              job_id, time_limit,
-                                                                              log_file, err_file,
-                                                                              command)
-            # call([bsub_command], shell=True)
-            # submit job and get the bsub job id from its output
-            outp = check_output([bsub_command], shell=True).decode().rstrip()
-            bsub_id = int(outp.split()[1].lstrip('<').rstrip('>'))
-            self.bsub_ids.append(bsub_id)
-            print(outp)
+            self._submit_job(job_id, job_prefix, n_threads, time_limit)
+
+    def _submit_job(self, job_id, job_prefix, n_threads, time_limit):
+        script_path = os.path.join(self.tmp_folder, self.task_name + '.py')
+        job_name = self._job_name(job_prefix)
+        config_file = self._config_path(job_id, job_prefix)
+        command = '%s %s' % (script_path, config_file)
+        # set the thread limits for the job command
+        thread_env = ' '.join('%s=%s' % (var, val) for var, val in self._thread_env(n_threads).items())
+        if thread_env:
+            command = '%s %s' % (thread_env, command)
+        log_file = os.path.join(self.tmp_folder, 'logs',
+                                '%s_%i.log' % (job_name, job_id))
+        err_file = os.path.join(self.tmp_folder, 'error_logs',
+                                '%s_%i.err' % (job_name, job_id))
+        bsub_command = 'bsub -n %i -J %s_%i -We %i -o %s -e %s \'%s\'' % (n_threads,
+                                                                          self.task_name,
+                                                                          job_id, time_limit,
+                                                                          log_file, err_file,
+                                                                          command)
+        # call([bsub_command], shell=True)
+        # submit job and get the bsub job id from its output
+        outp = check_output([bsub_command], shell=True).decode().rstrip()
+        bsub_id = int(outp.split()[1].lstrip('<').rstrip('>'))
+        self.bsub_ids.append(bsub_id)
+        print(outp)
+
+    def _submit_speculative_jobs(self, job_ids, job_prefix=None):
+        task_config = self.get_task_config()
+        n_threads = task_config.get("threads_per_job", 1)
+        time_limit = task_config.get("time_limit", 60)
+        for job_id in job_ids:
+            self._submit_job(job_id, job_prefix, n_threads, time_limit)
+
+    def _cancel_jobs(self, job_ids):
+        call(['bkill'] + [str(self.bsub_ids[job_id]) for job_id in job_ids])
+
+    @staticmethod
+    def _array_finished(outp):
+        """ Check from the output of bjobs if all elements of the job array have finished
+        """
+        # the array is not known anymore once all its elements have finished for a while
+        if 'not found' in outp:
+            return True
+        states = [out.strip() for out in outp.split('\n') if out.strip() != '']
+        return all(state in ('DONE', 'EXIT') for state in states)
+
+    def _wait_for_job_array(self, wait_time):
+        # we only query the state of the array elements, not all jobs of the user
+        while True:
+            time.sleep(wait_time)
+            try:
+                outp = check_output(['bjobs', '-a', '-noheader', '-o', 'stat', str(self.bsub_array_id)],
+                                    stderr=STDOUT).decode()
+            except CalledProcessError as e:
+                outp = e.output.decode()
+                if 'not found' not in outp:
+                    raise e
+            if self._array_finished(outp):
+                break
 
     def wait_for_jobs(self, job_prefix=None):
         # TODO move to some config
         wait_time = 10
+        if getattr(self, 'bsub_array_id', None) is not None:
+            self._wait_for_job_array(wait_time)
+            return
+
         while True:
             time.sleep(wait_time)
+            self._speculate(job_prefix)
             # parse the output from bjobs
             try:
                 outp = check_output(['bjobs | grep $USER'], shell=True, stderr=STDOUT).decode()
@@ -659,6 +1824,135 @@ class LSFTask(BaseClusterTask):
         pass
 
 
+# dask client of the executor target, shared by all tasks in this process
+_dask_client = None
+
+
+def _get_dask_client(address, n_workers):
+    global _dask_client
+    if _dask_client is None:
+        from dask.distributed import Client, LocalCluster
+        if address is None:
+            # the jobs use `threads_per_job` threads themselves, so we start single-threaded workers
+            cluster = LocalCluster(n_workers=n_workers, threads_per_worker=1, processes=True)
+            _dask_client = Client(cluster)
+        else:
+            _dask_client = Client(address)
+    return _dask_client
+
+
+def _run_job_function(module_name, function_name, job_id, config_path, config, n_threads=None):
+    """ Run the job function in the current (worker) process with the config passed in memory.
+
+    Returns whether the job was successful and the stdout and stderr of the job.
+    """
+    from .utils import job_utils as ju
+    out, err = io.StringIO(), io.StringIO()
+    success = True
+    limits = nullcontext() if n_threads is None else _thread_limits(n_threads)
+    ru.start_job()
+    with redirect_stdout(out), redirect_stderr(err), limits, ju.in_memory_job_config(config_path, config):
+        try:
+            job_function = getattr(importlib.import_module(module_name), function_name)
+            job_function(job_id, config_path)
+        except (Exception, SystemExit):
+            traceback.print_exc()
+            success = False
+        finally:
+            mu.stop_watchdog()
+            ru.record_peak_rss()
+    return success, out.getvalue(), err.getvalue()
+
+
+class ExecutorTask(BaseClusterTask):
+    """
+    Task for running the job functions directly on an executor
+
+    The job functions are called in the workers of a persistent process pool (`executor: "processes"`)
+    or of a dask.distributed cluster (`executor: "dask"`); if `executor_address` is not given,
+    a local dask cluster is started. The job configs are passed in memory and the success of the jobs
+    is taken from the return values instead of parsing the logs, the logs are still written to the tmp folder.
+    The job scripts are not copied, so the shebang is not used and the workers use their own interpreter.
+    The dask workers must be single-threaded, because the jobs redirect the output of their process.
+    """
+    # number of workers for the process pool and local dask cluster
+    max_local_jobs = cpu_count()
+    preload_modules = LocalTask.preload_modules
+    # name of the job function in the task module, defaults to the module name
+    job_function = None
+
+    def _job_function_name(self):
+        # the job function is in the module of the job script `src_file`: the module in the `jobs` sub-package
+        # next to the task module, or the task module itself if it is also the job script
+        script_name = os.path.splitext(os.path.basename(self.src_file))[0]
+        module_name = next(cls.__module__ for cls in type(self).__mro__ if 'src_file' in vars(cls))
+        if os.path.abspath(sys.modules[module_name].__file__) != os.path.abspath(self.src_file):
+            module_name = '%s.jobs.%s' % (module_name.rsplit('.', 1)[0], script_name)
+        function_name = script_name if self.job_function is None else self.job_function
+        return module_name, function_name
+
+    # the job functions are run directly, so we don't need the job script
+    def _write_script_file(self, shebang):
+        self._write_log('run job function %s.%s on %s executor' % (*self._job_function_name(),
+                                                                   self.get_global_config()['executor']))
+
+    def _dump_job_config(self, config_path, config):
+        self.job_configs[config_path] = config
+
+    # the job configs are passed in memory, so we don't need the manifest
+    def _use_block_manifest(self, n_blocks, global_config=None):
+        return False
+
+    def _load_job_config(self, job_id, job_prefix=None):
+        return self.job_configs[self._config_path(job_id, job_prefix)]
+
+    def prepare_jobs(self, n_jobs, block_list, config,
+                     job_prefix=None, consecutive_blocks=False, block_weights=None):
+        self.job_configs = {}
+        self._write_job_config(n_jobs, block_list, config, job_prefix, consecutive_blocks, block_weights)
+
+    def submit_jobs(self, n_jobs, job_prefix=None):
+        global_config = self.get_global_config()
+        executor = global_config.get('executor', 'processes')
+        n_threads = self.get_task_config().get("threads_per_job", 1)
+        n_threads = n_threads if self._thread_env(n_threads) else None
+
+        module_name, function_name = self._job_function_name()
+        args = [(module_name, function_name, job_id, self._config_path(job_id, job_prefix),
+                 self.job_configs[self._config_path(job_id, job_prefix)], n_threads)
+                for job_id in range(n_jobs)]
+        if executor == 'processes':
+            pool = _get_worker_pool(self.max_local_jobs, self.preload_modules)
+            self.job_futures = [pool.submit(_run_job_function, *arg) for arg in args]
+        elif executor == 'dask':
+            client = _get_dask_client(global_config.get('executor_address', None), self.max_local_jobs)
+            self.job_futures = [client.submit(_run_job_function, *arg, pure=False) for arg in args]
+        else:
+            raise ValueError("Invalid executor %s, expected one of 'processes' or 'dask'" % executor)
+
+    def wait_for_jobs(self, job_prefix=None):
+        job_name = self._job_name(job_prefix)
+        self.job_results = {}
+        for job_id, future in enumerate(self.job_futures):
+            try:
+                success, out, err = future.result()
+            # a worker died (e.g. segfault or oom-kill)
+            except Exception as e:
+                success, out, err = False, '', 'worker failed: %s\n' % str(e)
+                if isinstance(e, BrokenProcessPool):
+                    _reset_worker_pool()
+            self.job_results[job_id] = success
+            with open(os.path.join(self.tmp_folder, 'logs', '%s_%i.log' % (job_name, job_id)), 'w') as f:
+                f.write(out)
+            with open(os.path.join(self.tmp_folder, 'error_logs', '%s_%i.err' % (job_name, job_id)), 'w') as f:
+                f.write(err)
+        # release the results on the executor
+        self.job_futures = []
+
+    def _passed_jobs(self, log_prefix, n_jobs, job_prefix=None):
+        return [job_id for job_id in range(n_jobs) if self.job_results.get(job_id, False)]
+
+
 class WorkflowBase(luigi.Task):
     """
     Base class for a workflow task, that just chains together
@@ -670,13 +1964,13 @@ class WorkflowBase(luigi.Task):
     max_jobs = luigi.IntParameter()
     # path for the global configuration
     config_dir = luigi.Parameter()
-    # target can be local, slurm, lsf (case insensitive)
+    # target can be local, slurm, lsf or executor (case insensitive)
     target = luigi.Parameter()
     # the workflow can have dependencies; per default we
     # set to be a dummy task that is always successfull
     dependency = luigi.TaskParameter(default=DummyTask())
 
-    _target_dict = {'lsf': 'LSF', 'slurm': 'Slurm', 'local': 'Local'}
+    _target_dict = {'lsf': 'LSF', 'slurm': 'Slurm', 'local': 'Local', 'executor': 'Executor'}
 
     def _get_task_name(self, task_base_name):
         target_postfix = self._target_dict[self.target.lower()]
@@ -686,6 +1980,12 @@ class WorkflowBase(luigi.Task):
         # we just mirror the target of the last task
         return luigi.LocalTarget(self.input().path)
 
+    # part of the luigi API
+    def complete(self):
+        # the output of the last task may exist, but the task may need to run again
+        # because the dirty regions have changed, see `BaseClusterTask.complete`
+        return super().complete() and all(dep.complete() for dep in luigi.task.flatten(self.requires()))
+
     @staticmethod
     def get_config():
         """ Return all default configs and their save_path indexed by the task name
@@ -1 +1,6 @@
-from .connected_components_workflow import ConnectedComponentsWorkflow, ConnectedComponentsAndWatershedWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".connected_components_workflow": ["ConnectedComponentsWorkflow",
+                                       "ConnectedComponentsAndWatershedWorkflow"],
+})
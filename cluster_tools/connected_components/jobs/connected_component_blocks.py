@@ -0,0 +1,166 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+from skimage.morphology import label
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+def _load_input(ds_in, bb, channel):
+    if channel is None:
+        input_ = ds_in[bb]
+    else:
+        channel_ = [channel] if isinstance(channel, int) else channel
+        in_shape = (len(channel_),) + tuple(b.stop - b.start for b in bb)
+        input_ = np.zeros(in_shape, dtype=ds_in.dtype)
+        for chan_id, chan in enumerate(channel_):
+            bb_inp = (slice(chan, chan + 1),) + bb
+            input_[chan_id] = ds_in[bb_inp].squeeze()
+        input_ = np.mean(input_, axis=0)
+    return input_
+
+
+def _threshold_impl(input_, threshold, threshold_mode, sigma):
+    input_ = input_ if threshold_mode is None else vu.normalize(input_)
+    if sigma > 0 and threshold_mode is not None:
+        input_ = vu.apply_filter(input_, "gaussianSmoothing", sigma)
+        input_ = vu.normalize(input_)
+
+    if threshold_mode == "greater":
+        input_ = input_ > threshold
+    elif threshold_mode == "less":
+        input_ = input_ < threshold
+    elif threshold_mode == "equal":
+        input_ = input_ == threshold
+    elif threshold_mode is None:
+        pass
+    else:
+        raise RuntimeError("Thresholding Mode %s not supported" % threshold_mode)
+    return input_
+
+
+def _cc_block(block_id, blocking,
+              ds_in, ds_out, threshold,
+              threshold_mode, channel, sigma, tmp_folder):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    input_ = _load_input(ds_in, bb, channel)
+    input_ = _threshold_impl(input_, threshold, threshold_mode, sigma)
+    if np.sum(input_) == 0:
+        fu.log_block_success(block_id)
+        return 0
+
+    components = label(input_)
+    # add global offset to make ids unique between blocks
+    offset = block_id * int(np.prod(blocking.blockShape))
+    assert offset < np.iinfo('uint64').max, "Id overflow"
+    components[components != 0] += offset
+
+    this_ids = np.unique(components)
+    if not len(this_ids) == 1 and this_ids[0] == 0:
+        id_path = os.path.join(tmp_folder, f"ids_{block_id}.npy")
+    np.save(id_path, this_ids)
+
+    ds_out[bb] = components
+    fu.log_block_success(block_id)
+
+
+def _cc_block_with_mask(block_id, blocking,
+                        ds_in, ds_out, threshold,
+                        threshold_mode, mask,
+                        channel, sigma, tmp_folder):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    # get the mask and check if we have any pixels
+    in_mask = mask[bb].astype("bool")
+    if np.sum(in_mask) == 0:
+        fu.log_block_success(block_id)
+        return 0
+
+    input_ = _load_input(ds_in, bb, channel)
+    input_ = _threshold_impl(input_, threshold, threshold_mode, sigma)
+    input_[np.logical_not(in_mask)] = 0
+    if np.sum(input_) == 0:
+        fu.log_block_success(block_id)
+        return 0
+
+    components = label(input_)
+    # add global offset to make ids unique between blocks
+    offset = block_id * int(np.prod(blocking.blockShape))
+    assert offset < np.iinfo('uint64').max, "Id overflow"
+    components[components != 0] += offset
+
+    this_ids = np.unique(components)
+    if not len(this_ids) == 1 and this_ids[0] == 0:
+        id_path = os.path.join(tmp_folder, f"ids_{block_id}.npy")
+        np.save(id_path, this_ids)
+
+    ds_out[bb] = components
+    fu.log_block_success(block_id)
+
+
+def connected_components_block(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+    input_path = config["input_path"]
+    input_key = config["input_key"]
+    output_path = config["output_path"]
+    output_key = config["output_key"]
+    block_list = config["block_list"]
+    block_shape = config["block_shape"]
+    threshold = config["threshold"]
+    threshold_mode = config["threshold_mode"]
+    tmp_folder = config["tmp_folder"]
+
+    sigma = config.get("sigma_prefilter", 0)
+
+    mask_path = config.get("mask_path", "")
+    mask_key = config.get("mask_key", "")
+
+    channel = config.get("channel", None)
+
+    fu.log("Applying threshold %f with mode %s" % (threshold, threshold_mode))
+
+    with vu.file_reader(input_path, "r") as f_in, vu.file_reader(output_path) as f_out:
+
+        ds_in = f_in[input_key]
+        ds_out = f_out[output_key]
+
+        shape = ds_in.shape
+        if channel is not None:
+            shape = shape[1:]
+        assert len(shape) == 3
+
+        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
+
+        if mask_path != "":
+            mask = vu.load_mask(mask_path, mask_key, shape)
+            for block_id in block_list:
+                _cc_block_with_mask(block_id, blocking, ds_in, ds_out, threshold,
+                                    threshold_mode, mask, channel, sigma, tmp_folder)
+
+        else:
+            for block_id in block_list:
+                _cc_block(block_id, blocking, ds_in, ds_out, threshold,
+                          threshold_mode, channel, sigma, tmp_folder)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    connected_components_block(job_id, path)
@@ -0,0 +1,73 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import vigra
+import nifty.ufd as nufd
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.reduce_utils as rdu
+
+
+def merge_assignments(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+
+    # merge the partial results for a level of the reduction tree
+    if rdu.is_reduce_job(config):
+        rdu.run_reduce_job(config)
+        fu.log_job_success(job_id)
+        return
+
+    output_path = config["output_path"]
+    output_key = config["output_key"]
+
+    # load labels
+    labels = rdu.load_partials("unique", config["label_paths"], allow_missing=True)
+    if config["add_background"]:
+        labels.append(np.array([0], dtype="uint64"))
+    labels = rdu.merge_uniques(labels)
+
+    # load assignments
+    assignments = rdu.load_partials("union_find", config["assignment_paths"], allow_missing=True)
+
+    if assignments:
+        assignments = np.concatenate(assignments, axis=0)
+        assignments = np.unique(assignments, axis=0)
+        assert assignments.shape[1] == 2
+        fu.log("have %i pairs of node assignments" % len(assignments))
+        have_assignments = True
+    else:
+        fu.log("did not find any node assignments and will not merge any components")
+        have_assignments = False
+
+    if have_assignments:
+        ufd = nufd.boost_ufd(labels)
+        ufd.merge(assignments)
+        label_assignments = ufd.find(labels)
+    else:
+        label_assignemnts = labels.copy()
+
+    n_labels = len(labels)
+    label_assignemnts, max_id, _ = vigra.analysis.relabelConsecutive(label_assignments, keep_zeros=True, start_label=1)
+    assert len(label_assignments) == n_labels
+    fu.log("reducing the number of labels from %i to %i" % (n_labels, max_id + 1))
+
+    label_assignments = np.concatenate([labels[:, None], label_assignments[:, None]], axis=1).astype("uint64")
+    chunks = (min(65334, n_labels), 2)
+    with vu.file_reader(output_path) as f:
+        f.create_dataset(output_key, data=label_assignments, compression="gzip", chunks=chunks)
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    merge_assignments(job_id, path)
@@ -1,12 +1,19 @@
-from .copy_sources import CopySourcesLocal, CopySourcesSlurm, CopySourcesLSF
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".copy_sources": ["CopySourcesLocal", "CopySourcesSlurm", "CopySourcesLSF", "CopySourcesExecutor"],
+})
 
 
 def get_copy_task(target):
+    from .copy_sources import CopySourcesLocal, CopySourcesSlurm, CopySourcesLSF, CopySourcesExecutor
     if target == "local":
         return CopySourcesLocal
     elif target == "slurm":
         return CopySourcesSlurm
     elif target == "lsf":
         return CopySourcesLSF
+    elif target == "executor":
+        return CopySourcesExecutor
     else:
         raise ValueError(f"Target {target} is not supported")
@@ -0,0 +1,93 @@
+#! /bin/python
+
+import os
+import sys
+
+import imageio
+from pybdv.downsample import get_downsampler, sample_shape
+
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.volume_utils as vu
+
+
+#
+# Implementation
+#
+
+
+def load_source(input_file, key):
+    if key is None:
+        # image file that can be read with imageio
+        source = imageio.imread(input_file)
+    else:
+        # image file that can be read with open_file
+        with vu.file_reader(input_file, "r") as f:
+            source = f[key][:]
+    return source
+
+
+def write_source(source, output_file,
+                 scale_factors, chunks,
+                 metadata_format, downscaling_mode):
+    sampler = get_downsampler(downscaling_mode)
+    kwargs = {"dimension_separator": "/"} if metadata_format == "ome.zarr" else {}
+    with vu.file_reader(output_file, "a", **kwargs) as f:
+        key = vu.get_format_key(metadata_format, scale=0)
+        f.require_dataset(key, data=source, compression="gzip", chunks=tuple(chunks),
+                          shape=source.shape, dtype=source.dtype)
+
+        for scale, scale_factor in enumerate(scale_factors, 1):
+            sampled_shape = sample_shape(source.shape, scale_factor)
+            chunks = tuple(min(sh, ch) for sh, ch in zip(sampled_shape, chunks))
+            source = sampler(source, scale_factor, sampled_shape)
+            key = vu.get_format_key(metadata_format, scale=scale)
+            f.require_dataset(key, data=source, compression="gzip", chunks=chunks,
+                              shape=source.shape, dtype=source.dtype)
+
+
+def copy_source(input_file, output_file, key,
+                metadata_format, metadata_dict, name,
+                scale_factors, chunks, downscaling_mode):
+    source = load_source(input_file, key)
+    write_source(source, output_file,
+                 scale_factors, chunks,
+                 metadata_format, downscaling_mode)
+    metadata_dict.update({"setup_name": name})
+    vu.write_format_metadata(metadata_format, output_file, metadata_dict, scale_factors)
+
+
+def copy_sources(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_files = config["input_files"]
+    output_files = config["output_files"]
+    key = config["key"]
+    metadata_format = config["metadata_format"]
+    metadata_dict = config["metadata_dict"]
+    downscaling_mode = config["downscaling_mode"]
+    scale_factors = config["scale_factors"]
+    chunks = config["chunks"]
+    names = config["names"]
+
+    # these are the ids of files to copy in this job
+    # the field is called block list because we are re-using functionality from 3d blocking logic
+    file_ids = config["block_list"]
+
+    for file_id in file_ids:
+        name = None if names is None else names[file_id]
+        copy_source(input_files[file_id], output_files[file_id], key,
+                    metadata_format, metadata_dict, name,
+                    scale_factors, chunks, downscaling_mode)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    copy_sources(job_id, path)
@@ -1 +1,5 @@
-from .copy_volume import CopyVolumeLocal, CopyVolumeSlurm, CopyVolumeLSF
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".copy_volume": ["CopyVolumeLocal", "CopyVolumeSlurm", "CopyVolumeLSF", "CopyVolumeExecutor"],
+})
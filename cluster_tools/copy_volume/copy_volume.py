@@ -1,19 +1,10 @@
-#! /bin/python
-
 import os
-import sys
-import json
-import warnings
-from concurrent import futures
 
 import numpy as np
 import luigi
-import nifty.tools as nt
-from elf.io.label_multiset_wrapper import LabelMultisetWrapper
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 # this is needed to deal with some other representations of numpy data types
@@ -40,7 +31,7 @@ class CopyVolumeBase(luigi.Task):
     """
 
     task_name = "copy_volume"
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'copy_volume.py'))
 
     # input and output volumes
     input_path = luigi.Parameter()
@@ -192,167 +183,8 @@ class CopyVolumeLSF(CopyVolumeBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def cast_type(data, dtype, int_to_uint):
-    data_dtype = data.dtype
-    if np.dtype(data_dtype) == np.dtype(dtype):
-        return data
-    # check negative values for signed int
-    elif int_to_uint:
-        return (data-np.iinfo(data.dtype).min).astype(dtype)
-    # special casting for uint8
-    elif np.issubdtype(data_dtype, np.floating) and np.dtype(dtype) == "uint8":
-        # FIXME this needs to be done based on the global min max values, but these need to be computed
-        # externally and then passed to this task!
-        warnings.warn("Conversion from float to uint8 based on local normalization, this may lead to artifacts!")
-        data = vu.normalize(data)
-        data *= 255
-        return data.astype("uint8")
-    else:
-        return data.astype(dtype)
-
-
-def _copy_blocks(ds_in, ds_out, blocking, block_list, roi_begin, reduce_function, n_threads,
-                 map_uniform_blocks_to_background, value_list, offset, insert_mode, int_to_uint):
-
-    dtype = ds_out.dtype
-
-    def _copy_block(block_id):
-        fu.log("start processing block %i" % block_id)
-
-        block = blocking.getBlock(block_id)
-        bb = tuple(slice(beg, end) for beg, end in zip(block.begin, block.end))
-        if ds_in.ndim == 4:
-            bb = (slice(None),) + bb
-
-        # hackery for broken knossos files, leave here for reference
-        # try:
-        #     data = ds_in[bb]
-        # except EOFError:
-        #     fu.log("%i failed with eof error" % block_id)
-        #     fu.log_block_success(block_id)
-        #     return
-
-        data = ds_in[bb]
-
-        if value_list is not None:
-            value_mask = np.isin(data, value_list)
-            data[~value_mask] = 0
-
-        # don't write empty blocks
-        if data.sum() == 0:
-            fu.log_block_success(block_id)
-            return
-
-        if map_uniform_blocks_to_background and (len(np.unique(data)) == 1):
-            fu.log_block_success(block_id)
-            return
-
-        # if we have a roi begin, we need to substract it
-        # from the output bounding box, because in this case
-        # the output shape has been fit to the roi
-        if roi_begin is not None:
-            bb = tuple(slice(b.start - off, b.stop - off)
-                       for b, off in zip(bb, roi_begin))
-
-        if reduce_function is not None and data.ndim == 4:
-            data = reduce_function(data[0:3], axis=0)
-            bb = bb[1:]
-
-        if offset is not None:
-            data[data != 0] += offset
-
-        if insert_mode:
-            prev_data = ds_out[bb]
-            insert_mask = data == 0
-            data[insert_mask] = prev_data[insert_mask]
-
-        ds_out[bb] = cast_type(data, dtype, int_to_uint)
-        fu.log_block_success(block_id)
-
-    if n_threads > 1:
-        with futures.ThreadPoolExecutor(n_threads) as tp:
-            tasks = [tp.submit(_copy_block, block_id) for block_id in block_list]
-            [t.result() for t in tasks]
-    else:
-        [_copy_block(block_id) for block_id in block_list]
-
-
-def copy_volume(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, "r") as f:
-        config = json.load(f)
-
-    # read the input cofig
-    input_path = config["input_path"]
-    input_key = config["input_key"]
-
-    block_shape = list(config["block_shape"])
-    block_list = config["block_list"]
-
-    # read the output config
-    output_path = config["output_path"]
-    output_key = config["output_key"]
-
-    # check if we offset by roi
-    roi_begin = config.get("roi_begin", None)
-
-    # check if we reduce channels
-    reduce_function = config.get("reduce_channels", None)
-    if reduce_function is not None:
-        reduce_function = getattr(np, reduce_function)
-
-    # check if we copy only specified values
-    value_list = config.get("value_list", None)
-
-    # check if we have an offset value
-    offset = config.get("offset", None)
-
-    # check if we are in insert mode
-    insert_mode = config.get("insert_mode", False)
-    int_to_uint = config.get("int_to_uint", False)
-
-    map_uniform_blocks_to_background = config.get("map_uniform_blocks_to_background", False)
-    n_threads = config.get("threads_per_job", 1)
-
-    # submit blocks
-    with vu.file_reader(input_path, mode="r") as f_in, vu.file_reader(output_path, mode="a") as f_out:
-        ds_in = f_in[input_key]
-        if ds_in.attrs.get("isLabelMultiset", False):
-            ds_in = LabelMultisetWrapper(ds_in)
-        ds_out = f_out[output_key]
-
-        ndim = ds_in.ndim
-        shape = list(ds_in.shape)
-        if len(shape) == 4:
-            ndim = 3
-            shape = shape[1:]
-        blocking = nt.blocking([0] * ndim, shape, block_shape)
-        _copy_blocks(ds_in, ds_out, blocking, block_list, roi_begin,
-                     reduce_function, n_threads, map_uniform_blocks_to_background,
-                     value_list, offset, insert_mode, int_to_uint)
-
-        # copy the attributes with job 0
-        if job_id == 0 and hasattr(ds_in, "attrs") and hasattr(ds_out, "attrs"):
-            attrs_in = ds_in.attrs
-            for k, v in attrs_in.items():
-                try:
-                    ds_out.attrs[k] = v
-                # skup type errors for objects that can't be json encoded
-                except TypeError:
-                    pass
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == "__main__":
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
-    copy_volume(job_id, path)
+class CopyVolumeExecutor(CopyVolumeBase, ExecutorTask):
+    """
+    copy_volume on executor
+    """
+    pass
@@ -0,0 +1,63 @@
+#! /usr/bin/python
+
+import os
+import sys
+import pickle
+
+import numpy as np
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+def predict(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    rf_path = config['rf_path']
+    n_threads = config['threads_per_job']
+    features_path = config['features_path']
+    features_key = config['features_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    n_edges = config['n_edges']
+    edge_chunk_size = config['chunk_size']
+    edge_block_list = config['block_list']
+
+    # assert that the edge block list is consecutive
+    diff_list = np.diff(edge_block_list)
+    assert (diff_list == 1).all()
+
+    with open(rf_path, 'rb') as f:
+        rf = pickle.load(f)
+    rf.n_jobs = n_threads
+
+    edge_blocking = nt.blocking([0], [n_edges], [edge_chunk_size])
+    edge_begin = edge_blocking.getBlock(edge_block_list[0]).begin[0]
+    edge_end = edge_blocking.getBlock(edge_block_list[-1]).end[0]
+
+    feat_roi = np.s_[edge_begin:edge_end, :]
+    with vu.file_reader(features_path) as f:
+        ds = f[features_key]
+        ds.n_threads = n_threads
+        feats = ds[feat_roi]
+
+    probs = rf.predict_proba(feats)[:, 1].astype('float32')
+    with vu.file_reader(output_path) as f:
+        ds = f[output_key]
+        ds.n_threads = n_threads
+        ds[edge_begin:edge_end] = probs
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    predict(job_id, path)
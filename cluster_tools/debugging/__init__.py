@@ -1,2 +1,7 @@
-from .check_ws_workflow import CheckWsWorkflow
-from .check_sub_graphs_workflow import CheckSubGraphsWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".check_ws_workflow": ["CheckWsWorkflow"],
+    ".check_sub_graphs_workflow": ["CheckSubGraphsWorkflow"],
+    ".runtime_report": ["RuntimeReport"],
+})
@@ -0,0 +1,47 @@
+import json
+import os
+from datetime import datetime
+
+import luigi
+
+from ..utils import telemetry_utils as tu
+
+
+class RuntimeReport(luigi.Task):
+    """ Aggregate the block telemetry of the tasks in the tmp folder.
+
+    Requires that the tasks were run with 'telemetry' enabled in the global config.
+    Writes the summary for each task (or for the given task names) to a json file.
+    """
+    tmp_folder = luigi.Parameter()
+    dependency = luigi.TaskParameter()
+    task_names = luigi.ListParameter(default=None)
+    n_slowest = luigi.IntParameter(default=10)
+
+    def requires(self):
+        return self.dependency
+
+    def _write_log(self, msg):
+        log_file = os.path.join(self.tmp_folder, "runtime_report.log")
+        with open(log_file, "a") as f:
+            f.write("%s: %s\n" % (str(datetime.now()), msg))
+
+    def run(self):
+        files = tu.find_telemetry_files(self.tmp_folder)
+        if self.task_names is not None:
+            files = {name: paths for name, paths in files.items() if name in self.task_names}
+            missing = set(self.task_names) - set(files)
+            if missing:
+                self._write_log("no telemetry found for %s" % ", ".join(sorted(missing)))
+
+        report = {}
+        for job_name, paths in files.items():
+            events = tu.load_events(paths)
+            report[job_name] = tu.summarize_events(events, self.n_slowest)
+            self._write_log("summarized %i blocks from %i jobs of %s" % (len(events), len(paths), job_name))
+
+        with open(self.output().path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def output(self):
+        return luigi.LocalTarget(os.path.join(self.tmp_folder, "runtime_report.json"))
@@ -1 +1,5 @@
-from .distance_workflow import PairwiseDistanceWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".distance_workflow": ["PairwiseDistanceWorkflow"],
+})
@@ -0,0 +1,202 @@
+#! /bin/python
+
+# IMPORTANT do threadctl import first (before numpy imports)
+from threadpoolctl import threadpool_limits
+
+import os
+import sys
+from functools import partial
+from concurrent import futures
+
+import numpy as np
+
+import vigra
+import nifty.tools as nt
+from skimage.measure import block_reduce
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _ds_vol(x, out_shape, sampler, scale_factor, dtype):
+    sample_2d = not isinstance(scale_factor, int)
+    out = sampler(x, out_shape, sample_2d)
+    if np.dtype(dtype) in (np.dtype('uint8'), np.dtype('uint16')):
+        max_val = np.iinfo(np.dtype(dtype)).max
+        np.clip(out, 0, max_val, out=out)
+        np.round(out, out=out)
+    return out.astype(dtype)
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _ds_block(blocking, block_id, ds_in, ds_out, scale_factor, halo, sampler):
+    fu.log_block_start(block_id)
+
+    # load the block (output dataset / downsampled) coordinates
+    if halo is None:
+        block = blocking.getBlock(block_id)
+        local_bb = np.s_[:]
+        in_bb = vu.block_to_bb(block)
+        out_bb = vu.block_to_bb(block)
+        out_shape = block.shape
+    else:
+        halo_ds = [ha // scale_factor for ha in halo] if isinstance(scale_factor, int) else\
+            [ha // sf for sf, ha in zip(scale_factor, halo)]
+        block = blocking.getBlockWithHalo(block_id, halo_ds)
+        in_bb = vu.block_to_bb(block.outerBlock)
+        out_bb = vu.block_to_bb(block.innerBlock)
+        local_bb = vu.block_to_bb(block.innerBlockLocal)
+        out_shape = block.outerBlock.shape
+
+    # check if we have channels
+    ndim = ds_in.ndim
+    in_shape = ds_in.shape
+    if ndim == 4:
+        in_shape = in_shape[1:]
+
+    # upsample the input bounding box
+    if isinstance(scale_factor, int):
+        in_bb = tuple(slice(ib.start * scale_factor, min(ib.stop * scale_factor, sh))
+                      for ib, sh in zip(in_bb, in_shape))
+    else:
+        in_bb = tuple(slice(ib.start * sf, min(ib.stop * sf, sh))
+                      for ib, sf, sh in zip(in_bb, scale_factor, in_shape))
+    # load the input
+    if ndim == 4:
+        in_bb = (slice(None),) + in_bb
+        out_bb = (slice(None),) + out_bb
+        local_bb = (slice(None),) + local_bb
+    x = ds_in[in_bb]
+
+    # don't sample empty blocks
+    if np.sum(x != 0) == 0:
+        fu.log_block_success(block_id)
+        return
+
+    dtype = x.dtype
+    if np.dtype(dtype) != np.dtype("float32"):
+        x = x.astype("float32")
+
+    if ndim == 4:
+        n_channels = x.shape[0]
+        out = np.zeros((n_channels,) + tuple(out_shape), dtype=dtype)
+        for c in range(n_channels):
+            out[c] = _ds_vol(x[c], out_shape, sampler, scale_factor, dtype)
+    else:
+        out = _ds_vol(x, out_shape, sampler, scale_factor, dtype)
+
+    try:
+        ds_out[out_bb] = out[local_bb]
+    except IndexError:
+        raise(IndexError("%s, %s, %s" % (str(out_bb), str(local_bb), str(out.shape))))
+
+    # log block success
+    fu.log_block_success(block_id)
+
+
+# wrap vigra.sampling.resize
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _ds_vigra(inp, output_shape, sample_2d, **vigra_kwargs):
+    if sample_2d:
+        out = np.zeros(output_shape, dtype="float32")
+        for z in range(output_shape[0]):
+            out[z] = vigra.sampling.resize(inp[z], shape=output_shape[1:], **vigra_kwargs)
+        return out
+    else:
+        return vigra.sampling.resize(inp, output_shape, **vigra_kwargs)
+
+
+# wrap skimage block_reduce
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _ds_skimage(inp, output_shape, sample_2d, block_size, func):
+    return block_reduce(inp, block_size=block_size, func=func)
+
+
+def _submit_blocks(ds_in, ds_out, block_shape, block_list,
+                   scale_factor, halo, library,
+                   library_kwargs, n_threads):
+
+    # get the blocking
+    ndim = ds_out.ndim
+    shape = ds_out.shape
+    if len(shape) == 4:
+        ndim = 3
+        shape = shape[1:]
+    blocking = nt.blocking([0]*ndim, shape, block_shape)
+    if library == "vigra":
+        sampler = partial(_ds_vigra, **library_kwargs)
+    elif library == "skimage":
+        sk_scale = (scale_factor,) * ndim if isinstance(scale_factor, int) else tuple(scale_factor)
+        ds_function = library_kwargs.get("function", "mean")
+        ds_function = getattr(np, ds_function)
+        sampler = partial(_ds_skimage, block_size=sk_scale, func=ds_function)
+    else:
+        raise ValueError("Invalid library %s, only vigra and skimage are supported" % library)
+
+    if n_threads <= 1:
+        for block_id in block_list:
+            _ds_block(blocking, block_id, ds_in, ds_out,
+                      scale_factor, halo, sampler)
+    else:
+        with futures.ThreadPoolExecutor(n_threads) as tp:
+            tasks = [tp.submit(_ds_block, blocking, block_id, ds_in, ds_out,
+                               scale_factor, halo, sampler) for block_id in block_list]
+            [t.result() for t in tasks]
+
+
+def downscaling(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input config
+    input_path = config["input_path"]
+    input_key = config["input_key"]
+
+    block_shape = list(config["block_shape"])
+    block_list = config["block_list"]
+
+    # read the output config
+    output_path = config["output_path"]
+    output_key = config["output_key"]
+
+    scale_factor = config["scale_factor"]
+    library = config.get("library", "vigra")
+    library_kwargs = config.get("library_kwargs", None)
+    if library_kwargs is None:
+        library_kwargs = {}
+    halo = config.get("halo", None)
+    n_threads = config.get("threads_per_job", 1)
+
+    # submit blocks
+    # check if in and out - file are the same
+    # because hdf5 does not like opening files twice
+    if input_path == output_path:
+        with vu.file_reader(output_path, mode="a") as f:
+            ds_in = f[input_key]
+            ds_out = f[output_key]
+            _submit_blocks(ds_in, ds_out, block_shape, block_list, scale_factor, halo,
+                           library, library_kwargs, n_threads)
+
+    else:
+        with vu.file_reader(input_path, mode="r") as f_in, vu.file_reader(output_path, mode="a") as f_out:
+            ds_in = f_in[input_key]
+            ds_out = f_out[output_key]
+            _submit_blocks(ds_in, ds_out, block_shape, block_list, scale_factor, halo,
+                           library, library_kwargs, n_threads)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    downscaling(job_id, path)
@@ -0,0 +1,117 @@
+#! /bin/python
+
+# IMPORTANT do threadctl import first (before numpy imports)
+from threadpoolctl import threadpool_limits
+
+import os
+import sys
+
+import numpy as np
+
+import nifty.tools as nt
+from elf.wrapper.resized_volume import ResizedVolume
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def compute_halo(erode_by, erode_3d):
+    if isinstance(erode_by, int):
+        halo = erode_by
+    else:
+        assert isinstance(erode_by, dict), 'Need int or dict'
+        halo = max(erode_by.values())
+    halo = 3 * [halo] if erode_3d else [0, halo, halo]
+    return halo
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _scale_block(block_id, blocking,
+                 ds_in, ds_bd, ds_out,
+                 offset, erode_by, erode_3d, channel):
+    fu.log_block_start(block_id)
+    # load the block with halo set to 'erode_by'
+    halo = compute_halo(erode_by, erode_3d)
+    block = blocking.getBlockWithHalo(block_id, halo)
+    in_bb = vu.block_to_bb(block.outerBlock)
+    out_bb = vu.block_to_bb(block.innerBlock)
+    local_bb = vu.block_to_bb(block.innerBlockLocal)
+
+    obj = ds_in[in_bb]
+    # don't scale if block is empty
+    if np.sum(obj != 0) == 0:
+        fu.log_block_success(block_id)
+        return
+
+    # load boundary map and fit obj to it
+    if ds_bd.ndim == 4:
+        in_bb = (slice(channel, channel + 1),) + in_bb
+    hmap = ds_bd[in_bb].squeeze()
+    obj, _ = vu.fit_to_hmap(obj, hmap, erode_by, erode_3d)
+    obj = obj[local_bb]
+
+    fg_mask = obj != 0
+    obj[fg_mask] += offset
+
+    # load previous output volume, insert obj into it and save again
+    out = ds_out[out_bb]
+    out[fg_mask] += obj[fg_mask]
+    ds_out[out_bb] = out
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def scale_to_boundaries(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read paths from the config
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    boundaries_path = config['boundaries_path']
+    boundaries_key = config['boundaries_key']
+    offset = config['offset']
+
+    # additional config
+    erode_by = config['erode_by']
+    erode_3d = config.get('erode_3d', True)
+    channel = config['channel']
+
+    block_shape = list(config['block_shape'])
+    block_list = config['block_list']
+
+    with vu.file_reader(input_path, 'r') as fin,\
+            vu.file_reader(boundaries_path, 'r') as fb,\
+            vu.file_reader(output_path) as fout:
+
+        ds_bd = fb[boundaries_key]
+        ds_out = fout[output_key]
+
+        shape = ds_out.shape
+        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
+
+        ds_in = ResizedVolume(fin[input_key], shape)
+
+        for block_id in block_list:
+            _scale_block(block_id, blocking,
+                         ds_in, ds_bd, ds_out,
+                         offset, erode_by, erode_3d, channel)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    scale_to_boundaries(job_id, path)
@@ -1,24 +1,9 @@
-#! /bin/python
-
-# IMPORTANT do threadctl import first (before numpy imports)
-from threadpoolctl import threadpool_limits
-
 import os
-import sys
-import json
-from functools import partial
-from concurrent import futures
-from math import ceil
-
-import numpy as np
 
 import luigi
-import vigra
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 
@@ -32,7 +17,7 @@ class UpscalingBase(luigi.Task):
     """
 
     task_name = 'upscaling'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'upscaling.py'))
 
     # input and output volumes
     input_path = luigi.Parameter()
@@ -197,132 +182,8 @@ class UpscalingLSF(UpscalingBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _upsample_block(blocking, block_id, ds_in, ds_out, scale_factor, sampler):
-    fu.log("start processing block %i" % block_id)
-
-    # load the block (output dataset / upscaled) coordinates
-    block = blocking.getBlock(block_id)
-    local_bb = np.s_[:]
-    in_bb = vu.block_to_bb(block)
-    out_bb = vu.block_to_bb(block)
-    out_shape = block.shape
-
-    # upsample the input bounding box
-    if isinstance(scale_factor, int):
-        in_bb = tuple(slice(int(ib.start // scale_factor),
-                            min(int(ceil(ib.stop / scale_factor)), sh))
-                      for ib, sh in zip(in_bb, ds_in.shape))
-    else:
-        in_bb = tuple(slice(int(ib.start // sf),
-                            min(int(ceil(ib.stop // sf)), sh))
-                      for ib, sf, sh in zip(in_bb, scale_factor, ds_in.shape))
-
-    x = ds_in[in_bb]
-
-    # don't sample empty blocks
-    if np.sum(x != 0) == 0:
-        fu.log_block_success(block_id)
-        return
-
-    dtype = x.dtype
-    if np.dtype(dtype) != np.dtype('float32'):
-        x = x.astype('float32')
-
-    if isinstance(scale_factor, int):
-        out = sampler(x, shape=out_shape)
-    else:
-        out = np.zeros(out_shape, dtype='float32')
-        for z in range(out_shape[0]):
-            out[z] = sampler(x[z], shape=out_shape[1:])
-
-    if np.dtype(dtype) in (np.dtype('uint8'), np.dtype('uint16')):
-        max_val = np.iinfo(np.dtype(dtype)).max
-        np.clip(out, 0, max_val, out=out)
-        np.round(out, out=out)
-
-    try:
-        ds_out[out_bb] = out[local_bb].astype(dtype)
-    except IndexError:
-        raise(IndexError("%s, %s, %s" % (str(out_bb), str(local_bb), str(out.shape))))
-
-    # log block success
-    fu.log_block_success(block_id)
-
-
-def _submit_blocks(ds_in, ds_out, block_shape, block_list,
-                   scale_factor, library,
-                   library_kwargs, n_threads):
-
-    # get the blocking
-    shape = ds_out.shape
-    blocking = nt.blocking([0, 0, 0], shape, block_shape)
-
-    sampler = partial(vigra.sampling.resize, **library_kwargs)
-
-    if n_threads <= 1:
-        for block_id in block_list:
-            _upsample_block(blocking, block_id, ds_in, ds_out,
-                            scale_factor, sampler)
-    else:
-        with futures.ThreadPoolExecutor(n_threads) as tp:
-            tasks = [tp.submit(_upsample_block, blocking, block_id, ds_in, ds_out,
-                               scale_factor, sampler) for block_id in block_list]
-            [t.result() for t in tasks]
-
-
-def upscaling(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # read the input cofig
-    input_path = config['input_path']
-    input_key = config['input_key']
-
-    block_shape = list(config['block_shape'])
-    block_list = config['block_list']
-
-    # read the output config
-    output_path = config['output_path']
-    output_key = config['output_key']
-
-    scale_factor = config['scale_factor']
-    library = config.get('library', 'vigra')
-    library_kwargs = config.get('library_kwargs', None)
-    if library_kwargs is None:
-        library_kwargs = {}
-    n_threads = config.get('threads_per_job', 1)
-
-    # submit blocks
-    # check if in and out - file are the same
-    # because hdf5 does not like opening files twice
-    if input_path == output_path:
-        with vu.file_reader(output_path) as f:
-            ds_in = f[input_key]
-            ds_out = f[output_key]
-            _submit_blocks(ds_in, ds_out, block_shape, block_list, scale_factor,
-                           library, library_kwargs, n_threads)
-
-    else:
-        with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
-            ds_in = f_in[input_key]
-            ds_out = f_out[output_key]
-            _submit_blocks(ds_in, ds_out, block_shape, block_list, scale_factor,
-                           library, library_kwargs, n_threads)
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    upscaling(job_id, path)
+class UpscalingExecutor(UpscalingBase, ExecutorTask):
+    """
+    downscaling on executor
+    """
+    pass
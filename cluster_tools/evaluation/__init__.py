@@ -1,4 +1,5 @@
-from .evaluation_workflow import (EvaluationWorkflow,
-                                  MeanAPWorkflow,
-                                  ObjectIouWorkflow,
-                                  ObjectViWorkflow)
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".evaluation_workflow": ["EvaluationWorkflow", "MeanAPWorkflow", "ObjectIouWorkflow", "ObjectViWorkflow"],
+})
@@ -1 +1,5 @@
-from .features_workflow import EdgeFeaturesWorkflow, RegionFeaturesWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".features_workflow": ["EdgeFeaturesWorkflow", "RegionFeaturesWorkflow"],
+})
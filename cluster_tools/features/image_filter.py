@@ -1,19 +1,9 @@
-#! /usr/bin/python
-
 import os
-import sys
-import argparse
-import json
 
-import numpy as np
 import luigi
-import z5py
-import nifty.tools as nt
-import nifty.distributed as ndist
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 # TODO support multi-channel filter
@@ -22,7 +12,7 @@ class ImageFilterBase(luigi.Task):
     """
 
     task_name = 'image_filter'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'image_filter.py'))
 
     # input and output volumes
     input_path = luigi.Parameter()
@@ -97,64 +87,7 @@ class ImageFilterLSF(ImageFilterBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _apply_filter(blocking, block_id, ds_in, ds_out,
-                  halo, filter_name, sigma, apply_in_2d):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlockWithHalo(block_id, halo)
-    bb_in = vu.block_to_bb(block.outerBlock)
-    input_ = vu.normalize(ds_in[bb_in])
-    response = vu.apply_filter(input_, filter_name, sigma, apply_in_2d)
-    bb_out = vu.block_to_bb(block.innerBlock)
-    inner_bb = vu.block_to_bb(block.innerBlockLocal)
-    ds_out[bb_out] = response[inner_bb]
-    fu.log_block_success(block_id)
-
-
-def image_filter(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    block_list = config['block_list']
-    input_path = config['input_path']
-    input_key = config['input_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    block_shape = config['block_shape']
-
-    sigma = config['sigma']
-    filter_name = config['filter_name']
-    halo = config['halo']
-    apply_in_2d = config.get('apply_in_2d', False)
-
-    # iterate over blocks and apply filter
-    with vu.file_reader(input_path, 'r') as f_in,\
-        vu.file_reader(output_path) as f_out:
-
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-
-        shape = list(ds_in.shape)
-        blocking = nt.blocking([0, 0, 0], shape, block_shape)
-
-        for block_id in block_list:
-            _apply_filter(blocking, block_id, ds_in, ds_out,
-                          halo, filter_name, sigma, apply_in_2d)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    image_filter(job_id, path)
+class ImageFilterExecutor(ImageFilterBase, ExecutorTask):
+    """ ImageFilter on executor
+    """
+    pass
@@ -0,0 +1,274 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.thread_utils as thu
+
+
+#
+# Implementation
+#
+
+
+def _accumulate(input_path, input_key,
+                labels_path, labels_key,
+                graph_path, subgraph_key,
+                output_path, output_key,
+                block_list, offsets):
+
+    fu.log("accumulate features without applying filters")
+    with vu.file_reader(input_path, "r") as f:
+        dtype = f[input_key].dtype
+        input_dim = f[input_key].ndim
+
+    if offsets is None:
+        assert input_dim == 3, str(input_dim)
+        fu.log("accumulate boundary map for type %s" % str(dtype))
+        boundary_function = ndist.extractBlockFeaturesFromBoundaryMaps_uint8 if dtype == "uint8" else \
+            ndist.extractBlockFeaturesFromBoundaryMaps_float32
+        boundary_function(graph_path, subgraph_key,
+                          input_path, input_key,
+                          labels_path, labels_key,
+                          block_list,
+                          output_path, output_key,
+                          increaseRoi=True)
+    else:
+        assert input_dim == 4, str(input_dim)
+        fu.log("accumulate affinity map for type %s" % str(dtype))
+        affinity_function = ndist.extractBlockFeaturesFromAffinityMaps_uint8 if dtype == "uint8" else \
+            ndist.extractBlockFeaturesFromAffinityMaps_float32
+        affinity_function(graph_path, subgraph_key,
+                          input_path, input_key,
+                          labels_path, labels_key,
+                          block_list,
+                          output_path, output_key,
+                          offsets)
+    # number of featres is 10 for both boundaries and affinities
+    n_feats = 10
+    return n_feats
+
+
+def _accumulate_filter(input_, graph, labels, bb_local,
+                       filter_name, sigma, ignore_label,
+                       with_size, apply_in_2d):
+    response = vu.apply_filter(input_, filter_name, sigma,
+                               apply_in_2d=apply_in_2d)[bb_local]
+    if response.ndim == 4:
+        n_chan = response.shape[-1]
+        assert response.shape[:-1] == labels.shape
+        return np.concatenate([ndist.accumulateInput(graph, response[..., c], labels,
+                                                     ignore_label,
+                                                     with_size and c == n_chan-1,
+                                                     response[..., c].min(),
+                                                     response[..., c].max())
+                               for c in range(n_chan)], axis=1)
+    else:
+        assert response.shape == labels.shape
+        return ndist.accumulateInput(graph, response, labels,
+                                     ignore_label, with_size,
+                                     response.min(), response.max())
+
+
+def _accumulate_block(block_id, blocking,
+                      ds_in, ds_labels, ds_edges, ds_out,
+                      filters, sigmas, halo, ignore_label,
+                      apply_in_2d, channel_agglomeration):
+
+    fu.log_block_start(block_id)
+    chunk_pos = blocking.blockGridPosition(block_id)
+
+    # load edges and construct the graph if this block has edges
+    edges = ds_edges.read_chunk(chunk_pos)
+    if edges is None:
+        fu.log("block %i has no edges" % block_id)
+        fu.log_block_success(block_id)
+        return
+
+    edges = edges.reshape((edges.size // 2, 2))
+    graph = ndist.Graph(edges)
+
+    shape = ds_labels.shape
+    # get the bounding
+    if sum(halo) > 0:
+        block = blocking.getBlockWithHalo(block_id, halo)
+        block_shape = block.outerBlock.shape
+        bb_in = vu.block_to_bb(block.outerBlock)
+        bb = vu.block_to_bb(block.innerBlock)
+        bb_local = vu.block_to_bb(block.innerBlockLocal)
+        # increase inner bounding box by 1 in posirive direction
+        # in accordance with the graph extraction
+        bb = tuple(slice(b.start,
+                         min(b.stop + 1, sh)) for b, sh in zip(bb, shape))
+        bb_local = tuple(slice(b.start,
+                               min(b.stop + 1, bsh)) for b, bsh in zip(bb_local,
+                                                                       block_shape))
+    else:
+        block = blocking.getBlock(block_id)
+        bb = vu.block_to_bb(block)
+        bb = tuple(slice(b.start,
+                         min(b.stop + 1, sh)) for b, sh in zip(bb, shape))
+        bb_in = bb
+        bb_local = slice(None)
+
+    input_dim = ds_in.ndim
+    # TODO make choice of channels optional
+    if input_dim == 4:
+        bb_in = (slice(0, 3),) + bb_in
+
+    input_ = vu.normalize(ds_in[bb_in])
+    if input_dim == 4:
+        assert channel_agglomeration is not None
+        input_ = getattr(np, channel_agglomeration)(input_, axis=0)
+
+    # load labels
+    labels = ds_labels[bb]
+
+    # TODO pre-smoothing ?!
+    # accumulate the edge features
+    edge_features = [_accumulate_filter(input_, graph, labels, bb_local,
+                                        filter_name, sigma, ignore_label,
+                                        filter_name == filters[-1] and sigma == sigmas[-1],
+                                        apply_in_2d)
+                     for filter_name in filters for sigma in sigmas]
+    edge_features = np.concatenate(edge_features, axis=1)
+
+    # save the features
+    fu.log("saving feature result of shape %s" % str(edge_features.shape))
+    ds_out.write_chunk(chunk_pos, edge_features.flatten(), True)
+    fu.log_block_success(block_id)
+    return edge_features.shape[1]
+
+
+def _accumulate_with_filters(input_path, input_key,
+                             labels_path, labels_key,
+                             graph_path, subgraph_key,
+                             output_path, output_key,
+                             block_list, block_shape,
+                             filters, sigmas, halo,
+                             apply_in_2d, channel_agglomeration, n_threads=1):
+
+    fu.log("accumulate features with applying filters:")
+
+    with vu.file_reader(input_path, "r") as f,\
+            vu.file_reader(labels_path, "r") as fl,\
+            vu.file_reader(graph_path, "r") as fg,\
+            vu.file_reader(output_path) as fo:
+
+        g = fg[subgraph_key]
+        shape = g.attrs["shape"]
+        ignore_label = g.attrs["ignore_label"]
+        ds_edges = g["edges"]
+
+        ds_in = f[input_key]
+        ds_labels = fl[labels_key]
+        ds_out = fo[output_key]
+
+        blocking = nt.blocking([0, 0, 0], shape, block_shape)
+        budget = thu.ThreadBudget(n_threads, len(block_list))
+        budget.set_io_threads(ds_in, ds_labels)
+        n_feats = budget.map(lambda block_id: _accumulate_block(block_id, blocking,
+                                                                ds_in, ds_labels, ds_edges, ds_out,
+                                                                filters, sigmas, halo, ignore_label,
+                                                                apply_in_2d, channel_agglomeration),
+                             block_list)
+
+    # empty blocks don't return the number of features
+    n_feats = [n for n in n_feats if n is not None]
+    return n_feats[0] if n_feats else None
+
+
+def block_edge_features(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    block_list = config["block_list"]
+    input_path = config["input_path"]
+    input_key = config["input_key"]
+    labels_path = config["labels_path"]
+    labels_key = config["labels_key"]
+    output_path = config["output_path"]
+    block_shape = config["block_shape"]
+    graph_path = config["graph_path"]
+    subgraph_key = config["subgraph_key"]
+    output_key = config["output_key"]
+
+    # offsets for accumulation of affinity maps
+    offsets = config.get("offsets", None)
+    filters = config.get("filters", None)
+    sigmas = config.get("sigmas", None)
+    apply_in_2d = config.get("apply_in_2d", False)
+    halo = config.get("halo", [0, 0, 0])
+    channel_agglomeration = config.get("channel_agglomeration", "mean")
+    assert channel_agglomeration in ("mean", "max", "min", None)
+
+    # check if we accumulate with filters
+    with_filters = filters is not None
+
+    with vu.file_reader(input_path, "r") as f:
+        ndim = f[input_key].ndim
+
+    fu.log(f"Saving block features at {output_path}:{output_key}")
+    fu.log(f"Offsets: {offsets}")
+    has_channels = ndim == 4
+    agglomerate_channels = False
+    if has_channels and offsets is None:
+        assert channel_agglomeration is not None
+        agglomerate_channels = True
+
+    if with_filters:
+        assert offsets is None, "Filters and offsets are not supported"
+        assert sigmas is not None, "Need sigma values"
+        fu.log("Accumulate edge features with filters")
+        n_feats = _accumulate_with_filters(input_path, input_key,
+                                           labels_path, labels_key,
+                                           graph_path, subgraph_key,
+                                           output_path, output_key,
+                                           block_list, block_shape,
+                                           filters, sigmas, halo,
+                                           apply_in_2d, channel_agglomeration,
+                                           config.get("threads_per_job", 1))
+    elif agglomerate_channels:
+        fu.log("Accumulate edge features with channel agglomeration")
+        filters = ["identity"]
+        sigmas = [0]
+        n_feats = _accumulate_with_filters(input_path, input_key,
+                                           labels_path, labels_key,
+                                           graph_path, subgraph_key,
+                                           output_path, output_key,
+                                           block_list, block_shape,
+                                           filters, sigmas, halo,
+                                           apply_in_2d, channel_agglomeration,
+                                           config.get("threads_per_job", 1))
+    else:
+        fu.log("Accumulate edge features")
+        n_feats = _accumulate(input_path, input_key,
+                              labels_path, labels_key,
+                              graph_path, subgraph_key,
+                              output_path, output_key,
+                              block_list, offsets)
+
+    # we need to serialize the number of features for job 0
+    if job_id == 0:
+        with vu.file_reader(output_path, "a") as f:
+            ds = f[output_key]
+            ds.attrs["n_features"] = n_feats
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    block_edge_features(job_id, path)
@@ -1,17 +1,10 @@
-#! /usr/bin/python
-
 import os
-import sys
-import json
 
-import numpy as np
 import luigi
-import nifty.distributed as ndist
 import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 class MergeEdgeFeaturesBase(luigi.Task):
@@ -19,7 +12,7 @@ class MergeEdgeFeaturesBase(luigi.Task):
     """
 
     task_name = "merge_edge_features"
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'merge_edge_features.py'))
     allow_retry = False
 
     # input and output volumes
@@ -107,63 +100,7 @@ class MergeEdgeFeaturesLSF(MergeEdgeFeaturesBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-# TODO how to make this more efficient:
-# compute a edgeToBlocks data structure, that maps the edge ids to list of blocks containing the edgge
-# (probably need a n5 varlen chunk thingy to make ragged array storage efficient)
-# then we can treat this one as a proper map-like job parallelized over the edges, because we can just load
-# the per edge blocks for each edge
-def merge_edge_features(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path, "r") as f:
-        config = json.load(f)
-    graph_path = config["graph_path"]
-    subgraph_key = config["subgraph_key"]
-
-    in_path = config["in_path"]
-    output_path = config["output_path"]
-    subfeat_key = config["subfeat_key"]
-    output_key = config["output_key"]
-    n_threads = config["threads_per_job"]
-    edge_block_list = config["block_list"]
-    edge_chunk_size = config["edge_chunk_size"]
-    block_ids = config["block_ids"]
-
-    # assert that the edge block list is consecutive
-    diff_list = np.diff(edge_block_list)
-    assert (diff_list == 1).all()
-
-    n_edges = config["n_edges"]
-    edge_blocking = nt.blocking([0], [n_edges], [edge_chunk_size])
-    edge_begin = edge_blocking.getBlock(edge_block_list[0]).begin[0]
-    edge_end = edge_blocking.getBlock(edge_block_list[-1]).end[0]
-
-    # the block list might either be the number of blocks or a list of blocks
-    block_ids = list(range(block_ids)) if isinstance(block_ids, int) else block_ids
-
-    fu.log(f"Merge edge features stored at {in_path}:{subfeat_key}")
-    fu.log(f"to {output_path}:{output_key}")
-    fu.log(f"Accumulate features for edges {edge_begin} to {edge_end} in {len(block_ids)} blocks")
-    ndist.mergeFeatureBlocks(graph_path, subgraph_key,
-                             in_path, subfeat_key,
-                             output_path, output_key,
-                             blockIds=block_ids,
-                             edgeIdBegin=edge_begin,
-                             edgeIdEnd=edge_end,
-                             numberOfThreads=n_threads)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == "__main__":
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
-    merge_edge_features(job_id, path)
+class MergeEdgeFeaturesExecutor(MergeEdgeFeaturesBase, ExecutorTask):
+    """ MergeEdgeFeatures on executor
+    """
+    pass
@@ -1 +1,5 @@
-from .graph_workflow import GraphWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".graph_workflow": ["GraphWorkflow"],
+})
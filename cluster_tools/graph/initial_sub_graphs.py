@@ -1,16 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.tools as nt
-import nifty.distributed as ndist
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -23,7 +16,9 @@ class InitialSubGraphsBase(luigi.Task):
     """
 
     task_name = 'initial_sub_graphs'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'initial_sub_graphs.py'))
+    # the sub-graphs can be restricted to the dirty regions
+    supports_dirty_regions = True
 
     # input volumes and graph
     input_path = luigi.Parameter()
@@ -76,6 +71,8 @@ class InitialSubGraphsBase(luigi.Task):
 
         if self.n_retries == 0:
             block_list = vu.blocks_in_volume(shape, block_shape, roi_begin, roi_end)
+            # the edges to the next block are extracted with a halo of one pixel
+            block_list = self.restrict_to_dirty_regions(block_list, shape, block_shape, halo=[1, 1, 1])
         else:
             block_list = self.block_list
             self.clean_up_for_retry(block_list)
@@ -108,57 +105,7 @@ class InitialSubGraphsLSF(InitialSubGraphsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _graph_block(block_id, blocking, input_path, input_key, graph_path,
-                 ignore_label):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    # we only need the halo into one direction,
-    # hence we use the outer-block only for the end coordinate
-
-    subgraph_key = 's0/sub_graphs'
-    ndist.computeMergeableRegionGraph(input_path, input_key,
-                                      block.begin, block.end,
-                                      graph_path, subgraph_key,
-                                      ignore_label,
-                                      increaseRoi=True,
-                                      serializeToVarlen=True)
-    # log block success
-    fu.log_block_success(block_id)
-
-
-def initial_sub_graphs(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-    input_path = config['input_path']
-    input_key = config['input_key']
-    block_shape = config['block_shape']
-    block_list = config['block_list']
-    graph_path = config['graph_path']
-    ignore_label = config.get('ignore_label', True)
-
-    shape = vu.get_shape(input_path, input_key)
-    blocking = nt.blocking(roiBegin=[0, 0, 0],
-                           roiEnd=list(shape),
-                           blockShape=list(block_shape))
-
-    for block_id in block_list:
-        _graph_block(block_id, blocking, input_path, input_key, graph_path,
-                     ignore_label)
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    initial_sub_graphs(job_id, path)
+class InitialSubGraphsExecutor(InitialSubGraphsBase, ExecutorTask):
+    """ InitialSubGraphs on executor
+    """
+    pass
@@ -0,0 +1,65 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def _graph_block(block_id, blocking, input_path, input_key, graph_path,
+                 ignore_label):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    # we only need the halo into one direction,
+    # hence we use the outer-block only for the end coordinate
+
+    subgraph_key = 's0/sub_graphs'
+    ndist.computeMergeableRegionGraph(input_path, input_key,
+                                      block.begin, block.end,
+                                      graph_path, subgraph_key,
+                                      ignore_label,
+                                      increaseRoi=True,
+                                      serializeToVarlen=True)
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def initial_sub_graphs(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+    input_path = config['input_path']
+    input_key = config['input_key']
+    block_shape = config['block_shape']
+    block_list = config['block_list']
+    graph_path = config['graph_path']
+    ignore_label = config.get('ignore_label', True)
+
+    shape = vu.get_shape(input_path, input_key)
+    blocking = nt.blocking(roiBegin=[0, 0, 0],
+                           roiEnd=list(shape),
+                           blockShape=list(block_shape))
+
+    for block_id in block_list:
+        _graph_block(block_id, blocking, input_path, input_key, graph_path,
+                     ignore_label)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    initial_sub_graphs(job_id, path)
@@ -0,0 +1,41 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.distributed as ndist
+
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def map_edge_ids(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+    scale = config['scale']
+    graph_path = config['graph_path']
+    input_key = config['input_key']
+    block_list = config['block_list']
+    n_threads = config['threads_per_job']
+
+    subgraph_key = 's%i/sub_graphs' % scale
+    ndist.mapEdgeIds(graph_path, input_key,
+                     subgraphKey=subgraph_key,
+                     blockIds=block_list,
+                     numberOfThreads=n_threads)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    map_edge_ids(job_id, path)
@@ -0,0 +1,92 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def _merge_graph(graph_path, output_key, scale,
+                 block_list, blocking, shape, n_threads):
+    subgraph_key = 's%i/sub_graphs' % scale
+    ndist.mergeSubgraphs(graph_path,
+                         subgraphKey=subgraph_key,
+                         blockIds=block_list,
+                         outKey=output_key,
+                         numberOfThreads=n_threads,
+                         serializeToVarlen=False)
+    with vu.file_reader(graph_path) as f:
+        f[output_key].attrs['shape'] = shape
+
+
+def _merge_subblocks(block_id, blocking, previous_blocking, graph_path, output_key, scale):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    input_key = 's%i/sub_graphs' % (scale - 1,)
+    block_list = previous_blocking.getBlockIdsInBoundingBox(roiBegin=block.begin,
+                                                            roiEnd=block.end,
+                                                            blockHalo=[0, 0, 0])
+    ndist.mergeSubgraphs(graph_path,
+                         subgraphKey=input_key,
+                         blockIds=block_list.tolist(),
+                         outKey=output_key, serializeToVarlen=True)
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def merge_sub_graphs(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+    scale = config['scale']
+    initial_block_shape = config['block_shape']
+    graph_path = config['graph_path']
+    output_key = config['output_key']
+    merge_complete_graph = config['merge_complete_graph']
+    block_list = config['block_list']
+
+    with vu.file_reader(graph_path, 'r') as f:
+        shape = f[output_key].attrs['shape']
+    factor = 2**scale
+    block_shape = [factor * bs for bs in initial_block_shape]
+    blocking = nt.blocking(roiBegin=[0, 0, 0],
+                           roiEnd=list(shape),
+                           blockShape=block_shape)
+
+    if merge_complete_graph:
+        fu.log("merge complete graph at scale %i" % scale)
+        n_threads = config['threads_per_job']
+        _merge_graph(graph_path, output_key, scale,
+                     block_list, blocking, shape, n_threads)
+
+    else:
+        fu.log("merging subgraphs at scale %i" % scale)
+        previous_factor = 2**(scale - 1)
+        previous_block_shape = [previous_factor * bs for bs in initial_block_shape]
+        previous_blocking = nt.blocking(roiBegin=[0, 0, 0],
+                                        roiEnd=list(shape),
+                                        blockShape=previous_block_shape)
+        for block_id in block_list:
+            _merge_subblocks(block_id, blocking, previous_blocking,
+                             graph_path, output_key, scale)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    merge_sub_graphs(job_id, path)
@@ -1,15 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.distributed as ndist
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -21,7 +15,7 @@ class MapEdgeIdsBase(luigi.Task):
     """
 
     task_name = 'map_edge_ids'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'map_edge_ids.py'))
     allow_retry = False
 
     # input volumes and graph
@@ -93,35 +87,7 @@ class MapEdgeIdsLSF(MapEdgeIdsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def map_edge_ids(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-    scale = config['scale']
-    graph_path = config['graph_path']
-    input_key = config['input_key']
-    block_list = config['block_list']
-    n_threads = config['threads_per_job']
-
-    subgraph_key = 's%i/sub_graphs' % scale
-    ndist.mapEdgeIds(graph_path, input_key,
-                     subgraphKey=subgraph_key,
-                     blockIds=block_list,
-                     numberOfThreads=n_threads)
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    map_edge_ids(job_id, path)
+class MapEdgeIdsExecutor(MapEdgeIdsBase, ExecutorTask):
+    """ MapEdgeIds on executor
+    """
+    pass
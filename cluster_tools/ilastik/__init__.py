@@ -1,2 +1,7 @@
-from .ilastik_workflow import IlastikPredictionWorkflow, IlastikCarvingWorkflow
-from .stack_predictions import StackPredictionsLocal, StackPredictionsSlurm, StackPredictionsLSF
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".ilastik_workflow": ["IlastikPredictionWorkflow", "IlastikCarvingWorkflow"],
+    ".stack_predictions": ["StackPredictionsLocal", "StackPredictionsSlurm",
+                           "StackPredictionsLSF", "StackPredictionsExecutor"],
+})
@@ -0,0 +1,153 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+try:
+    import lazyflow
+    from ilastik.experimental.api import from_project_file
+    # set the number of threads used by ilastik to 0.
+    # otherwise it does not work inside of the torch loader (and we want to limit number of threads anyways)
+    # see https://github.com/ilastik/ilastik/issues/2517
+    lazyflow.request.Request.reset_thread_pool(0)
+except ImportError:
+    from_project_file = None
+try:
+    from xarray import DataArray
+except ImportError:
+    DataArray = None
+
+
+# TODO implement more dtype conversion
+def _to_dtype(input_, dtype):
+    idtype = input_.dtype
+    if np.dtype(dtype) == idtype:
+        return input_
+    elif dtype == "uint8":
+        input_ *= 255.
+        return input_.astype("uint8")
+    else:
+        raise NotImplementedError(dtype)
+
+
+def _pad_if_necessary(data, shape):
+    if data.shape == shape:
+        return data, None
+    pad_width = []
+    crop = []
+    for dsh, sh in zip(data.shape, shape):
+        if dsh == sh:
+            pad_width.append((0, 0))
+            crop.append(slice(None))
+        else:
+            assert sh > dsh
+            pad_width.append((0, sh - dsh))
+            crop.append(slice(0, dsh))
+    data = np.pad(data, pad_width)
+    assert data.shape == shape
+    return data, tuple(crop)
+
+
+def _predict_block(block_id, blocking, ilp, ds_in, ds_out, ds_mask, halo, out_channels):
+    fu.log("Start processing block %i" % block_id)
+    block = blocking.getBlockWithHalo(block_id, halo)
+    bb = vu.block_to_bb(block.outerBlock)
+
+    # check if there is any data to be processed, if we have a mask
+    if ds_mask is not None:
+        bb_mask = ds_mask[bb].astype("bool")
+        if np.sum(bb_mask) == 0:
+            fu.log_block_success(block_id)
+            return
+
+    dims = ("z", "y", "x")
+    if ds_in.ndim == 4:
+        bb = (slice(None),) + bb
+        dims = ("c",) + dims
+    input_ = ds_in[bb]
+
+    # we need to pad to the full size for border chunks, because otherwise some filters may not be valid
+    full_block_shape = tuple(sh + 2*ha for sh, ha in zip(blocking.blockShape, halo))
+    input_, crop = _pad_if_necessary(input_, full_block_shape)
+
+    # if we have a mask should set it as prediction mask in ilastik
+    # (currently not supported by ilastik)
+    pred = ilp.predict(DataArray(input_, dims=dims)).values
+    if crop is not None:
+        pred = pred[crop]
+
+    inner_bb = vu.block_to_bb(block.innerBlockLocal)
+    inner_bb = inner_bb + (tuple(out_channels),)
+    pred = pred[inner_bb]
+    if pred.shape[-1] == 1:
+        pred = pred[..., 0]
+    else:
+        pred = pred.transpose((3, 0, 1, 2))
+    pred = _to_dtype(pred, ds_out.dtype)
+    assert pred.ndim in (3, 4)
+
+    bb = vu.block_to_bb(block.innerBlock)
+    if pred.ndim == 4:
+        bb = (slice(None),) + bb
+    ds_out[bb] = pred
+    fu.log_block_success(block_id)
+
+
+def prediction(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config["input_path"]
+    input_key = config["input_key"]
+    halo = config["halo"]
+    ilastik_project = config["ilastik_project"]
+
+    output_path = config["output_path"]
+    output_key = config["output_key"]
+    out_channels = config["out_channels"]
+
+    assert os.path.exists(ilastik_project), ilastik_project
+    assert os.path.exists(input_path)
+
+    block_shape = config["block_shape"]
+    block_list = config["block_list"]
+    shape = vu.get_shape(input_path, input_key)
+    if len(shape) == 4:
+        shape = shape[1:]
+    blocking = nt.blocking([0, 0, 0], shape, block_shape)
+
+    ilp = from_project_file(ilastik_project)
+    fu.log("start ilastik prediction")
+    with vu.file_reader(input_path, "r") as f_in, vu.file_reader(output_path, "a") as f_out:
+        ds_in = f_in[input_key]
+        ds_out = f_out[output_key]
+
+        if "mask_path" in config:
+            mask_path, mask_key = config["mask_path"], config["mask_key"]
+            fu.log("Load mask from %s:%s" % (mask_path, mask_key))
+            mask = vu.load_mask(mask_path, mask_key, shape)
+            fu.log("Have loaded mask")
+        else:
+            mask = None
+
+        for block_id in block_list:
+            _predict_block(block_id, blocking, ilp, ds_in, ds_out, mask, halo, out_channels)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    prediction(job_id, path)
@@ -1,19 +1,9 @@
-#! /usr/bin/python
-
 import os
-import sys
-import argparse
-import pickle
-import json
-import subprocess
 
-import numpy as np
 import luigi
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 class StackPredictionsBase(luigi.Task):
@@ -21,7 +11,7 @@ class StackPredictionsBase(luigi.Task):
     """
 
     task_name = 'stack_predictions'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'stack_predictions.py'))
     allow_retry = False
 
     raw_path = luigi.Parameter()
@@ -93,74 +83,7 @@ class StackPredictionsLSF(StackPredictionsBase, LSFTask):
     pass
 
 
-def cast(input_, dtype):
-    if np.dtype(input_.dtype) == np.dtype(dtype):
-        return input_
-    # TODO allow more general casting
-    assert dtype in ('float32', 'uint8')
-    # option one: cast float to uint8
-    if dtype == 'uint8':
-        input_ *= 255
-        return input_.astype('uint8')
-    # option two: cast uint8 to float
-    else:
-        input_ = input_.astype('float32')
-        input_ /= input_.max()
-        return input_
-
-
-def stack_block(block_id, blocking, ds_raw, ds_pred, ds_out, dtype):
-    fu.log("start processing block %i" % block_id)
-    bb = vu.block_to_bb(blocking.getBlock(block_id))
-    raw = cast(ds_raw[bb], dtype)
-    bb = (slice(None),) + bb
-    pred = cast(ds_pred[bb], dtype)
-    out = np.concatenate([raw[None], pred], axis=0)
-    ds_out[bb] = out
-    fu.log_block_success(block_id)
-
-
-def stack_predictions(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    raw_path = config['raw_path']
-    raw_key = config['raw_key']
-    pred_path = config['pred_path']
-    pred_key = config['pred_key']
-
-    output_path = config['output_path']
-    output_key = config['output_key']
-
-    block_shape = config['block_shape']
-    block_list = config['block_list']
-
-    with vu.file_reader(raw_path, 'r') as fr,\
-        vu.file_reader(pred_path, 'r') as fp,\
-        vu.file_reader(output_path) as fout:
-
-        ds_raw = fr[raw_key]
-        ds_pred = fp[pred_key]
-        ds_out = fout[output_key]
-
-        dtype = str(ds_out.dtype)
-
-        shape = ds_raw.shape
-        blocking = nt.blocking([0, 0, 0], shape, block_shape)
-
-        for block_id in block_list:
-            stack_block(block_id, blocking, ds_raw, ds_pred, ds_out, dtype)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    stack_predictions(job_id, path)
+class StackPredictionsExecutor(StackPredictionsBase, ExecutorTask):
+    """ StackPredictions on executor
+    """
+    pass
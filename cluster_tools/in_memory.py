@@ -0,0 +1,196 @@
+""" Run the multicut segmentation workflows in a single process for volumes that fit into memory.
+
+The steps of `MulticutSegmentationWorkflow` and `LiftedMulticutSegmentationWorkflow`
+(watershed, graph, features, costs, (lifted) multicut and write) are run on numpy arrays with
+the implementation functions of the tasks, without luigi, job configs or intermediate files.
+The watershed and write steps process the blocks in parallel with threads.
+This is meant for iterating on the parameters with small and medium sized crops.
+
+The results are the same as for the workflows with `n_scales=0` (the cluster workflows
+solve the multicut hierarchically for `n_scales > 0`), except for the quantile features,
+which the workflows approximate by merging the block features; the costs only depend on the
+mean and size features and are the same. The node labels for the costs (`node_label_dict`),
+the random forest and the lifted problem from node labels are not supported; the lifted edges
+and costs need to be passed for the lifted multicut.
+"""
+import os
+from contextlib import contextmanager, redirect_stdout
+
+import numpy as np
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+from .costs import probs_to_costs as cost_tasks
+from .costs.jobs import probs_to_costs as cost_jobs
+from .graph import initial_sub_graphs as graph_tasks
+from .lifted_multicut import solve_lifted_global as lifted_multicut_tasks
+from .lifted_multicut.jobs import solve_lifted_global as lifted_multicut_jobs
+from .multicut import solve_global as multicut_tasks
+from .multicut.jobs import solve_global as multicut_jobs
+from .relabel.jobs import find_labeling as labeling_jobs
+from .utils import thread_utils as thu
+from .watershed import watershed as watershed_tasks
+from .watershed.jobs import watershed as watershed_jobs
+from .write import write as write_tasks
+from .write.jobs import write as write_jobs
+
+
+def _task_config(configs, name, task):
+    # the configs have the same format as the configs of the workflows, see `get_config`
+    config = task.default_task_config()
+    config.update((configs or {}).get(name, {}))
+    return config
+
+
+@contextmanager
+def _log_output(verbose):
+    # the task functions log to stdout, which is only shown if verbose
+    if verbose:
+        yield
+    else:
+        with open(os.devnull, "w") as f, redirect_stdout(f):
+            yield
+
+
+def _watershed(input_, mask, config, blocking, n_threads):
+    shape = input_.shape[1:] if input_.ndim == 4 else input_.shape
+    ws = np.zeros(shape, dtype="uint64")
+    block_list = list(range(blocking.numberOfBlocks))
+    budget = thu.ThreadBudget(n_threads, len(block_list))
+    budget.map(lambda block_id: watershed_jobs._ws_block(blocking, block_id, input_, ws, mask, config),
+               block_list)
+    return ws
+
+
+def _relabel(ws, config, blocking, n_threads):
+    # relabel the watershed consecutively in-place, like the `RelabelWorkflow`
+    assignments = labeling_jobs._find_labeling(np.unique(ws))
+    node_labels = dict(zip(assignments[:, 0], assignments[:, 1]))
+    write_jobs._write(ws, ws, blocking, list(range(blocking.numberOfBlocks)), n_threads,
+                       node_labels, config.get("allow_empty_assignments", False))
+    return ws
+
+
+def _region_graph(labels, ignore_label):
+    # the edges between the labels of face-adjacent voxels; they are sorted lexicographically
+    # like the edges of the graph merged from the sub-graphs
+    uv_ids = []
+    for axis in range(labels.ndim):
+        lower = labels[tuple(slice(None, -1) if ax == axis else slice(None) for ax in range(labels.ndim))]
+        upper = labels[tuple(slice(1, None) if ax == axis else slice(None) for ax in range(labels.ndim))]
+        boundary = lower != upper
+        uv_ids.append(np.sort(np.stack([lower[boundary], upper[boundary]], axis=1), axis=1))
+    uv_ids = np.unique(np.concatenate(uv_ids, axis=0), axis=0)
+    if ignore_label:
+        uv_ids = uv_ids[(uv_ids != 0).all(axis=1)]
+    return uv_ids.astype("uint64")
+
+
+def _edge_features(input_, labels, uv_ids, ignore_label):
+    # the boundary map features (mean, variance, min, quantiles, max and size) with the
+    # value range used for the block features
+    assert input_.ndim == 3, "Only boundary maps are supported for the edge features"
+    value_range = (0., 255.) if input_.dtype == np.dtype("uint8") else (0., 1.)
+    graph = ndist.Graph(uv_ids)
+    features = ndist.accumulateInput(graph, input_.astype("float32"), labels,
+                                     ignore_label, True, *value_range)
+    return features.astype("float64")
+
+
+def _problem(input_, block_shape, configs, mask, watershed, n_threads):
+    shape = input_.shape[1:] if input_.ndim == 4 else input_.shape
+    blocking = nt.blocking([0, 0, 0], list(shape), list(block_shape))
+
+    # the watershed is relabeled, unless it is given (like `skip_ws` for the workflows)
+    if watershed is None:
+        ws_config = _task_config(configs, "watershed", watershed_tasks.WatershedLocal)
+        ws = _watershed(input_, mask, ws_config, blocking, n_threads)
+        write_config = _task_config(configs, "write", write_tasks.WriteLocal)
+        ws = _relabel(ws, write_config, blocking, n_threads)
+    else:
+        assert watershed.shape == tuple(shape), "%s, %s" % (str(watershed.shape), str(shape))
+        ws = watershed.astype("uint64")
+
+    graph_config = _task_config(configs, "initial_sub_graphs", graph_tasks.InitialSubGraphsLocal)
+    ignore_label = graph_config.get("ignore_label", True)
+    uv_ids = _region_graph(ws, ignore_label)
+    features = _edge_features(input_, ws, uv_ids, ignore_label)
+
+    cost_config = _task_config(configs, "probs_to_costs", cost_tasks.ProbsToCostsLocal)
+    # the probabilities are the mean boundary values and the edge sizes the last feature
+    costs = cost_jobs._probs_to_costs(features[:, 0], cost_config, features[:, -1])
+    # the costs are stored as float32 by the workflows
+    costs = costs.astype("float32")
+    return blocking, ws, uv_ids, features, costs, ignore_label
+
+
+def _write_segmentation(ws, node_labels, configs, blocking, n_threads):
+    write_config = _task_config(configs, "write", write_tasks.WriteLocal)
+    seg = np.zeros_like(ws)
+    write_jobs._write(ws, seg, blocking, list(range(blocking.numberOfBlocks)), n_threads,
+                       node_labels, write_config.get("allow_empty_assignments", False))
+    return seg
+
+
+def multicut_segmentation(input_, block_shape, configs=None, mask=None, watershed=None,
+                          n_threads=1, return_intermediates=False, verbose=False):
+    """ Run the multicut segmentation workflow in memory.
+
+    Arguments:
+        input_ [np.ndarray] - the boundary map, the watershed also supports inputs with channels
+        block_shape [list] - the block shape, the watershed ids depend on the blocks
+        configs [dict] - the task configs, same format as `MulticutSegmentationWorkflow.get_config` (default: None)
+        mask [np.ndarray] - binary mask for the watershed (default: None)
+        watershed [np.ndarray] - pre-computed watershed, the watershed step is skipped if given (default: None)
+        n_threads [int] - number of threads (default: 1)
+        return_intermediates [bool] - whether to also return the watershed, graph,
+            features, costs and node labels (default: False)
+        verbose [bool] - whether to print the logs of the task functions (default: False)
+    Returns:
+        np.ndarray - the segmentation
+        dict - the intermediate results, if `return_intermediates`
+    """
+    with _log_output(verbose):
+        blocking, ws, uv_ids, features, costs, ignore_label = _problem(input_, block_shape, configs,
+                                                                       mask, watershed, n_threads)
+        solver_config = _task_config(configs, "solve_global", multicut_tasks.SolveGlobalLocal)
+        node_labels = multicut_jobs._solve_multicut(uv_ids, costs, solver_config, n_threads)
+        node_labels = multicut_jobs._consecutive_node_labeling(node_labels, ignore_label)
+        seg = _write_segmentation(ws, node_labels, configs, blocking, n_threads)
+
+    if return_intermediates:
+        return seg, {"watershed": ws, "uv_ids": uv_ids, "features": features,
+                     "costs": costs, "node_labels": node_labels}
+    return seg
+
+
+def lifted_multicut_segmentation(input_, block_shape, lifted_uv_ids, lifted_costs,
+                                 configs=None, mask=None, watershed=None,
+                                 n_threads=1, return_intermediates=False, verbose=False):
+    """ Run the lifted multicut segmentation workflow in memory.
+
+    The lifted edges refer to the ids of the watershed, so the watershed
+    should usually be passed as well, see `multicut_segmentation` for the other arguments.
+
+    Arguments:
+        lifted_uv_ids [np.ndarray] - the lifted edges
+        lifted_costs [np.ndarray] - the costs of the lifted edges
+    Returns:
+        np.ndarray - the segmentation
+        dict - the intermediate results, if `return_intermediates`
+    """
+    assert len(lifted_uv_ids) == len(lifted_costs), "%i, %i" % (len(lifted_uv_ids), len(lifted_costs))
+    with _log_output(verbose):
+        blocking, ws, uv_ids, features, costs, ignore_label = _problem(input_, block_shape, configs,
+                                                                       mask, watershed, n_threads)
+        solver_config = _task_config(configs, "solve_lifted_global",
+                                     lifted_multicut_tasks.SolveLiftedGlobalLocal)
+        node_labels = lifted_multicut_jobs._solve_lifted_multicut(uv_ids, costs, lifted_uv_ids, lifted_costs,
+                                                                  solver_config, n_threads)
+        node_labels = multicut_jobs._consecutive_node_labeling(node_labels, ignore_label)
+        seg = _write_segmentation(ws, node_labels, configs, blocking, n_threads)
+
+    if return_intermediates:
+        return seg, {"watershed": ws, "uv_ids": uv_ids, "features": features,
+                     "costs": costs, "node_labels": node_labels}
+    return seg
@@ -5,7 +5,7 @@ import nifty.tools as nt
 from elf.io import open_file
 
 import cluster_tools.utils.volume_utils as vu
-from cluster_tools.inference.multiscale_inference import _show_inputs, _load_inputs
+from cluster_tools.inference.jobs.multiscale_inference import _show_inputs, _load_inputs
 
 
 def view_multiscale_inputs(input_path, input_group, input_scales,
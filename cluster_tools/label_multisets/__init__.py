@@ -1 +1,5 @@
-from .label_multiset_workflow import LabelMultisetWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".label_multiset_workflow": ["LabelMultisetWorkflow"],
+})
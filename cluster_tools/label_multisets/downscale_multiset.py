@@ -1,24 +1,10 @@
-#! /bin/python
-
-# IMPORTANT do threadctl import first (before numpy imports)
-from threadpoolctl import threadpool_limits
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.tools as nt
-from elf.util import chunks_overlapping_roi, downscale_shape
+from elf.util import downscale_shape
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
-
-import numpy as np
-from elf.label_multiset import (deserialize_multiset, serialize_multiset,
-                                downsample_multiset, merge_multisets,
-                                LabelMultiset)
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 class DownscaleMultisetBase(luigi.Task):
@@ -26,7 +12,7 @@ class DownscaleMultisetBase(luigi.Task):
     """
 
     task_name = 'downscale_multiset'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'downscale_multiset.py'))
     allow_retry = False
 
     # input and output volumes
@@ -120,143 +106,8 @@ class DownscaleMultisetLSF(DownscaleMultisetBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def background_multiset(shape, effective_pixel_size):
-    size = np.prod(list(shape))
-    amax = np.zeros(size, dtype='uint64')
-    offsets = np.zeros(size, dtype='int32')
-    ids = np.zeros(1, dtype='uint64')
-    counts = np.array([effective_pixel_size], dtype='int32')
-    return LabelMultiset(amax, offsets, ids, counts, shape)
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def normalize_chunks(chunk_ids):
-    # find the leftmost chunk
-    chunks = np.array(chunk_ids)
-    origin_id = np.argmin(chunks.sum(axis=1))
-    origin = chunks[origin_id]
-    assert all((origin[i] <= chunks[:, i]).all() for i in range(chunks.shape[1]))
-    chunk_ids = [tuple(ch - orig for ch, orig in zip(chunk_id, origin))
-                 for chunk_id in chunk_ids]
-    return chunk_ids
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _downscale_multiset_block(blocking, block_id, ds_in, ds_out,
-                              blocking_prev, scale_factor, restrict_set,
-                              effective_pixel_size):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-
-    ndim = ds_in.ndim
-    # get the blocks and chunk ids
-    # corresponding to this block in the previous scale level
-    roi_begin_prev = [beg * sc for beg, sc in zip(block.begin, scale_factor)]
-    roi_end_prev = [min(end * sc, sh) for end, sc, sh in zip(block.end,
-                                                             scale_factor,
-                                                             ds_in.shape)]
-    roi_shape_prev = tuple(re - rb for rb, re in zip(roi_begin_prev, roi_end_prev))
-    roi_prev = tuple(slice(rb, re) for rb, re in zip(roi_begin_prev, roi_end_prev))
-
-    block_shape_prev = blocking_prev.blockShape
-    chunk_ids_prev = list(chunks_overlapping_roi(roi_prev, block_shape_prev))
-    block_ids_prev = np.ravel_multi_index(np.array([[cid[d] for cid in chunk_ids_prev] for d in range(ndim)],
-                                                   dtype='int'),
-                                          blocking_prev.blocksPerAxis)
-    blocks_prev = [blocking_prev.getBlock(bid) for bid in block_ids_prev]
-
-    multisets = [ds_in.read_chunk(chunk_id) for chunk_id in chunk_ids_prev]
-    if all(mset is None for mset in multisets):
-        fu.log_block_success(block_id)
-        return
-
-    multisets = [background_multiset(block_prev.shape, effective_pixel_size) if mset is None
-                 else deserialize_multiset(mset, block_prev.shape)
-                 for mset, block_prev in zip(multisets, blocks_prev)]
-
-    chunk_ids_prev = normalize_chunks(chunk_ids_prev)
-    multiset = merge_multisets(multisets, chunk_ids_prev,
-                               roi_shape_prev, blocking_prev.blockShape)
-
-    # compute multiset from input labels
-    multiset = downsample_multiset(multiset, scale_factor, restrict_set)
-    ser = serialize_multiset(multiset)
-
-    chunk_id = tuple(beg // ch for beg, ch in zip(block.begin, ds_out.chunks))
-    ds_out.write_chunk(chunk_id, ser, True)
-    fu.log_block_success(block_id)
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def write_metadata(ds_out, restrict_set, scale_factor):
-    attrs = ds_out.attrs
-    attrs['isLabelMultiset'] = True
-    attrs['maxNumEntries'] = restrict_set
-    # we reverse the scale factor, because java axis conventions are XYZ and we have ZYX
-    attrs['downsamplingFactors'] = [float(sf) for sf in reversed(scale_factor)]
-
-
-def downscale_multiset(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # read the input cofig
-    input_path = config['input_path']
-    input_key = config['input_key']
-    restrict_set = config['restrict_set']
-    restrict_set = -1 if restrict_set is None else restrict_set
-    scale_factor = config['scale_factor']
-    scale_factor = scale_factor if isinstance(scale_factor, list) else [scale_factor] * 3
-
-    block_shape = list(config['block_shape'])
-    block_list = config['block_list']
-
-    # read the output config
-    output_path = config['output_path']
-    output_key = config['output_key']
-    shape = list(vu.get_shape(output_path, output_key))
-    prev_shape = list(vu.get_shape(input_path, input_key))
-
-    # NOTE for now, we assume that the block_shape stays constant throughout
-    # the scale levels
-    # get the blocking for this scale level
-    blocking = nt.blocking([0, 0, 0], shape, block_shape)
-    # get the blocking for the previous scale level
-    blocking_prev = nt.blocking([0, 0, 0], prev_shape, block_shape)
-
-    effective_scale_factor = config['effective_scale_factor']
-    # we need the effective pixel size of the previous scale level here,
-    # which we get by dividing the current effective pixel size by the product of the
-    # scale factor
-    effective_pixel_size = int(np.prod(effective_scale_factor) / np.prod(scale_factor))
-
-    # submit blocks
-    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-
-        for block_id in block_list:
-            _downscale_multiset_block(blocking, block_id, ds_in, ds_out,
-                                      blocking_prev, scale_factor, restrict_set,
-                                      effective_pixel_size)
-
-        if job_id == 0:
-            write_metadata(ds_out, restrict_set, effective_scale_factor)
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    downscale_multiset(job_id, path)
+class DownscaleMultisetExecutor(DownscaleMultisetBase, ExecutorTask):
+    """
+    DownscaleMultiset on executor
+    """
+    pass
@@ -1,15 +1,8 @@
-#! /usr/bin/python
-
 import os
-import sys
-import json
 
-import numpy as np
 import luigi
 
-import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 class EdgeLabelsBase(luigi.Task):
@@ -17,7 +10,7 @@ class EdgeLabelsBase(luigi.Task):
     """
 
     task_name = 'edge_labels'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'edge_labels.py'))
     # retry is too complecated for now ...
     allow_retry = False
 
@@ -80,52 +73,7 @@ class EdgeLabelsLSF(EdgeLabelsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def edge_labels(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    output_path = config['output_path']
-    output_key = config['output_key']
-    graph_path = config['graph_path']
-    graph_key = config['graph_key']
-    node_labels_path = config['node_labels_path']
-    node_labels_key = config['node_labels_key']
-    ignore_label_gt = config.get('ignore_label_gt', False)
-
-    # load the node labels
-    with vu.file_reader(node_labels_path, 'r') as f:
-        node_labels = f[node_labels_key][:]
-
-    # load the uv ids and check
-    with vu.file_reader(graph_path, 'r') as f:
-        uv_ids = f[graph_key]['edges'][:]
-
-    lu = node_labels[uv_ids[:, 0]]
-    lv = node_labels[uv_ids[:, 1]]
-    edge_labels = (lu != lv).astype('int8')
-    if ignore_label_gt:
-        ignore_mask = np.logical_or(lu == 0, lv == 0)
-        edge_labels[ignore_mask] = -1
-
-    n_edges = len(edge_labels)
-    chunks = (min(262144, n_edges),)
-    with vu.file_reader(output_path) as f:
-        f.create_dataset(output_key, data=edge_labels,
-                         chunks=chunks, compression='gzip')
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    edge_labels(job_id, path)
+class EdgeLabelsExecutor(EdgeLabelsBase, ExecutorTask):
+    """ EdgeLabels on executor
+    """
+    pass
@@ -0,0 +1,59 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def edge_labels(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+    output_path = config['output_path']
+    output_key = config['output_key']
+    graph_path = config['graph_path']
+    graph_key = config['graph_key']
+    node_labels_path = config['node_labels_path']
+    node_labels_key = config['node_labels_key']
+    ignore_label_gt = config.get('ignore_label_gt', False)
+
+    # load the node labels
+    with vu.file_reader(node_labels_path, 'r') as f:
+        node_labels = f[node_labels_key][:]
+
+    # load the uv ids and check
+    with vu.file_reader(graph_path, 'r') as f:
+        uv_ids = f[graph_key]['edges'][:]
+
+    lu = node_labels[uv_ids[:, 0]]
+    lv = node_labels[uv_ids[:, 1]]
+    edge_labels = (lu != lv).astype('int8')
+    if ignore_label_gt:
+        ignore_mask = np.logical_or(lu == 0, lv == 0)
+        edge_labels[ignore_mask] = -1
+
+    n_edges = len(edge_labels)
+    chunks = (min(262144, n_edges),)
+    with vu.file_reader(output_path) as f:
+        f.create_dataset(output_key, data=edge_labels,
+                         chunks=chunks, compression='gzip')
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    edge_labels(job_id, path)
@@ -1,13 +1,7 @@
-#! /bin/python
-
 import os
-import sys
-import json
 import luigi
 
-import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 #
 # Clear Labels Tasks
@@ -21,7 +15,7 @@ class ClearLiftedEdgesFromLabelsBase(luigi.Task):
     """
 
     task_name = 'clear_lifted_edges_from_labels'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'clear_lifted_edges_from_labels.py'))
     allow_retry = False
 
     node_labels_path = luigi.Parameter()
@@ -75,61 +69,7 @@ class ClearLiftedEdgesFromLabelsLSF(ClearLiftedEdgesFromLabelsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def clear_lifted_edges_from_labels(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-
-    node_labels_path = config['node_labels_path']
-    node_labels_key = config['node_labels_key']
-    lifted_edge_path = config['lifted_edge_path']
-    lifted_edge_key = config['lifted_edge_key']
-    n_threads = config.get('threads_per_job', 1)
-
-    # load node labels
-    with vu.file_reader(node_labels_path, 'r') as f:
-        ds = f[node_labels_key]
-        ds.n_threads = n_threads
-        node_labels = ds[:]
-    # load lifted edges
-    f = vu.file_reader(lifted_edge_path)
-    ds = f[lifted_edge_key]
-    ds.n_threads = n_threads
-    lifted_edges = ds[:]
-    chunks = ds.chunks
-
-    n_lifted = len(lifted_edges)
-    # map lifted edges to node labels
-    lifted_mapped = node_labels[lifted_edges]
-    # mask out lifted edges that mix labels
-    lifted_mask = lifted_mapped[:, 0] == lifted_mapped[:, 1]
-    lifted_edges = lifted_edges[lifted_mask]
-
-    n_lifted_new = len(lifted_edges)
-    fu.log("clear number of lifted edges from %i to %i" % (n_lifted, n_lifted_new))
-
-    # resave lifted edges iff number of edges differs
-    if n_lifted_new < n_lifted:
-        # remove the old dataset
-        del f[lifted_edge_key]
-        ds = f.create_dataset(lifted_edge_key, shape=lifted_edges.shape, chunks=chunks,
-                              compression='gzip', dtype=lifted_edges.dtype)
-        ds.n_threads = n_threads
-        ds[:] = lifted_edges
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    clear_lifted_edges_from_labels(job_id, path)
+class ClearLiftedEdgesFromLabelsExecutor(ClearLiftedEdgesFromLabelsBase, ExecutorTask):
+    """ ClearLiftedEdgesFromLabels on executor
+    """
+    pass
@@ -1,17 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
-import numpy as np
 
 import luigi
-import nifty.distributed as ndist
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -23,7 +15,7 @@ class CostsFromNodeLabelsBase(luigi.Task):
     """
 
     task_name = 'costs_from_node_labels'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'costs_from_node_labels.py'))
     allow_retry = False
 
     nh_path = luigi.Parameter()
@@ -111,74 +103,7 @@ class CostsFromNodeLabelsLSF(CostsFromNodeLabelsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _costs_for_edge_block(block_id, blocking,
-                          ds_in, ds_out, node_labels,
-                          inter_label_cost, intra_label_cost):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    id_begin, id_end = block.begin[0], block.end[0]
-    uv_ids = ds_in[id_begin:id_end]
-
-    labels_a = node_labels[uv_ids[:, 0]]
-    labels_b = node_labels[uv_ids[:, 1]]
-
-    # make sure we don't have nodes without labels
-    assert np.sum(labels_a == 0) == np.sum(labels_b == 0) == 0
-
-    edge_costs = intra_label_cost * np.ones(len(uv_ids), dtype='float32')
-    edge_costs[labels_a != labels_b] = inter_label_cost
-
-    ds_out[id_begin:id_end] = edge_costs
-    # log block success
-    fu.log_block_success(block_id)
-
-
-def costs_from_node_labels(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-
-    nh_path = config['nh_path']
-    nh_key = config['nh_key']
-    node_label_path = config['node_label_path']
-    node_label_key = config['node_label_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    chunk_size = config['chunk_size']
-
-    inter_label_cost = config['inter_label_cost']
-    intra_label_cost = config['intra_label_cost']
-
-    block_list = config['block_list']
-
-    with vu.file_reader(node_label_path, 'r') as f:
-        node_labels = f[node_label_key][:]
-    with vu.file_reader(nh_path) as f_in, vu.file_reader(output_path) as f_out:
-        ds_in = f_in[nh_key]
-        ds_out = f_out[output_key]
-
-        n_lifted_edges = ds_in.shape[0]
-        blocking = nt.blocking([0], [n_lifted_edges], [chunk_size])
-
-        for block_id in block_list:
-            _costs_for_edge_block(block_id, blocking,
-                                  ds_in, ds_out, node_labels,
-                                  inter_label_cost, intra_label_cost)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    costs_from_node_labels(job_id, path)
+class CostsFromNodeLabelsExecutor(CostsFromNodeLabelsBase, ExecutorTask):
+    """ CostsFromNodeLabels on executor
+    """
+    pass
@@ -0,0 +1,55 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.distributed as ndist
+
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.volume_utils as vu
+
+
+#
+# Implementation
+#
+
+def sparse_lifted_neighborhood(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    graph_path = config['graph_path']
+    graph_key = config['graph_key']
+    node_label_path = config['node_label_path']
+    node_label_key = config['node_label_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    n_threads = config.get('threads_per_job', 1)
+    graph_depth = config['nh_graph_depth']
+    node_ignore_label = config['node_ignore_label']
+
+    mode = config.get('mode', 'all')
+    fu.log("lifted nh mode set to %s, depth set to %i" % (mode, graph_depth))
+    fu.log("have ignore label: %i" % node_ignore_label)
+
+    fu.log("start lifted neighborhood extraction for depth %i" % graph_depth)
+    ndist.computeLiftedNeighborhoodFromNodeLabels(graph_path, graph_key,
+                                                  node_label_path, node_label_key,
+                                                  output_path, output_key,
+                                                  graph_depth, n_threads,
+                                                  mode, node_ignore_label)
+    with vu.file_reader(output_path, 'r') as f:
+        n_lifted = f[output_key].shape[0]
+    fu.log("extracted %i lifted edges" % n_lifted)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    sparse_lifted_neighborhood(job_id, path)
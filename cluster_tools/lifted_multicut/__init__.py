@@ -1 +1,7 @@
-from .lifted_multicut_workflow import LiftedMulticutWorkflow, SubLiftedSolutionsWorkflow, ReducedLiftedSolutionWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".lifted_multicut_workflow": ["LiftedMulticutWorkflow",
+                                  "SubLiftedSolutionsWorkflow",
+                                  "ReducedLiftedSolutionWorkflow"],
+})
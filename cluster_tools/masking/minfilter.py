@@ -1,16 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import numpy as np
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -23,7 +16,7 @@ class MinfilterBase(luigi.Task):
     """
 
     task_name = 'minfilter'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'minfilter.py'))
 
     # input and output volumes
     input_path = luigi.Parameter()
@@ -102,59 +95,7 @@ class MinfilterLSF(MinfilterBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _minfilter_block(block_id, blocking, halo, ds_in, ds_out, filter_shape):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlockWithHalo(block_id, halo)
-    outer_roi = vu.block_to_bb(block.outerBlock)
-    inner_roi = vu.block_to_bb(block.innerBlock)
-    local_roi = vu.block_to_bb(block.innerBlockLocal)
-    mask = ds_in[outer_roi]
-    min_filter_mask = minimum_filter(mask, size=filter_shape)
-    ds_out[inner_roi] = min_filter_mask[local_roi]
-    fu.log_block_success(block_id)
-
-
-# TODO minfilter from downsampled mask
-def minfilter(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # input/output files
-    input_path = config['input_path']
-    input_key = config['input_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-
-    # blocks and task config
-    block_list = config['block_list']
-    filter_shape = config['filter_shape']
-
-    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-        shape = ds_in.shape
-
-        blocking = nt.blocking(roiBegin=[0, 0, 0],
-                               roiEnd=list(shape),
-                               blockShape=list(block_shape))
-
-        # TODO is half of the halo really enough halo ?
-        halo = list(fshape // 2 for fshape in filter_shape)
-        [_minfilter_block(block_id, blocking, halo, ds_in,
-                           ds_out, filter_shape) for block_id in block_list]
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    watershed(job_id, path)
+class MinfilterExecutor(MinfilterBase, ExecutorTask):
+    """ Minfilter on executor
+    """
+    pass
@@ -1,19 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.tools as nt
-import numpy as np
-
-from elf.mesh import io as meshio
-from elf.mesh import marching_cubes
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 
@@ -27,7 +17,9 @@ class ComputeMeshesBase(luigi.Task):
     """
 
     task_name = 'compute_meshes'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'compute_meshes.py'))
+    # the jobs can pull their blocks from the block queue
+    supports_block_queue = True
     allow_retry = False
 
     # input and output volumes
@@ -111,96 +103,8 @@ class ComputeMeshesLSF(ComputeMeshesBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-# not parallelized for now
-def _compute_meshes_id_block(blocking, block_id, ds_in, output_path,
-                             sizes, bb_min, bb_max, resolution,
-                             size_threshold, smoothing_iterations,
-                             output_format):
-
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    id_begin, id_end = block.begin[0], block.end[0]
-    # we don't compute the skeleton for id 0, which is reserved for the ignore label
-    id_begin = 1 if id_begin == 0 else id_begin
-
-    # compute_meshes ids in range and serialize skeletons
-    for seg_id in range(id_begin, id_end):
-        if size_threshold is not None:
-            if sizes[seg_id] < size_threshold:
-                continue
-        bb = tuple(slice(mi, ma) for mi, ma in zip(bb_min[seg_id], bb_max[seg_id]))
-        obj = ds_in[bb] == seg_id
-
-        # try to compute_meshes the object, skip if any exception is thrown
-        verts, faces, normals = marching_cubes(obj, smoothing_iterations=smoothing_iterations,
-                                               resolution=resolution)
-        offsets = [b.start * res for b, res in zip(bb, resolution)]
-        verts += np.array(offsets)
-
-        if output_format == 'npy':
-            out_path = os.path.join(output_path, '%i.npz' % seg_id)
-            meshio.write_numpy(out_path, verts, faces, normals)
-        else:
-            out_path = os.path.join(output_path, '%.obj' % seg_id)
-            meshio.write_obj(out_path, verts, faces, normals)
-
-    fu.log_block_success(block_id)
-
-
-def compute_meshes(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # read the input cofig
-    input_path = config['input_path']
-    input_key = config['input_key']
-    morphology_path = config['morphology_path']
-    morphology_key = config['morphology_key']
-    output_path = config['output_path']
-    size_threshold = config['size_threshold']
-    resolution = config['resolution']
-    output_format = config['output_format']
-    smoothing_iterations = config.get('smoothing_iterations', 0)
-
-    # morphology feature-columns
-    # 0    = label-id
-    # 1    = pixel size
-    # 2:5  = center of mass
-    # 5:8  = min coordinate
-    # 8:11  = max coordinate
-    with vu.file_reader(morphology_path) as f:
-        morpho = f[morphology_key][:]
-        sizes = morpho[:, 1].astype('uint64')
-        bb_min = morpho[:, 5:8].astype('uint64')
-        bb_max = morpho[:, 8:11].astype('uint64') + 1
-
-    block_list = config['block_list']
-    block_len = config['block_len']
-    n_labels = config['number_of_labels']
-    blocking = nt.blocking([0], [n_labels], [block_len])
-
-    # compute_meshes this id block
-    with vu.file_reader(input_path, 'r') as f_in:
-        ds_in = f_in[input_key]
-        for block_id in block_list:
-            _compute_meshes_id_block(blocking, block_id, ds_in, output_path,
-                                     sizes, bb_min, bb_max, resolution,
-                                     size_threshold, smoothing_iterations,
-                                     output_format)
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    compute_meshes(job_id, path)
+class ComputeMeshesExecutor(ComputeMeshesBase, ExecutorTask):
+    """
+    compute_meshes on executor
+    """
+    pass
@@ -1,2 +1,5 @@
-from .morphology_workflow import MorphologyWorkflow
-from .morphology_workflow import RegionCentersWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".morphology_workflow": ["MorphologyWorkflow", "RegionCentersWorkflow"],
+})
@@ -0,0 +1,81 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+def _morphology_for_block(block_id, blocking, ds_in,
+                          output_path, output_key):
+    fu.log_block_start(block_id)
+    # read labels and input in this block
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+    seg = ds_in[bb]
+
+    # check if segmentation block is empty
+    if seg.sum() == 0:
+        fu.log("block %i is empty" % block_id)
+        fu.log_block_success(block_id)
+        return
+
+    chunk_id = tuple(beg // ch
+                     for beg, ch in zip(block.begin,
+                                        blocking.blockShape))
+    # extract and save simple morphology:
+    # - size of segments                 1
+    # - center of mass of segments       2:5
+    # - minimum coordinates of segments  5:8
+    # - maximum coordinates of segments  8:11
+    # [:,0] is the label id
+    ndist.computeAndSerializeMorphology(seg, block.begin,
+                                        output_path, output_key,
+                                        chunk_id)
+    fu.log_block_success(block_id)
+
+
+def block_morphology(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    block_shape = config['block_shape']
+    block_list = config['block_list']
+
+    with vu.file_reader(input_path, 'r') as f:
+        shape = f[input_key].shape
+
+    blocking = nt.blocking([0, 0, 0],
+                           list(shape),
+                           list(block_shape))
+
+    with vu.file_reader(input_path, 'r') as f_in:
+        ds_in = f_in[input_key]
+        [_morphology_for_block(block_id, blocking, ds_in,
+                               output_path, output_key)
+         for block_id in block_list]
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    block_morphology(job_id, path)
@@ -0,0 +1,51 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def merge_morphology(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    block_list = config['block_list']
+    out_shape = config['out_shape']
+    out_chunks = config['out_chunks']
+
+    blocking = nt.blocking([0], out_shape[:1], out_chunks[:1])
+
+    # merge and serialize the overlaps
+    for block_id in block_list:
+        block = blocking.getBlock(block_id)
+        label_begin = block.begin[0]
+        label_end = block.end[0]
+        ndist.mergeAndSerializeMorphology(input_path, input_key,
+                                          output_path, output_key,
+                                          labelBegin=label_begin, labelEnd=label_end)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    merge_morphology(job_id, path)
@@ -0,0 +1,101 @@
+#! /bin/python
+
+# IMPORTANT do threadctl import first (before numpy imports)
+from threadpoolctl import threadpool_limits
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+from scipy.ndimage.morphology import distance_transform_edt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def region_centers_for_label_range(ds_in, ds_out, bb_start, bb_stop,
+                                   label_begin, label_end,
+                                   ignore_label, resolution):
+
+    n_labels = label_end - label_begin
+    centers = np.zeros((n_labels, 3), dtype='float32')
+    for label_id in range(label_begin, label_end):
+        if ignore_label == label_id:
+            continue
+
+        bb = tuple(slice(start, stop) for start, stop in
+                   zip(bb_start[label_id], bb_stop[label_id]))
+        obj = ds_in[bb] == label_id
+
+        # can't do anything if the object is empty
+        if obj.sum() == 0:
+            continue
+
+        dist = distance_transform_edt(obj, sampling=resolution)
+        center = np.argmax(dist)
+        center = np.unravel_index([center], obj.shape)
+
+        offset = tuple(b.start for b in bb)
+        center = [ce[0] + off for ce, off in zip(center, offset)]
+
+        centers[label_id - label_begin] = center
+
+    ds_out[label_begin:label_end] = centers
+
+
+def region_centers(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+    morphology_path = config['morphology_path']
+    morphology_key = config['morphology_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    ignore_label = config['ignore_label']
+    resolution = config['resolution']
+
+    block_list = config['block_list']
+    id_chunks = config['id_chunks']
+    number_of_labels = int(vu.file_reader(input_path, 'r')[input_key].attrs['maxId']) + 1
+    blocking = nt.blocking([0], [number_of_labels], [id_chunks])
+
+    # load the morphology and get the relevant cols
+    with vu.file_reader(morphology_path) as f:
+        ds = f[morphology_key]
+        morphology = ds[:]
+    bb_start = morphology[:, 5:8].astype('uint64')
+    bb_stop = morphology[:, 8:11].astype('uint64')
+
+    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+        ds_in = f_in[input_key]
+        ds_out = f_out[output_key]
+
+        for block_id in block_list:
+            block = blocking.getBlock(block_id)
+            label_begin = block.begin[0]
+            label_end = block.end[0]
+            region_centers_for_label_range(ds_in, ds_out, bb_start, bb_stop,
+                                           label_begin, label_end,
+                                           ignore_label, resolution)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    region_centers(job_id, path)
@@ -1 +1,5 @@
-from .multicut_workflow import MulticutWorkflow, SubSolutionsWorkflow, ReducedSolutionWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".multicut_workflow": ["MulticutWorkflow", "SubSolutionsWorkflow", "ReducedSolutionWorkflow"],
+})
@@ -0,0 +1,130 @@
+#! /bin/python
+
+import os
+import sys
+
+import vigra
+import nifty
+from elf.segmentation.multicut import get_multicut_solver
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def _solve_multicut(uv_ids, costs, config, n_threads):
+    """ Solve the multicut problem with the agglomerator from the task config.
+    """
+    agglomerator_key = config["agglomerator"]
+    time_limit = config.get("time_limit_solver", None)
+    solver_kwargs = dict(config.get("solver_kwargs", {}))
+    solver_kwargs.update({"n_threads": n_threads})
+
+    fu.log("using solver %s" % agglomerator_key)
+    if time_limit is None:
+        fu.log("agglomeration without time limit")
+    else:
+        fu.log("agglomeration time limit %i" % time_limit)
+
+    # don't log anything, otherwise parsing the log file fails
+    solver_kwargs.update({"log_level": "NONE"})
+    solver = get_multicut_solver(agglomerator_key, **solver_kwargs)
+
+    n_nodes = int(uv_ids.max() + 1)
+    fu.log("creating graph with %i nodes an %i edges" % (n_nodes, len(uv_ids)))
+    graph = nifty.graph.undirectedGraph(n_nodes)
+    graph.insertEdges(uv_ids)
+    fu.log("start agglomeration")
+    node_labeling = solver(graph, costs,
+                           n_threads=n_threads,
+                           time_limit=time_limit)
+    fu.log("finished agglomeration")
+    return node_labeling
+
+
+def _consecutive_node_labeling(node_labeling, ignore_label):
+    """ Make the node labeling consecutive (in-place), node 0 is mapped to 0 if we have an ignore label.
+    """
+    # make sure zero is mapped to 0 if we have an ignore label
+    if ignore_label and node_labeling[0] != 0:
+        new_max_label = int(node_labeling.max() + 1)
+        node_labeling[node_labeling == 0] = new_max_label
+        node_labeling[0] = 0
+
+    # make node labeling consecutive
+    vigra.analysis.relabelConsecutive(node_labeling, start_label=1, keep_zeros=True,
+                                      out=node_labeling)
+    return node_labeling
+
+
+def solve_global(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+    # path to the reduced problem
+    problem_path = config["problem_path"]
+    # path where the node labeling shall be written
+    assignment_path = config["assignment_path"]
+    assignment_key = config["assignment_key"]
+    scale = config["scale"]
+    n_threads = config["threads_per_job"]
+
+    with vu.file_reader(problem_path, "r") as f:
+        group = f["s%i" % scale]
+        graph_group = group["graph"]
+        ignore_label = graph_group.attrs["ignore_label"]
+
+        ds = graph_group["edges"]
+        ds.n_threads = n_threads
+        uv_ids = ds[:]
+        n_edges = len(uv_ids)
+
+        # we only need to load the initial node labeling if at
+        # least one reduction step was performed i.e. scale > 0
+        if scale > 0:
+            ds = group["node_labeling"]
+            ds.n_threads = n_threads
+            initial_node_labeling = ds[:]
+
+        ds = group["costs"]
+        ds.n_threads = n_threads
+        costs = ds[:]
+        assert len(costs) == n_edges, "%i, %i" % (len(costs), n_edges)
+
+    node_labeling = _solve_multicut(uv_ids, costs, config, n_threads)
+
+    # get the labeling of initial nodes
+    if scale > 0:
+        initial_node_labeling = node_labeling[initial_node_labeling]
+    else:
+        initial_node_labeling = node_labeling
+    n_nodes = len(initial_node_labeling)
+    initial_node_labeling = _consecutive_node_labeling(initial_node_labeling, ignore_label)
+
+    # write node labeling
+    node_shape = (n_nodes,)
+    chunks = (min(n_nodes, 524288),)
+    with vu.file_reader(assignment_path) as f:
+        ds = f.require_dataset(assignment_key, dtype="uint64",
+                               shape=node_shape,
+                               chunks=chunks,
+                               compression="gzip")
+        ds.n_threads = n_threads
+        ds[:] = initial_node_labeling
+
+    fu.log("saving results to %s:%s" % (assignment_path, assignment_key))
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    solve_global(job_id, path)
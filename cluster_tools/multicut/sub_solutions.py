@@ -1,19 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
-from concurrent import futures
 
-import numpy as np
 import luigi
-import z5py
-import nifty.tools as nt
-import nifty.distributed as ndist
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -26,7 +16,7 @@ class SubSolutionsBase(luigi.Task):
     """
 
     task_name = 'sub_solutions'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'sub_solutions.py'))
 
     # input volumes and graph
     problem_path = luigi.Parameter()
@@ -136,142 +126,7 @@ class SubSolutionsLSF(SubSolutionsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _read_subresults(ds_results, block_node_prefix, blocking,
-                     block_list, n_threads, initial_node_labeling=None):
-
-    def read_subres(block_id):
-        block = blocking.getBlock(block_id)
-        # load nodes corresponding to this block
-        block_path = block_node_prefix + str(block_id)
-        nodes = ndist.loadNodes(block_path)
-        # load the sub result for this block
-        chunk = tuple(beg // bs for beg, bs in zip(block.begin, blocking.blockShape))
-        subres = ds_results.read_chunk(chunk)
-
-        # subres is None -> this block has ignore label
-        # and has no edgees. Note that this does not imply that the
-        # block ONLY has ignore label (or only one ordinary node)
-        # because multiple ordinary nodes could be seperated by the ignore label
-        # and thus not share an edge.
-        if subres is None:
-            assert 0 in nodes
-            return None
-
-        assert len(nodes) == len(subres), "block %i: %i, %i" % (block_id,
-                                                                len(nodes),
-                                                                len(subres))
-        return nodes, subres, int(subres.max()) + 1
-
-    with futures.ThreadPoolExecutor(n_threads) as tp:
-        tasks = [tp.submit(read_subres, block_id) for block_id in block_list]
-        results = [t.result() for t in tasks]
-
-    # filter and get results
-    block_list = [block_id for block_id, res
-                  in zip(block_list, results) if res is not None]
-    block_nodes = [res[0] for res in results if res is not None]
-    block_res = [res[1] for res in results if res is not None]
-    block_offsets = np.array([res[2] for res
-                              in results if res is not None], dtype='uint64')
-
-    # get the offsets and add them to the block results to make these unique
-    block_offsets = np.roll(block_offsets, 1)
-    block_offsets[0] = 0
-    block_offsets = np.cumsum(block_offsets)
-    block_res = [bres + boff for bres, boff in zip(block_res, block_offsets)]
-
-    # apply the node labeling
-    if initial_node_labeling is not None:
-        fu.log("Apply initial node labeling to block nodes")
-        block_nodes = [initial_node_labeling[nodes] for nodes in block_nodes]
-
-    # construct result dicts for each block
-    # keep zero mapped to zero
-    block_results = [{node_id: res_id if node_id != 0 else 0
-                      for node_id, res_id in zip(bnodes, bres)}
-                     for bnodes, bres in zip(block_nodes, block_res)]
-    return block_list, block_results
-
-
-def _write_block_res(ds_in, ds_out,
-                     block_id, blocking, block_res):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-    ws = ds_in[bb]
-
-    seg = nt.takeDict(block_res, ws)
-    ds_out[bb] = seg
-    fu.log_block_success(block_id)
-
-
-def sub_solutions(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-    # input configs
-    problem_path = config['problem_path']
-    scale = config['scale']
-    block_shape = config['block_shape']
-    block_list = config['block_list']
-    n_threads = config['threads_per_job']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    ws_path = config['ws_path']
-    ws_key = config['ws_key']
-
-    sub_result_identifier = config.get('sub_result_identifier', 'sub_results')
-    sub_graph_identifier = config.get('sub_graph_identifier', 'sub_graphs')
-
-    fu.log("reading problem from %s" % problem_path)
-    problem = z5py.N5File(problem_path)
-    shape = problem.attrs['shape']
-
-    blocking = nt.blocking([0, 0, 0], list(shape), list(block_shape))
-
-    # we need to project the ws labels back to the original labeling
-    # for this, we first need to load the initial node labeling
-    if scale > 1:
-        node_label_key = 's%i/node_labeling' % scale
-        fu.log("scale %i > 1; reading node labeling from %s" % (scale, node_label_key))
-        ds_node_labeling = problem[node_label_key]
-        ds_node_labeling.n_threads = n_threads
-        initial_node_labeling = ds_node_labeling[:]
-    else:
-        initial_node_labeling = None
-
-    # read the sub results
-    ds_results = problem['s%i/%s/node_result' % (scale, sub_result_identifier)]
-    # TODO should be varlen dataset
-    fu.log("reading subresults")
-    block_node_prefix = os.path.join(problem_path, 's%i' % scale, sub_graph_identifier, 'block_')
-    block_list, block_results = _read_subresults(ds_results, block_node_prefix, blocking,
-                                                 block_list, n_threads, initial_node_labeling)
-
-    fu.log("writing subresults")
-    # write the resulting segmentation
-    with vu.file_reader(output_path) as f_out, vu.file_reader(ws_path, 'r') as f_in:
-        ds_in = f_in[ws_key]
-        ds_out = f_out[output_key]
-        with futures.ThreadPoolExecutor(n_threads) as tp:
-            tasks = [tp.submit(_write_block_res, ds_in, ds_out,
-                               block_id, blocking, block_res)
-                     for block_id, block_res in zip(block_list, block_results)]
-            [t.result() for t in tasks]
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    sub_solutions(job_id, path)
+class SubSolutionsExecutor(SubSolutionsBase, ExecutorTask):
+    """ SubSolutions on executor
+    """
+    pass
@@ -1 +1,5 @@
-from .node_label_workflow import NodeLabelWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".node_label_workflow": ["NodeLabelWorkflow"],
+})
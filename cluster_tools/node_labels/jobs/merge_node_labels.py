@@ -0,0 +1,58 @@
+#! /bin/python
+
+import os
+import sys
+
+import nifty.tools as nt
+import nifty.distributed as ndist
+
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def merge_node_labels(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    max_overlap = config['max_overlap']
+    n_threads = config.get('threads_per_job', 1)
+    block_list = config['block_list']
+    node_shape = config['node_shape']
+    node_chunks = config['node_chunks']
+    ignore_label = config['ignore_label']
+    serialize_counts = config['serialize_counts']
+
+    blocking = nt.blocking([0], list(node_shape), list(node_chunks))
+
+    # merge and serialize the overlaps
+    for block_id in block_list:
+        block = blocking.getBlock(block_id)
+        label_begin = block.begin[0]
+        label_end = block.end[0]
+        ndist.mergeAndSerializeOverlaps(input_path, input_key,
+                                        output_path, output_key,
+                                        max_overlap=max_overlap,
+                                        labelBegin=label_begin, labelEnd=label_end,
+                                        numberOfThreads=n_threads,
+                                        ignoreLabel=0 if ignore_label is None else ignore_label,
+                                        serializeCount=serialize_counts)
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    merge_node_labels(job_id, path)
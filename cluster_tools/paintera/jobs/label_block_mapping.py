@@ -0,0 +1,51 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import nifty.distributed as ndist
+
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def label_block_mapping(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # read the config
+    config = fu.load_job_config(config_path)
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    number_of_labels = config['number_of_labels']
+
+    roi_begin = config.get('roi_begin', None)
+    roi_end = config.get('roi_end', None)
+    assert (roi_begin is None) == (roi_end is None)
+
+    # we need to turn `None` rois to empty lists,
+    # because I don't really understand how pybind11 handles None yet
+    if roi_begin is None:
+        roi_begin = []
+        roi_end = []
+
+    n_threads = config.get('threads_per_job', 1)
+    ndist.serializeBlockMapping(input_path, input_key,
+                                output_path, output_key,
+                                number_of_labels, n_threads,
+                                roi_begin, roi_end)
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    label_block_mapping(job_id, path)
@@ -0,0 +1,78 @@
+#! /usr/bin/python
+
+# IMPORTANT do threadctl import first (before numpy imports)
+from threadpoolctl import threadpool_limits
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+
+from elf.label_multiset import deserialize_multiset
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
+def _uniques(ds, ds_out, blocking, block_list, is_multiset):
+    for block_id in block_list:
+        fu.log_block_start(block_id)
+        block = blocking.getBlock(block_id)
+        chunk_id = tuple(beg // ch for beg, ch in zip(block.begin, ds.chunks))
+
+        labels = ds.read_chunk(chunk_id)
+        if labels is None:
+            fu.log_block_success(block_id)
+            return
+
+        if is_multiset:
+            labels = deserialize_multiset(labels, block.shape).ids
+
+        uniques = np.unique(labels)
+        ds_out.write_chunk(chunk_id, uniques, True)
+        fu.log_block_success(block_id)
+
+
+def unique_block_labels(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # read the config
+    config = fu.load_job_config(config_path)
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+    is_multiset = config['is_multiset']
+
+    # open the input file
+    with vu.file_reader(input_path, 'r') as f, vu.file_reader(output_path) as f_out:
+        ds = f[input_key]
+        ds_out = f_out[output_key]
+        chunks = ds.chunks
+        shape = ds.shape
+        assert tuple(chunks) == tuple(block_shape),\
+            "Chunks %s and block shape %s must agree" % (str(chunks), str(block_shape))
+
+        blocking = nt.blocking([0, 0, 0], shape, block_shape)
+        _uniques(ds, ds_out, blocking, block_list, is_multiset)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    unique_block_labels(job_id, path)
@@ -1,6 +1,10 @@
-from .postprocess_workflow import SizeFilterWorkflow
-from .postprocess_workflow import FilterLabelsWorkflow
-from .postprocess_workflow import FilterByThresholdWorkflow
-from .postprocess_workflow import FilterOrphansWorkflow
-from .postprocess_workflow import SizeFilterAndGraphWatershedWorkflow
-from .postprocess_workflow import ConnectedComponentsWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".postprocess_workflow": ["SizeFilterWorkflow",
+                              "FilterLabelsWorkflow",
+                              "FilterByThresholdWorkflow",
+                              "FilterOrphansWorkflow",
+                              "SizeFilterAndGraphWatershedWorkflow",
+                              "ConnectedComponentsWorkflow"],
+})
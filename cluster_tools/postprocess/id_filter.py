@@ -1,14 +1,7 @@
-#! /bin/python
-
 import os
-import sys
-import json
-import numpy as np
 import luigi
 
-import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -20,7 +13,7 @@ class IdFilterBase(luigi.Task):
     """
 
     task_name = 'id_filter'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'id_filter.py'))
     allow_retry = False
 
     node_label_path = luigi.Parameter()
@@ -76,41 +69,7 @@ class IdFilterLSF(IdFilterBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-def id_filter(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-
-    node_label_path = config['node_label_path']
-    node_label_key = config['node_label_key']
-    output_path = config['output_path']
-    filter_labels = np.array(config['filter_labels'], dtype='uint64')
-
-    with vu.file_reader(node_label_path, 'r') as f:
-        node_labels = f[node_label_key][:]
-
-    # find the node ids that overlap with the filter labels
-    filter_mask = np.in1d(node_labels, filter_labels)
-    filter_ids = np.where(filter_mask)[0].tolist()
-
-    fu.log("%i ids will be filtered" % len(filter_ids))
-    fu.log("saving filter ids to %s" % output_path)
-    with open(output_path, 'w') as f:
-        json.dump(filter_ids, f)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    id_filter(job_id, path)
+class IdFilterExecutor(IdFilterBase, ExecutorTask):
+    """ IdFilter on executor
+    """
+    pass
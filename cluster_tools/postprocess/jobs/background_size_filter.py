@@ -0,0 +1,103 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def apply_block(block_id, blocking, ds_in, ds_out, discard_ids):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    bb = tuple(slice(b, e) for b, e in zip(block.begin, block.end))
+    labels = ds_in[bb]
+
+    # check if everything is ignore label
+    if np.sum(labels) == 0:
+        fu.log_block_success(block_id)
+        return
+
+    discard_mask = np.in1d(labels, discard_ids).reshape(labels.shape)
+    # check if the discard-mask is empty
+    if np.sum(discard_mask) == 0:
+        ds_out[bb] = labels
+        fu.log_block_success(block_id)
+        return
+
+    labels[discard_mask] = 0
+    ds_out[bb] = labels
+    fu.log_block_success(block_id)
+
+
+def background_size_filter(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # read the config
+    config = fu.load_job_config(config_path)
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+    res_path = config['res_path']
+
+    # get the shape
+    with vu.file_reader(input_path, 'r') as f:
+        ds = f[input_key]
+        shape = f[input_key].shape
+    blocking = nt.blocking(roiBegin=[0, 0, 0],
+                           roiEnd=list(shape),
+                           blockShape=list(block_shape))
+
+    discard_ids = np.load(res_path)
+    fu.log("Discarding %i ids" % len(discard_ids))
+
+    same_file = input_path == output_path
+    in_place = same_file and input_key == output_key
+
+    if in_place:
+        with vu.file_reader(input_path) as f:
+            ds = f[input_key]
+            [apply_block(block_id, blocking, ds, ds, discard_ids)
+             for block_id in block_list]
+    elif same_file:
+        with vu.file_reader(input_path) as f:
+            ds_in = f[input_key]
+            ds_out = f[output_key]
+            [apply_block(block_id, blocking, ds_in, ds_out, discard_ids)
+             for block_id in block_list]
+    else:
+        with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+            ds_in = f_in[input_key]
+            ds_out = f_out[output_key]
+            [apply_block(block_id, blocking, ds_in, ds_out, discard_ids)
+             for block_id in block_list]
+
+    # copy the 'maxId' attribute if present
+    if job_id == 0 and not in_place:
+        with vu.file_reader(input_path, 'r') as f:
+            attrs = f[input_key].attrs
+            max_id = attrs.get('maxId', None)
+        if max_id is not None:
+            with vu.file_reader(output_path) as f:
+                f[output_key].attrs['maxId'] = max_id
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    background_size_filter(job_id, path)
@@ -0,0 +1,119 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+from skimage.segmentation import watershed
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def apply_block(block_id, blocking, ds_hmap, ds_in, ds_out, discard_ids, preserve_zeros):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+    bb = tuple(slice(b, e) for b, e in zip(block.begin, block.end))
+    labels = ds_in[bb]
+
+    # check if everything is ignore label
+    if np.sum(labels) == 0:
+        fu.log_block_success(block_id)
+        return
+
+    discard_mask = np.in1d(labels, discard_ids).reshape(labels.shape)
+    # check if the discard-mask is empty
+    if np.sum(discard_mask) == 0:
+        ds_out[bb] = labels
+        fu.log_block_success(block_id)
+        return
+
+    # load the hmap and fill discard ids via watershed
+    hmap_bb = (slice(0, 1),) + bb if ds_hmap.ndim == 4 else bb
+    hmap = ds_hmap[hmap_bb].squeeze()
+
+    mask = labels != 0 if preserve_zeros else None
+    labels[discard_mask] = 0
+    labels = watershed(hmap, markers=labels, mask=mask)
+
+    ds_out[bb] = labels.astype(ds_out.dtype)
+    fu.log_block_success(block_id)
+
+
+def filling_size_filter(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # read the config
+    config = fu.load_job_config(config_path)
+    input_path = config['input_path']
+    input_key = config['input_key']
+    hmap_path = config['hmap_path']
+    hmap_key = config['hmap_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+    preserve_zeros = config['preserve_zeros']
+    res_path = config['res_path']
+
+    # get the shape
+    with vu.file_reader(input_path, 'r') as f:
+        ds = f[input_key]
+        shape = f[input_key].shape
+    blocking = nt.blocking(roiBegin=[0, 0, 0],
+                           roiEnd=list(shape),
+                           blockShape=list(block_shape))
+
+    discard_ids = np.load(res_path)
+
+    same_file = input_path == output_path
+    in_place = same_file and input_key == output_key
+
+    if in_place:
+        with vu.file_reader(input_path) as f, vu.file_reader(hmap_path, 'r') as f_h:
+            ds = f[input_key]
+            ds_hmap = f_h[hmap_key]
+            [apply_block(block_id, blocking, ds_hmap, ds, ds, discard_ids, preserve_zeros)
+             for block_id in block_list]
+    elif same_file:
+        with vu.file_reader(input_path) as f, vu.file_reader(hmap_path, 'r') as f_h:
+            ds_in = f[input_key]
+            ds_out = f[output_key]
+            ds_hmap = f_h[hmap_key]
+            [apply_block(block_id, blocking, ds_hmap, ds_in, ds_out, discard_ids, preserve_zeros)
+             for block_id in block_list]
+    else:
+        with vu.file_reader(input_path, 'r') as f_in,\
+             vu.file_reader(output_path) as f_out,\
+             vu.file_reader(hmap_path, 'r') as f_h:
+            ds_in = f_in[input_key]
+            ds_out = f_out[output_key]
+            ds_hmap = f_h[hmap_key]
+            [apply_block(block_id, blocking, ds_hmap, ds_in, ds_out, discard_ids, preserve_zeros)
+             for block_id in block_list]
+
+    # copy the 'maxId' attribute if present
+    if job_id == 0:
+        with vu.file_reader(input_path, 'r') as f:
+            attrs = f[input_key].attrs
+            max_id = attrs.get('maxId', None)
+        if max_id is not None:
+            max_id = max(set(range(max_id + 1)) - set(discard_ids))
+            with vu.file_reader(output_path) as f:
+                f[output_key].attrs['maxId'] = max_id
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    filling_size_filter(job_id, path)
@@ -0,0 +1,120 @@
+#! /bin/python
+
+import os
+import sys
+import json
+import numpy as np
+
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+def _filter_block(blocking, block_id,
+                  ds_in, ds_out, filter_ids):
+    fu.log_block_start(block_id)
+    # read labels and input in this block
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    seg = ds_in[bb]
+
+    # check if segmentation block is empty
+    if seg.sum() == 0:
+        fu.log_block_success(block_id)
+        return
+
+    # check for filter_ids
+    filter_mask = np.in1d(seg, filter_ids).reshape(seg.shape)
+    seg[filter_mask] = 0
+    ds_out[bb] = seg
+    fu.log_block_success(block_id)
+
+
+def _filter_block_inplace(blocking, block_id,
+                          ds, filter_ids):
+    fu.log_block_start(block_id)
+    # read labels and input in this block
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    seg = ds[bb]
+
+    # check if segmentation block is empty
+    if seg.sum() == 0:
+        fu.log_block_success(block_id)
+        return
+
+    # check for filter_ids
+    filter_mask = np.in1d(seg, filter_ids).reshape(seg.shape)
+
+    # check if we filter any ids
+    if filter_mask.sum() == 0:
+        fu.log_block_success(block_id)
+        return
+
+    seg[filter_mask] = 0
+    ds[bb] = seg
+    fu.log_block_success(block_id)
+
+
+def filter_blocks(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+    filter_path = config['filter_path']
+
+    block_shape = config['block_shape']
+    block_list = config['block_list']
+
+    with vu.file_reader(input_path, 'r') as f:
+        shape = f[input_key].shape
+
+    blocking = nt.blocking([0, 0, 0],
+                           list(shape),
+                           list(block_shape))
+
+    with open(filter_path) as f:
+        filter_ids = json.load(f)
+    filter_ids = np.array(filter_ids, dtype='uint64')
+
+    in_place = input_path == output_path and input_key == output_key
+    if in_place:
+        fu.log("filtering blocks in place")
+        with vu.file_reader(input_path) as f:
+            ds = f[input_key]
+            for block_id in block_list:
+                _filter_block_inplace(blocking, block_id,
+                                      ds, filter_ids)
+    else:
+        fu.log("filtering blocks to new dataset")
+        with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+
+            ds_in = f_in[input_key]
+            ds_out = f_out[output_key]
+
+            for block_id in block_list:
+                _filter_block(blocking, block_id,
+                              ds_in, ds_out, filter_ids)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    filter_blocks(job_id, path)
@@ -0,0 +1,48 @@
+#! /bin/python
+
+import os
+import sys
+import json
+import numpy as np
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+def id_filter(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    node_label_path = config['node_label_path']
+    node_label_key = config['node_label_key']
+    output_path = config['output_path']
+    filter_labels = np.array(config['filter_labels'], dtype='uint64')
+
+    with vu.file_reader(node_label_path, 'r') as f:
+        node_labels = f[node_label_key][:]
+
+    # find the node ids that overlap with the filter labels
+    filter_mask = np.in1d(node_labels, filter_labels)
+    filter_ids = np.where(filter_mask)[0].tolist()
+
+    fu.log("%i ids will be filtered" % len(filter_ids))
+    fu.log("saving filter ids to %s" % output_path)
+    with open(output_path, 'w') as f:
+        json.dump(filter_ids, f)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    id_filter(job_id, path)
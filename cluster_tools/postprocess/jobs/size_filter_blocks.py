@@ -0,0 +1,52 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.reduce_utils as rdu
+
+
+def size_filter_blocks(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+
+    # merge the partial results for a level of the reduction tree
+    if rdu.is_reduce_job(config):
+        rdu.run_reduce_job(config)
+        fu.log_job_success(job_id)
+        return
+
+    tmp_folder = config['tmp_folder']
+
+    uniques_and_counts = rdu.reduce_partials('counts', config['input_paths'])
+    uniques, counts = uniques_and_counts[:, 0], uniques_and_counts[:, 1]
+
+    if 'size_threshold' in config:
+        size_threshold = config['size_threshold']
+        fu.log("applying size filter %i" % size_threshold)
+        discard_ids = uniques[counts < size_threshold]
+    else:
+        target_number = config['target_number']
+        fu.log("filtering until we only have %i segments" % target_number)
+        size_sorted = np.argsort(counts)[::-1]
+        discard_ids = uniques[size_sorted[target_number:]]
+    fu.log("discarding %i / %i ids" % (len(discard_ids), len(uniques)))
+
+    save_path = os.path.join(tmp_folder, 'discard_ids.npy')
+    fu.log("saving results to %s" % save_path)
+    np.save(save_path, discard_ids)
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    size_filter_blocks(job_id, path)
@@ -1 +1,5 @@
-from .relabel_workflow import RelabelWorkflow, UniqueWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".relabel_workflow": ["RelabelWorkflow", "UniqueWorkflow"],
+})
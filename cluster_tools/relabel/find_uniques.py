@@ -1,21 +1,9 @@
-#! /usr/bin/python
-
-# IMPORTANT do threadctl import first (before numpy imports)
-from threadpoolctl import threadpool_limits
-
 import os
-import sys
-import json
-
-import numpy as np
 
 import luigi
-import nifty.tools as nt
-from elf.io.label_multiset_wrapper import LabelMultisetWrapper
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 class FindUniquesBase(luigi.Task):
@@ -23,13 +11,15 @@ class FindUniquesBase(luigi.Task):
     """
 
     task_name = 'find_uniques'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'find_uniques.py'))
 
     input_path = luigi.Parameter()
     input_key = luigi.Parameter()
     dependency = luigi.TaskParameter()
     return_counts = luigi.BoolParameter(default=False)
     prefix = luigi.Parameter(default=None)
+    # only find the uniques of the blocks in the dirty regions, see `RelabelWorkflow`
+    incremental = luigi.BoolParameter(default=False)
 
     def requires(self):
         return self.dependency
@@ -48,6 +38,8 @@ class FindUniquesBase(luigi.Task):
         if self.n_retries == 0:
             block_list = vu.blocks_in_volume(shape, block_shape, roi_begin, roi_end,
                                              block_list_path=block_list_path)
+            if self.incremental:
+                block_list = self.restrict_to_dirty_regions(block_list, shape, block_shape)
         else:
             block_list = self.block_list
             self.clean_up_for_retry(block_list)
@@ -96,91 +88,8 @@ class FindUniquesLSF(FindUniquesBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def uniques_in_block(block_id, blocking, ds, return_counts):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-    shape = tuple(b.stop - b.start for b in bb)
-
-    labels = ds[bb]
-    empty_labels = labels.sum() == 0
-
-    if empty_labels:
-        fu.log_block_success(block_id)
-        if return_counts:
-            return np.array([0], dtype='uint64'), np.array([int(np.prod(shape))], dtype='int64')
-        return np.array([0], dtype='uint64')
-
-    if return_counts:
-        uniques, counts = np.unique(labels, return_counts=True)
-        fu.log_block_success(block_id)
-        return uniques, counts
-    else:
-        uniques = np.unique(labels)
-        fu.log_block_success(block_id)
-        return uniques
-
-
-def find_uniques(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # read the config
-    with open(config_path) as f:
-        config = json.load(f)
-    input_path = config['input_path']
-    input_key = config['input_key']
-    block_list = config['block_list']
-    block_shape = config['block_shape']
-    tmp_folder = config['tmp_folder']
-    return_counts = config['return_counts']
-
-    # open the input file
-    with vu.file_reader(input_path, 'r') as f:
-        ds = f[input_key]
-        is_label_multiset = ds.attrs.get("isLabelMultiset", False)
-        if is_label_multiset:
-            ds = LabelMultisetWrapper(ds)
-
-        shape = ds.shape
-        blocking = nt.blocking(roiBegin=[0, 0, 0],
-                               roiEnd=list(shape),
-                               blockShape=list(block_shape))
-
-        # find uniques for all blocks
-        uniques = [uniques_in_block(block_id, blocking, ds, return_counts)
-                   for block_id in block_list]
-
-    if return_counts:
-        unique_values = np.unique(np.concatenate([un[0] for un in uniques]))
-        counts = np.zeros(int(unique_values[-1] + 1), dtype='uint64')
-        for uniques_block, counts_block in uniques:
-            counts[uniques_block] += counts_block.astype('uint64')
-        counts = counts[unique_values]
-        assert len(counts) == len(unique_values)
-
-        count_path = os.path.join(tmp_folder, 'counts_job_%i.npy' % job_id)
-        np.save(count_path, counts)
-
-    else:
-        unique_values = np.unique(np.concatenate(uniques))
-
-    # save the uniques for this job
-    save_path = os.path.join(tmp_folder, 'find_uniques_job_%i.npy' % job_id)
-    fu.log("saving results to %s" % save_path)
-    np.save(save_path, unique_values)
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    find_uniques(job_id, path)
+class FindUniquesExecutor(FindUniquesBase, ExecutorTask):
+    """
+    FindUniques on executor
+    """
+    pass
@@ -0,0 +1,82 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import numpy as np
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.reduce_utils as rdu
+
+
+def _find_labeling(uniques, max_id=0):
+    """ Map the unique ids to consecutive ids after `max_id`, 0 is kept if it is one of the ids.
+    """
+    if uniques[0] == 0:
+        new_ids = np.concatenate([np.zeros(1, dtype='uint64'),
+                                  np.arange(max_id + 1, max_id + len(uniques), dtype='uint64')])
+    else:
+        new_ids = np.arange(max_id + 1, max_id + len(uniques) + 1, dtype='uint64')
+    fu.log("relabel to new max-id %i" % new_ids[-1])
+    return np.concatenate([uniques[:, None], new_ids[:, None]], axis=1)
+
+
+def _previous_max_id(assignment_path, assignment_key):
+    # the max id of the previous labeling, the ids that are kept are smaller or equal
+    if not os.path.exists(assignment_path):
+        return 0
+    with vu.file_reader(assignment_path, 'r') as f:
+        if assignment_key not in f:
+            return 0
+        ds = f[assignment_key]
+        if 'maxId' in ds.attrs:
+            return int(ds.attrs['maxId'])
+        return int(ds[:, 1].max()) if ds.shape[0] > 0 else 0
+
+
+def find_labeling(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+
+    # merge the partial results for a level of the reduction tree
+    if rdu.is_reduce_job(config):
+        rdu.run_reduce_job(config)
+        fu.log_job_success(job_id)
+        return
+
+    input_paths = config['input_paths']
+    n_threads = config['threads_per_job']
+    assignment_path = config['assignment_path']
+    assignment_key = config['assignment_key']
+
+    fu.log("read and merge uniques")
+    uniques = rdu.reduce_partials('unique', input_paths)
+
+    # if we relabel incrementally, the ids of the other blocks are kept from the previous labeling,
+    # so the new ids start after its max id
+    max_id = _previous_max_id(assignment_path, assignment_key) if config.get('incremental', False) else 0
+    assignments = _find_labeling(uniques, max_id)
+
+    fu.log("saving results to %s/%s" % (assignment_path, assignment_key))
+    with vu.file_reader(assignment_path) as f:
+        chunk_size = min(int(1e6), len(assignments))
+        chunks = (chunk_size, 2)
+        ds = vu.force_dataset(f, assignment_key, shape=assignments.shape, dtype='uint64',
+                              compression='gzip', chunks=chunks)
+        ds.n_threads = n_threads
+        ds[:] = assignments
+        ds.attrs['maxId'] = max(int(assignments[:, 1].max()), max_id)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    find_labeling(job_id, path)
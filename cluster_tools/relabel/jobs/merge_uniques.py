@@ -0,0 +1,50 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.reduce_utils as rdu
+
+
+def merge_uniques(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+
+    # merge the partial results for a level of the reduction tree
+    if rdu.is_reduce_job(config):
+        rdu.run_reduce_job(config)
+        fu.log_job_success(job_id)
+        return
+
+    input_paths = config['input_paths']
+    n_threads = config['threads_per_job']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    fu.log("read and merge uniques")
+    uniques = rdu.reduce_partials('unique', input_paths)
+    fu.log("found %i unique values" % len(uniques))
+
+    fu.log("saving results to %s/%s" % (output_path, output_key))
+    with vu.file_reader(output_path) as f:
+        chunk_size = min(int(1e6), len(uniques))
+        chunks = (chunk_size,)
+        ds = f.create_dataset(output_key, shape=uniques.shape, dtype='uint64',
+                              compression='gzip', chunks=chunks)
+        ds.n_threads = n_threads
+        ds[:] = uniques
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    merge_uniques(job_id, path)
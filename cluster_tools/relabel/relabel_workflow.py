@@ -15,17 +15,28 @@ class RelabelWorkflow(WorkflowBase):
     output_path = luigi.Parameter(default="")
     output_key = luigi.Parameter(default="")
     prefix = luigi.Parameter(default=None)
+    # set to false if the dependency has already computed the uniques per job
+    # (e.g. a fused watershed task), otherwise they are computed by `FindUniques`
+    find_uniques = luigi.BoolParameter(default=True)
+    # only relabel the blocks in the dirty regions (see `BaseClusterTask.restrict_to_dirty_regions`),
+    # the ids of the other blocks are kept and the new ids are appended after the max id of the previous
+    # relabeling; the ids in the dirty regions must not occur in other blocks, e.g. for the block-wise watershed
+    incremental = luigi.BoolParameter(default=False)
 
     def requires(self):
-        unique_task = getattr(unique_tasks,
-                              self._get_task_name("FindUniques"))
-        dep = unique_task(tmp_folder=self.tmp_folder,
-                          max_jobs=self.max_jobs,
-                          config_dir=self.config_dir,
-                          input_path=self.input_path,
-                          input_key=self.input_key,
-                          dependency=self.dependency,
-                          prefix=self.prefix)
+        if self.find_uniques:
+            unique_task = getattr(unique_tasks,
+                                  self._get_task_name("FindUniques"))
+            dep = unique_task(tmp_folder=self.tmp_folder,
+                              max_jobs=self.max_jobs,
+                              config_dir=self.config_dir,
+                              input_path=self.input_path,
+                              input_key=self.input_key,
+                              dependency=self.dependency,
+                              prefix=self.prefix,
+                              incremental=self.incremental)
+        else:
+            dep = self.dependency
 
         # for now, we hard-code the assignment path here,
         # because it is only used internally for this task
@@ -37,7 +48,8 @@ class RelabelWorkflow(WorkflowBase):
                             input_path=self.input_path, input_key=self.input_key,
                             assignment_path=self.assignment_path,
                             assignment_key=self.assignment_key,
-                            prefix=self.prefix)
+                            prefix=self.prefix,
+                            incremental=self.incremental)
 
         # check if we relabel in-place (default) or to a new output file
         if self.output_path == "":
@@ -60,7 +72,8 @@ class RelabelWorkflow(WorkflowBase):
                          assignment_path=self.assignment_path,
                          assignment_key=self.assignment_key,
                          identifier=write_id,
-                         dependency=dep)
+                         dependency=dep,
+                         incremental=self.incremental)
         return dep
 
     @staticmethod
@@ -1 +1,5 @@
-from .skeleton_workflow import SkeletonWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".skeleton_workflow": ["SkeletonWorkflow"],
+})
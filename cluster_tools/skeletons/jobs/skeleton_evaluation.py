@@ -0,0 +1,55 @@
+#! /bin/python
+
+import os
+import sys
+import json
+
+import nifty.skeletons as nskel
+
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def skeleton_evaluation(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_path = config['input_path']
+    input_key = config['input_key']
+
+    skeleton_path = config['skeleton_path']
+    skeleton_key = config['skeleton_key']
+
+    output_path = config['output_path']
+    skeleton_format = config['skeleton_format']
+    n_threads = config.get('threads_per_job', 1)
+
+    # TODO adapt nskel.SkeletonMetrics to new n5 skeleton format
+    skeleton_ids = os.listdir(skeleton_file)
+    skeleton_ids = [int(sk) for sk in skeleton_ids if sk.isdigit()]
+    skeleton_ids.sort()
+    metrics = nskel.SkeletonMetrics(os.path.join(input_path, input_key),
+                                    os.path.join(skeleton_path, skeleton_key),
+                                    skeleton_ids, n_threads)
+
+    # TODO expose parameters for different eval options
+    correct, split, merge, n_merges = metrics.computeGoogleScore(n_threads)
+    res = {'correct': correct, 'split': split, 'merge': merge, 'n_merges': n_merges}
+    with open(output_path, 'w') as f:
+        json.dump(res, f)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    skeleton_evaluation(job_id, path)
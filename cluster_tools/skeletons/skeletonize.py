@@ -1,18 +1,11 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.tools as nt
 
-import elf.skeleton.io as skelio
-from elf.skeleton import skeletonize as skel_impl, get_method_names
+from elf.skeleton import get_method_names
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 
@@ -26,7 +19,7 @@ class SkeletonizeBase(luigi.Task):
     """
 
     task_name = 'skeletonize'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'skeletonize.py'))
     allow_retry = False
 
     # input and output volumes
@@ -120,99 +113,8 @@ class SkeletonizeLSF(SkeletonizeBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-# not parallelized for now
-def _skeletonize_id_block(blocking, block_id, ds_in, ds_out,
-                          sizes, bb_min, bb_max, resolution, size_threshold,
-                          method):
-
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    id_begin, id_end = block.begin[0], block.end[0]
-    # we don't compute the skeleton for id 0, which is reserved for the ignore label
-    id_begin = 1 if id_begin == 0 else id_begin
-
-    # we increase the bounding box with a small halo, otherwise there
-    # semms to be boundary inconsistencies
-    halo = (2, 2, 2)
-    shape = ds_in.shape
-
-    # skeletonize ids in range and serialize skeletons
-    for seg_id in range(id_begin, id_end):
-        if size_threshold is not None:
-            if sizes[seg_id] < size_threshold:
-                continue
-        bb = tuple(slice(max(int(mi - ha), 0),
-                         min(int(ma + ha), sh)) for mi, ma, sh, ha in zip(bb_min[seg_id],
-                                                                          bb_max[seg_id],
-                                                                          shape, halo))
-        fu.log("skeletonize id %i from bb %s" % (seg_id, str(bb)))
-        obj = ds_in[bb] == seg_id
-
-        # try to skeletonize the object, skip if any exception is thrown
-        try:
-            nodes, edges = skel_impl(obj, resolution=resolution, method=method)
-        except Exception:
-            continue
-
-        offsets = [b.start * res for b, res in zip(bb, resolution)]
-        skelio.write_n5(ds_out, seg_id, nodes, edges, offsets)
-    fu.log_block_success(block_id)
-
-
-def skeletonize(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # read the input cofig
-    input_path = config['input_path']
-    input_key = config['input_key']
-    morphology_path = config['morphology_path']
-    morphology_key = config['morphology_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-    size_threshold = config['size_threshold']
-    resolution = config['resolution']
-    method = config['method']
-
-    # morphology feature-columns
-    # 0    = label-id
-    # 1    = pixel size
-    # 2:5  = center of mass
-    # 5:8  = min coordinate
-    # 8:11 = max coordinate
-    with vu.file_reader(morphology_path) as f:
-        morpho = f[morphology_key][:]
-        sizes = morpho[:, 1].astype('uint64')
-        bb_min = morpho[:, 5:8].astype('uint64')
-        bb_max = morpho[:, 8:11].astype('uint64') + 1
-
-    block_list = config['block_list']
-    block_len = config['block_len']
-    n_labels = config['number_of_labels']
-    blocking = nt.blocking([0], [n_labels], [block_len])
-
-    # skeletonize this id block
-    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-        for block_id in block_list:
-            _skeletonize_id_block(blocking, block_id, ds_in, ds_out,
-                                  sizes, bb_min, bb_max, resolution, size_threshold,
-                                  method)
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    skeletonize(job_id, path)
+class SkeletonizeExecutor(SkeletonizeBase, ExecutorTask):
+    """
+    skeletonize on executor
+    """
+    pass
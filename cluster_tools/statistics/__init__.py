@@ -1 +1,5 @@
-from .statistics_workflow import DataStatisticsWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".statistics_workflow": ["DataStatisticsWorkflow"],
+})
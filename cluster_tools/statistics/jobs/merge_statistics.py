@@ -0,0 +1,43 @@
+#! /bin/python
+
+import os
+import sys
+import json
+
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.reduce_utils as rdu
+
+
+#
+# Implementation
+#
+
+
+def merge_statistics(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # get the config
+    config = fu.load_job_config(config_path)
+
+    # merge the partial results for a level of the reduction tree
+    if rdu.is_reduce_job(config):
+        rdu.run_reduce_job(config)
+        fu.log_job_success(job_id)
+        return
+
+    output_path = config['output_path']
+
+    stats = rdu.reduce_partials('moments', config['input_paths'])
+    with open(output_path, 'w') as f:
+        json.dump(stats, f)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    merge_statistics(job_id, path)
@@ -1,15 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
-from cluster_tools.statistics.block_statistics import merge_stats
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -21,7 +15,7 @@ class MergeStatisticsBase(luigi.Task):
     """
 
     task_name = 'merge_statistics'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'merge_statistics.py'))
     output_path = luigi.Parameter()
     shape = luigi.ListParameter()
     dependency = luigi.TaskParameter()
@@ -41,11 +35,14 @@ class MergeStatisticsBase(luigi.Task):
                                          roi_begin, roi_end)
         n_jobs = min(len(block_list), self.max_jobs)
 
+        # merge the statistics of the jobs in a reduction tree, so that the last job only needs to merge a few of them
+        input_paths = self.tree_reduce([os.path.join(self.tmp_folder, 'block_statistics_job%i.json' % job_id)
+                                        for job_id in range(n_jobs)], 'moments', config)
+
         # update the config with input and graph paths and keys
         # as well as block shape
         config.update({'output_path': self.output_path,
-                       'tmp_folder': self.tmp_folder,
-                       'n_jobs': n_jobs})
+                       'input_paths': input_paths})
 
         # prime and run the jobs
         self.prepare_jobs(1, None, config)
@@ -74,40 +71,7 @@ class MergeStatisticsLSF(MergeStatisticsBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def merge_statistics(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    # get the config
-    with open(config_path) as f:
-        config = json.load(f)
-
-    n_jobs = config['n_jobs']
-    tmp_folder = config['tmp_folder']
-    output_path = config['output_path']
-
-    job_stats = []
-    for stat_job_id in range(n_jobs):
-        job_path = os.path.join(tmp_folder, 'block_statistics_job%i.json' % stat_job_id)
-        with open(job_path) as f:
-            job_stat = json.load(f)
-        job_stats.append(job_stat)
-
-    stats = merge_stats(job_stats)
-    with open(output_path, 'w') as f:
-        json.dump(stats, f)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    merge_statistics(job_id, path)
+class MergeStatisticsExecutor(MergeStatisticsBase, ExecutorTask):
+    """ MergeStatistics on executor
+    """
+    pass
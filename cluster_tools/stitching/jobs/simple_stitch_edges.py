@@ -0,0 +1,46 @@
+#! /usr/bin/python
+
+import os
+import sys
+
+import nifty.distributed as ndist
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+def simple_stitch_edges(job_id, config_path):
+
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    config = fu.load_job_config(config_path)
+
+    graph_path = config['graph_path']
+    labels_path = config['labels_path']
+    labels_key = config['labels_key']
+    n_edges = config['n_edges']
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+
+    out_path = config['out_path']
+    out_key = 'job_results/job_%i' % job_id
+
+    subgraph_key = 's0/sub_graphs'
+    res = ndist.findBlockBoundaryEdges(graph_path, subgraph_key, labels_path, labels_key,
+                                       n_edges, block_shape, block_list)
+    fu.log('Found %i / %i block boundary edges' % (res.sum(), len(res)))
+
+    with vu.file_reader(out_path) as f:
+        chunks = (min(int(1e6), len(res)),)
+        vu.force_dataset(f, out_key, data=res.astype('uint8'), compression='gzip',
+                         chunks=chunks, shape=res.shape)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    simple_stitch_edges(job_id, path)
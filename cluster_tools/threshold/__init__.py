@@ -1 +1,5 @@
-from .threshold import ThresholdLocal, ThresholdSlurm, ThresholdLSF
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".threshold": ["ThresholdLocal", "ThresholdSlurm", "ThresholdLSF", "ThresholdExecutor"],
+})
@@ -1,16 +1,9 @@
-#! /usr/bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import numpy as np
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 
@@ -19,7 +12,7 @@ class ThresholdBase(luigi.Task):
     """
 
     task_name = "threshold"
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'threshold.py'))
     allow_retry = False
 
     input_path = luigi.Parameter()
@@ -128,85 +121,8 @@ class ThresholdLSF(ThresholdBase, LSFTask):
     pass
 
 
-def _threshold_block(block_id, blocking,
-                     ds_in, ds_out, threshold,
-                     threshold_mode, channel, sigma):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-
-    bb = vu.block_to_bb(block)
-    if channel is None:
-        input_ = ds_in[bb]
-    else:
-        channel_ = [channel] if isinstance(channel, int) else channel
-        in_shape = (len(channel_),) + tuple(b.stop - b.start for b in bb)
-        input_ = np.zeros(in_shape, dtype=ds_in.dtype)
-        for chan_id, chan in enumerate(channel_):
-            bb_inp = (slice(chan, chan + 1),) + bb
-            input_[chan_id] = ds_in[bb_inp].squeeze()
-        input_ = np.mean(input_, axis=0)
-
-    input_ = vu.normalize(input_)
-    if sigma > 0:
-        input_ = vu.apply_filter(input_, "gaussianSmoothing", sigma)
-        input_ = vu.normalize(input_)
-
-    if threshold_mode == "greater":
-        input_ = input_ > threshold
-    elif threshold_mode == "less":
-        input_ = input_ < threshold
-    elif threshold_mode == "equal":
-        input_ = input_ == threshold
-    else:
-        raise RuntimeError("Thresholding Mode %s not supported" % threshold_mode)
-
-    ds_out[bb] = input_.astype("uint8")
-    fu.log_block_success(block_id)
-
-
-def threshold(job_id, config_path):
-
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-
-    with open(config_path, "r") as f:
-        config = json.load(f)
-    input_path = config["input_path"]
-    input_key = config["input_key"]
-    output_path = config["output_path"]
-    output_key = config["output_key"]
-    block_list = config["block_list"]
-    block_shape = config["block_shape"]
-    threshold = config["threshold"]
-    threshold_mode = config["threshold_mode"]
-
-    sigma = config.get("sigma_prefilter", 0)
-    channel = config.get("channel", None)
-
-    fu.log("Applying threshold %f with mode %s" % (threshold, threshold_mode))
-
-    with vu.file_reader(input_path, "r") as f_in, vu.file_reader(output_path) as f_out:
-
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-
-        shape = ds_in.shape
-        if channel is not None:
-            shape = shape[1:]
-        assert len(shape) == 3
-
-        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
-
-        [_threshold_block(block_id, blocking,
-                          ds_in, ds_out, threshold,
-                          threshold_mode, channel, sigma) for block_id in block_list]
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == "__main__":
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
-    threshold(job_id, path)
+class ThresholdExecutor(ThresholdBase, ExecutorTask):
+    """
+    Threshold on executor
+    """
+    pass
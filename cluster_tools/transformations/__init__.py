@@ -1,4 +1,8 @@
-from .transformation_workflows import (AffineTransformationWorkflow,
-                                       LinearTransformationWorkflow,
-                                       TransformixCoordinateTransformationWorkflow,
-                                       TransformixTransformationWorkflow)
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".transformation_workflows": ["AffineTransformationWorkflow",
+                                  "LinearTransformationWorkflow",
+                                  "TransformixCoordinateTransformationWorkflow",
+                                  "TransformixTransformationWorkflow"],
+})
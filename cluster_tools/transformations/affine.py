@@ -1,17 +1,9 @@
-#! /bin/python
-
 import os
-import sys
-import json
 
 import luigi
-import nifty.tools as nt
-from elf.transformation import parameters_to_matrix
-from elf.wrapper.affine_volume import AffineVolume
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 from cluster_tools.utils.task_utils import DummyTask
 
 
@@ -24,7 +16,7 @@ class AffineBase(luigi.Task):
     """
 
     task_name = 'affine'
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'affine.py'))
 
     # input and output volumes
     input_path = luigi.Parameter()
@@ -124,63 +116,8 @@ class AffineLSF(AffineBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-def _copy_blocks(ds_in, ds_out, blocking, block_list):
-    for block_id in block_list:
-        fu.log("start processing block %i" % block_id)
-        block = blocking.getBlock(block_id)
-        bb = vu.block_to_bb(block)
-        data = ds_in[bb]
-        ds_out[bb] = data
-
-
-def affine(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("reading config from %s" % config_path)
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # read the input and output cofig
-    input_path = config['input_path']
-    input_key = config['input_key']
-    output_path = config['output_path']
-    output_key = config['output_key']
-
-    # compute the transformation matrix
-    trafo = config['transformation']
-    trafo = parameters_to_matrix(trafo)
-
-    # load additional trafo parameter
-    order = config['order']
-    fill_value = config['fill_value']
-    sigma_anti_aliasing = config['sigma_anti_aliasing']
-
-    block_shape = list(config['block_shape'])
-    block_list = config['block_list']
-
-    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
-        ds_in = f_in[input_key]
-        ds_out = f_out[output_key]
-        shape = ds_out.shape
-
-        # wrap the input dataset into the affine volume wrapper
-        ds_in = AffineVolume(ds_in, shape=shape, affine_matrix=trafo,
-                             order=order, fill_value=fill_value,
-                             sigma_anti_aliasing=sigma_anti_aliasing)
-
-        blocking = nt.blocking([0, 0, 0], list(shape), block_shape)
-        _copy_blocks(ds_in, ds_out, blocking, block_list)
-
-    # log success
-    fu.log_job_success(job_id)
-
-
-if __name__ == '__main__':
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
-    affine(job_id, path)
+class AffineExecutor(AffineBase, ExecutorTask):
+    """
+    Affine intensity transform on executor
+    """
+    pass
@@ -0,0 +1,138 @@
+#! /bin/python
+
+import os
+import sys
+import json
+
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+
+def _load_transformation(trafo_file, shape):
+    with open(trafo_file) as f:
+        trafo = json.load(f)
+
+    # for now, we support two different transformation specifications:
+    # 1.) global trafo specified as {'a': a, 'b': b}
+    # 2.) transformation for each slcie, specified as {'1': {'a': a, 'b': b}, ...}
+    if len(trafo) == 2:
+        assert set(trafo.keys()) == {'a', 'b'}
+        fu.log("Found global transformation with values %f, %f" % (trafo['a'], trafo['b']))
+    else:
+        assert len(trafo) == shape[0]
+        assert all((len(tr) == 2 for tr in trafo.values()))
+        trafo = {int(k): v for k, v in trafo.items()}
+        fu.log("Found transformation per slice")
+    return trafo
+
+
+def _transform_data(data, a, b, mask=None):
+    if mask is None:
+        data = a * data + b
+    else:
+        data[mask] = a * data[mask] + b
+    return data
+
+
+def _transform_block(ds_in, ds_out, transformation, blocking, block_id, mask=None):
+    fu.log_block_start(block_id)
+    block = blocking.getBlock(block_id)
+
+    bb = vu.block_to_bb(block)
+    if mask is None:
+        bb_mask = None
+    else:
+        bb_mask = mask[bb].astype('bool')
+        if bb_mask.sum() == 0:
+            fu.log_block_success(block_id)
+            return
+
+    data = ds_in[bb]
+    if len(transformation) == 2:
+        data = _transform_data(data, transformation['a'], transformation['b'], bb_mask)
+    else:
+        z_offset = block.begin[0]
+        for z in range(data.shape[0]):
+            trafo = transformation[z + z_offset]
+            mask_z = None if bb_mask is None else bb_mask[z]
+            data[z] = _transform_data(data[z], trafo['a'], trafo['b'], mask_z)
+
+    ds_out[bb] = data
+    fu.log_block_success(block_id)
+
+
+def _transform_linear(ds_in, ds_out, transformation, blocking, block_list, mask=None):
+    for block_id in block_list:
+        _transform_block(ds_in, ds_out, transformation, blocking, block_id, mask)
+
+
+def linear(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_path = config['input_path']
+    input_key = config['input_key']
+
+    block_shape = list(config['block_shape'])
+    block_list = config['block_list']
+
+    # read the output config and path to transformation
+    output_path = config['output_path']
+    output_key = config['output_key']
+    trafo_file = config['transformation']
+
+    mask_path = config['mask_path']
+    mask_key = config['mask_key']
+
+    if mask_path == '':
+        mask = None
+    else:
+        assert mask_key != ''
+        with vu.file_reader(input_path, 'r') as f:
+            in_shape = f[input_key].shape
+        mask = vu.load_mask(mask_path, mask_key, in_shape)
+
+    same_file = input_path == output_path
+    in_place = same_file and (input_key == output_key)
+
+    # submit blocks
+    if same_file:
+        with vu.file_reader(input_path) as f:
+            ds_in = f[input_key]
+            ds_out = ds_in if in_place else f[output_key]
+
+            shape = list(ds_in.shape)
+            trafo = _load_transformation(trafo_file, shape)
+
+            blocking = nt.blocking([0, 0, 0], shape, block_shape)
+            _transform_linear(ds_in, ds_out, trafo, blocking, block_list, mask)
+
+    else:
+        with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+            ds_in = f_in[input_key]
+            ds_out = f_out[output_key]
+
+            shape = list(ds_in.shape)
+            trafo = _load_transformation(trafo_file, shape)
+
+            blocking = nt.blocking([0, 0, 0], shape, block_shape)
+            _transform_linear(ds_in, ds_out, trafo, blocking, block_list, mask)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    linear(job_id, path)
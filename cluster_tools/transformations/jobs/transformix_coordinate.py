@@ -0,0 +1,122 @@
+#! /usr/bin/python
+
+import os
+import subprocess
+import sys
+from shutil import rmtree
+
+import cluster_tools.utils.function_utils as fu
+import nifty.tools as nt
+
+from elf.io import open_file
+from nifty.transformation import coordinateTransformationZ5
+
+
+#
+# Implementation
+#
+
+
+def _write_coords(starts, stops, out_file):
+    n_coords = (stops[0] - starts[0]) * (stops[1] - starts[1]) * (stops[2] - starts[2])
+    with open(out_file, 'w') as f:
+
+        f.write("index\n")
+        f.write(f"{n_coords}\n")
+
+        for z in range(starts[0], stops[0]):
+            for y in range(starts[1], stops[1]):
+                for x in range(starts[2], stops[2]):
+                    coord_str = " ".join(map(str, (x, y, z)))
+                    f.write(f"{coord_str}\n")
+
+
+def process_block(ds_in, ds_out,
+                  blocking, block_id,
+                  transformix_bin,
+                  transformation_file,
+                  tmp_folder):
+    block = blocking.getBlock(block_id)
+    coord_folder = os.path.join(tmp_folder, f'coords_{block_id}')
+    os.makedirs(coord_folder, exist_ok=True)
+
+    # get the output coordinates for this block and write to file
+    in_coord_file = os.path.join(coord_folder, 'inpoints.txt')
+    _write_coords(block.begin, block.end, in_coord_file)
+
+    # apply transformix to transform all coordinates
+    cmd = [transformix_bin,
+           '-def', in_coord_file,
+           '-out', coord_folder,
+           '-tp', transformation_file]
+    subprocess.run(cmd)
+    out_file = os.path.join(coord_folder, 'outputpoints.txt')
+
+    # TODO support other data backends than n5/zarr
+    # use nifty transformation functionality to apply the transformation
+    bb = tuple(slice(beg, end)
+               for beg, end in zip(block.begin, block.end))
+    out = coordinateTransformationZ5(ds_in, out_file, bb)
+
+    # write the output
+    ds_out[bb] = out
+
+    # clean up
+    rmtree(coord_folder)
+
+
+def transformix_coordinate(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+
+    # read the config
+    config = fu.load_job_config(config_path)
+
+    input_path = config['input_path']
+    input_key = config['input_key']
+
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    transformation_file = config['transformation_file']
+    elastix_dir = config['elastix_directory']
+    tmp_folder = config['tmp_folder']
+
+    block_list = config['block_list']
+    block_shape = config['block_shape']
+
+    fu.log("Applying registration with:")
+    fu.log("transformation_file: %s" % transformation_file)
+    fu.log("elastix_directory: %s" % elastix_dir)
+
+    transformix_bin = os.path.join(elastix_dir, 'bin', 'transformix')
+    # set the ld library path
+    lib_path = os.environ['LD_LIBRARY_PATH']
+    elastix_lib_path = os.path.join(elastix_dir, 'lib')
+    os.environ['LD_LIBRARY_PATH'] = f"{lib_path}:{elastix_lib_path}"
+
+    with open_file(input_path, 'r') as f_in, open_file(output_path, 'a') as f_out:
+
+        ds_in = f_in[input_key]
+        ds_out = f_out[output_key]
+        shape = ds_out.shape
+
+        blocking = nt.blocking([0, 0, 0], shape, block_shape)
+
+        for block_id in block_list:
+            fu.log_block_start(block_id)
+            process_block(ds_in, ds_out,
+                          blocking, block_id,
+                          transformix_bin,
+                          transformation_file,
+                          tmp_folder)
+            fu.log_block_success(block_id)
+
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    transformix_coordinate(job_id, path)
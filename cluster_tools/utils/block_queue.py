@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+
+from . import completion_utils as cu
+
+# the block queue db is stored in the tmp folder of the workflow
+DB_NAME = "block_queue.sqlite"
+
+
+def get_db_path(tmp_folder):
+    return os.path.join(tmp_folder, DB_NAME)
+
+
+def _connect(db_path):
+    # we manage the transactions ourselves (isolation_level=None), so that
+    # we can lock the db before claiming a block.
+    # use a generous timeout, because many jobs may access the queue at the same time
+    conn = sqlite3.connect(db_path, timeout=120., isolation_level=None, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS queue "
+                 "(queue_name TEXT, position INTEGER, block_id INTEGER, job_id INTEGER, "
+                 "PRIMARY KEY (queue_name, position))")
+    # index of the unclaimed blocks, so that claiming the next block doesn't scan the claimed ones
+    conn.execute("CREATE INDEX IF NOT EXISTS unclaimed ON queue (queue_name, position) WHERE job_id IS NULL")
+    return conn
+
+
+def create_queue(db_path, queue_name, block_list):
+    """ Create the queue with the given blocks; replaces an existing queue of the same name.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM queue WHERE queue_name = ?", (queue_name,))
+        conn.executemany("INSERT INTO queue VALUES (?, ?, ?, NULL)",
+                         ((queue_name, position, int(block_id)) for position, block_id in enumerate(block_list)))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def get_claimed_blocks(db_path, queue_name, job_ids):
+    """ Get the blocks that were claimed by the given jobs.
+    """
+    conn = _connect(db_path)
+    try:
+        claimed = []
+        for job_id in job_ids:
+            rows = conn.execute("SELECT block_id FROM queue WHERE queue_name = ? AND job_id = ?",
+                                (queue_name, job_id)).fetchall()
+            claimed.extend(row[0] for row in rows)
+    finally:
+        conn.close()
+    return claimed
+
+
+class BlockQueue:
+    """ Iterator over the blocks of a queue that is shared by all jobs of a task.
+
+    Each block is claimed by exactly one job. Jobs that finish their blocks early
+    keep on claiming blocks until the queue is empty, which balances the load between jobs.
+    The iterator is thread-safe, so the threads of a job can share it.
+    """
+    def __init__(self, db_path, queue_name, job_id):
+        self.queue_name = queue_name
+        self.job_id = job_id
+        self._conn = _connect(db_path)
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            if self._conn is None:
+                raise StopIteration
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT position, block_id FROM queue "
+                                         "WHERE queue_name = ? AND job_id IS NULL "
+                                         "ORDER BY position LIMIT 1", (self.queue_name,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE queue SET job_id = ? WHERE queue_name = ? AND position = ?",
+                                       (self.job_id, self.queue_name, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if row is None:
+                self._conn.close()
+                self._conn = None
+                raise StopIteration
+            return row[1]
+
+
+def job_blocks(config, job_id):
+    """ Get the blocks to be processed by this job.
+
+    Returns the block queue if the task uses it, otherwise the block list of the job config.
+    """
+    if "block_queue" in config:
+        blocks = BlockQueue(config["block_queue"], config["queue_name"], job_id)
+    else:
+        blocks = config["block_list"]
+    # with speculative execution, a copy of this job processes the same blocks,
+    # so we skip the blocks that were finished by the other copy
+    if config.get("speculative", False):
+        return (block_id for block_id in blocks if not cu.is_block_done(block_id))
+    return blocks
@@ -0,0 +1,253 @@
+import itertools
+import math
+import os
+from functools import reduce
+
+import numpy as np
+
+from . import volume_utils as vu
+
+
+def _lcm(a, b):
+    return a * b // math.gcd(a, b)
+
+
+def get_chunks(path, key, ndim=None):
+    """ Get the chunk shape and item size of a dataset.
+
+    Returns None if the dataset does not exist or is not chunked.
+    If `ndim` is given, only the last `ndim` axes of the chunks are returned (e.g. for datasets with
+    channels) and None is returned for datasets with fewer dimensions.
+    """
+    if not path or not key or not os.path.exists(path):
+        return None
+    try:
+        with vu.file_reader(path, "r") as f:
+            if key not in f:
+                return None
+            ds = f[key]
+            chunks, itemsize = ds.chunks, np.dtype(ds.dtype).itemsize
+    # not a container or dataset that can be opened by file_reader (e.g. a group, a tif file or a graph)
+    except Exception:
+        return None
+    if chunks is None:
+        return None
+    chunks = tuple(int(ch) for ch in chunks)
+    if ndim is not None:
+        if len(chunks) < ndim:
+            return None
+        chunks = chunks[-ndim:]
+    return chunks, itemsize
+
+
+def _touched_extent(block_len, chunk_len):
+    # average extent of the chunks touched by a block along one axis,
+    # the block start positions repeat with period lcm(block_len, chunk_len)
+    n_starts = _lcm(block_len, chunk_len) // block_len
+    n_chunks = sum((start + block_len - 1) // chunk_len - start // chunk_len + 1
+                   for start in range(0, n_starts * block_len, block_len))
+    return chunk_len * n_chunks / n_starts
+
+
+def read_amplification(block_shape, chunks):
+    """ Ratio of the size of the chunks touched by a block to the size of the block.
+
+    The ratio is averaged over the positions of the blocks in the volume. It is 1 if the
+    block shape is a multiple of the chunks, otherwise each block reads (or writes)
+    partially covered chunks, which are also accessed by the neighboring blocks.
+    """
+    assert len(block_shape) == len(chunks), "%s, %s" % (str(block_shape), str(chunks))
+    touched = np.prod([_touched_extent(bs, ch) for bs, ch in zip(block_shape, chunks)])
+    return float(touched / np.prod(block_shape))
+
+
+def plan_block_shape(block_shape, chunk_shapes, max_block_mb=None, itemsize=1):
+    """ Find a block shape that is a multiple of the given chunk shapes.
+
+    Each axis of the block shape is a multiple of the least common multiple of the chunks
+    along this axis, that is closest to the requested block shape. If `max_block_mb` is given,
+    the block is shrunk (along the axis with the most multiples first) until it fits the memory budget.
+
+    Arguments:
+        block_shape [tuple] - the requested block shape
+        chunk_shapes [list[tuple]] - the chunk shapes of the datasets read and written by the task
+        max_block_mb [float] - memory budget for a block in MB (default: None)
+        itemsize [int] - number of bytes per voxel, summed over the datasets (default: 1)
+    Returns:
+        tuple - the planned block shape
+    """
+    ndim = len(block_shape)
+    chunk_shapes = [tuple(chunks) for chunks in chunk_shapes]
+    assert all(len(chunks) == ndim for chunks in chunk_shapes), "%s, %s" % (str(block_shape), str(chunk_shapes))
+    if not chunk_shapes:
+        return tuple(block_shape)
+    units = [reduce(_lcm, (chunks[axis] for chunks in chunk_shapes)) for axis in range(ndim)]
+    multiples = [max(int(round(bs / unit)), 1) for bs, unit in zip(block_shape, units)]
+
+    if max_block_mb is not None:
+        max_voxels = max_block_mb * 1.e6 / itemsize
+        while np.prod([m * unit for m, unit in zip(multiples, units)]) > max_voxels:
+            axis = int(np.argmax(multiples))
+            if multiples[axis] == 1:
+                break
+            multiples[axis] -= 1
+    return tuple(m * unit for m, unit in zip(multiples, units))
+
+
+#
+# functionality to restrict the blocks to the regions that have changed (dirty regions)
+#
+
+def _block_bounding_boxes(shape, block_shape, block_list):
+    # the block ids follow the (C-order) blocking used in `vu.blocks_in_volume`
+    blocks_per_axis = [(sh + bs - 1) // bs for sh, bs in zip(shape, block_shape)]
+    positions = np.array(np.unravel_index(np.array(block_list, dtype="int64"), blocks_per_axis)).T
+    begins = positions * np.array(block_shape)[None]
+    ends = np.minimum(begins + np.array(block_shape)[None], np.array(shape)[None])
+    return begins, ends
+
+
+def blocks_in_regions(shape, block_shape, block_list, regions, halo=None):
+    """ Get the blocks in the block list that overlap with one of the regions.
+
+    Arguments:
+        shape [tuple] - shape of the volume
+        block_shape [tuple] - shape of the blocks
+        block_list [list[int]] - the block ids
+        regions [list] - the regions given as `[begin, end]`
+        halo [tuple] - halo that is read around the blocks (default: None)
+    Returns:
+        list[int] - the blocks that overlap with the regions
+    """
+    if not block_list or not regions:
+        return []
+    halo = np.zeros(len(shape), dtype="int64") if halo is None else np.array(halo, dtype="int64")
+    begins, ends = _block_bounding_boxes(shape, block_shape, block_list)
+    begins, ends = begins - halo[None], ends + halo[None]
+    overlapping = np.zeros(len(block_list), dtype="bool")
+    for region_begin, region_end in regions:
+        overlapping |= ((begins < np.array(region_end)[None]) & (ends > np.array(region_begin)[None])).all(axis=1)
+    return np.array(block_list, dtype="int64")[overlapping].tolist()
+
+
+def block_regions(shape, block_shape, block_list):
+    """ Get the regions `[begin, end]` covered by the blocks.
+    """
+    if not block_list:
+        return []
+    begins, ends = _block_bounding_boxes(shape, block_shape, block_list)
+    return [[beg.tolist(), end.tolist()] for beg, end in zip(begins, ends)]
+
+
+#
+# functionality to split blocks into sub-blocks, e.g. to process blocks that do not fit into memory
+#
+
+def split_shape(block_shape, level):
+    """ Shape of the sub-blocks of a block that is split `level` times, each split halves all axes.
+    """
+    return [max(int(math.ceil(bs / 2 ** level)), 1) for bs in block_shape]
+
+
+def split_block(begin, end, sub_block_shape, shape, halo=None):
+    """ Split a block into sub-blocks.
+
+    Each sub-block gets a voxel offset, the number of voxels of the previous sub-blocks, so that ids that
+    are offset per block and sub-block (e.g. for the watershed) stay within the id range of the block.
+
+    Arguments:
+        begin [tuple] - begin of the block
+        end [tuple] - end of the block
+        sub_block_shape [tuple] - shape of the sub-blocks
+        shape [tuple] - shape of the volume, the halo is clipped to it
+        halo [tuple] - halo around the sub-blocks (default: None)
+    Returns:
+        list[tuple] - the input and output bounding box, the inner bounding box (local to the input)
+            and the voxel offset of the sub-blocks
+    """
+    halo = [0] * len(shape) if halo is None else list(halo)
+    sub_blocks, voxel_offset = [], 0
+    for sub_begin in itertools.product(*[range(b, e, s) for b, e, s in zip(begin, end, sub_block_shape)]):
+        sub_end = [min(b + s, e) for b, s, e in zip(sub_begin, sub_block_shape, end)]
+        input_begin = [max(b - h, 0) for b, h in zip(sub_begin, halo)]
+        input_end = [min(e + h, sh) for e, h, sh in zip(sub_end, halo, shape)]
+        input_bb = tuple(slice(b, e) for b, e in zip(input_begin, input_end))
+        output_bb = tuple(slice(b, e) for b, e in zip(sub_begin, sub_end))
+        inner_bb = tuple(slice(b - ib, e - ib) for b, e, ib in zip(sub_begin, sub_end, input_begin))
+        sub_blocks.append((input_bb, inner_bb, output_bb, voxel_offset))
+        voxel_offset += int(np.prod([e - b for b, e in zip(sub_begin, sub_end)]))
+    return sub_blocks
+
+
+#
+# space-filling curves to order the blocks, so that consecutive blocks are close in space
+#
+
+def _n_bits(positions):
+    return max(int(positions.max()).bit_length(), 1) if positions.size else 1
+
+
+def _interleave_bits(coords, n_bits):
+    # the key is made of the bits of the coordinates, from the highest to the lowest bit
+    key = np.zeros(coords.shape[0], dtype="int64")
+    for bit in range(n_bits - 1, -1, -1):
+        for axis in range(coords.shape[1]):
+            key = (key << 1) | ((coords[:, axis] >> bit) & 1)
+    return key
+
+
+def morton_keys(positions):
+    """ Morton (z-order) keys of the block positions, given as array of shape (n_blocks, ndim).
+    """
+    positions = np.asarray(positions, dtype="int64")
+    return _interleave_bits(positions, _n_bits(positions))
+
+
+def hilbert_keys(positions):
+    """ Hilbert curve keys of the block positions, given as array of shape (n_blocks, ndim).
+
+    Uses the algorithm from J. Skilling, "Programming the Hilbert curve", AIP Conf. Proc. 707, 2004.
+    """
+    x = np.array(positions, dtype="int64")
+    n_bits, ndim = _n_bits(x), x.shape[1]
+    # inverse undo excess work
+    q = 1 << (n_bits - 1)
+    while q > 1:
+        p = q - 1
+        for i in range(ndim):
+            high = (x[:, i] & q) != 0
+            x[high, 0] ^= p
+            t = (x[~high, 0] ^ x[~high, i]) & p
+            x[~high, 0] ^= t
+            x[~high, i] ^= t
+        q >>= 1
+    # gray encode
+    for i in range(1, ndim):
+        x[:, i] ^= x[:, i - 1]
+    t = np.zeros(x.shape[0], dtype="int64")
+    q = 1 << (n_bits - 1)
+    while q > 1:
+        t[(x[:, ndim - 1] & q) != 0] ^= q - 1
+        q >>= 1
+    x ^= t[:, None]
+    return _interleave_bits(x, n_bits)
+
+
+def order_blocks(shape, block_shape, block_list, order):
+    """ Order the blocks along a space-filling curve.
+
+    Arguments:
+        shape [tuple] - shape of the volume
+        block_shape [tuple] - shape of the blocks
+        block_list [list[int]] - the block ids
+        order [str] - the space-filling curve, "morton" or "hilbert"
+    Returns:
+        list[int] - the ordered block ids
+    """
+    assert order in ("morton", "hilbert"), order
+    if not block_list:
+        return []
+    begins, _ = _block_bounding_boxes(shape, block_shape, block_list)
+    positions = begins // np.array(block_shape)[None]
+    keys = morton_keys(positions) if order == "morton" else hilbert_keys(positions)
+    return np.array(block_list, dtype="int64")[np.argsort(keys, kind="stable")].tolist()
@@ -0,0 +1,125 @@
+import os
+import threading
+
+from .job_utils import current_job_config
+
+# the block and job completion db is stored in the tmp folder of the workflow
+DB_NAME = "completion.sqlite"
+
+# the db connection is shared by all threads of a job
+_lock = threading.Lock()
+_connections = {}
+
+
+def get_db_path(tmp_folder):
+    return os.path.join(tmp_folder, DB_NAME)
+
+
+def _connect(db_path):
+    # sqlite3 is imported here, because this module is imported by all jobs, but the db is only used by some
+    import sqlite3
+    # use a generous timeout, because many jobs may write to the db at the same time
+    conn = sqlite3.connect(db_path, timeout=120., check_same_thread=False)
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS blocks "
+                     "(job_name TEXT, block_id INTEGER, PRIMARY KEY (job_name, block_id))")
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs "
+                     "(job_name TEXT, job_id INTEGER, PRIMARY KEY (job_name, job_id))")
+        # the key of the run that recorded the blocks, see `reset`
+        conn.execute("CREATE TABLE IF NOT EXISTS runs "
+                     "(job_name TEXT PRIMARY KEY, run_key TEXT)")
+    return conn
+
+
+def _get_connection(db_path):
+    conn = _connections.get(db_path, None)
+    if conn is None:
+        conn = _connect(db_path)
+        _connections[db_path] = conn
+    return conn
+
+
+def _current_job():
+    """ Get the db path and job name for the job running in this process.
+
+    The job config only contains the db path if the completion db was enabled for the task.
+    """
+    config = current_job_config()
+    return config.get("completion_db", None), config.get("job_name", None)
+
+
+def _mark_done(table, id_):
+    db_path, job_name = _current_job()
+    if db_path is None:
+        return
+    with _lock:
+        conn = _get_connection(db_path)
+        # each insert is committed immediately, so that completed blocks
+        # are recorded even if the job is killed afterwards
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO %s VALUES (?, ?)" % table, (job_name, int(id_)))
+
+
+def mark_block_done(block_id):
+    """ Record that the block was processed by the current job.
+    """
+    _mark_done("blocks", block_id)
+
+
+def mark_job_done(job_id):
+    """ Record that the current job was finished successfully.
+    """
+    _mark_done("jobs", job_id)
+
+
+def is_block_done(block_id):
+    """ Check if the block was processed already by any job of the current task.
+    """
+    db_path, job_name = _current_job()
+    if db_path is None:
+        return False
+    with _lock:
+        conn = _get_connection(db_path)
+        row = conn.execute("SELECT 1 FROM blocks WHERE job_name = ? AND block_id = ?",
+                           (job_name, int(block_id))).fetchone()
+    return row is not None
+
+
+#
+# functionality to query and reset the db in the tasks
+#
+
+def get_passed_jobs(db_path, job_name, n_jobs):
+    with _lock:
+        conn = _get_connection(db_path)
+        rows = conn.execute("SELECT job_id FROM jobs WHERE job_name = ? AND job_id < ?",
+                            (job_name, n_jobs)).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def get_passed_blocks(db_path, job_name):
+    with _lock:
+        conn = _get_connection(db_path)
+        rows = conn.execute("SELECT block_id FROM blocks WHERE job_name = ?", (job_name,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def reset(db_path, job_name, reset_blocks=True, run_key=None):
+    """ Remove the job (and block) entries for the given job name.
+
+    If `run_key` is given, the block entries are only removed if they were recorded
+    for a different run key, so that an interrupted run with the same key can be resumed.
+    """
+    with _lock:
+        conn = _get_connection(db_path)
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE job_name = ?", (job_name,))
+            if not reset_blocks:
+                return
+            row = conn.execute("SELECT run_key FROM runs WHERE job_name = ?", (job_name,)).fetchone()
+            if run_key is None or row is None or row[0] != run_key:
+                conn.execute("DELETE FROM blocks WHERE job_name = ?", (job_name,))
+            if run_key is None:
+                conn.execute("DELETE FROM runs WHERE job_name = ?", (job_name,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?)", (job_name, run_key))
@@ -1,26 +1,63 @@
+import os
 from datetime import datetime
 
+from . import completion_utils as cu
+from . import job_utils as ju
+from . import memory_utils as mu
+from . import resource_utils as ru
+
 
 # stdout is always piped to file, so we can use it as logging
 def log(msg):
     print("%s: %s" % (str(datetime.now()), msg))
 
 
+def log_block_start(block_id):
+    # raises a MemoryError if the memory watchdog stops the job before the memory limit is reached
+    mu.block_started(block_id)
+    print("%s: start processing block %i" % (str(datetime.now()), block_id))
+
+
 def log_block_success(block_id):
     print("%s: processed block %i" % (str(datetime.now()), block_id))
+    cu.mark_block_done(block_id)
+    mu.block_done(block_id)
 
 
 def log_job_success(job_id):
     print("%s: processed job %i" % (str(datetime.now()), job_id))
+    cu.mark_job_done(job_id)
+    ru.record_job_resources(job_id)
+    mu.stop_watchdog()
+
+
+def load_job_config(config_path):
+    """ Load the job config, which is passed in memory if the job is run in-process.
+
+    Starts the memory watchdog if it is enabled for the task and records the peak memory
+    at exit if requested by the task.
+    """
+    config = ju.load_job_config(config_path)
+    mu.start_watchdog(config)
+    ru.record_peak_rss_at_exit(config)
+    return config
 
 
 # pythonic implementation of
 # tail -<n_lines> <path>
-def tail(path, n_lines):
-    out = []
-    with open(path, "r") as f:
-        for i, line in enumerate(reversed(list(f)), 1):
-            out.append(line.rstrip())
-            if i == n_lines:
-                break
-    return out[::-1]
+# we read chunks from the end of the file, so that we don't need to load the full file
+def tail(path, n_lines, chunk_size=4096):
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # we need one more line break than lines, because the first line may be incomplete
+        while pos > 0 and data.count(b"\n") <= n_lines:
+            read_size = min(chunk_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            data = f.read(read_size) + data
+    # drop the incomplete first line, it could start within a multi-byte character
+    if pos > 0:
+        data = data[data.index(b"\n") + 1:]
+    lines = data.decode().splitlines()
+    return [line.rstrip() for line in lines[-n_lines:]]
@@ -0,0 +1,46 @@
+import threading
+
+
+class BlockCache:
+    """ Write-through wrapper around a dataset for fused tasks.
+
+    Fused tasks run the block functions of several tasks in sequence within one job.
+    The blocks written by one stage are stored in the dataset and kept in memory,
+    so that the next stage can read them without loading them from disk again.
+    A cached block is released when it is read, so the cache only holds
+    the blocks that are currently processed.
+    """
+    def __init__(self, ds):
+        self._ds = ds
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    # forward everything else (shape, dtype, attrs, ...) to the dataset
+    def __getattr__(self, name):
+        return getattr(self._ds, name)
+
+    @staticmethod
+    def _key(bb):
+        if not isinstance(bb, tuple) or not all(isinstance(b, slice) for b in bb):
+            return None
+        return tuple((b.start, b.stop, b.step) for b in bb)
+
+    def __setitem__(self, bb, data):
+        self._ds[bb] = data
+        key = self._key(bb)
+        if key is not None:
+            with self._lock:
+                self._cache[key] = data
+
+    def __getitem__(self, bb):
+        key = self._key(bb)
+        if key is not None:
+            with self._lock:
+                data = self._cache.pop(key, None)
+            if data is not None:
+                return data
+        return self._ds[bb]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+from .manifest_utils import resolve_block_list
+
+# cache of the loaded job configs
+_job_configs = {}
+# configs of the jobs that are run in-process, passed in memory instead of via the config file
+_in_memory_configs = {}
+
+
+def load_job_config(config_path):
+    """ Load the config of a job.
+
+    Returns the config passed in memory if the job is run in-process (executor target),
+    otherwise reads it from the config file. If the blocks of the job are stored in a block manifest,
+    they are loaded from it into the `block_list`.
+    """
+    if config_path in _in_memory_configs:
+        return _in_memory_configs[config_path]
+    with open(config_path) as f:
+        config = json.load(f)
+    return resolve_block_list(config) if isinstance(config, dict) else config
+
+
+@contextmanager
+def in_memory_job_config(config_path, config):
+    """ Make the config of a job that is run in-process available under its config path.
+
+    Sets the command line arguments like for a job script, so that
+    the job running in this process can be found via `current_job_config`.
+    """
+    argv = sys.argv
+    sys.argv = [argv[0] if argv else "", config_path]
+    _in_memory_configs[config_path] = config
+    try:
+        yield
+    finally:
+        sys.argv = argv
+        _in_memory_configs.pop(config_path, None)
+        _job_configs.pop(config_path, None)
+
+
+def current_job_config_path():
+    """ Get the path to the config of the job running in this process.
+
+    The job config is passed as first argument to all job scripts.
+    Returns None if this process does not run a job.
+    """
+    if len(sys.argv) < 2:
+        return None
+    if sys.argv[1] in _in_memory_configs or os.path.isfile(sys.argv[1]):
+        return sys.argv[1]
+    return None
+
+
+def current_job_config():
+    """ Get the config of the job running in this process, empty if this process does not run a job.
+    """
+    config_path = current_job_config_path()
+    if config_path is None:
+        return {}
+    if config_path not in _job_configs:
+        try:
+            config = load_job_config(config_path)
+        except (ValueError, UnicodeDecodeError):
+            config = {}
+        _job_configs[config_path] = config if isinstance(config, dict) else {}
+    return _job_configs[config_path]
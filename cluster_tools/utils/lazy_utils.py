@@ -0,0 +1,31 @@
+import importlib
+import sys
+
+
+def lazy_exports(package, exports):
+    """ Export the names of the sub-modules of a package lazily.
+
+    The sub-modules are only imported when one of their names is accessed, so that
+    importing a module from the package (e.g. a job script) does not import all workflows
+    and their dependencies. Sets `__all__` of the package to the exported names, so that they
+    are imported by `from package import *`. Returns the module level `__getattr__` and `__dir__` (PEP 562).
+
+    Arguments:
+        package [str] - name of the package, i.e. `__name__` of its `__init__`
+        exports [dict] - the exported names for each relative sub-module name
+    """
+    submodules = {name: submodule for submodule, names in exports.items() for name in names}
+    sys.modules[package].__all__ = list(submodules)
+
+    def __getattr__(name):
+        if name not in submodules:
+            raise AttributeError("module %r has no attribute %r" % (package, name))
+        value = getattr(importlib.import_module(submodules[name], package), name)
+        # cache the value, so that __getattr__ is only called once per name
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(submodules))
+
+    return __getattr__, __dir__
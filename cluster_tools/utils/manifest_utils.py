@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+
+#
+# binary manifests for the blocks of the jobs and for per-block metadata
+#
+# The block lists of all jobs of a task are stored in a single .npy file that the jobs memory-map
+# and slice, the job configs only hold the path and the range of their blocks in the manifest.
+# This avoids writing and parsing large json configs for tasks with many blocks.
+#
+
+# the manifest is written next to the job configs
+MANIFEST_EXT = ".blocks.npy"
+
+
+def is_block_list(block_list):
+    """ Can the block list be stored in a manifest, i.e. does it only contain integer ids?
+    """
+    return all(isinstance(block_id, (int, np.integer)) and not isinstance(block_id, bool)
+               for block_id in block_list)
+
+
+def write_manifest(path, job_blocks):
+    """ Write the block lists of the jobs to the manifest.
+
+    Arguments:
+        path [str] - path to the manifest
+        job_blocks [list[list[int]]] - the block lists of the jobs
+    Returns:
+        list[list[int]] - the range `[start, stop]` of the blocks of each job in the manifest
+    """
+    sizes = [len(blocks) for blocks in job_blocks]
+    offsets = np.concatenate([[0], np.cumsum(sizes, dtype="int64")]).tolist()
+    blocks = np.concatenate([np.array(blocks, dtype="int64") for blocks in job_blocks]) if job_blocks else\
+        np.zeros(0, dtype="int64")
+    np.save(path, blocks)
+    return [[start, stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def load_job_blocks(path, block_range):
+    """ Load the blocks of a job from the manifest; only the range of the job is read.
+    """
+    start, stop = block_range
+    return np.load(path, mmap_mode="r")[start:stop].tolist()
+
+
+def resolve_block_list(config):
+    """ Replace the manifest in the job config by the block list of the job.
+    """
+    if "block_manifest" not in config:
+        return config
+    config = dict(config)
+    config["block_list"] = load_job_blocks(config.pop("block_manifest"), config.pop("block_range"))
+    return config
+
+
+#
+# label offsets per block, e.g. to make the ids of a blockwise segmentation unique
+#
+
+class _MappedOffsets:
+    # the offsets of the blocks, given the cumulative offsets
+    def __init__(self, offsets):
+        self._offsets = offsets
+
+    def __getitem__(self, block_id):
+        return int(self._offsets[block_id])
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class _MappedEmptyBlocks:
+    # the blocks without labels, given the cumulative offsets
+    def __init__(self, offsets):
+        self._offsets = offsets
+
+    def __contains__(self, block_id):
+        return self._offsets[block_id] == self._offsets[block_id + 1]
+
+
+def save_block_offsets(path, offsets, n_labels):
+    """ Save the label offsets of the blocks in the binary format.
+
+    The .npy file contains the offsets of the blocks followed by the number of labels,
+    the blocks without labels (with the same offset as the next block) are empty.
+    """
+    np.save(path, np.array(list(offsets) + [n_labels], dtype="uint64"))
+
+
+def load_block_offsets(path):
+    """ Load the label offsets of the blocks.
+
+    Supports the json format with `offsets`, `empty_blocks` and `n_labels` and the binary format
+    written by `save_block_offsets` (.npy). The binary format is memory-mapped, so that
+    only the offsets of the blocks that are accessed are read.
+    Returns:
+        the offsets indexed by the block id
+        the empty blocks, supports `block_id in empty_blocks`
+        int - the number of labels
+    """
+    if os.path.splitext(path)[1] == ".npy":
+        offsets = np.load(path, mmap_mode="r")
+        return _MappedOffsets(offsets), _MappedEmptyBlocks(offsets), int(offsets[-1])
+    with open(path) as f:
+        offset_config = json.load(f)
+    return offset_config["offsets"], set(offset_config["empty_blocks"]), offset_config["n_labels"]
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from .job_utils import current_job_config_path
+from .resource_utils import _peak_rss_mb, record_peak_rss
+from .telemetry_utils import _percentile
+
+# the peak memory per block is written to a sidecar file next to the job config
+MEMORY_EXT = ".memory.jsonl"
+
+# the watchdog of the job running in this process
+_watchdog = None
+
+
+def get_memory_path(config_path):
+    return os.path.splitext(config_path)[0] + MEMORY_EXT
+
+
+def current_rss_mb():
+    """ Get the current memory (resident set size) of this process in MB.
+
+    Falls back to the peak memory if the current memory is not available (only on linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            n_pages = int(f.read().split()[1])
+        return n_pages * os.sysconf("SC_PAGE_SIZE") / 1024. ** 2
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _log(msg):
+    # flush, so that the message is in the log even if the job is killed afterwards
+    print("%s: %s" % (str(datetime.now()), msg), flush=True)
+
+
+class MemoryWatchdog(threading.Thread):
+    """ Background thread that samples the memory of the job.
+
+    Records the peak memory of each block, from `log_block_start` to `log_block_success`,
+    to the memory sidecar of the job. If the memory exceeds `warn_fraction` of the `mem_limit`
+    a warning is logged, if it exceeds `stop_fraction` the job stops before starting the next block,
+    so that the blocks that were processed are recorded correctly for the retry. The blocks
+    processed in parallel by the threads of a job share the memory of the process.
+    """
+    def __init__(self, config_path, mem_limit=None, interval=1., warn_fraction=0.8, stop_fraction=0.95):
+        super().__init__(daemon=True)
+        self.path = get_memory_path(config_path)
+        self.interval = interval
+        # the mem limit is given in GB
+        has_limit = isinstance(mem_limit, (int, float))
+        self.warn_mb = 1024. * mem_limit * warn_fraction if has_limit and warn_fraction is not None else None
+        self.stop_mb = 1024. * mem_limit * stop_fraction if has_limit and stop_fraction is not None else None
+        self.stop_message = None
+        self._blocks = {}
+        self._warned = False
+        self._recorded_peak = 0.
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def sample(self):
+        rss = current_rss_mb()
+        with self._lock:
+            for block in self._blocks.values():
+                block["peak_rss_mb"] = max(block["peak_rss_mb"], rss)
+        if self.warn_mb is not None and rss >= self.warn_mb and not self._warned:
+            self._warned = True
+            _log("WARNING: memory usage of %.1f MB is close to the memory limit" % rss)
+        if self.stop_mb is not None and rss >= self.stop_mb and self.stop_message is None:
+            self.stop_message = "memory usage of %.1f MB exceeds %.1f MB, stop before the memory limit is reached" % (
+                rss, self.stop_mb)
+            _log("WARNING: %s" % self.stop_message)
+        # update the peak memory record, so that it is available if the job is killed
+        if rss > 1.1 * self._recorded_peak:
+            self._recorded_peak = rss
+            record_peak_rss()
+        return rss
+
+    def run(self):
+        while not self._finished.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._finished.set()
+
+    def block_started(self, block_id):
+        rss = self.sample()
+        if self.stop_message is not None:
+            raise MemoryError(self.stop_message)
+        with self._lock:
+            self._blocks[block_id] = {"block_id": int(block_id), "start_rss_mb": rss, "peak_rss_mb": rss}
+
+    def block_done(self, block_id):
+        self.sample()
+        with self._lock:
+            block = self._blocks.pop(block_id, None)
+            if block is None:
+                return
+            # we open the file in append mode for each block, so that the records are kept if the job is killed
+            with open(self.path, "a") as f:
+                f.write(json.dumps(block) + "\n")
+
+
+def start_watchdog(config):
+    """ Start the memory watchdog for the job running in this process, if enabled for the task.
+    """
+    global _watchdog
+    if not config.get("memory_watchdog", False):
+        return
+    config_path = current_job_config_path()
+    if config_path is None:
+        return
+    stop_watchdog()
+    _watchdog = MemoryWatchdog(config_path, config.get("mem_limit", None),
+                               interval=config.get("memory_watchdog_interval", 1.),
+                               warn_fraction=config.get("memory_warn_fraction", 0.8),
+                               stop_fraction=config.get("memory_stop_fraction", 0.95))
+    _watchdog.start()
+
+
+def stop_watchdog():
+    """ Stop the memory watchdog; for jobs that are run in a persistent worker process.
+    """
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+
+
+def block_started(block_id):
+    """ Start recording the memory of the block; raises a `MemoryError` if the job should stop.
+    """
+    if _watchdog is not None:
+        _watchdog.block_started(block_id)
+
+
+def block_done(block_id):
+    if _watchdog is not None:
+        _watchdog.block_done(block_id)
+
+
+#
+# functionality to aggregate the peak memory per block in the tasks
+#
+
+def load_block_memory(paths):
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                # the last line may be incomplete if the job was killed
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def summarize_block_memory(records):
+    """ Summarize the peak memory per block of a task.
+
+    Reports the percentiles of the peak memory of the jobs while processing the blocks and
+    of the memory increase during the blocks, which estimates the memory needed per block.
+    """
+    if not records:
+        return {"n_blocks": 0}
+    peaks = [rec["peak_rss_mb"] for rec in records]
+    increases = [rec["peak_rss_mb"] - rec["start_rss_mb"] for rec in records]
+    largest = max(records, key=lambda rec: rec["peak_rss_mb"] - rec["start_rss_mb"])
+    return {"n_blocks": len(records),
+            "peak_rss_mb": {"p%i" % q: _percentile(peaks, q) for q in (50, 95, 100)},
+            "block_increase_mb": {"p%i" % q: _percentile(increases, q) for q in (50, 95, 100)},
+            "largest_block": largest["block_id"]}
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from .job_utils import current_job_config, current_job_config_path
+
+# the block statistics recorded by a job are written to a sidecar file next to the job config
+OCCUPANCY_EXT = ".occupancy.jsonl"
+
+# the threads of a job share the sidecar file
+_lock = threading.Lock()
+
+
+#
+# the occupancy index of a dataset
+#
+# For each block of the dataset (for a given block shape) the index stores whether the block
+# contains non-zero values (`occupied`) and the minimal and maximal value of the block (`min`, `max`),
+# the maximal value is the maximal id for label data. The entries are only valid for the blocks that are `known`.
+#
+
+def _dataset_prefix(path, key):
+    name = "%s:%s" % (os.path.abspath(path), key)
+    return "occupancy_%s_" % hashlib.sha1(name.encode()).hexdigest()[:16]
+
+
+def get_index_path(index_folder, path, key, block_shape):
+    """ Get the path of the occupancy index of the dataset for the given block shape.
+    """
+    return os.path.join(index_folder, _dataset_prefix(path, key) + "x".join(map(str, block_shape)) + ".npz")
+
+
+def _blocks_per_axis(shape, block_shape):
+    return [(sh + bs - 1) // bs for sh, bs in zip(shape, block_shape)]
+
+
+def empty_index(shape, block_shape):
+    n_blocks = int(np.prod(_blocks_per_axis(shape, block_shape)))
+    return {"shape": np.array(shape, dtype="int64"), "block_shape": np.array(block_shape, dtype="int64"),
+            "known": np.zeros(n_blocks, dtype="bool"), "occupied": np.ones(n_blocks, dtype="bool"),
+            "min": np.zeros(n_blocks, dtype="float64"), "max": np.zeros(n_blocks, dtype="float64")}
+
+
+def load_index(index_path):
+    """ Load the occupancy index, returns None if it does not exist.
+    """
+    if index_path is None or not os.path.exists(index_path):
+        return None
+    with np.load(index_path) as f:
+        return {name: f[name] for name in f.files}
+
+
+def save_index(index_path, index):
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    # write to a temporary file first, so that the index is never read half-written
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, **index)
+    os.replace(tmp_path, index_path)
+
+
+def remove_indices(index_folder, path, key):
+    """ Remove the occupancy indices of the dataset for all block shapes.
+    """
+    if not os.path.exists(index_folder):
+        return
+    prefix = _dataset_prefix(path, key)
+    for name in os.listdir(index_folder):
+        if name.startswith(prefix):
+            os.remove(os.path.join(index_folder, name))
+
+
+def _existing_chunks(path, key, ndim):
+    # find the chunks that exist on the filesystem for n5 and zarr (v2) datasets;
+    # returns None if the existing chunks cannot be determined, e.g. for hdf5
+    ds_path = os.path.join(path, key)
+    if os.path.exists(os.path.join(ds_path, "attributes.json")):
+        # n5 stores the chunks as nested directories with the axes in reversed order
+        separator, reverse = "/", True
+    elif os.path.exists(os.path.join(ds_path, ".zarray")):
+        with open(os.path.join(ds_path, ".zarray")) as f:
+            separator = json.load(f).get("dimension_separator", ".")
+        reverse = False
+    else:
+        return None
+
+    chunks = []
+    for root, _, files in os.walk(ds_path):
+        rel = os.path.relpath(root, ds_path)
+        prefix = [] if rel == "." else rel.split(os.sep)
+        for name in files:
+            parts = prefix + [name] if separator == "/" else prefix + name.split(".")
+            if len(parts) != ndim or not all(part.isdigit() for part in parts):
+                continue
+            chunk_id = tuple(int(part) for part in parts)
+            chunks.append(chunk_id[::-1] if reverse else chunk_id)
+    return chunks
+
+
+def derive_index(path, key, shape, chunks, block_shape):
+    """ Derive the occupancy index from the chunks that exist on the filesystem.
+
+    The chunks that do not exist are filled with zeros, so the blocks that do not
+    overlap with any existing chunk are known to be empty. The blocks that overlap with
+    existing chunks may still be empty and are not known. Only supported for n5 and zarr,
+    returns None for other formats.
+    """
+    ndim = len(shape)
+    existing = _existing_chunks(path, key, ndim)
+    if existing is None:
+        return None
+    chunk_grid = np.zeros(_blocks_per_axis(shape, chunks), dtype="bool")
+    if existing:
+        existing = np.array(existing, dtype="int64")
+        in_grid = (existing < np.array(chunk_grid.shape)[None]).all(axis=1)
+        chunk_grid[tuple(existing[in_grid].T)] = True
+
+    index = empty_index(shape, block_shape)
+    blocks_per_axis = _blocks_per_axis(shape, block_shape)
+    # the block ids follow the (C-order) blocking used in `vu.blocks_in_volume`
+    for block_id, block_pos in enumerate(np.ndindex(*blocks_per_axis)):
+        begin = [pos * bs for pos, bs in zip(block_pos, block_shape)]
+        end = [min(beg + bs, sh) for beg, bs, sh in zip(begin, block_shape, shape)]
+        bb = tuple(slice(beg // ch, (e - 1) // ch + 1) for beg, e, ch in zip(begin, end, chunks))
+        if not chunk_grid[bb].any():
+            index["known"][block_id] = True
+            index["occupied"][block_id] = False
+    return index
+
+
+def empty_blocks(index, block_list):
+    """ Get the blocks in the block list that are known to be empty.
+    """
+    block_list = np.array(block_list, dtype="int64")
+    if block_list.size == 0:
+        return []
+    empty = index["known"][block_list] & ~index["occupied"][block_list]
+    return block_list[empty].tolist()
+
+
+#
+# functionality to record the block statistics in the jobs
+#
+
+def get_occupancy_path(config_path):
+    return os.path.splitext(config_path)[0] + OCCUPANCY_EXT
+
+
+def record_block(block_id, data):
+    """ Record the occupancy and value range of a block written by the job running in this process.
+
+    Only recorded if the occupancy index of the task output is kept.
+    """
+    if not current_job_config().get("occupancy_record", False):
+        return
+    occupied = bool(np.any(data != 0))
+    record = {"block_id": int(block_id), "occupied": occupied,
+              "min": float(data.min()) if data.size else 0., "max": float(data.max()) if data.size else 0.}
+    line = json.dumps(record) + "\n"
+    with _lock:
+        # we append for each block, so that the records are kept if the job is killed
+        with open(get_occupancy_path(current_job_config_path()), "a") as f:
+            f.write(line)
+
+
+def load_records(paths):
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                # the last line may be incomplete if the job was killed
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def update_index(index, records):
+    """ Update the occupancy index with the block statistics recorded by the jobs.
+    """
+    for record in records:
+        block_id = record["block_id"]
+        index["known"][block_id] = True
+        index["occupied"][block_id] = record["occupied"]
+        index["min"][block_id] = record["min"]
+        index["max"][block_id] = record["max"]
+    return index
@@ -61,6 +61,53 @@ def parse_runtime_task(log_prefix, max_jobs, return_summary=True):
         return runtimes
 
 
+def _parse_log_line(line):
+    """ Split a log line into its datetime and message
+    """
+    parts = line.split()
+    if len(parts) < 3:
+        return None, None
+    try:
+        date = datetime.datetime.fromisoformat(" ".join(parts[:2]).rstrip(":"))
+    except ValueError:
+        return None, None
+    return date, " ".join(parts[2:])
+
+
+def parse_block_runtimes(log_file):
+    """ Parse the run-times of the blocks processed in a job from a log-file
+
+    Only blocks for which the job logged "start processing block" are taken into account.
+    """
+    start_times, runtimes = {}, {}
+    with open(log_file, 'r') as f:
+        for line in f:
+            date, msg = _parse_log_line(line)
+            if msg is None:
+                continue
+            if msg.startswith('start processing block'):
+                start_times[int(msg.split()[-1])] = date
+            elif msg.startswith('processed block'):
+                block_id = int(msg.split()[-1])
+                if block_id in start_times:
+                    runtimes[block_id] = (date - start_times[block_id]).total_seconds()
+    return runtimes
+
+
+def parse_block_runtimes_task(log_prefix, max_jobs):
+    """ Parse the run-times of all processed blocks for the jobs of a task.
+
+    The result can be saved as json and used as `block_weights_path` in the global config.
+    """
+    runtimes = {}
+    for job_id in range(max_jobs):
+        log_file = log_prefix + '%i.log' % job_id
+        if not os.path.exists(log_file):
+            continue
+        runtimes.update(parse_block_runtimes(log_file))
+    return runtimes
+
+
 # TODO
 def parse_runtime_segmentation_workflow():
     pass
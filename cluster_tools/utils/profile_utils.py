@@ -0,0 +1,41 @@
+import cProfile
+import os
+import pstats
+import runpy
+
+# the job profiles are written to the log folder
+PROFILE_EXT = ".prof"
+
+
+def get_profile_path(config_path):
+    """ Get the profile path for a job, e.g. 'tmp/logs/watershed_job_0.prof' for 'tmp/watershed_job_0.config'.
+    """
+    folder, name = os.path.split(config_path)
+    return os.path.join(folder, "logs", os.path.splitext(name)[0] + PROFILE_EXT)
+
+
+def run_profiled(script_path, config_path):
+    """ Run the job script as `__main__` under cProfile and save the profile next to the job log.
+    """
+    profile_path = get_profile_path(config_path)
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(runpy.run_path, script_path, run_name="__main__")
+    # we also save the profile if the job fails
+    finally:
+        profiler.dump_stats(profile_path)
+
+
+def merge_profiles(paths, out_path):
+    """ Merge the job profiles into a single stats file.
+
+    The stats file can be inspected with `pstats` or converted to a flame-graph with
+    tools like snakeviz, flameprof or gprof2dot.
+    """
+    if not paths:
+        return False
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+    stats.dump_stats(out_path)
+    return True
@@ -0,0 +1,139 @@
+import json
+import os
+
+import numpy as np
+
+#
+# hierarchical (tree) reduction of partial results
+#
+# The partial results of the jobs of a task are merged by `fan_in` at a time in a tree of reduce levels,
+# each level is run as a set of jobs, see `BaseClusterTask.tree_reduce`. The final job of the merge task
+# then only needs to merge the (at most `fan_in`) partial results of the last level.
+#
+
+
+def merge_uniques(partials):
+    """ Merge sorted arrays of unique values.
+    """
+    return np.unique(np.concatenate(partials))
+
+
+def merge_counts(partials):
+    """ Merge arrays of shape (n, 2) with values and counts, the counts of the same values are summed.
+    """
+    partials = np.concatenate(partials, axis=0)
+    values, inverse = np.unique(partials[:, 0], return_inverse=True)
+    counts = np.zeros(len(values), dtype="uint64")
+    np.add.at(counts, inverse.ravel(), partials[:, 1].astype("uint64"))
+    return np.concatenate([values[:, None], counts[:, None]], axis=1).astype("uint64")
+
+
+def merge_union_find(partials):
+    """ Merge arrays of shape (n, 2) with pairs of ids that belong to the same component.
+
+    Returns the pairs of (id, representative) for all ids in the pairs,
+    the representative is the smallest id of the component.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    pairs = np.concatenate([np.asarray(partial, dtype="uint64").reshape((-1, 2)) for partial in partials], axis=0)
+    if len(pairs) == 0:
+        return np.zeros((0, 2), dtype="uint64")
+    ids, pairs = np.unique(pairs, return_inverse=True)
+    pairs = pairs.reshape((-1, 2))
+    n_ids = len(ids)
+    graph = coo_matrix((np.ones(len(pairs), dtype="uint8"), (pairs[:, 0], pairs[:, 1])), shape=(n_ids, n_ids))
+    _, components = connected_components(graph, directed=False)
+    # the ids are sorted, so the first id of each component is the smallest one
+    representatives = np.full(components.max() + 1, n_ids, dtype="int64")
+    np.minimum.at(representatives, components, np.arange(n_ids))
+    return np.concatenate([ids[:, None], ids[representatives[components]][:, None]], axis=1).astype("uint64")
+
+
+def merge_moments(partials):
+    """ Merge statistics with `size`, `mean`, `variance`, `min` and `max`, see `block_statistics.merge_stats`.
+    """
+    from ..statistics.jobs.block_statistics import merge_stats
+    # the merged statistics are saved as json
+    return {key: float(val) for key, val in merge_stats(partials).items()}
+
+
+def _load_npy(path):
+    # a partial result can be given by several files that are concatenated column-wise,
+    # e.g. the uniques and counts written by `find_uniques`
+    if isinstance(path, (list, tuple)):
+        return np.concatenate([np.load(pp).reshape((-1, 1)) for pp in path], axis=1)
+    return np.load(path)
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+# reducer name -> (merge function, load function, save function, file extension)
+REDUCERS = {
+    "unique": (merge_uniques, _load_npy, np.save, ".npy"),
+    "counts": (merge_counts, _load_npy, np.save, ".npy"),
+    "union_find": (merge_union_find, _load_npy, np.save, ".npy"),
+    "moments": (merge_moments, _load_json, _save_json, ".json"),
+}
+
+
+def _exists(path):
+    return all(os.path.exists(pp) for pp in path) if isinstance(path, (list, tuple)) else os.path.exists(path)
+
+
+def load_partials(reducer, paths, allow_missing=False):
+    """ Load the partial results.
+
+    Raises an error for paths that don't exist, unless `allow_missing` is set, in which case they are skipped.
+    """
+    if not allow_missing:
+        missing = [path for path in paths if not _exists(path)]
+        if missing:
+            raise FileNotFoundError("Missing %i partial results: %s" % (len(missing), ", ".join(map(str, missing))))
+    load = REDUCERS[reducer][1]
+    return [load(path) for path in paths if _exists(path)]
+
+
+def reduce_partials(reducer, paths, allow_missing=False):
+    """ Load and merge the partial results, returns None if none of them exists and `allow_missing` is set.
+    """
+    partials = load_partials(reducer, paths, allow_missing)
+    if not partials:
+        return None
+    return REDUCERS[reducer][0](partials)
+
+
+def plan_level(paths, fan_in):
+    """ Group the paths into groups of at most `fan_in` paths.
+    """
+    return [paths[i:i + fan_in] for i in range(0, len(paths), fan_in)]
+
+
+def level_output_path(tmp_folder, task_name, reducer, level, group_id):
+    return os.path.join(tmp_folder, "%s_reduce_level%i_%i%s" % (task_name, level, group_id, REDUCERS[reducer][3]))
+
+
+def is_reduce_job(config):
+    return "reduce_groups" in config
+
+
+def run_reduce_job(config):
+    """ Merge the groups of partial results assigned to this job, for a level of the reduction tree.
+    """
+    reducer = config["reducer"]
+    save = REDUCERS[reducer][2]
+    # if partial results may be missing, a group without any of them has no output,
+    # which is skipped in the next level as well
+    allow_missing = config.get("reduce_allow_missing", False)
+    for group_id in config["block_list"]:
+        merged = reduce_partials(reducer, config["reduce_groups"][group_id], allow_missing)
+        if merged is not None:
+            save(config["reduce_outputs"][group_id], merged)
@@ -0,0 +1,196 @@
+import atexit
+import json
+import math
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+from .job_utils import current_job_config, current_job_config_path
+from .telemetry_utils import _percentile
+
+# the resources of a job are written to a sidecar file next to the job config
+RESOURCES_EXT = ".resources.json"
+# the resources that can be set to "auto" in the task config
+AUTO_RESOURCES = ("time_limit", "mem_limit", "threads_per_job")
+# the peak memory of a job is written to a sidecar file when the job exits, also if it has failed
+PEAK_RSS_EXT = ".peak_rss.json"
+# messages in the job logs that indicate that the job ran out of memory: python, the linux oom-killer,
+# slurm and lsf; jobs that are killed by `LocalTask` or the kernel without a message are logged as oom-killed
+OOM_MESSAGES = ("MemoryError", "oom-kill", "Out of memory", "OUT_OF_MEMORY",
+                "Exceeded job memory limit", "TERM_MEMLIMIT")
+
+# start time and cpu time at the start of the job running in this process
+_job_start = time.time()
+_job_cpu_start = 0.
+# is the peak memory recorded at exit of this process?
+_peak_rss_at_exit = False
+
+
+def get_resources_path(config_path):
+    return os.path.splitext(config_path)[0] + RESOURCES_EXT
+
+
+def start_job():
+    """ Reset the job start time and cpu time; for jobs that are run in a persistent worker process.
+    """
+    global _job_start, _job_cpu_start
+    _job_start = time.time()
+    _job_cpu_start = _cpu_time()
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux and in bytes on mac
+    scale = 1. / 1024 ** 2 if sys.platform == "darwin" else 1. / 1024
+    return scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _cpu_time():
+    return sum(ru.ru_utime + ru.ru_stime for ru in (resource.getrusage(resource.RUSAGE_SELF),
+                                                    resource.getrusage(resource.RUSAGE_CHILDREN)))
+
+
+def record_job_resources(job_id):
+    """ Record the runtime, cpu time and peak memory of the job running in this process.
+
+    Only written if the resources are recorded for the task. Note that the peak memory of a job
+    that is run in a persistent worker process is the peak memory of the worker.
+    """
+    config = current_job_config()
+    if not config.get("record_resources", False):
+        return
+    block_list = config.get("block_list", None)
+    record = {"job_id": int(job_id), "runtime_s": time.time() - _job_start, "cpu_s": _cpu_time() - _job_cpu_start,
+              "peak_rss_mb": _peak_rss_mb(), "threads_per_job": config.get("threads_per_job", 1),
+              "n_blocks": None if block_list is None else len(block_list)}
+    with open(get_resources_path(current_job_config_path()), "w") as f:
+        json.dump(record, f)
+
+
+def get_peak_rss_path(config_path):
+    return os.path.splitext(config_path)[0] + PEAK_RSS_EXT
+
+
+def record_peak_rss():
+    """ Record the peak memory of the job running in this process.
+
+    Only written if requested by the task (`record_peak_rss`), which uses it to detect jobs that ran
+    out of memory. Called at exit of the job scripts and after the jobs run in a persistent worker.
+    """
+    config_path = current_job_config_path()
+    if config_path is None or not current_job_config().get("record_peak_rss", False):
+        return
+    with open(get_peak_rss_path(config_path), "w") as f:
+        json.dump({"peak_rss_mb": _peak_rss_mb()}, f)
+
+
+def record_peak_rss_at_exit(config):
+    """ Record the peak memory when the job script exits, if requested by the task.
+
+    Called when the job loads its config, so that the peak memory is also recorded if the job fails.
+    """
+    global _peak_rss_at_exit
+    if config.get("record_peak_rss", False) and not _peak_rss_at_exit:
+        atexit.register(record_peak_rss)
+        _peak_rss_at_exit = True
+
+
+def load_peak_rss(path):
+    """ Load the recorded peak memory in MB, None if it was not recorded.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)["peak_rss_mb"]
+    except (ValueError, KeyError):
+        return None
+
+
+def is_oom_failure(state=None, log_paths=(), peak_rss_mb=None, rss_limit_mb=None):
+    """ Check if a failed job ran out of memory.
+
+    Arguments:
+        state [str] - the final state of the job reported by the scheduler (default: None)
+        log_paths [list[str]] - the logs of the job, that are checked for `OOM_MESSAGES` (default: ())
+        peak_rss_mb [float] - the recorded peak memory of the job in MB (default: None)
+        rss_limit_mb [float] - the peak memory above which the job is considered out of memory (default: None)
+    """
+    if state == "OUT_OF_MEMORY":
+        return True
+    if peak_rss_mb is not None and rss_limit_mb is not None and peak_rss_mb >= rss_limit_mb:
+        return True
+    for path in log_paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, errors="replace") as f:
+            if any(msg in line for line in f for msg in OOM_MESSAGES):
+                return True
+    return False
+
+
+#
+# functionality to keep the resource history and estimate the resources in the tasks
+#
+
+def append_history(history_path, task_name, block_shape, records):
+    """ Append the job resource records of a task to the history.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+    date = datetime.now().isoformat()
+    with open(history_path, "a") as f:
+        for record in records:
+            f.write(json.dumps({"task_name": task_name, "block_shape": list(block_shape),
+                                "date": date, **record}) + "\n")
+
+
+def load_history(history_path, task_name, block_shape, max_records=1000):
+    """ Load the most recent job records for the task and block shape.
+    """
+    if history_path is None or not os.path.exists(history_path):
+        return []
+    block_shape = list(block_shape)
+    records = []
+    with open(history_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("task_name") == task_name and record.get("block_shape") == block_shape:
+                records.append(record)
+    return records[-max_records:]
+
+
+def estimate_resources(records, blocks_per_job=None, percentile=95, margin=1.2):
+    """ Estimate the resources of a job from the history.
+
+    The memory and time limits are the given percentile of the recorded peak memory
+    and runtime times the margin. If the number of blocks per job is known, the runtime
+    is scaled from the runtime per block. The number of threads is the percentile
+    of the number of cores that were actually used. Returns an empty dict if there is no history.
+
+    Arguments:
+        records [list[dict]] - the job records for the task and block shape
+        blocks_per_job [int] - the (maximal) number of blocks per job (default: None)
+        percentile [float] - the percentile of the recorded resources (default: 95)
+        margin [float] - the factor applied to the percentile (default: 1.2)
+    Returns:
+        dict - the estimated `mem_limit` in GB, `time_limit` in minutes and `threads_per_job`
+    """
+    if not records:
+        return {}
+    mem_gb = _percentile([rec["peak_rss_mb"] / 1024. for rec in records], percentile)
+
+    per_block = [rec["runtime_s"] / rec["n_blocks"] for rec in records if rec.get("n_blocks")]
+    if blocks_per_job is not None and per_block:
+        runtime_s = _percentile(per_block, percentile) * blocks_per_job
+    else:
+        runtime_s = _percentile([rec["runtime_s"] for rec in records], percentile)
+
+    cores = _percentile([rec["cpu_s"] / rec["runtime_s"] for rec in records if rec["runtime_s"] > 0], percentile)
+    return {"mem_limit": round(mem_gb * margin, 2),
+            "time_limit": max(int(math.ceil(runtime_s * margin / 60.)), 1),
+            "threads_per_job": 1 if cores is None else max(int(math.ceil(cores)), 1)}
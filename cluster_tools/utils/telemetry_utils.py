@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from .job_utils import current_job_config, current_job_config_path
+
+# the telemetry events are written to a sidecar file next to the job config
+TELEMETRY_EXT = ".telemetry.jsonl"
+
+# the threads of a job share the sidecar file
+_lock = threading.Lock()
+
+
+def get_telemetry_path(config_path):
+    return os.path.splitext(config_path)[0] + TELEMETRY_EXT
+
+
+def _current_telemetry_path():
+    """ Get the telemetry sidecar of the job running in this process.
+
+    Returns None if telemetry was not enabled for the task.
+    """
+    if not current_job_config().get("telemetry", False):
+        return None
+    return get_telemetry_path(current_job_config_path())
+
+
+def _write_event(path, event):
+    line = json.dumps(event) + "\n"
+    with _lock:
+        # we open the file in append mode for each event,
+        # so that the events are kept if the job is killed
+        with open(path, "a") as f:
+            f.write(line)
+
+
+class BlockTelemetry:
+    """ Record the stage timings and the data volume for processing a block.
+
+    Use as context manager around the block function. The time spent in the `read` and `write`
+    stages is measured via the `stage` context or the `read` and `write` helpers,
+    the rest of the time is counted as compute. The event is only written if telemetry is
+    enabled for the task and the block was processed without error.
+    """
+    def __init__(self, block_id):
+        self.block_id = int(block_id)
+        self.stage_times = {"read": 0., "write": 0.}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._path = _current_telemetry_path()
+
+    def __enter__(self):
+        self._start_time = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        total = time.perf_counter() - self._t0
+        if self._path is None or exc_type is not None:
+            return False
+        io_time = sum(self.stage_times.values())
+        event = {"block_id": self.block_id, "start": self._start_time,
+                 "total": total, "compute": max(total - io_time, 0.),
+                 "bytes_read": self.bytes_read, "bytes_written": self.bytes_written,
+                 **self.stage_times}
+        _write_event(self._path, event)
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0.) + time.perf_counter() - t0
+
+    def read(self, ds, bb):
+        """ Read the bounding box from the dataset and record it.
+        """
+        with self.stage("read"):
+            data = ds[bb]
+        self.bytes_read += getattr(data, "nbytes", 0)
+        return data
+
+    def write(self, ds, bb, data):
+        """ Write the data to the bounding box of the dataset and record it.
+        """
+        with self.stage("write"):
+            ds[bb] = data
+        self.bytes_written += getattr(data, "nbytes", 0)
+
+
+#
+# functionality to aggregate the telemetry in the tasks
+#
+
+def find_telemetry_files(tmp_folder):
+    """ Find the telemetry files in the tmp folder and group them by job name.
+
+    The telemetry files are named like the job configs, i.e.
+    '<task_name>_job_<job_id>' or '<task_name>_job_<prefix>_<job_id>'.
+    """
+    pattern = re.compile(r"(.+)_job_(?:(.+)_)?\d+" + re.escape(TELEMETRY_EXT))
+    files = {}
+    for name in sorted(os.listdir(tmp_folder)):
+        match = pattern.fullmatch(name)
+        if match is None:
+            continue
+        task_name, prefix = match.groups()
+        job_name = task_name if prefix is None else "%s_%s" % (task_name, prefix)
+        files.setdefault(job_name, []).append(os.path.join(tmp_folder, name))
+    return files
+
+
+def load_events(paths):
+    events = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                # the last line may be incomplete if the job was killed
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    pos = (len(values) - 1) * q / 100.
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def summarize_events(events, n_slowest=10):
+    """ Summarize the block telemetry of a task.
+
+    Reports the percentiles of the block runtimes, the throughput per core
+    (the blocks are processed by a single thread each), the share of time spent in I/O
+    and the slowest blocks.
+    """
+    if not events:
+        return {"n_blocks": 0}
+    totals = [ev["total"] for ev in events]
+    total_time = sum(totals)
+    read_time = sum(ev.get("read", 0.) for ev in events)
+    write_time = sum(ev.get("write", 0.) for ev in events)
+    n_bytes = sum(ev.get("bytes_read", 0) + ev.get("bytes_written", 0) for ev in events)
+    slowest = sorted(events, key=lambda ev: ev["total"], reverse=True)[:n_slowest]
+    return {"n_blocks": len(events),
+            "total_time": total_time,
+            "percentiles": {"p%i" % q: _percentile(totals, q) for q in (50, 90, 99)},
+            "max_time": max(totals),
+            "mb_read": sum(ev.get("bytes_read", 0) for ev in events) / 1.e6,
+            "mb_written": sum(ev.get("bytes_written", 0) for ev in events) / 1.e6,
+            "mb_per_s_per_core": n_bytes / 1.e6 / total_time if total_time > 0 else None,
+            "read_share": read_time / total_time if total_time > 0 else None,
+            "write_share": write_time / total_time if total_time > 0 else None,
+            "compute_share": 1. - (read_time + write_time) / total_time if total_time > 0 else None,
+            "slowest_blocks": [{"block_id": ev["block_id"], "total": ev["total"]} for ev in slowest]}
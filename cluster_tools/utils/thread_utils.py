@@ -0,0 +1,85 @@
+import threading
+from concurrent import futures
+
+# the environment variables that control the threads of numpy / BLAS and OpenMP
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def thread_env(n_threads):
+    """ Environment variables that limit the BLAS / OpenMP threads of a job.
+
+    Need to be set before the job starts, because the thread pools are initialized on import.
+    """
+    return {var: str(int(n_threads)) for var in THREAD_ENV_VARS}
+
+
+class ThreadBudget:
+    """ Split the threads of a job between block-level parallelism, chunk I/O and BLAS / OpenMP.
+
+    The blocks are processed in parallel first, because this scales best; each block thread
+    gets the remaining threads for the chunk I/O of the datasets and for numpy / BLAS / OpenMP.
+    So a job with 8 threads and 2 blocks processes both blocks in parallel with 4 threads each,
+    a job with 8 threads and 16 blocks processes 8 blocks in parallel with 1 thread each.
+
+    Arguments:
+        n_threads [int] - number of threads of the job (`threads_per_job`)
+        n_blocks [int] - number of blocks of the job, None if not known (e.g. for the block queue)
+    """
+    def __init__(self, n_threads, n_blocks=None):
+        self.n_threads = max(int(n_threads), 1)
+        n_blocks = self.n_threads if n_blocks is None else n_blocks
+        self.block_threads = max(min(self.n_threads, n_blocks), 1)
+        self.inner_threads = max(self.n_threads // self.block_threads, 1)
+
+    @classmethod
+    def from_config(cls, config, n_blocks=None):
+        return cls(config.get("threads_per_job", 1), n_blocks)
+
+    # the inner threads are used for chunk I/O and compute, which happen one after the other
+    @property
+    def io_threads(self):
+        return self.inner_threads
+
+    @property
+    def compute_threads(self):
+        return self.inner_threads
+
+    def set_io_threads(self, *datasets):
+        """ Set the number of chunk I/O threads for datasets that support it (z5py).
+        """
+        for ds in datasets:
+            if hasattr(ds, "n_threads"):
+                ds.n_threads = self.io_threads
+
+    def limits(self):
+        """ Limit numpy / BLAS / OpenMP to the compute threads.
+        """
+        from threadpoolctl import threadpool_limits
+        return threadpool_limits(limits=self.compute_threads)
+
+    def map(self, func, items):
+        """ Apply the function to the items with `block_threads` threads.
+
+        The threads pull the items from a shared iterator, so that items from the block queue
+        are only claimed when a thread is free. Returns the results in arbitrary order.
+        """
+        items = iter(items)
+        lock = threading.Lock()
+
+        def _worker():
+            results = []
+            while True:
+                with lock:
+                    item = next(items, StopIteration)
+                if item is StopIteration:
+                    return results
+                results.append(func(item))
+
+        # the limits are process wide, so we set them once for all block threads
+        with self.limits():
+            if self.block_threads == 1:
+                return _worker()
+            with futures.ThreadPoolExecutor(self.block_threads) as tp:
+                tasks = [tp.submit(_worker) for _ in range(self.block_threads)]
+                return [res for t in tasks for res in t.result()]
@@ -2,24 +2,22 @@ import os
 import json
 from itertools import product
 
-import elf.io
 import numpy as np
-import vigra
-
-from elf.wrapper.resized_volume import ResizedVolume
-from scipy.ndimage.morphology import binary_erosion
-from nifty.tools import blocking
-from pybdv.metadata import (write_h5_metadata,
-                            write_n5_metadata,
-                            write_xml_metadata)
-from pybdv.util import get_key, relative_to_absolute_scale_factors
-
-# use vigra filters as fallback if we don't have
-# fastfilters available
-try:
-    import fastfilters as ff
-except ImportError:
-    import vigra.filters as ff
+
+# NOTE the heavy dependencies (elf, vigra, nifty, scipy, pybdv, fastfilters) are imported
+# in the functions that need them, because this module is imported by all job scripts
+# and most jobs only need a few of them. This reduces the start-up time of the jobs.
+
+
+def _filter_module():
+    # use vigra filters as fallback if we don't have
+    # fastfilters available
+    try:
+        import fastfilters as ff
+    except ImportError:
+        import vigra.filters as ff
+    return ff
+
 
 AXES_TYPE_DICT = {
     "x": "space",
@@ -31,6 +29,7 @@ AXES_TYPE_DICT = {
 
 
 def file_reader(path, mode="a", **kwargs):
+    import elf.io
     return elf.io.open_file(path, mode=mode, **kwargs)
 
 
@@ -42,7 +41,13 @@ def get_shape(path, key):
 
 def blocks_in_volume(shape, block_shape,
                      roi_begin=None, roi_end=None,
-                     block_list_path=None, return_blocking=False):
+                     block_list_path=None, return_blocking=False,
+                     occupancy_index=None):
+    """ Get the ids of the blocks in the volume, restricted to the roi and the blocks in the block list path.
+
+    If the path to an occupancy index (see `occupancy_utils`) is given,
+    the blocks that are known to be empty are dropped.
+    """
     assert len(shape) == len(block_shape), "%i; %i" % (len(shape), len(block_shape))
     assert (roi_begin is None) == (roi_end is None)
     have_roi = roi_begin is not None
@@ -51,15 +56,18 @@ def blocks_in_volume(shape, block_shape,
         assert os.path.exists(block_list_path),\
             "Was given block_list_path %s that doesn't exist" % block_list_path
 
+    from nifty.tools import blocking
     blocking_ = blocking([0] * len(shape), list(shape), list(block_shape))
 
     # we don't have a roi and don't have a block_list_path
     # -> return all block_ids
     if not have_roi and not block_list_path:
+        block_list = list(range(blocking_.numberOfBlocks))
+        block_list = _drop_empty_blocks(block_list, occupancy_index, shape, block_shape)
         if return_blocking:
-            return list(range(blocking_.numberOfBlocks)), blocking_
+            return block_list, blocking_
         else:
-            return list(range(blocking_.numberOfBlocks))
+            return block_list
 
     # if we have a roi load the blocks in roi
     if have_roi:
@@ -80,12 +88,25 @@ def blocks_in_volume(shape, block_shape,
         else:
             block_list = list_from_path
 
+    block_list = _drop_empty_blocks(block_list, occupancy_index, shape, block_shape)
     if return_blocking:
         return block_list, blocking_
     else:
         return block_list
 
 
+def _drop_empty_blocks(block_list, occupancy_index, shape, block_shape):
+    if occupancy_index is None:
+        return block_list
+    from .occupancy_utils import load_index, empty_blocks
+    index = load_index(occupancy_index)
+    # the index is only valid for the same shape and blocking
+    if index is None or index["shape"].tolist() != list(shape) or index["block_shape"].tolist() != list(block_shape):
+        return block_list
+    empty = set(empty_blocks(index, block_list))
+    return [block_id for block_id in block_list if block_id not in empty]
+
+
 def block_to_bb(block):
     return tuple(slice(beg, end) for beg, end in zip(block.begin, block.end))
 
@@ -93,6 +114,8 @@ def block_to_bb(block):
 def apply_filter(input_, filter_name, sigma, apply_in_2d=False):
     if filter_name == "identity":
         return input_
+    import vigra
+    ff = _filter_module()
     # apply 3d filter with anisotropic sigma - only supported in vigra
     if isinstance(sigma, (tuple, list)):
         assert len(sigma) == input_.ndim
@@ -196,10 +219,33 @@ def load_mask(mask_path, mask_key, shape):
     else:
         with file_reader(mask_path, "r") as f_mask:
             mask = f_mask[mask_key][:].astype("bool")
+        from elf.wrapper.resized_volume import ResizedVolume
         mask = ResizedVolume(mask, shape=shape, order=0)
     return mask
 
 
+def mask_block_weights(mask_path, mask_key, shape, blocking, block_list, min_weight=0.01):
+    """ Compute block weights from the mask occupancy, e.g. to balance the blocks per job.
+
+    The mask is read at its stored resolution, so a down-sampled mask is cheap to evaluate.
+    Note that the blocks are read one after the other in the calling process (the scheduler for the tasks),
+    so a full-resolution mask is read completely before the jobs are submitted.
+    Blocks outside of the mask get `min_weight`, because they still need to be loaded.
+    """
+    with file_reader(mask_path, "r") as f:
+        ds = f[mask_key]
+        mshape = ds.shape
+        scale = [msh / sh for msh, sh in zip(mshape, shape)]
+        weights = {}
+        for block_id in block_list:
+            block = blocking.getBlock(block_id)
+            bb = tuple(slice(int(beg * sc), max(int(np.ceil(end * sc)), int(beg * sc) + 1))
+                       for beg, end, sc in zip(block.begin, block.end, scale))
+            occupancy = float(np.mean(ds[bb] > 0))
+            weights[block_id] = max(occupancy, min_weight)
+    return weights
+
+
 def get_face(blocking, block_id, ngb_id, axis, halo=[1, 1, 1]):
     # get the two block coordinates
     block_a = blocking.getBlock(block_id)
@@ -274,6 +320,7 @@ def mask_corners(input_, halo):
 
 
 def preserving_erosion(mask, erode_by):
+    from scipy.ndimage.morphology import binary_erosion
     eroded = binary_erosion(mask, iterations=erode_by)
     n_foreground = eroded.sum()
     while n_foreground == 0:
@@ -286,6 +333,7 @@ def preserving_erosion(mask, erode_by):
 
 
 def fit_seeds(objs, obj_ids, bg_id, erode_by, max_erode):
+    from scipy.ndimage.morphology import binary_erosion
     background = objs == 0
     seeds = bg_id * binary_erosion(background, iterations=max_erode)
     seeds = seeds.astype("uint32")
@@ -302,6 +350,7 @@ def fit_seeds(objs, obj_ids, bg_id, erode_by, max_erode):
 
 
 def fit_to_hmap_2d(objs, hmap, erode_by, max_erode, obj_ids, bg_id):
+    import vigra
 
     # make the seeds by binary erosion of background and foreground
     seeds = np.zeros_like(hmap, dtype="uint32")
@@ -332,6 +381,7 @@ def fit_to_hmap_2d(objs, hmap, erode_by, max_erode, obj_ids, bg_id):
 
 
 def fit_to_hmap_3d(objs, hmap, erode_by, max_erode, obj_ids, bg_id):
+    import vigra
     seeds = fit_seeds(objs, obj_ids, bg_id, erode_by, max_erode)
 
     # apply dt before watershed
@@ -401,6 +451,7 @@ def get_format_key(metadata_format, scale, key_prefix=""):
         prefix = "s%i" % scale
         out_key = prefix if key_prefix == "" else os.path.join(key_prefix, prefix)
     else:
+        from pybdv.util import get_key
         is_h5 = metadata_format in ("bdv", "bdv.hdf5")
         # TODO support multiple set-ups for multi-channel data
         out_key = get_key(is_h5, timepoint=0, setup_id=0, scale=scale)
@@ -445,6 +496,7 @@ def _paintera_metadata(path, prefix, metadata_dict, scale_factors, scale_offset)
 
 
 def _bdv_metadata(metadata_format, path, metadata_dict, scale_factors, scale_offset):
+    from pybdv.metadata import write_h5_metadata, write_n5_metadata, write_xml_metadata
     is_h5 = metadata_format in ("bdv", "bdv.hdf5")
     xml_out_path = os.path.splitext(path)[0] + ".xml"
 
@@ -503,6 +555,7 @@ def create_ngff_metadata(g, name, axes_names, scales=None, units=None):
 
 
 def _ome_zarr_metadata(path, prefix, metadata_dict, scale_factors, scale_offset):
+    from pybdv.util import relative_to_absolute_scale_factors
     setup_name = metadata_dict.get("setup_name", None)
     setup_name = "data" if setup_name is None else setup_name
     unit = metadata_dict.get("unit", "pixel")
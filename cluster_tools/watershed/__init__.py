@@ -1 +1,5 @@
-from .watershed_workflow import WatershedWorkflow
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".watershed_workflow": ["WatershedWorkflow"],
+})
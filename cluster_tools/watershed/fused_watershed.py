@@ -0,0 +1,57 @@
+import os
+
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
+from cluster_tools.watershed.watershed import WatershedBase
+
+
+#
+# Fused Watershed Tasks
+#
+
+class FusedWatershedBase(WatershedBase):
+    """ Watershed fused with finding the unique ids for relabeling.
+
+    Computes the watershed and the unique ids per block in one job, reusing the watershed block
+    that was just written instead of reading it again. Writes the watershed and the same per-job
+    unique ids as `FindUniques`, so the relabel workflow can continue with `FindLabeling`.
+    """
+    task_name = 'fused_watershed'
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'fused_watershed.py'))
+    # the per job uniques must cover all blocks, so we cannot retry single blocks,
+    # pull blocks from the queue or duplicate straggler jobs
+    allow_retry = False
+    supports_block_queue = False
+    allow_speculation = False
+
+    def get_task_config(self):
+        config = super().get_task_config()
+        config.update({'tmp_folder': self.tmp_folder})
+        return config
+
+
+class FusedWatershedLocal(FusedWatershedBase, LocalTask):
+    """
+    FusedWatershed on local machine
+    """
+    pass
+
+
+class FusedWatershedSlurm(FusedWatershedBase, SlurmTask):
+    """
+    FusedWatershed on slurm cluster
+    """
+    pass
+
+
+class FusedWatershedLSF(FusedWatershedBase, LSFTask):
+    """
+    FusedWatershed on lsf cluster
+    """
+    pass
+
+
+class FusedWatershedExecutor(FusedWatershedBase, ExecutorTask):
+    """
+    FusedWatershed on executor
+    """
+    pass
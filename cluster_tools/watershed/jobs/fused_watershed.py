@@ -0,0 +1,82 @@
+#! /bin/python
+
+import os
+import sys
+
+import numpy as np
+
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.thread_utils as thu
+from cluster_tools.utils.fusion_utils import BlockCache
+from cluster_tools.watershed.jobs.watershed import _ws_block
+from cluster_tools.relabel.jobs.find_uniques import uniques_in_block
+
+
+#
+# Implementation
+#
+
+
+def fused_watershed(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_path = config['input_path']
+    input_key = config['input_key']
+    shape = list(vu.get_shape(input_path, input_key))
+    if len(shape) == 4:
+        shape = shape[1:]
+
+    block_shape = list(config['block_shape'])
+    block_list = config['block_list']
+    tmp_folder = config['tmp_folder']
+
+    # read the output config
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    # get the blocking
+    blocking = nt.blocking([0, 0, 0], shape, block_shape)
+
+    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+        ds_in = f_in[input_key]
+        assert ds_in.ndim in (3, 4)
+        # the watershed blocks are kept in memory for finding the uniques
+        ds_out = BlockCache(f_out[output_key])
+        assert ds_out.ndim == 3
+
+        if 'mask_path' in config:
+            mask_path = config['mask_path']
+            mask_key = config['mask_key']
+            mask = vu.load_mask(mask_path, mask_key, shape)
+        else:
+            mask = None
+
+        uniques = []
+        # the blocks are processed one after the other, so they can use all threads of the job
+        with thu.ThreadBudget.from_config(config, n_blocks=1).limits():
+            for block_id in block_list:
+                _ws_block(blocking, block_id, ds_in, ds_out, mask, config)
+                uniques.append(uniques_in_block(block_id, blocking, ds_out, False))
+        ds_out.clear()
+
+    # save the uniques for this job
+    unique_values = np.unique(np.concatenate(uniques))
+    save_path = os.path.join(tmp_folder, 'find_uniques_job_%i.npy' % job_id)
+    fu.log("saving results to %s" % save_path)
+    np.save(save_path, unique_values)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    fused_watershed(job_id, path)
@@ -0,0 +1,210 @@
+#! /bin/python
+
+import os
+import sys
+
+import numpy as np
+
+import vigra
+import nifty.tools as nt
+from elf.segmentation.watershed import watershed as run_watershed
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.thread_utils as thu
+from cluster_tools.watershed.jobs.watershed import _ws_block, _get_bbs, _read_data, _apply_dt, _make_seeds, _make_hmap
+
+
+#
+# Implementation
+#
+
+
+def _apply_watershed_with_seeds(input_, dt, initial_seeds, config, mask, offset):
+    apply_2d = config.get('apply_ws_2d', True)
+    size_filter = config.get('size_filter', 25)
+    sigma_weights = config.get('sigma_weights', 2.)
+    alpha = config.get('alpha', 0.8)
+
+    # apply the watersheds in 2d
+    if apply_2d:
+        ws = np.zeros_like(input_, dtype='uint64')
+        for z in range(ws.shape[0]):
+
+            dtz = dt[z]
+            # get the initial seeds for this slice
+            # and a mask for the inital seeds
+            initial_seeds_z = initial_seeds[z]
+            initial_seed_mask = initial_seeds_z != 0
+            # don't place maxima at initial seeds
+            dtz[initial_seed_mask] = 0
+
+            seeds = _make_seeds(dtz, config)
+            # remove seeds in mask
+            if mask is not None:
+                seeds[mask[z]] = 0
+
+            # add offset to seeds
+            seeds[seeds != 0] += offset
+            # add initial seeds
+            seeds[initial_seed_mask] = initial_seeds_z[initial_seed_mask]
+
+            # we need to remap the seeds consecutively, because vigra
+            # watersheds can only handle uint32 seeds, and we WILL overflow uint32
+            seeds, _, old_to_new = vigra.analysis.relabelConsecutive(seeds,
+                                                                     start_label=1,
+                                                                     keep_zeros=True)
+            new_to_old = {new: old for old, new in old_to_new.items()}
+
+            # run watershed
+            hmap = _make_hmap(input_[z], dtz, alpha, sigma_weights)
+            wsz, max_id = run_watershed(hmap, seeds=seeds, size_filter=size_filter,
+                                        exclude=initial_seeds_z)
+            wsz = wsz.astype('uint64')
+            # mask the result if we have a mask
+            if mask is not None:
+                wsz[mask[z]] = 0
+                inv_mask = np.logical_not(mask[z])
+                # NOTE we might not have any pixels in mask for 2d slice
+                max_id = int(wsz[inv_mask].max()) if inv_mask.sum() > 0 else 0
+
+            # increase the offset
+            offset += max_id
+            # map back to original ids
+            wsz = nt.takeDict(new_to_old, wsz)
+            ws[z] = wsz
+        #
+        return ws
+
+    # apply the watersheds in 3d
+    else:
+        # find seeds
+        seeds = _make_seeds(dt, config)
+        # remove seeds in mask
+        if mask is not None:
+            seeds[mask] = 0
+        seeds[seeds != 0] += offset
+
+        # add the initial seeds
+        initial_seed_mask = initial_seeds != 0
+        seeds[initial_seed_mask] = initial_seeds[initial_seed_mask]
+
+        # we need to remap the seeds consecutively, because vigra
+        # watersheds can only handle uint32 seeds, and we WILL overflow uint32
+        seeds, _, old_to_new = vigra.analysis.relabelConsecutive(seeds,
+                                                                 start_label=1,
+                                                                 keep_zeros=True)
+        new_to_old = {new: old for old, new in old_to_new.items()}
+
+        # run watershed
+        initial_seed_ids = np.unique(initial_seeds[initial_seed_mask])
+        hmap = _make_hmap(input_, dt, alpha, sigma_weights)
+        ws, max_id = run_watershed(hmap, seeds=seeds, size_filter=size_filter,
+                                   exclude=initial_seed_ids)
+        ws = ws.astype('uint64')
+        ws = nt.takeDict(new_to_old, ws)
+        if mask is not None:
+            ws[mask] = 0
+        return ws
+
+
+def _ws_pass2(blocking, block_id, ds_in, ds_out, mask, config):
+    fu.log_block_start(block_id)
+
+    input_bb, inner_bb, output_bb = _get_bbs(blocking, block_id, config)
+    # get the mask and check if we have any pixels
+    if mask is None:
+        in_mask = out_mask = None
+    else:
+        in_mask = mask[input_bb].astype('bool')
+        out_mask = in_mask[inner_bb]
+        if np.sum(out_mask) == 0:
+            fu.log_block_success(block_id)
+            return
+
+    # read the input
+    input_ = _read_data(ds_in, input_bb, config)
+
+    # load seeds
+    initial_seeds = ds_out[input_bb]
+
+    if mask is None:
+        inv_mask = None
+    else:
+        # mask the input
+        inv_mask = np.logical_not(in_mask)
+        input_[inv_mask] = 1
+
+    # apply distance transform
+    dt = _apply_dt(input_, config)
+    # check if input was valid
+    if dt is None:
+        fu.log_block_success(block_id)
+        return
+
+    # get offset to make new seeds unique between blocks
+    # (we need to relabel later to make processing efficient !)
+    offset = block_id * np.prod(blocking.blockShape)
+
+    # run watershed with initial seeds
+    ws = _apply_watershed_with_seeds(input_, dt, initial_seeds, config, inv_mask, offset)
+
+    # -> apply ws and write the results to the inner volume
+    ds_out[output_bb] = ws[inner_bb]
+
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def two_pass_watershed(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_path = config['input_path']
+    input_key = config['input_key']
+    shape = list(vu.get_shape(input_path, input_key))
+    if len(shape) == 4:
+        shape = shape[1:]
+
+    block_shape = list(config['block_shape'])
+    block_list = config['block_list']
+
+    # read the output config
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    # get the blocking
+    blocking = nt.blocking([0, 0, 0], shape, block_shape)
+    pass_id = config['pass']
+
+    # submit blocks
+    with vu.file_reader(input_path, 'r') as f_in, vu.file_reader(output_path) as f_out:
+        ds_in = f_in[input_key]
+        assert ds_in.ndim in (3, 4)
+        ds_out = f_out[output_key]
+        assert ds_out.ndim == 3
+
+        if 'mask_path' in config:
+            mask_path = config['mask_path']
+            mask_key = config['mask_key']
+            mask = vu.load_mask(mask_path, mask_key, shape)
+        else:
+            mask = None
+
+        ws_fu = _ws_block if pass_id == 0 else _ws_pass2
+        # the blocks are processed one after the other, so they can use all threads of the job
+        with thu.ThreadBudget.from_config(config, n_blocks=1).limits():
+            for block_id in block_list:
+                ws_fu(blocking, block_id, ds_in, ds_out, mask, config)
+
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    two_pass_watershed(job_id, path)
@@ -0,0 +1,161 @@
+#! /bin/python
+
+import os
+import sys
+
+import numpy as np
+import nifty.tools as nt
+
+import cluster_tools.utils.volume_utils as vu
+import cluster_tools.utils.function_utils as fu
+
+
+#
+# Implementation
+#
+
+def _read_data(ds_in, input_bb, config):
+    # read the input data
+    if ds_in.ndim == 4:
+        channel_begin = config.get('channel_begin', 0)
+        channel_end = config.get('channel_end', None)
+        input_bb = (slice(channel_begin, channel_end),) + input_bb
+        input_ = vu.normalize(ds_in[input_bb])
+        agglomerate = config.get('agglomerate_channels', 'mean')
+        assert agglomerate in ('mean', 'max', 'min')
+        input_ = getattr(np, agglomerate)(input_, axis=0)
+    else:
+        input_ = vu.normalize(ds_in[input_bb])
+    return input_
+
+
+def _ws_block(blocking, block_id, ds_in, ds_seeds, ds_out, config):
+    fu.log_block_start(block_id)
+    size_filter = config.get('size_filter', 0)
+
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    # read input and seeds
+    input_ = _read_data(ds_in, bb, config)
+    seeds = ds_seeds[bb]
+
+    # run watershed
+    # vigra seeds need to be uint32
+    # TODO use skimage or make PR to vigra
+    max_id = int(seeds.max())
+    # TODO implment mapping of ids ...
+    assert max_id < np.iinfo('uint32').max, "Overflow detected"
+    ws, _ = vu.watershed(input_, seeds=seeds.astype('uint32'),
+                         size_filter=size_filter)
+    ds_out[bb] = ws.astype('uint64')
+
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def _ws_block_masked(blocking, block_id,
+                     ds_in, ds_seeds, ds_out, mask, config):
+    fu.log_block_start(block_id)
+    size_filter = config.get('size_filter', 0)
+
+    block = blocking.getBlock(block_id)
+    bb = vu.block_to_bb(block)
+
+    # get the mask and check if we have any pixels
+    in_mask = mask[bb].astype('bool')
+    if np.sum(in_mask) == 0:
+        fu.log_block_success(block_id)
+        return
+
+    # read input and seeds
+    input_ = _read_data(ds_in, bb, config)
+    seeds = ds_seeds[bb]
+
+    # mask the input and run watershed
+    inv_mask = np.logical_not(in_mask)
+    input_[inv_mask] = 1
+
+    # vigra seeds need to be uint32
+    # TODO use skimage or make PR to vigra
+    max_id = int(seeds.max())
+    # TODO implment mapping of ids ...
+    assert max_id < np.iinfo('uint32').max, "Overflow detected"
+    ws, _ = vu.watershed(input_, seeds=seeds.astype('uint32'),
+                         size_filter=size_filter)
+    ws = ws.astype('uint64')
+
+    # set mask to zero and write ws
+    ws[inv_mask] = 0
+    ds_out[bb] = ws
+
+    # log block success
+    fu.log_block_success(block_id)
+
+
+def watershed_from_seeds(job_id, config_path):
+    fu.log("start processing job %i" % job_id)
+    fu.log("reading config from %s" % config_path)
+    config = fu.load_job_config(config_path)
+
+    # read the input cofig
+    input_path = config['input_path']
+    input_key = config['input_key']
+    shape = list(vu.get_shape(input_path, input_key))
+    if len(shape) == 4:
+        shape = shape[1:]
+
+    block_shape = list(config['block_shape'])
+    block_list = config['block_list']
+
+    # TODO seeds and output might be identical
+    # in that case we would need in-place logic if we
+    # want to support h5 (it's fine with n5 as is)
+    # read the seed and  output config
+    seeds_path = config['seeds_path']
+    seeds_key = config['seeds_key']
+    output_path = config['output_path']
+    output_key = config['output_key']
+
+    # check if we have a mask
+    with_mask = 'mask_path' in config
+    if with_mask:
+        mask_path = config['mask_path']
+        mask_key = config['mask_key']
+
+    # get the blocking
+    blocking = nt.blocking([0, 0, 0], shape, block_shape)
+
+    # submit blocks
+    with vu.file_reader(input_path, 'r') as f_in,\
+         vu.file_reader(seeds_path, 'r') as f_seeds,\
+         vu.file_reader(output_path) as f_out:
+
+        ds_in  = f_in[input_key]
+        assert ds_in.ndim in (3, 4)
+        ds_seeds = f_out[seeds_key]
+        assert ds_seeds.ndim == 3
+        ds_out = f_out[output_key]
+        assert ds_out.ndim == 3
+
+        # note that the mask is usually small enough to keep it
+        # in memory (and we interpolate to get to the full volume)
+        # if this does not hold need to change this code!
+        if with_mask:
+            mask = vu.load_mask(mask_path, mask_key, shape)
+            for block_id in block_list:
+                _ws_block_masked(blocking, block_id,
+                                 ds_in, ds_seeds, ds_out, mask, config)
+
+        else:
+            for block_id in block_list:
+                _ws_block(blocking, block_id, ds_in, ds_seeds, ds_out, config)
+    # log success
+    fu.log_job_success(job_id)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split('.')[0].split('_')[-1])
+    watershed_from_seeds(job_id, path)
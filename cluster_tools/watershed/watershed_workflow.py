@@ -2,6 +2,7 @@ import luigi
 
 from ..cluster_tasks import WorkflowBase
 from . import watershed as watershed_tasks
+from . import fused_watershed as fused_watershed_tasks
 from . import two_pass_watershed as two_pass_tasks
 from . import agglomerate as agglomerate_tasks
 from . import slice_agglomeration as slice_agglomeration_tasks
@@ -19,6 +20,9 @@ class WatershedWorkflow(WorkflowBase):
     agglomeration = luigi.BoolParameter(default=False)
     slice_agglomeration = luigi.BoolParameter(default=False)
     max_jobs_slice_agglomeration = luigi.IntParameter(default=8)
+    # find the unique ids for relabeling in the watershed jobs
+    # instead of reading the watershed again in a separate task
+    fuse_relabel = luigi.BoolParameter(default=False)
 
     def get_agglomeration_task(self, dep):
         if (self.slice_agglomeration and self.agglomeration):
@@ -52,7 +56,18 @@ class WatershedWorkflow(WorkflowBase):
         return dep
 
     def requires(self):
-        if self.two_pass:
+        # the relabeling keeps the ids of the watershed blocks outside of the dirty regions,
+        # so only these blocks are recomputed, unless the agglomeration changes the ids of all blocks
+        incremental = not (self.two_pass or self.agglomeration or self.slice_agglomeration)
+        ws_kwargs = {} if self.two_pass else {'incremental': incremental}
+        if self.fuse_relabel:
+            # the uniques would be invalidated by the agglomeration
+            # and the two-pass watershed is not supported yet
+            assert not (self.two_pass or self.agglomeration or self.slice_agglomeration),\
+                "Fused relabeling is only supported for the single pass watershed without agglomeration"
+            ws_task = getattr(fused_watershed_tasks,
+                              self._get_task_name('FusedWatershed'))
+        elif self.two_pass:
             ws_task = getattr(two_pass_tasks,
                               self._get_task_name('TwoPassWatershed'))
         else:
@@ -66,7 +81,8 @@ class WatershedWorkflow(WorkflowBase):
                       output_path=self.output_path,
                       output_key=self.output_key,
                       mask_path=self.mask_path,
-                      mask_key=self.mask_key)
+                      mask_key=self.mask_key,
+                      **ws_kwargs)
         dep = self.get_agglomeration_task(dep)
         dep = RelabelWorkflow(tmp_folder=self.tmp_folder,
                               max_jobs=self.max_jobs,
@@ -76,13 +92,16 @@ class WatershedWorkflow(WorkflowBase):
                               input_key=self.output_key,
                               assignment_path=self.output_path,
                               assignment_key='relabel_watershed',
-                              dependency=dep)
+                              dependency=dep,
+                              find_uniques=not self.fuse_relabel,
+                              incremental=incremental)
         return dep
 
     @staticmethod
     def get_config():
         configs = super(WatershedWorkflow, WatershedWorkflow).get_config()
         configs.update({'watershed': watershed_tasks.WatershedLocal.default_task_config(),
+                        'fused_watershed': fused_watershed_tasks.FusedWatershedLocal.default_task_config(),
                         'two_pass_watershed': two_pass_tasks.TwoPassWatershedLocal.default_task_config(),
                         'agglomerate': agglomerate_tasks.AgglomerateLocal.default_task_config(),
                         'slice_agglomeration': slice_agglomeration_tasks.SliceAgglomerationLocal.default_task_config(),
@@ -1 +1,5 @@
-from .write import WriteLocal, WriteSlurm, WriteLSF
+from ..utils.lazy_utils import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    ".write": ["WriteLocal", "WriteSlurm", "WriteLSF", "WriteExecutor"],
+})
@@ -1,24 +1,10 @@
-#! /bin/python
-
-# IMPORTANT do threadctl import first (before numpy imports)
-from threadpoolctl import threadpool_limits
-
 import os
-import sys
-import json
-import pickle
-from concurrent import futures
-
-import numpy as np
-from elf.io.label_multiset_wrapper import LabelMultisetWrapper
 
 import luigi
-import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
-import cluster_tools.utils.function_utils as fu
 from cluster_tools.utils.task_utils import DummyTask
-from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask
+from cluster_tools.cluster_tasks import SlurmTask, LocalTask, LSFTask, ExecutorTask
 
 
 #
@@ -30,7 +16,9 @@ class WriteBase(luigi.Task):
     Write node assignments for all blocks
     """
     task_name = "write"
-    src_file = os.path.abspath(__file__)
+    src_file = os.path.abspath(os.path.join(os.path.dirname(__file__), 'jobs', 'write.py'))
+    # the occupancy of the written blocks is recorded
+    occupancy_output = "output"
 
     # path and key to input and output datasets
     input_path = luigi.Parameter()
@@ -48,7 +36,11 @@ class WriteBase(luigi.Task):
     # we may have different write tasks,
     # so we need an identifier to keep them apart
     identifier = luigi.Parameter()
+    # the label offsets of the blocks, see `manifest_utils.load_block_offsets`
     offset_path = luigi.Parameter(default="")
+    # only write the blocks in the dirty regions, e.g. for the incremental relabeling (see `RelabelWorkflow`),
+    # otherwise all blocks are written and added to the dirty regions
+    incremental = luigi.BoolParameter(default=False)
 
     def requires(self):
         return self.dependency
@@ -108,8 +100,11 @@ class WriteBase(luigi.Task):
 
         # get block list and jobs
         if self.n_retries == 0:
+            # empty input blocks are not written, so we can skip them
             block_list = vu.blocks_in_volume(shape, block_shape, roi_begin, roi_end,
-                                             block_list_path=block_list_path)
+                                             block_list_path=block_list_path,
+                                             occupancy_index=self.occupancy_index_path("input", shape, block_shape))
+            block_list = self.restrict_to_dirty_regions(block_list, shape, block_shape, restrict=self.incremental)
         else:
             block_list = self.block_list
             self.clean_up_for_retry(block_list, self.identifier)
@@ -147,253 +142,7 @@ class WriteLSF(WriteBase, LSFTask):
     pass
 
 
-#
-# Implementation
-#
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _apply_node_labels(seg, node_labels, allow_empty_assignments):
-    # choose the appropriate mapping:
-    # - 1d np.array -> just apply it
-    # - 2d np.array -> extract the local dict and apply
-    # - dict -> extract the local dict and apply
-    apply_array = False if isinstance(node_labels, dict) else (True if node_labels.ndim == 1 else False)
-    if apply_array:
-        assert seg.max() < len(node_labels), "Max id %i exceeds number of node labels %i" % (seg.max(),
-                                                                                             len(node_labels))
-        seg = nt.take(node_labels, seg)
-    else:
-        # this copys the dict and hence is extremely RAM hungry
-        # so we make the dict as small as possible
-        this_labels = np.unique(seg)
-        if isinstance(node_labels, dict):
-            # do we allow for assignments that are not in the assignment table?
-            if allow_empty_assignments:
-                this_assignment = {label: node_labels.get(label, label) for label in this_labels}
-            else:
-                this_assignment = {label: node_labels[label] for label in this_labels}
-        else:
-            this_assignment = node_labels[:, 1][np.in1d(node_labels[:, 0], this_labels)]
-            this_assignment = {label: this_assignment[ii] for ii, label in enumerate(this_labels)}
-        # FIXME this casts to uint32 which can lead to nasty over-flows
-        seg = nt.takeDict(this_assignment, seg)
-    return seg
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _write_block_with_offsets(ds_in, ds_out, blocking, block_id,
-                              node_labels, offsets, allow_empty_assignments):
-    fu.log("start processing block %i" % block_id)
-    off = offsets[block_id]
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-    seg = ds_in[bb]
-
-    # check if this block is empty and don"t write if it is
-    mask = seg != 0
-    if np.sum(mask) == 0:
-        fu.log_block_success(block_id)
-        return
-
-    seg[mask] += off
-    seg = _apply_node_labels(seg, node_labels, allow_empty_assignments)
-    ds_out[bb] = seg
-    fu.log_block_success(block_id)
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _write_with_offsets(ds_in, ds_out, blocking, block_list,
-                        n_threads, node_labels, offset_path,
-                        allow_empty_assignments):
-
-    fu.log("loading offsets from %s" % offset_path)
-    with open(offset_path) as f:
-        offset_config = json.load(f)
-        offsets = offset_config["offsets"]
-        empty_blocks = offset_config["empty_blocks"]
-
-    with futures.ThreadPoolExecutor(n_threads) as tp:
-        tasks = [tp.submit(_write_block_with_offsets, ds_in, ds_out,
-                           blocking, block_id, node_labels, offsets,
-                           allow_empty_assignments)
-                 for block_id in block_list if block_id not in empty_blocks]
-        [t.result() for t in tasks]
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _write_block(ds_in, ds_out, blocking, block_id, node_labels,
-                 allow_empty_assignments):
-    fu.log("start processing block %i" % block_id)
-    block = blocking.getBlock(block_id)
-    bb = vu.block_to_bb(block)
-    seg = ds_in[bb]
-    # check if this block is empty and don"t write if it is
-    if np.sum(seg != 0) == 0:
-        fu.log_block_success(block_id)
-        return
-
-    seg = _apply_node_labels(seg, node_labels, allow_empty_assignments)
-    ds_out[bb] = seg
-    fu.log_block_success(block_id)
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _write(ds_in, ds_out, blocking, block_list,
-           n_threads, node_labels, allow_empty_assignments):
-    with futures.ThreadPoolExecutor(n_threads) as tp:
-        tasks = [tp.submit(_write_block, ds_in, ds_out,
-                           blocking, block_id, node_labels,
-                           allow_empty_assignments)
-                 for block_id in block_list]
-        [t.result() for t in tasks]
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _load_assignments(path, key, n_threads):
-    # if we have no key, this is a pickle file
-    if key is None:
-        assert os.path.split(path)[1].split(".")[-1] == "pkl"
-        with open(path, "rb") as f:
-            node_labels = pickle.load(f)
-        assert isinstance(node_labels, dict)
-    else:
-        with vu.file_reader(path, "r") as f:
-            ds = f[key]
-            assert ds.ndim in (1, 2)
-            ds.n_threads = n_threads
-            node_labels = ds[:]
-
-            # this can happen if we only have a single label.
-            # for some reason z5 returns this as int, not as array
-            if isinstance(node_labels, int):
-                node_labels = np.array([node_labels], dtype="uint64")
-
-            # if we have 2d node_labels, these correspond to an assignment table
-            # and we turn them into a dict for efficient downstream processing
-            if node_labels.ndim == 2:
-                if node_labels.shape[1] == 2:
-                    node_labels = dict(zip(node_labels[:, 0], node_labels[:, 1]))
-                elif node_labels.shape[0] == 2:
-                    node_labels = dict(zip(node_labels[0, :], node_labels[1, :]))
-                else:
-                    raise ValueError("Invalid shape for 2d node labels")
-
-    return node_labels
-
-
-@threadpool_limits.wrap(limits=1)  # restrict the numpy threadpool to 1 to avoid oversubscription
-def _write_maxlabel(output_path, output_key, node_labels):
-    if isinstance(node_labels, np.ndarray):
-        max_id = int(node_labels.max())
-    elif isinstance(node_labels, dict):
-        max_id = int(np.max(list(node_labels.values())))
-    else:
-        raise AttributeError("Invalide type %s" % type(node_labels))
-    with vu.file_reader(output_path) as f:
-        f[output_key].attrs["maxId"] = max_id
-
-
-def write(job_id, config_path):
-    fu.log("start processing job %i" % job_id)
-    fu.log("loading config from %s" % config_path)
-    with open(config_path, "r") as f:
-        config = json.load(f)
-
-    # read I/O config
-    input_path = config["input_path"]
-    input_key = config["input_key"]
-
-    # check if we write in-place
-    if "output_path" in config:
-        output_path = config["output_path"]
-        output_key = config["output_key"]
-        in_place = False
-    else:
-        in_place = True
-
-    block_shape = config["block_shape"]
-    block_list = config["block_list"]
-    n_threads = config.get("threads_per_job", 1)
-    allow_empty_assignments = config.get("allow_empty_assignments", False)
-
-    # read node assignments
-    assignment_path = config["assignment_path"]
-    assignment_key = config.get("assignment_key", None)
-    fu.log("loading node labels from %s" % assignment_path)
-    node_labels = _load_assignments(assignment_path, assignment_key, n_threads)
-
-    offset_path = config.get("offset_path", None)
-
-    # if we write in-place, we only need to open one file and one dataset
-    if in_place:
-        with vu.file_reader(input_path) as f:
-            ds_in = f[input_key]
-            if ds_in.attrs.get("isLabelMultiset", False):
-                raise RuntimeError("Cannot write inplace for label multiset")
-            ds_out = ds_in
-
-            shape = ds_in.shape
-            blocking = nt.blocking([0, 0, 0], list(shape), list(block_shape))
-
-            if offset_path is None:
-                _write(ds_in, ds_out, blocking, block_list, n_threads, node_labels, allow_empty_assignments)
-            else:
-                _write_with_offsets(ds_in, ds_out, blocking, block_list,
-                                    n_threads, node_labels, offset_path, allow_empty_assignments)
-        # write the max-label
-        # for job 0
-        if job_id == 0:
-            _write_maxlabel(input_path, input_key, node_labels)
-
-    else:
-        # even if we do not write in-place, we might still write to the same output_file,
-        # but different datasets
-        # hdf5 does not like opening a file twice, so we need to check for this
-        if input_path == output_path:
-            with vu.file_reader(input_path) as f:
-                ds_in = f[input_key]
-                if ds_in.attrs.get("isLabelMultiset", False):
-                    ds_in = LabelMultisetWrapper(ds_in)
-                ds_out = f[output_key]
-
-                shape = ds_in.shape
-                blocking = nt.blocking([0, 0, 0], list(shape), list(block_shape))
-
-                if offset_path is None:
-                    _write(ds_in, ds_out, blocking, block_list, n_threads, node_labels,
-                           allow_empty_assignments)
-                else:
-                    _write_with_offsets(ds_in, ds_out, blocking, block_list,
-                                        n_threads, node_labels, offset_path,
-                                        allow_empty_assignments)
-        else:
-            with vu.file_reader(input_path, "r") as f_in, vu.file_reader(output_path) as f_out:
-                ds_in = f_in[input_key]
-                if ds_in.attrs.get("isLabelMultiset", False):
-                    ds_in = LabelMultisetWrapper(ds_in)
-                ds_out = f_out[output_key]
-
-                shape = ds_in.shape
-                blocking = nt.blocking([0, 0, 0], list(shape), list(block_shape))
-
-                if offset_path is None:
-                    _write(ds_in, ds_out, blocking, block_list, n_threads, node_labels,
-                           allow_empty_assignments)
-                else:
-                    _write_with_offsets(ds_in, ds_out, blocking, block_list,
-                                        n_threads, node_labels, offset_path,
-                                        allow_empty_assignments)
-        # write the max-label
-        # for job 0
-        if job_id == 0:
-            _write_maxlabel(output_path, output_key, node_labels)
-
-    fu.log_job_success(job_id)
-
-
-if __name__ == "__main__":
-    path = sys.argv[1]
-    assert os.path.exists(path), path
-    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
-    write(job_id, path)
+class WriteExecutor(WriteBase, ExecutorTask):
+    """ Write on executor
+    """
+    pass
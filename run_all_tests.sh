@@ -140,7 +140,27 @@ then
     exit 1
 fi
 
-python test/retry/test_retry.py
+python test/retry/test_retry.py TestRetry.test_retry
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/retry/test_retry.py TestRetry.test_retry_worker_pool
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/retry/test_retry.py TestRetry.test_retry_executor
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/retry/test_speculation.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/retry/test_resume.py
 if [[ $? != 0 ]]
 then
     exit 1
@@ -174,7 +194,93 @@ if [[ $? != 0 ]]
 then
     exit 1
 fi
+python test/utils/test_completion_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_block_queue.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_blocking_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_block_weights.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_parse_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_lsf_task.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_slurm_task.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_telemetry_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_profile_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_occupancy_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_resource_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_memory_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_manifest_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/utils/test_reduce_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
 
+python test/utils/test_thread_utils.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+
+python test/watershed/test_dirty_regions.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
+python test/watershed/test_fused_watershed.py
+if [[ $? != 0 ]]
+then
+    exit 1
+fi
 python test/watershed/test_watershed_with_mask.py
 if [[ $? != 0 ]]
 then
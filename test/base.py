@@ -95,7 +95,7 @@ class BaseTest(unittest.TestCase):
         self.assertTrue(ret)
 
     def get_target_name(self):
-        name_dict = {"local": "Local", "slurm": "Slurm", "lsf": "LSF"}
+        name_dict = {"local": "Local", "slurm": "Slurm", "lsf": "LSF", "executor": "Executor"}
         return name_dict[self.target]
 
 
@@ -2,14 +2,13 @@
 
 import os
 import sys
-import json
 
 import luigi
 import nifty.tools as nt
 
 import cluster_tools.utils.volume_utils as vu
 import cluster_tools.utils.function_utils as fu
-from cluster_tools.cluster_tasks import LocalTask
+from cluster_tools.cluster_tasks import LocalTask, ExecutorTask
 
 
 #
@@ -68,6 +67,12 @@ class FailingTaskLocal(FailingTaskBase, LocalTask):
     pass
 
 
+class FailingTaskExecutor(FailingTaskBase, ExecutorTask):
+    """FailingTask on executor
+    """
+    pass
+
+
 def _failing_block(block_id, blocking, ds, n_retries):
     # fail for odd block ids if we are in the first try
     if n_retries == 0 and block_id % 2 == 1:
@@ -80,8 +85,7 @@ def _failing_block(block_id, blocking, ds, n_retries):
 def failing_task(job_id, config_path):
 
     # get the config
-    with open(config_path) as f:
-        config = json.load(f)
+    config = fu.load_job_config(config_path)
     output_path = config["output_path"]
     output_key = config["output_key"]
     block_shape = config["block_shape"]
@@ -0,0 +1,89 @@
+#! /bin/python
+
+import os
+import sys
+import time
+from subprocess import Popen
+
+import luigi
+
+import cluster_tools.utils.function_utils as fu
+import cluster_tools.utils.block_queue as bq
+from cluster_tools.cluster_tasks import LocalTask
+
+
+#
+# Task with a straggler job to test the speculative execution
+#
+
+class SlowTaskBase(luigi.Task):
+    """ SlowTask base class
+    """
+
+    task_name = "slow_task"
+    src_file = os.path.abspath(__file__)
+    allow_speculation = True
+
+    output_folder = luigi.Parameter()
+    n_blocks = luigi.IntParameter()
+    delay = luigi.FloatParameter()
+
+    def run(self):
+        self.make_dirs()
+        shebang, block_shape, roi_begin, roi_end = self.global_config_values()
+        self.init(shebang)
+
+        config = self.get_task_config()
+        os.makedirs(self.output_folder, exist_ok=True)
+        config.update({"output_folder": self.output_folder, "delay": self.delay})
+
+        block_list = list(range(self.n_blocks))
+        n_jobs = min(len(block_list), self.max_jobs)
+        self.prepare_jobs(n_jobs, block_list, config)
+        self.submit_jobs(n_jobs)
+
+        self.wait_for_jobs()
+        self.check_jobs(n_jobs)
+
+
+class SlowTaskPolling(SlowTaskBase, LocalTask):
+    """ SlowTask with jobs that are started in the background and polled, like for the cluster targets
+    """
+    def _submit_speculative_jobs(self, job_ids, job_prefix=None):
+        for job_id in job_ids:
+            script_path, config_file, log_file, err_file = self._job_files(job_id, job_prefix)
+            with open(log_file, "w") as f_out, open(err_file, "w") as f_err:
+                self.processes[job_id] = Popen([script_path, config_file], stdout=f_out, stderr=f_err)
+
+    def _cancel_jobs(self, job_ids):
+        for job_id in job_ids:
+            self.processes[job_id].kill()
+
+    def submit_jobs(self, n_jobs, job_prefix=None):
+        self._init_speculation(n_jobs)
+        self.processes = {}
+        self._submit_speculative_jobs(range(n_jobs), job_prefix)
+
+    def wait_for_jobs(self, job_prefix=None):
+        while any(process.poll() is None for process in self.processes.values()):
+            time.sleep(0.1)
+            self._speculate(job_prefix)
+
+
+def slow_task(job_id, config_path):
+    config = fu.load_job_config(config_path)
+    for block_id in bq.job_blocks(config, job_id):
+        # the first job is the straggler
+        if job_id == 0:
+            time.sleep(config["delay"])
+        with open(os.path.join(config["output_folder"], "block_%i" % block_id), "w"):
+            pass
+        fu.log_block_success(block_id)
+    fu.log_job_success(job_id)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    assert os.path.exists(path), path
+    job_id = int(os.path.split(path)[1].split(".")[0].split("_")[-1])
+    slow_task(job_id, path)
@@ -0,0 +1,68 @@
+import os
+import json
+import unittest
+import sys
+
+import luigi
+
+try:
+    from ..base import BaseTest
+except Exception:
+    sys.path.append(os.path.join(os.path.split(__file__)[0], ".."))
+    from base import BaseTest
+
+try:
+    from .slow_task import SlowTaskPolling
+except ImportError:
+    from slow_task import SlowTaskPolling
+
+
+class TestResume(BaseTest):
+    n_blocks = 16
+    max_jobs = 4
+
+    def setUp(self):
+        super().setUp()
+        conf_path = os.path.join(self.config_folder, "global.config")
+        with open(conf_path) as f:
+            global_config = json.load(f)
+        global_config["completion_db"] = True
+        with open(conf_path, "w") as f:
+            json.dump(global_config, f)
+
+    def _run_task(self, output_folder):
+        # each call to build uses a new scheduler
+        return luigi.build([SlowTaskPolling(output_folder=output_folder,
+                                            n_blocks=self.n_blocks,
+                                            delay=0.,
+                                            config_dir=self.config_folder,
+                                            tmp_folder=self.tmp_folder,
+                                            max_jobs=self.max_jobs)], local_scheduler=True)
+
+    def test_resume(self):
+        import cluster_tools.utils.completion_utils as cu
+        output_folder = os.path.join(self.tmp_folder, "blocks")
+        all_blocks = set("block_%i" % block_id for block_id in range(self.n_blocks))
+
+        # the job that processes block 5 fails, because the block can't be written
+        os.makedirs(os.path.join(output_folder, "block_5"))
+        self.assertFalse(self._run_task(output_folder))
+        os.rmdir(os.path.join(output_folder, "block_5"))
+        processed = set(os.listdir(output_folder))
+        self.assertTrue(processed)
+        self.assertNotIn("block_5", processed)
+        for name in processed:
+            os.remove(os.path.join(output_folder, name))
+
+        # the new run only processes the blocks that were not processed in the first run
+        self.assertTrue(self._run_task(output_folder))
+        self.assertEqual(set(os.listdir(output_folder)), all_blocks - processed)
+        with open(os.path.join(self.tmp_folder, "slow_task.log")) as f:
+            self.assertIn("skipping %i / %i blocks" % (len(processed), self.n_blocks), f.read())
+
+        # the processed blocks are removed once the task has finished
+        self.assertEqual(cu.get_passed_blocks(cu.get_db_path(self.tmp_folder), "slow_task"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,9 +14,9 @@ except Exception:
     from base import BaseTest
 
 try:
-    from .failing_task import FailingTaskLocal
+    from .failing_task import FailingTaskLocal, FailingTaskExecutor
 except ImportError:
-    from failing_task import FailingTaskLocal
+    from failing_task import FailingTaskLocal, FailingTaskExecutor
 
 
 class TestRetry(BaseTest):
@@ -32,8 +32,15 @@ class TestRetry(BaseTest):
         with open(conf_path, "w") as f:
             json.dump(global_config, f)
 
-    def test_retry(self):
-        task = FailingTaskLocal
+    def _set_worker_pool(self):
+        conf_path = os.path.join(self.config_folder, "global.config")
+        with open(conf_path) as f:
+            global_config = json.load(f)
+        global_config["local_worker_pool"] = True
+        with open(conf_path, "w") as f:
+            json.dump(global_config, f)
+
+    def _test_retry(self, task=FailingTaskLocal):
         ret = luigi.build([task(output_path=self.output_path,
                                 output_key=self.output_key,
                                 shape=self.shape,
@@ -45,6 +52,18 @@ class TestRetry(BaseTest):
             data = f[self.output_key][:]
         self.assertTrue(np.allclose(data, 1))
 
+    def test_retry(self):
+        self._test_retry()
+
+    def test_retry_worker_pool(self):
+        self._set_worker_pool()
+        self._test_retry()
+
+    def test_retry_executor(self):
+        self._test_retry(FailingTaskExecutor)
+        # the job configs are passed in memory
+        self.assertFalse(any(name.endswith(".config") for name in os.listdir(self.tmp_folder)))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+import os
+import json
+import unittest
+import sys
+
+import luigi
+
+try:
+    from ..base import BaseTest
+except Exception:
+    sys.path.append(os.path.join(os.path.split(__file__)[0], ".."))
+    from base import BaseTest
+
+try:
+    from .slow_task import SlowTaskPolling
+except ImportError:
+    from slow_task import SlowTaskPolling
+
+
+class TestSpeculation(BaseTest):
+    n_blocks = 16
+    max_jobs = 4
+    delay = 2.
+
+    def setUp(self):
+        super().setUp()
+        conf_path = os.path.join(self.config_folder, "global.config")
+        with open(conf_path) as f:
+            global_config = json.load(f)
+        global_config["speculative_fraction"] = 0.5
+        with open(conf_path, "w") as f:
+            json.dump(global_config, f)
+
+    def test_speculation(self):
+        output_folder = os.path.join(self.tmp_folder, "blocks")
+        ret = luigi.build([SlowTaskPolling(output_folder=output_folder,
+                                           n_blocks=self.n_blocks,
+                                           delay=self.delay,
+                                           config_dir=self.config_folder,
+                                           tmp_folder=self.tmp_folder,
+                                           max_jobs=self.max_jobs)], local_scheduler=True)
+        self.assertTrue(ret)
+        self.assertEqual(sorted(os.listdir(output_folder)),
+                         sorted("block_%i" % block_id for block_id in range(self.n_blocks)))
+
+        # the straggler has been copied and cancelled once its copy was done
+        with open(os.path.join(self.tmp_folder, "slow_task.log")) as f:
+            log = f.read()
+        self.assertIn("submitting copies of the jobs 0", log)
+        self.assertIn("cancel the jobs 0", log)
+
+
+if __name__ == "__main__":
+    unittest.main()
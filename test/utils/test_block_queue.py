@@ -0,0 +1,51 @@
+import os
+import unittest
+from concurrent import futures
+from shutil import rmtree
+
+
+class TestBlockQueue(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def test_block_queue(self):
+        import cluster_tools.utils.block_queue as bq
+        db_path = bq.get_db_path(self.tmp_dir)
+        block_list = list(range(100))
+        bq.create_queue(db_path, "task", block_list)
+
+        # pull the blocks from several "jobs" with several threads each
+        def pull(job_id):
+            queue = bq.job_blocks({"block_queue": db_path, "queue_name": "task"}, job_id)
+            with futures.ThreadPoolExecutor(2) as tp:
+                results = [tp.submit(lambda: list(queue)) for _ in range(2)]
+                return [block_id for res in results for block_id in res.result()]
+
+        with futures.ThreadPoolExecutor(4) as tp:
+            claimed = list(tp.map(pull, range(4)))
+
+        # each block must be claimed exactly once
+        all_claimed = [block_id for job_blocks in claimed for block_id in job_blocks]
+        self.assertEqual(sorted(all_claimed), block_list)
+        for job_id, job_blocks in enumerate(claimed):
+            self.assertEqual(sorted(bq.get_claimed_blocks(db_path, "task", [job_id])), sorted(job_blocks))
+
+        # re-creating the queue resets it
+        bq.create_queue(db_path, "task", [3, 5])
+        self.assertEqual(list(bq.BlockQueue(db_path, "task", 0)), [3, 5])
+
+    def test_job_blocks_without_queue(self):
+        from cluster_tools.utils.block_queue import job_blocks
+        self.assertEqual(job_blocks({"block_list": [1, 2, 3]}, 0), [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import unittest
+from shutil import rmtree
+
+
+class TestBlockWeights(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def test_partition_by_weights(self):
+        from cluster_tools.cluster_tasks import BaseClusterTask
+        block_weights = {0: 7., 1: 5., 2: 4., 3: 3., 4: 3., 5: 2.}
+        partition, job_weights = BaseClusterTask._partition_by_weights(list(range(6)), block_weights, 2)
+        # longest processing time first: 7 -> 0, 5 -> 1, 4 -> 1, 3 -> 0, 3 -> 1, 2 -> 0
+        self.assertEqual(partition, [[0, 3, 5], [1, 2, 4]])
+        self.assertEqual(job_weights, [12., 12.])
+
+        # the heuristic is not optimal: the best makespan is 6 (3 + 3 and 2 + 2 + 2)
+        block_weights = {0: 3., 1: 3., 2: 2., 3: 2., 4: 2.}
+        partition, job_weights = BaseClusterTask._partition_by_weights(list(range(5)), block_weights, 2)
+        self.assertEqual(max(job_weights), 7.)
+        self.assertEqual(sorted(sum(partition, [])), list(range(5)))
+
+    def test_default_weight(self):
+        from cluster_tools.cluster_tasks import BaseClusterTask
+        # blocks without a weight get the mean weight
+        partition, job_weights = BaseClusterTask._partition_by_weights([0, 1, 2], {0: 4., 1: 2.}, 3)
+        self.assertEqual(partition, [[0], [2], [1]])
+        self.assertEqual(job_weights, [4., 3., 2.])
+        # and all blocks get the same weight if there are no weights
+        partition, job_weights = BaseClusterTask._partition_by_weights([0, 1, 2, 3], {}, 2)
+        self.assertEqual(sorted(len(job_blocks) for job_blocks in partition), [2, 2])
+        self.assertEqual(job_weights, [2., 2.])
+
+    def test_load_block_weights(self):
+        from cluster_tools.cluster_tasks import LocalTask
+        task = LocalTask(tmp_folder=self.tmp_dir, max_jobs=1, config_dir=self.tmp_dir)
+        self.assertIsNone(task._load_block_weights({"block_weights_path": None}))
+
+        # the block ids are stored as str keys in json
+        weights_path = os.path.join(self.tmp_dir, "weights.json")
+        with open(weights_path, "w") as f:
+            json.dump({3: 1.5, 10: 2}, f)
+        block_weights = task._load_block_weights({"block_weights_path": weights_path})
+        self.assertEqual(block_weights, {3: 1.5, 10: 2.})
+        self.assertTrue(all(isinstance(block_id, int) for block_id in block_weights))
+
+
+if __name__ == "__main__":
+    unittest.main()
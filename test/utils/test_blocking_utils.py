@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+
+
+class TestBlockingUtils(unittest.TestCase):
+
+    def test_read_amplification(self):
+        from cluster_tools.utils.blocking_utils import read_amplification
+        self.assertAlmostEqual(read_amplification([64, 64, 64], [32, 32, 32]), 1.)
+        # chunks that are larger than the block are read completely
+        self.assertAlmostEqual(read_amplification([32, 64, 64], [64, 64, 64]), 2.)
+        # blocks of size 48 always touch 2 chunks of size 32
+        self.assertAlmostEqual(read_amplification([48], [32]), 2 * 32 / 48)
+        # blocks of size 48 touch 3, 3, 4, 3, 3 chunks of size 20
+        self.assertAlmostEqual(read_amplification([48, 64], [20, 64]), 3.2 * 20 / 48)
+
+    def test_plan_block_shape(self):
+        from cluster_tools.utils.blocking_utils import plan_block_shape, read_amplification
+        chunk_shapes = [(32, 64, 64), (16, 128, 128)]
+        block_shape = plan_block_shape([50, 512, 500], chunk_shapes)
+        self.assertEqual(block_shape, (64, 512, 512))
+        self.assertTrue(all(read_amplification(block_shape, chunks) == 1. for chunks in chunk_shapes))
+
+        # the block is shrunk to fit the memory budget: 64 * 256 * 256 * 4 bytes = 16.8 MB
+        block_shape = plan_block_shape([50, 512, 500], chunk_shapes, max_block_mb=20, itemsize=4)
+        self.assertEqual(block_shape, (64, 256, 256))
+        # the block can not become smaller than the common multiple of the chunks
+        block_shape = plan_block_shape([50, 512, 500], chunk_shapes, max_block_mb=0.1)
+        self.assertEqual(block_shape, (32, 128, 128))
+
+    def test_blocks_in_regions(self):
+        from cluster_tools.utils.blocking_utils import blocks_in_regions, block_regions
+        shape, block_shape = (100, 100), (50, 40)
+        # 2 x 3 blocks, the blocks in the last column are cropped
+        block_list = list(range(6))
+        regions = block_regions(shape, block_shape, [2, 3])
+        self.assertEqual(regions, [[[0, 80], [50, 100]], [[50, 0], [100, 40]]])
+
+        regions = [[[10, 45], [20, 50]]]
+        self.assertEqual(blocks_in_regions(shape, block_shape, block_list, regions), [1])
+        self.assertEqual(blocks_in_regions(shape, block_shape, [0, 2, 3], regions), [])
+        # with a halo the neighboring blocks are affected as well
+        self.assertEqual(blocks_in_regions(shape, block_shape, block_list, regions, halo=[0, 6]), [0, 1])
+        self.assertEqual(blocks_in_regions(shape, block_shape, block_list, regions, halo=[31, 0]), [1, 4])
+        self.assertEqual(blocks_in_regions(shape, block_shape, block_list, []), [])
+
+    def test_split_block(self):
+        from cluster_tools.utils.blocking_utils import split_block, split_shape
+        self.assertEqual(split_shape([50, 512, 512], 1), [25, 256, 256])
+        self.assertEqual(split_shape([5, 3], 3), [1, 1])
+
+        # the last block of a volume of shape (100, 90) with block shape (50, 50)
+        begin, end, shape = [50, 50], [100, 90], [100, 90]
+        sub_blocks = split_block(begin, end, [25, 25], shape)
+        self.assertEqual(len(sub_blocks), 4)
+        covered = np.zeros(shape, dtype="uint8")
+        for input_bb, inner_bb, output_bb, _ in sub_blocks:
+            self.assertEqual(input_bb, output_bb)
+            covered[output_bb] += 1
+        self.assertTrue((covered[50:, 50:] == 1).all())
+        self.assertEqual(covered.sum(), 50 * 40)
+        # the voxel offsets are the number of voxels of the previous sub-blocks
+        self.assertEqual([sub_block[-1] for sub_block in sub_blocks], [0, 625, 1000, 1625])
+
+        # the halo is clipped to the volume
+        sub_blocks = split_block(begin, end, [25, 25], shape, halo=[4, 4])
+        input_bb, inner_bb, output_bb, _ = sub_blocks[-1]
+        self.assertEqual(input_bb, np.s_[71:100, 71:90])
+        self.assertEqual(output_bb, np.s_[75:100, 75:90])
+        self.assertEqual(inner_bb, np.s_[4:29, 4:19])
+
+    def test_order_blocks(self):
+        from cluster_tools.utils.blocking_utils import order_blocks
+        shape, block_shape = (64, 64, 64), (8, 8, 8)
+        block_list = list(range(512))
+        for order in ("morton", "hilbert"):
+            ordered = order_blocks(shape, block_shape, block_list, order)
+            self.assertEqual(sorted(ordered), block_list)
+            # the first 8 blocks form a 2x2x2 cube
+            positions = np.array(np.unravel_index(ordered[:8], (8, 8, 8))).T
+            self.assertEqual(positions.max(axis=0).tolist(), [1, 1, 1])
+        # consecutive blocks along the hilbert curve are neighbors
+        ordered = order_blocks(shape, block_shape, block_list, "hilbert")
+        positions = np.array(np.unravel_index(ordered, (8, 8, 8))).T
+        self.assertTrue((np.abs(np.diff(positions, axis=0)).sum(axis=1) == 1).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
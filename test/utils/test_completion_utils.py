@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import unittest
+from shutil import rmtree
+
+
+class TestCompletionUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _run_job(self, db_path, job_name, job_id, block_list):
+        import cluster_tools.utils.completion_utils as cu
+        config_path = os.path.join(self.tmp_dir, "%s_job_%i.config" % (job_name, job_id))
+        with open(config_path, "w") as f:
+            json.dump({"block_list": block_list, "completion_db": db_path, "job_name": job_name}, f)
+        # the job config is passed as first argument to the jobs
+        sys.argv = ["job.py", config_path]
+        for block_id in block_list:
+            cu.mark_block_done(block_id)
+        cu.mark_job_done(job_id)
+
+    def test_completion_db(self):
+        import cluster_tools.utils.completion_utils as cu
+        db_path = cu.get_db_path(self.tmp_dir)
+
+        self._run_job(db_path, "task_a", 0, [0, 2, 4])
+        self._run_job(db_path, "task_a", 2, [1, 3])
+        self._run_job(db_path, "task_b", 1, [5])
+
+        self.assertEqual(cu.get_passed_jobs(db_path, "task_a", 3), [0, 2])
+        self.assertEqual(cu.get_passed_jobs(db_path, "task_a", 2), [0])
+        self.assertEqual(cu.get_passed_jobs(db_path, "task_b", 3), [1])
+        self.assertEqual(sorted(cu.get_passed_blocks(db_path, "task_a")), [0, 1, 2, 3, 4])
+
+        cu.reset(db_path, "task_a", reset_blocks=False)
+        self.assertEqual(cu.get_passed_jobs(db_path, "task_a", 3), [])
+        self.assertEqual(sorted(cu.get_passed_blocks(db_path, "task_a")), [0, 1, 2, 3, 4])
+        cu.reset(db_path, "task_a")
+        self.assertEqual(cu.get_passed_blocks(db_path, "task_a"), [])
+        self.assertEqual(cu.get_passed_blocks(db_path, "task_b"), [5])
+
+    def test_run_key(self):
+        import cluster_tools.utils.completion_utils as cu
+        # use a new db, because the connections are cached per path
+        tmp_folder = os.path.join(self.tmp_dir, "run_key")
+        os.makedirs(tmp_folder)
+        db_path = cu.get_db_path(tmp_folder)
+
+        cu.reset(db_path, "task_c", run_key="a")
+        self._run_job(db_path, "task_c", 0, [0, 1])
+        # the blocks are kept for the same run key, but not the jobs
+        cu.reset(db_path, "task_c", run_key="a")
+        self.assertEqual(sorted(cu.get_passed_blocks(db_path, "task_c")), [0, 1])
+        self.assertEqual(cu.get_passed_jobs(db_path, "task_c", 1), [])
+        # and removed for a different run key
+        cu.reset(db_path, "task_c", run_key="b")
+        self.assertEqual(cu.get_passed_blocks(db_path, "task_c"), [])
+
+        # the key is removed by a reset without a key
+        self._run_job(db_path, "task_c", 0, [2])
+        cu.reset(db_path, "task_c")
+        self._run_job(db_path, "task_c", 0, [3])
+        cu.reset(db_path, "task_c", run_key="b")
+        self.assertEqual(cu.get_passed_blocks(db_path, "task_c"), [])
+
+    def test_no_completion_db(self):
+        import cluster_tools.utils.completion_utils as cu
+        config_path = os.path.join(self.tmp_dir, "task_job_0.config")
+        with open(config_path, "w") as f:
+            json.dump({"block_list": [0]}, f)
+        sys.argv = ["job.py", config_path]
+        cu.mark_block_done(0)
+        self.assertFalse(os.path.exists(cu.get_db_path(self.tmp_dir)))
+
+
+if __name__ == "__main__":
+    unittest.main()
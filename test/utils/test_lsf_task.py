@@ -0,0 +1,76 @@
+import json
+import os
+import unittest
+from shutil import rmtree
+
+
+class TestLSFTask(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _get_task(self, global_config):
+        from cluster_tools.cluster_tasks import LSFTask
+
+        class DummyLSFTask(LSFTask):
+            task_name = "dummy"
+            allow_speculation = True
+
+        with open(os.path.join(self.tmp_dir, "global.config"), "w") as f:
+            json.dump(global_config, f)
+        return DummyLSFTask(tmp_folder=self.tmp_dir, max_jobs=10, config_dir=self.tmp_dir)
+
+    def test_array_script(self):
+        from cluster_tools.utils.thread_utils import THREAD_ENV_VARS
+        task = self._get_task({"job_array": True, "limit_job_threads": True})
+        self.assertTrue(task._use_job_array())
+        task._write_array_script(None, 4)
+
+        script_path = os.path.join(self.tmp_dir, "lsf_dummy.sh")
+        self.assertTrue(os.access(script_path, os.X_OK))
+        with open(script_path) as f:
+            script = f.read().split("\n")
+
+        # the lsf array indices start at 1, the job ids at 0
+        self.assertEqual(script[:2], ["#!/bin/bash", "JOB_ID=$((LSB_JOBINDEX - 1))"])
+        for var in THREAD_ENV_VARS:
+            self.assertIn("export %s=4" % var, script)
+        # the job config and the logs are selected by the job id
+        exp_cmd = "%s %s > %s 2> %s" % (os.path.join(self.tmp_dir, "dummy.py"),
+                                        os.path.join(self.tmp_dir, "dummy_job_$JOB_ID.config"),
+                                        os.path.join(self.tmp_dir, "logs", "dummy_$JOB_ID.log"),
+                                        os.path.join(self.tmp_dir, "error_logs", "dummy_$JOB_ID.err"))
+        self.assertIn(exp_cmd, script)
+
+    def test_array_script_prefix(self):
+        task = self._get_task({"job_array": True})
+        task._write_array_script("s0", 1)
+        with open(os.path.join(self.tmp_dir, "lsf_dummy_s0.sh")) as f:
+            script = f.read().split("\n")
+        # no thread limits if they are not enabled
+        self.assertFalse(any(line.startswith("export") for line in script))
+        self.assertIn("dummy_job_s0_$JOB_ID.config", script[2])
+        self.assertIn("dummy_s0_$JOB_ID.log", script[2])
+
+    def test_no_speculation_for_array(self):
+        self.assertFalse(self._get_task({"job_array": True, "speculative_fraction": 0.5})._use_speculation())
+        self.assertTrue(self._get_task({"speculative_fraction": 0.5})._use_speculation())
+
+    def test_array_finished(self):
+        from cluster_tools.cluster_tasks import LSFTask
+        self.assertFalse(LSFTask._array_finished("DONE\nRUN\nPEND\n"))
+        self.assertFalse(LSFTask._array_finished("EXIT\nPEND\n"))
+        self.assertTrue(LSFTask._array_finished("DONE\nEXIT\nDONE\n"))
+        # bjobs does not know the array anymore once it has finished for a while
+        self.assertTrue(LSFTask._array_finished("Job <1234> is not found\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
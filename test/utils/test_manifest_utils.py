@@ -0,0 +1,59 @@
+import json
+import os
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+
+class TestManifestUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def test_manifest(self):
+        import cluster_tools.utils.manifest_utils as mfu
+        from cluster_tools.utils.job_utils import load_job_config
+        job_blocks = [[0, 3, 6], [1, 4], [], [2, 5]]
+        self.assertTrue(mfu.is_block_list(sum(job_blocks, [])))
+        self.assertFalse(mfu.is_block_list(["a.tif", "b.tif"]))
+
+        manifest_path = os.path.join(self.tmp_dir, "task" + mfu.MANIFEST_EXT)
+        block_ranges = mfu.write_manifest(manifest_path, job_blocks)
+        self.assertEqual(block_ranges, [[0, 3], [3, 5], [5, 5], [5, 7]])
+
+        for job_id, (blocks, block_range) in enumerate(zip(job_blocks, block_ranges)):
+            self.assertEqual(mfu.load_job_blocks(manifest_path, block_range), blocks)
+            # the block list is loaded from the manifest together with the job config
+            config_path = os.path.join(self.tmp_dir, "task_job_%i.config" % job_id)
+            with open(config_path, "w") as f:
+                json.dump({"block_manifest": manifest_path, "block_range": block_range, "threshold": .5}, f)
+            self.assertEqual(load_job_config(config_path), {"block_list": blocks, "threshold": .5})
+
+    def test_block_offsets(self):
+        import cluster_tools.utils.manifest_utils as mfu
+        # 5 blocks with 3, 0, 2, 0 and 4 labels
+        offsets, empty_blocks, n_labels = [0, 3, 3, 5, 5], [1, 3], 9
+        json_path = os.path.join(self.tmp_dir, "offsets.json")
+        with open(json_path, "w") as f:
+            json.dump({"offsets": offsets, "empty_blocks": empty_blocks, "n_labels": n_labels}, f)
+        npy_path = os.path.join(self.tmp_dir, "offsets.npy")
+        mfu.save_block_offsets(npy_path, offsets, n_labels)
+        self.assertEqual(np.load(npy_path).tolist(), offsets + [n_labels])
+
+        for path in (json_path, npy_path):
+            loaded_offsets, loaded_empty, loaded_n_labels = mfu.load_block_offsets(path)
+            self.assertEqual([loaded_offsets[block_id] for block_id in range(5)], offsets)
+            self.assertEqual([block_id for block_id in range(5) if block_id in loaded_empty], empty_blocks)
+            self.assertEqual(loaded_n_labels, n_labels)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+
+class TestMemoryUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        import cluster_tools.utils.memory_utils as mu
+        mu.stop_watchdog()
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _start_job(self, job_id, mem_limit):
+        import cluster_tools.utils.function_utils as fu
+        config_path = os.path.join(self.tmp_dir, "task_job_%i.config" % job_id)
+        with open(config_path, "w") as f:
+            json.dump({"block_list": [0, 1], "memory_watchdog": True, "memory_watchdog_interval": 0.01,
+                       "mem_limit": mem_limit}, f)
+        # the job config is passed as first argument to the jobs
+        sys.argv = ["job.py", config_path]
+        fu.load_job_config(config_path)
+        return config_path
+
+    def test_block_memory(self):
+        import cluster_tools.utils.function_utils as fu
+        import cluster_tools.utils.memory_utils as mu
+        config_path = self._start_job(0, mem_limit=1000.)
+        for block_id in (0, 1):
+            fu.log_block_start(block_id)
+            # allocate (and touch) 100 MB for the second block
+            data = np.ones(int(1e8) if block_id == 1 else 1, dtype="uint8")
+            fu.log_block_success(block_id)
+            del data
+        fu.log_job_success(0)
+
+        records = mu.load_block_memory([mu.get_memory_path(config_path)])
+        self.assertEqual([rec["block_id"] for rec in records], [0, 1])
+        summary = mu.summarize_block_memory(records)
+        self.assertEqual(summary["n_blocks"], 2)
+        self.assertEqual(summary["largest_block"], 1)
+        self.assertGreater(summary["block_increase_mb"]["p100"], 90)
+
+    def test_stop(self):
+        import cluster_tools.utils.function_utils as fu
+        # the memory limit is below the memory of this process, so the job stops before the first block
+        self._start_job(1, mem_limit=1.e-3)
+        with self.assertRaises(MemoryError):
+            fu.log_block_start(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
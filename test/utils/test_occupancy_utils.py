@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+
+class TestOccupancyUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+    shape = (64, 64, 64)
+    chunks = (16, 16, 16)
+    block_shape = (32, 32, 32)
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    # we only need the files of the dataset and the chunks to derive the index
+    def _make_n5(self, chunk_ids):
+        ds_path = os.path.join(self.tmp_dir, "data.n5", "seg")
+        os.makedirs(ds_path)
+        with open(os.path.join(ds_path, "attributes.json"), "w") as f:
+            json.dump({"dimensions": self.shape[::-1], "blockSize": self.chunks[::-1]}, f)
+        for chunk_id in chunk_ids:
+            # n5 stores the chunks with the axes in reversed order
+            chunk_path = os.path.join(ds_path, *map(str, chunk_id[::-1]))
+            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+            open(chunk_path, "w").close()
+        return os.path.join(self.tmp_dir, "data.n5"), "seg"
+
+    def _make_zarr(self, chunk_ids):
+        ds_path = os.path.join(self.tmp_dir, "data.zarr", "seg")
+        os.makedirs(ds_path)
+        with open(os.path.join(ds_path, ".zarray"), "w") as f:
+            json.dump({"shape": self.shape, "chunks": self.chunks}, f)
+        for chunk_id in chunk_ids:
+            open(os.path.join(ds_path, ".".join(map(str, chunk_id))), "w").close()
+        return os.path.join(self.tmp_dir, "data.zarr"), "seg"
+
+    def _check_derived(self, make_dataset):
+        import cluster_tools.utils.occupancy_utils as ou
+        # chunk (0, 0, 0) is in block 0, chunk (3, 1, 2) in block (1, 0, 1) = 5
+        path, key = make_dataset([(0, 0, 0), (3, 1, 2)])
+        index = ou.derive_index(path, key, self.shape, self.chunks, self.block_shape)
+        self.assertEqual(len(index["known"]), 8)
+        self.assertEqual(ou.empty_blocks(index, list(range(8))), [1, 2, 3, 4, 6, 7])
+        self.assertEqual(ou.empty_blocks(index, [0, 5, 7]), [7])
+
+    def test_derive_index(self):
+        self._check_derived(self._make_n5)
+        rmtree(self.tmp_dir)
+        self._check_derived(self._make_zarr)
+
+    def test_record_blocks(self):
+        import cluster_tools.utils.occupancy_utils as ou
+        config_path = os.path.join(self.tmp_dir, "write_job_0.config")
+        with open(config_path, "w") as f:
+            json.dump({"block_list": [0, 1], "occupancy_record": True}, f)
+        # the job config is passed as first argument to the jobs
+        sys.argv = ["job.py", config_path]
+        ou.record_block(0, np.zeros((4, 4), dtype="uint64"))
+        ou.record_block(1, np.arange(16, dtype="uint64").reshape((4, 4)))
+        records = ou.load_records([ou.get_occupancy_path(config_path)])
+        self.assertEqual(len(records), 2)
+
+        index_path = ou.get_index_path(os.path.join(self.tmp_dir, "index"), "data.n5", "seg", self.block_shape)
+        index = ou.update_index(ou.empty_index(self.shape, self.block_shape), records)
+        ou.save_index(index_path, index)
+        index = ou.load_index(index_path)
+        self.assertEqual(ou.empty_blocks(index, list(range(8))), [0])
+        self.assertEqual(index["max"][1], 15)
+
+        ou.remove_indices(os.path.join(self.tmp_dir, "index"), "data.n5", "seg")
+        self.assertIsNone(ou.load_index(index_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
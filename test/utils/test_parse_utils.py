@@ -0,0 +1,49 @@
+import os
+import unittest
+from shutil import rmtree
+
+
+class TestParseUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _write_log(self, path, lines):
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_parse_block_runtimes(self):
+        from cluster_tools.utils.parse_utils import parse_block_runtimes, parse_block_runtimes_task
+        log_prefix = os.path.join(self.tmp_dir, "task_")
+        self._write_log(log_prefix + "0.log", [
+            "2021-03-04 10:00:00.000000: start processing job 0",
+            "2021-03-04 10:00:00.500000: start processing block 3",
+            "2021-03-04 10:00:02.000000: processed block 3",
+            "2021-03-04 10:00:02.000000: start processing block 7",
+            "Traceback (most recent call last):",
+            "2021-03-04 10:01:02.250000: processed block 7",
+            # blocks without a start message are not taken into account
+            "2021-03-04 10:01:03.000000: processed block 8",
+            "2021-03-04 10:01:03.000000: processed job 0",
+        ])
+        runtimes = parse_block_runtimes(log_prefix + "0.log")
+        self.assertEqual(runtimes, {3: 1.5, 7: 60.25})
+
+        # the log of job 1 is missing
+        self._write_log(log_prefix + "2.log", [
+            "2021-03-04 10:00:00.000000: start processing block 1",
+            "2021-03-04 10:00:04.000000: processed block 1",
+        ])
+        runtimes = parse_block_runtimes_task(log_prefix, 3)
+        self.assertEqual(runtimes, {1: 4., 3: 1.5, 7: 60.25})
+
+
+if __name__ == "__main__":
+    unittest.main()
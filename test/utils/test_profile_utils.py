@@ -0,0 +1,51 @@
+import os
+import pstats
+import sys
+import unittest
+from shutil import rmtree
+
+
+class TestProfileUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(os.path.join(self.tmp_dir, "logs"), exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def test_profiles(self):
+        import cluster_tools.utils.profile_utils as pu
+        script_path = os.path.join(self.tmp_dir, "job.py")
+        with open(script_path, "w") as f:
+            f.write("import sys\n\n"
+                    "def job_function(n):\n"
+                    "    return sum(range(n))\n\n"
+                    "if __name__ == '__main__':\n"
+                    "    assert sys.argv[1].endswith('.config')\n"
+                    "    job_function(1000)\n")
+
+        profile_paths = []
+        for job_id in range(3):
+            config_path = os.path.join(self.tmp_dir, "task_job_%i.config" % job_id)
+            sys.argv = [script_path, config_path]
+            pu.run_profiled(script_path, config_path)
+            profile_path = pu.get_profile_path(config_path)
+            self.assertEqual(profile_path, os.path.join(self.tmp_dir, "logs", "task_job_%i.prof" % job_id))
+            self.assertTrue(os.path.exists(profile_path))
+            profile_paths.append(profile_path)
+
+        out_path = os.path.join(self.tmp_dir, "profile_task.prof")
+        self.assertTrue(pu.merge_profiles(profile_paths, out_path))
+        stats = pstats.Stats(out_path).stats
+        n_calls = [stat[1] for func, stat in stats.items() if func[2] == "job_function"]
+        self.assertEqual(n_calls, [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+
+class TestReduceUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def test_reducers(self):
+        import cluster_tools.utils.reduce_utils as rdu
+        uniques = rdu.merge_uniques([np.array([1, 3]), np.array([2, 3, 5])])
+        self.assertTrue(np.array_equal(uniques, [1, 2, 3, 5]))
+
+        counts = rdu.merge_counts([np.array([[1, 2], [3, 1]]), np.array([[3, 4], [5, 1]])])
+        self.assertTrue(np.array_equal(counts, [[1, 2], [3, 5], [5, 1]]))
+
+        # components {1, 4, 7} and {2, 9}
+        pairs = rdu.merge_union_find([np.array([[4, 7], [2, 9]]), np.array([[7, 1]])])
+        self.assertTrue(np.array_equal(pairs, [[1, 1], [2, 2], [4, 1], [7, 1], [9, 2]]))
+
+        data = [np.random.rand(100), np.random.rand(50) + 1]
+        stats = [{"mean": d.mean(), "variance": d.var(), "min": d.min(), "max": d.max(), "size": d.size}
+                 for d in data]
+        stats = rdu.merge_moments(stats)
+        data = np.concatenate(data)
+        self.assertAlmostEqual(stats["mean"], data.mean())
+        self.assertAlmostEqual(stats["std"], data.std())
+        self.assertEqual(stats["size"], data.size)
+
+    def test_reduce_tree(self):
+        import cluster_tools.utils.reduce_utils as rdu
+        values = [np.random.randint(0, 1000, size=100) for _ in range(10)]
+        paths = []
+        for ii, val in enumerate(values):
+            paths.append(os.path.join(self.tmp_dir, "uniques_%i.npy" % ii))
+            np.save(paths[-1], np.unique(val))
+
+        # run the levels of the tree with a fan-in of 3 in a single job
+        level = 0
+        while len(paths) > 3:
+            groups = rdu.plan_level(paths, 3)
+            outputs = [rdu.level_output_path(self.tmp_dir, "merge", "unique", level, group_id)
+                       for group_id in range(len(groups))]
+            config = {"reducer": "unique", "reduce_groups": groups, "reduce_outputs": outputs,
+                      "block_list": list(range(len(groups)))}
+            self.assertTrue(rdu.is_reduce_job(config))
+            rdu.run_reduce_job(config)
+            paths, level = outputs, level + 1
+        self.assertEqual(level, 2)
+
+        uniques = rdu.reduce_partials("unique", paths)
+        self.assertTrue(np.array_equal(uniques, np.unique(np.concatenate(values))))
+        missing = [os.path.join(self.tmp_dir, "missing.npy")]
+        with self.assertRaises(FileNotFoundError):
+            rdu.reduce_partials("unique", missing)
+        self.assertIsNone(rdu.reduce_partials("unique", missing, allow_missing=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import unittest
+from shutil import rmtree
+
+
+class TestResourceUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _run_job(self, job_id, block_list, record_resources=True):
+        import cluster_tools.utils.function_utils as fu
+        import cluster_tools.utils.resource_utils as ru
+        config_path = os.path.join(self.tmp_dir, "task_job_%i.config" % job_id)
+        with open(config_path, "w") as f:
+            json.dump({"block_list": block_list, "record_resources": record_resources}, f)
+        # the job config is passed as first argument to the jobs
+        sys.argv = ["job.py", config_path]
+        ru.start_job()
+        fu.log_job_success(job_id)
+        return ru.get_resources_path(config_path)
+
+    def test_record_resources(self):
+        path = self._run_job(0, [0, 1, 2])
+        self.assertTrue(os.path.exists(path))
+        with open(path) as f:
+            record = json.load(f)
+        self.assertEqual(record["job_id"], 0)
+        self.assertEqual(record["n_blocks"], 3)
+        self.assertGreater(record["peak_rss_mb"], 0)
+        self.assertGreaterEqual(record["runtime_s"], 0)
+        # the cpu time is counted from the start of the job, not of the process
+        import cluster_tools.utils.resource_utils as ru
+        self.assertLess(record["cpu_s"], ru._cpu_time())
+
+        path = self._run_job(1, [3], record_resources=False)
+        self.assertFalse(os.path.exists(path))
+
+    def test_oom_failure(self):
+        import cluster_tools.utils.resource_utils as ru
+        config_path = os.path.join(self.tmp_dir, "oom_task_job_0.config")
+        with open(config_path, "w") as f:
+            json.dump({"block_list": [0], "record_peak_rss": True}, f)
+        sys.argv = ["job.py", config_path]
+        ru.record_peak_rss()
+        peak_rss = ru.load_peak_rss(ru.get_peak_rss_path(config_path))
+        self.assertGreater(peak_rss, 0)
+
+        self.assertTrue(ru.is_oom_failure(state="OUT_OF_MEMORY"))
+        self.assertFalse(ru.is_oom_failure(state="FAILED"))
+        self.assertTrue(ru.is_oom_failure(peak_rss_mb=peak_rss, rss_limit_mb=peak_rss))
+        self.assertFalse(ru.is_oom_failure(peak_rss_mb=peak_rss, rss_limit_mb=2 * peak_rss))
+
+        log_path = os.path.join(self.tmp_dir, "task_0.err")
+        with open(log_path, "w") as f:
+            f.write("Traceback (most recent call last):\nRuntimeError: Fail\n")
+        self.assertFalse(ru.is_oom_failure(log_paths=[log_path, "missing.log"]))
+        with open(log_path, "a") as f:
+            f.write("numpy.core._exceptions._ArrayMemoryError: Unable to allocate 8.00 GiB\n")
+        self.assertTrue(ru.is_oom_failure(log_paths=[log_path]))
+
+    def test_estimate_resources(self):
+        import cluster_tools.utils.resource_utils as ru
+        history_path = os.path.join(self.tmp_dir, "history", "resources.jsonl")
+        self.assertEqual(ru.load_history(history_path, "task", [10, 10]), [])
+
+        records = [{"job_id": job_id, "runtime_s": 60. * (job_id + 1), "cpu_s": 120. * (job_id + 1),
+                    "peak_rss_mb": 1024. * (job_id + 1), "n_blocks": 10} for job_id in range(10)]
+        ru.append_history(history_path, "task", [10, 10], records)
+        ru.append_history(history_path, "task", [20, 20], records[:1])
+        ru.append_history(history_path, "other_task", [10, 10], records[:1])
+
+        history = ru.load_history(history_path, "task", [10, 10])
+        self.assertEqual(len(history), 10)
+        self.assertEqual(ru.estimate_resources([]), {})
+
+        # 95th percentile of 1 ... 10 GB is 9.55 GB
+        estimate = ru.estimate_resources(history, percentile=95, margin=1.)
+        self.assertAlmostEqual(estimate["mem_limit"], 9.55)
+        self.assertEqual(estimate["time_limit"], 10)
+        self.assertEqual(estimate["threads_per_job"], 2)
+
+        # the time limit is scaled by the number of blocks per job
+        estimate = ru.estimate_resources(history, blocks_per_job=20, percentile=95, margin=1.)
+        self.assertEqual(estimate["time_limit"], 20)
+        estimate = ru.estimate_resources(history, blocks_per_job=20, percentile=95, margin=1.5)
+        self.assertEqual(estimate["time_limit"], 29)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import unittest
+from shutil import rmtree
+
+
+class TestSlurmTask(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def tearDown(self):
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _get_task(self, global_config):
+        from cluster_tools.cluster_tasks import SlurmTask
+
+        class DummySlurmTask(SlurmTask):
+            task_name = "dummy"
+
+        with open(os.path.join(self.tmp_dir, "global.config"), "w") as f:
+            json.dump(global_config, f)
+        return DummySlurmTask(tmp_folder=self.tmp_dir, max_jobs=10, config_dir=self.tmp_dir)
+
+    def _read_script(self, job_name="dummy"):
+        with open(os.path.join(self.tmp_dir, "slurm_%s.sh" % job_name)) as f:
+            return f.read().split("\n")
+
+    def test_array_script(self):
+        task = self._get_task({"job_array": True, "job_array_limit": 4, "easybuild": False})
+        self.assertTrue(task._use_job_array())
+        task._write_slurm_file(n_jobs=10)
+        script = self._read_script()
+
+        self.assertIn("#SBATCH --array=0-9%4", script)
+        self.assertIn("#SBATCH -J dummy", script)
+        # the log files are named by the array task id
+        self.assertIn("#SBATCH -o %s" % os.path.join(self.tmp_dir, "logs", "dummy_%a.log"), script)
+        self.assertIn("#SBATCH -e %s" % os.path.join(self.tmp_dir, "error_logs", "dummy_%a.err"), script)
+        # and the job config is selected by the array task id
+        self.assertEqual(script[-1], "%s %s" % (os.path.join(self.tmp_dir, "dummy.py"),
+                                                os.path.join(self.tmp_dir, "dummy_job_$SLURM_ARRAY_TASK_ID.config")))
+
+    def test_array_script_no_limit(self):
+        task = self._get_task({"job_array": True, "easybuild": False})
+        task._write_slurm_file(job_prefix="s0", n_jobs=3)
+        script = self._read_script("dummy_s0")
+        self.assertIn("#SBATCH --array=0-2", script)
+        self.assertIn("#SBATCH -J dummy_s0", script)
+        self.assertTrue(script[-1].endswith("dummy_job_s0_$SLURM_ARRAY_TASK_ID.config"))
+
+    def test_single_job_script(self):
+        task = self._get_task({"easybuild": False})
+        self.assertFalse(task._use_job_array())
+        task._write_slurm_file()
+        script = self._read_script()
+        self.assertFalse(any(line.startswith("#SBATCH --array") for line in script))
+        # the job config is passed as argument to the script
+        self.assertTrue(script[-1].endswith("dummy_job_$1.config"))
+
+    def test_parse_job_states(self):
+        from cluster_tools.cluster_tasks import SlurmTask
+        outp = ("1234_0|COMPLETED\n"
+                "1234_1|FAILED\n"
+                "1234_2|CANCELLED by 5678\n"
+                "1234_3|CANCELLED+\n"
+                "1234_[4-9%4]|PENDING\n"
+                "\n"
+                "1235|TIMEOUT|\n")
+        states = SlurmTask._parse_job_states(outp)
+        self.assertEqual(states, {"1234_0": "COMPLETED", "1234_1": "FAILED",
+                                  "1234_2": "CANCELLED", "1234_3": "CANCELLED",
+                                  "1234_[4-9%4]": "PENDING", "1235": "TIMEOUT"})
+        self.assertTrue(all(state in SlurmTask.final_states for job_id, state in states.items()
+                            if job_id != "1234_[4-9%4]"))
+        self.assertEqual(SlurmTask._parse_job_states(""), {})
+
+    def test_passed_jobs_from_states(self):
+        task = self._get_task({})
+        # the final states are known for all jobs, so the logs are not checked
+        task.slurm_ids = ["1234_0", "1234_1", "1234_2"]
+        task.slurm_states = {"1234_0": "COMPLETED", "1234_1": "OUT_OF_MEMORY", "1234_2": "COMPLETED"}
+        self.assertEqual(task._passed_jobs("dummy", 3), [0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+
+class TestTelemetryUtils(unittest.TestCase):
+    tmp_dir = "./tmp"
+
+    def setUp(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+        try:
+            rmtree(self.tmp_dir)
+        except OSError:
+            pass
+
+    def _run_job(self, task_name, job_id, block_list, telemetry=True):
+        import cluster_tools.utils.telemetry_utils as tu
+        config_path = os.path.join(self.tmp_dir, "%s_job_%i.config" % (task_name, job_id))
+        with open(config_path, "w") as f:
+            json.dump({"block_list": block_list, "telemetry": telemetry}, f)
+        # the job config is passed as first argument to the jobs
+        sys.argv = ["job.py", config_path]
+        data = np.zeros((10, 10), dtype="uint64")
+        for block_id in block_list:
+            with tu.BlockTelemetry(block_id) as telemetry:
+                block = telemetry.read(data, np.s_[:5, :])
+                telemetry.write(data, np.s_[5:, :], block + 1)
+        return tu.get_telemetry_path(config_path)
+
+    def test_telemetry(self):
+        import cluster_tools.utils.telemetry_utils as tu
+        path_a = self._run_job("task_a", 0, [0, 2, 4])
+        self._run_job("task_a", 1, [1, 3])
+        self._run_job("task_b", 0, [5])
+        self.assertTrue(os.path.exists(path_a))
+
+        files = tu.find_telemetry_files(self.tmp_dir)
+        self.assertEqual(sorted(files.keys()), ["task_a", "task_b"])
+        self.assertEqual(len(files["task_a"]), 2)
+
+        events = tu.load_events(files["task_a"])
+        self.assertEqual(sorted(ev["block_id"] for ev in events), [0, 1, 2, 3, 4])
+        self.assertTrue(all(ev["bytes_read"] == 400 and ev["bytes_written"] == 400 for ev in events))
+
+        summary = tu.summarize_events(events, n_slowest=2)
+        self.assertEqual(summary["n_blocks"], 5)
+        self.assertEqual(len(summary["slowest_blocks"]), 2)
+        self.assertAlmostEqual(summary["mb_read"], 5 * 400 / 1.e6)
+        shares = summary["read_share"] + summary["write_share"] + summary["compute_share"]
+        self.assertAlmostEqual(shares, 1.)
+
+    def test_no_telemetry(self):
+        path = self._run_job("task", 0, [0], telemetry=False)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import threading
+import unittest
+
+
+class TestThreadUtils(unittest.TestCase):
+
+    def test_budget(self):
+        from cluster_tools.utils.thread_utils import ThreadBudget
+        budget = ThreadBudget(8, n_blocks=2)
+        self.assertEqual(budget.block_threads, 2)
+        self.assertEqual(budget.inner_threads, 4)
+
+        budget = ThreadBudget(8, n_blocks=16)
+        self.assertEqual(budget.block_threads, 8)
+        self.assertEqual(budget.inner_threads, 1)
+
+        budget = ThreadBudget(4)
+        self.assertEqual(budget.block_threads, 4)
+        self.assertEqual(budget.inner_threads, 1)
+
+        budget = ThreadBudget(4, n_blocks=0)
+        self.assertEqual(budget.block_threads, 1)
+        self.assertEqual(budget.inner_threads, 4)
+
+    def test_map(self):
+        from cluster_tools.utils.thread_utils import ThreadBudget
+        thread_ids = set()
+
+        def _square(x):
+            thread_ids.add(threading.get_ident())
+            return x ** 2
+
+        for n_threads in (1, 4):
+            thread_ids.clear()
+            budget = ThreadBudget(n_threads, n_blocks=32)
+            res = budget.map(_square, range(32))
+            self.assertEqual(sorted(res), [x ** 2 for x in range(32)])
+            self.assertLessEqual(len(thread_ids), n_threads)
+
+    def test_map_error(self):
+        from cluster_tools.utils.thread_utils import ThreadBudget
+
+        def _fail(x):
+            if x == 3:
+                raise RuntimeError("block failed")
+            return x
+
+        with self.assertRaises(RuntimeError):
+            ThreadBudget(4).map(_fail, range(8))
+
+    def test_thread_env(self):
+        from cluster_tools.utils.thread_utils import thread_env, THREAD_ENV_VARS
+        env = thread_env(3)
+        self.assertEqual(set(env), set(THREAD_ENV_VARS))
+        self.assertTrue(all(val == "3" for val in env.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
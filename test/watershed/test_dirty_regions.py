@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import unittest
+
+import numpy as np
+import luigi
+import z5py
+
+import nifty.distributed as ndist
+
+try:
+    from ..base import BaseTest
+except Exception:
+    sys.path.append(os.path.join(os.path.split(__file__)[0], ".."))
+    from base import BaseTest
+
+
+class TestDirtyRegions(BaseTest):
+    input_key = "volumes/affinities"
+    affinity_key = "affinities"
+    ws_key = "watershed"
+    graph_key = "graph"
+    # the region of the affinities that is edited
+    region = [[0, 0, 0], [16, 128, 128]]
+
+    def setUp(self):
+        super().setUp()
+        from cluster_tools.watershed import WatershedWorkflow
+        config = WatershedWorkflow.get_config()["watershed"]
+        config["apply_presmooth_2d"] = True
+        config["apply_dt_2d"] = True
+        config["apply_ws_2d"] = True
+        config["threshold"] = 0.25
+        config["sigma_weights"] = 0.
+        config["halo"] = [0, 32, 32]
+        with open(os.path.join(self.config_folder, "watershed.config"), "w") as f:
+            json.dump(config, f)
+
+        # copy the affinities, so that we can edit them
+        with z5py.File(self.input_path, "r") as f:
+            ds = f[self.input_key]
+            ds.n_threads = 4
+            affs = ds[:]
+            chunks = ds.chunks
+        with z5py.File(self.output_path, "a") as f:
+            f.create_dataset(self.affinity_key, data=affs, chunks=chunks, compression="gzip")
+
+    def _edit_affinities(self):
+        bb = (slice(None),) + tuple(slice(beg, end) for beg, end in zip(*self.region))
+        with z5py.File(self.output_path, "a") as f:
+            ds = f[self.affinity_key]
+            ds[bb] = 1. - ds[bb]
+
+    def _set_dirty_regions_path(self, dirty_path):
+        conf_path = os.path.join(self.config_folder, "global.config")
+        with open(conf_path) as f:
+            global_config = json.load(f)
+        global_config["dirty_regions_path"] = dirty_path
+        with open(conf_path, "w") as f:
+            json.dump(global_config, f)
+
+    def _run_workflows(self, tmp_folder, ws_key):
+        from cluster_tools.watershed import WatershedWorkflow
+        from cluster_tools.graph import GraphWorkflow
+        ws_task = WatershedWorkflow(input_path=self.output_path, input_key=self.affinity_key,
+                                    output_path=self.output_path, output_key=ws_key,
+                                    config_dir=self.config_folder, tmp_folder=tmp_folder,
+                                    target=self.target, max_jobs=self.max_jobs)
+        # each run has its own graph, because the sub-graphs are stored in the graph file
+        graph_task = GraphWorkflow(input_path=self.output_path, input_key=ws_key,
+                                   graph_path=os.path.join(tmp_folder, "graph.n5"), output_key=self.graph_key,
+                                   n_scales=1, config_dir=self.config_folder, tmp_folder=tmp_folder,
+                                   target=self.target, max_jobs=self.max_jobs, dependency=ws_task)
+        ret = luigi.build([graph_task], local_scheduler=True)
+        self.assertTrue(ret)
+
+    def _load_results(self, tmp_folder, ws_key):
+        with z5py.File(self.output_path, "r") as f:
+            ds = f[ws_key]
+            ds.n_threads = 4
+            seg = ds[:]
+        graph = ndist.Graph(os.path.join(tmp_folder, "graph.n5"), self.graph_key)
+        return seg, graph.numberOfEdges
+
+    def _check_same_segmentation(self, seg, exp):
+        self.assertEqual(seg.shape, exp.shape)
+        # the ids are different, but the segments are the same
+        pairs = np.unique(np.stack([seg.ravel(), exp.ravel()], axis=1), axis=0)
+        self.assertEqual(len(pairs), len(np.unique(seg)))
+        self.assertEqual(len(pairs), len(np.unique(exp)))
+
+    def test_dirty_regions(self):
+        tmp_folder = os.path.join(self.tmp_folder, "incremental")
+        self._run_workflows(tmp_folder, self.ws_key)
+        seg_before, _ = self._load_results(tmp_folder, self.ws_key)
+
+        # edit the affinities and recompute the dirty regions
+        self._edit_affinities()
+        dirty_path = os.path.abspath(os.path.join(self.tmp_folder, "dirty_regions.json"))
+        with open(dirty_path, "w") as f:
+            json.dump([self.region], f)
+        self._set_dirty_regions_path(dirty_path)
+        self._run_workflows(tmp_folder, self.ws_key)
+        seg, n_edges = self._load_results(tmp_folder, self.ws_key)
+
+        # the watershed was only recomputed for the blocks in the dirty regions (the first block),
+        # the ids of the other blocks were kept
+        with open(os.path.join(tmp_folder, "watershed.log")) as f:
+            self.assertIn("restricted to 1 /", f.read())
+        bb = np.s_[:, self.block_shape[1]:, :]
+        self.assertTrue(np.array_equal(seg[bb], seg_before[bb]))
+
+        # compare with the full computation on the edited affinities
+        self._set_dirty_regions_path(None)
+        full_tmp_folder = os.path.join(self.tmp_folder, "full")
+        self._run_workflows(full_tmp_folder, "watershed_full")
+        exp, exp_edges = self._load_results(full_tmp_folder, "watershed_full")
+        self._check_same_segmentation(seg, exp)
+        self.assertEqual(n_edges, exp_edges)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import unittest
+
+import numpy as np
+import luigi
+import z5py
+
+try:
+    from ..base import BaseTest
+except Exception:
+    sys.path.append(os.path.join(os.path.split(__file__)[0], ".."))
+    from base import BaseTest
+
+
+class TestFusedWatershed(BaseTest):
+    input_key = "volumes/affinities"
+    output_key = "watershed"
+    fused_key = "fused_watershed"
+
+    def setUp(self):
+        super().setUp()
+        # enable the speculative execution, which must not be used for the fused watershed
+        conf_path = os.path.join(self.config_folder, "global.config")
+        with open(conf_path) as f:
+            global_config = json.load(f)
+        global_config["speculative_fraction"] = 0.5
+        with open(conf_path, "w") as f:
+            json.dump(global_config, f)
+
+        from cluster_tools.watershed import WatershedWorkflow
+        config = WatershedWorkflow.get_config()["watershed"]
+        config["apply_presmooth_2d"] = True
+        config["apply_dt_2d"] = True
+        config["apply_ws_2d"] = True
+        config["threshold"] = 0.25
+        config["sigma_weights"] = 0.
+        config["halo"] = [0, 32, 32]
+        for name in ("watershed", "fused_watershed"):
+            with open(os.path.join(self.config_folder, "%s.config" % name), "w") as f:
+                json.dump(config, f)
+
+    def _run_ws(self, output_key, tmp_folder, fuse_relabel):
+        from cluster_tools.watershed import WatershedWorkflow
+        task = WatershedWorkflow(input_path=self.input_path,
+                                 input_key=self.input_key,
+                                 output_path=self.output_path,
+                                 output_key=output_key,
+                                 config_dir=self.config_folder,
+                                 tmp_folder=tmp_folder,
+                                 target=self.target,
+                                 max_jobs=self.max_jobs,
+                                 fuse_relabel=fuse_relabel)
+        ret = luigi.build([task], local_scheduler=True)
+        self.assertTrue(ret)
+
+    def test_fused_watershed(self):
+        from cluster_tools.watershed.fused_watershed import FusedWatershedLocal
+        self.assertFalse(FusedWatershedLocal(tmp_folder=self.tmp_folder, config_dir=self.config_folder,
+                                             max_jobs=self.max_jobs, input_path=self.input_path,
+                                             input_key=self.input_key, output_path=self.output_path,
+                                             output_key=self.fused_key)._use_speculation())
+
+        self._run_ws(self.output_key, os.path.join(self.tmp_folder, "ws"), fuse_relabel=False)
+        fused_tmp_folder = os.path.join(self.tmp_folder, "fused")
+        self._run_ws(self.fused_key, fused_tmp_folder, fuse_relabel=True)
+
+        # the per job uniques were written for all jobs and no job was duplicated
+        with open(os.path.join(fused_tmp_folder, "fused_watershed.log")) as f:
+            self.assertNotIn("submitting copies", f.read())
+
+        with z5py.File(self.output_path, "r") as f:
+            exp = f[self.output_key][:]
+            res = f[self.fused_key][:]
+        self.assertEqual(res.shape, exp.shape)
+        self.assertNotIn(0, res)
+        self.assertTrue(np.array_equal(res, exp))
+
+
+if __name__ == "__main__":
+    unittest.main()
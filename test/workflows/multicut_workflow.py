@@ -42,6 +42,29 @@ class TestMulticutWorkflow(BaseTest):
         self.assertTrue(ret)
         self._check_result()
 
+    def test_in_memory(self):
+        from cluster_tools import MulticutSegmentationWorkflow, multicut_segmentation
+        task = MulticutSegmentationWorkflow
+        t = task(input_path=self.input_path, input_key=self.input_key,
+                 ws_path=self.input_path, ws_key=self.ws_key,
+                 problem_path=self.output_path, node_labels_key="node_labels",
+                 output_path=self.output_path, output_key="volumes/multicut",
+                 n_scales=0, skip_ws=True,
+                 config_dir=self.config_folder, tmp_folder=self.tmp_folder,
+                 target=self.target, max_jobs=self.max_jobs)
+        ret = luigi.build([t], local_scheduler=True)
+        self.assertTrue(ret)
+
+        with z5py.File(self.input_path, "r") as f:
+            boundaries = f[self.input_key][:]
+            ws = f[self.ws_key][:]
+        seg, intermediates = multicut_segmentation(boundaries, self.block_shape, watershed=ws,
+                                                   n_threads=self.max_jobs, return_intermediates=True)
+        with z5py.File(self.output_path, "r") as f:
+            self.assertTrue(np.array_equal(intermediates["uv_ids"], f["s0/graph/edges"][:]))
+            self.assertTrue(np.allclose(intermediates["costs"], f["s0/costs"][:]))
+            self.assertTrue(np.array_equal(seg, f["volumes/multicut"][:]))
+
 
 if __name__ == "__main__":
     unittest.main()